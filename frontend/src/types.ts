@@ -97,6 +97,7 @@ export interface TaskEvent {
   output_path?: string | null;
   level?: string;
   result?: TaskResult;
+  cache?: "hit" | "miss" | null;
 }
 
 export interface AppSettings {
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import multiprocessing
 import os
 import socket
 import sys
@@ -10,9 +11,19 @@ import uuid
 from pathlib import Path
 from typing import Any
 
-from python_backend.json_output import dumps_json_line
+from python_backend.json_output import write_json_line
 from python_backend.protocol import TaskRequest
-from python_backend.task_runner import iter_font_targets, list_font_targets, run_task
+from python_backend.task_runner import (
+    collect_font_target_results,
+    iter_font_targets,
+    list_font_targets,
+    run_task,
+)
+from python_backend.worker_warmup import (
+    WorkerWarmup,
+    request_warmup_targets,
+    resolve_warmup_targets,
+)
 
 
 PARENT_LIVENESS_ADDR_ENV = "EPUB_TOOL_PARENT_LIVENESS_ADDR"
@@ -94,7 +105,12 @@ def load_request_from_args(args: argparse.Namespace) -> TaskRequest:
             "options": json.loads(args.options_json or "{}"),
         }
 
-    return load_request_from_payload(payload)
+    request = load_request_from_payload(payload)
+    if getattr(args, "jobs", None) is not None:
+        request.options["max_workers"] = args.jobs
+    if getattr(args, "resume", False):
+        request.options["resume"] = True
+    return request
 
 
 def cmd_run(args: argparse.Namespace) -> int:
@@ -103,24 +119,23 @@ def cmd_run(args: argparse.Namespace) -> int:
     return 0 if result.ok else 1
 
 
+def stream_font_targets(input_files: list[str], max_workers: int | None) -> list[dict[str, Any]]:
+    """按完成顺序输出进度事件，返回按输入顺序排列的结果。"""
+    events = []
+    for event in iter_font_targets(input_files, max_workers):
+        events.append(event)
+        write_json_line(event)
+    return collect_font_target_results(events)
+
+
 def cmd_list_fonts_batch(args: argparse.Namespace) -> int:
-    results = []
-    for event in iter_font_targets(args.input_files):
-        results.append(event["result"])
-        sys.stdout.write(dumps_json_line(event) + "\n")
-        sys.stdout.flush()
-
-    sys.stdout.write(
-        dumps_json_line({"event": "font-targets.finished", "font_targets": results})
-        + "\n"
-    )
-    sys.stdout.flush()
+    results = stream_font_targets(args.input_files, args.jobs)
+    write_json_line({"event": "font-targets.finished", "font_targets": results})
     return 0
 
 
 def cmd_list_fonts(args: argparse.Namespace) -> int:
-    payload = list_font_targets(args.input_file)
-    sys.stdout.write(dumps_json_line(payload) + "\n")
+    write_json_line(list_font_targets(args.input_file))
     return 0
 
 
@@ -134,17 +149,35 @@ def emit_worker_response(request_id: str, *, result: Any = None, error: str | No
         payload["result"] = result
     else:
         payload["error"] = error
-    sys.stdout.write(dumps_json_line(payload) + "\n")
-    sys.stdout.flush()
+    write_json_line(payload)
+
+
+def start_warmup(
+    warmup: WorkerWarmup, targets: list[str], request_id: str | None = None
+) -> list[str]:
+    """在后台预热目标，完成后输出一条 worker.warmup 事件。"""
+    resolved = resolve_warmup_targets(targets)
+
+    def emit_warmup_event(report: dict[str, Any]) -> None:
+        write_json_line({"event": "worker.warmup", "request_id": request_id, **report})
+
+    warmup.start(resolved, emit_warmup_event)
+    return resolved
 
 
-def cmd_serve(_args: argparse.Namespace) -> int:
+def cmd_serve(args: argparse.Namespace) -> int:
     """处理来自 Tauri 的长连接 JSON Lines 请求。
 
     请求按顺序执行，保证现有服务模块的全局 logger 替换和日志文件写入不发生
     并发冲突。任务事件会直接复用既有 stdout 协议，最后再发送 worker.response。
+    ``--preload`` 与 ``warmup`` 命令在后台线程加载模块，任务请求只等待自己
+    需要且仍在加载的模块。
     """
     start_parent_monitor()
+    warmup = WorkerWarmup()
+    preload = getattr(args, "preload", None)
+    if preload is not None:
+        start_warmup(warmup, preload)
     for raw_line in sys.stdin:
         line = raw_line.strip()
         if not line:
@@ -162,17 +195,21 @@ def cmd_serve(_args: argparse.Namespace) -> int:
                 request_payload = payload.get("request")
                 if not isinstance(request_payload, dict):
                     raise ValueError("run 请求缺少 request 对象")
-                result = run_task(load_request_from_payload(request_payload))
+                request = load_request_from_payload(request_payload)
+                warmup.wait_for(request_warmup_targets(request.task_type, request.options))
+                result = run_task(request)
                 emit_worker_response(request_id, result=result.to_dict())
+            elif command == "warmup":
+                targets = start_warmup(warmup, payload.get("targets"), request_id)
+                emit_worker_response(request_id, result={"targets": targets})
             elif command == "list-fonts-batch":
                 input_files = payload.get("input_files")
                 if not isinstance(input_files, list):
                     raise ValueError("list-fonts-batch 请求缺少 input_files 数组")
-                results = []
-                for event in iter_font_targets([str(path) for path in input_files]):
-                    results.append(event["result"])
-                    sys.stdout.write(dumps_json_line(event) + "\n")
-                    sys.stdout.flush()
+                results = stream_font_targets(
+                    [str(path) for path in input_files],
+                    payload.get("max_workers"),
+                )
                 emit_worker_response(request_id, result=results)
             else:
                 raise ValueError(f"不支持的 worker 命令: {command}")
@@ -208,6 +245,16 @@ def build_parser() -> argparse.ArgumentParser:
     run_parser.add_argument("--input-file", action="append")
     run_parser.add_argument("--output-dir")
     run_parser.add_argument("--options-json", help="任务选项 JSON")
+    run_parser.add_argument(
+        "--jobs",
+        type=int,
+        help="并行处理的进程数，等同于 options.max_workers；默认逐个处理",
+    )
+    run_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="按 task_id 的续跑日志跳过上次已完成且输入与选项未变化的文件，等同于 options.resume",
+    )
     run_parser.set_defaults(func=cmd_run)
 
     fonts_parser = subparsers.add_parser("list-fonts", help="列出可用字体 family")
@@ -218,9 +265,20 @@ def build_parser() -> argparse.ArgumentParser:
         "list-fonts-batch", help="批量列出可用字体 family"
     )
     fonts_batch_parser.add_argument("input_files", nargs="+")
+    fonts_batch_parser.add_argument(
+        "--jobs",
+        type=int,
+        help="并发扫描的线程数；进度事件按完成顺序输出，最终结果保持输入顺序",
+    )
     fonts_batch_parser.set_defaults(func=cmd_list_fonts_batch)
 
     serve_parser = subparsers.add_parser("serve", help="作为常驻 JSON Lines worker 运行")
+    serve_parser.add_argument(
+        "--preload",
+        nargs="*",
+        metavar="TARGET",
+        help="启动后在后台预热的任务模块或 ocr_backend；不带参数时预热字体任务与 OCR 会话",
+    )
     serve_parser.set_defaults(func=cmd_serve)
     return parser
 
@@ -237,4 +295,6 @@ def main(argv: list[str] | None = None) -> int:
 
 
 if __name__ == "__main__":
+    # PyInstaller 冻结的 sidecar 需要让进程池子进程走 multiprocessing 的入口。
+    multiprocessing.freeze_support()
     raise SystemExit(main())
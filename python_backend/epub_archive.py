@@ -0,0 +1,175 @@
+"""EPUB 归档写出的共享工具。
+
+未修改的成员通过 ``copy_zip_entry`` 直接复制源归档中的压缩数据与 CRC，
+避免字体、图片、音频等资源在输出时被解压再重新压缩。标准库 ``zipfile``
+没有公开的原始复制接口，这里按其写入流程直接追加本地文件头与压缩数据，
+并把条目登记到目标归档的中央目录；遇到无法安全原样复制的条目时回退为
+解压后重新压缩。
+
+``DeflatedEntry`` 则允许在写出线程之外预先完成 deflate 压缩与 CRC 计算，
+写出线程只需按顺序追加压缩数据。
+"""
+
+from __future__ import annotations
+
+import shutil
+import struct
+import time
+import zipfile
+import zlib
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import BinaryIO
+
+
+COPY_CHUNK_SIZE = 1024 * 1024
+DATA_DESCRIPTOR_FLAG = 0x08
+RAW_COPY_COMPRESS_TYPES = frozenset({zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED})
+
+
+class _RawEntryReader:
+    """在持有源归档锁期间顺序读取一个条目的压缩数据。"""
+
+    def __init__(self, source: zipfile.ZipFile, info: zipfile.ZipInfo) -> None:
+        self.source = source
+        self.remaining = info.compress_size
+        self.position = self._data_offset(info)
+
+    def _data_offset(self, info: zipfile.ZipInfo) -> int:
+        fp = self.source.fp
+        fp.seek(info.header_offset)
+        header = fp.read(zipfile.sizeFileHeader)
+        if len(header) != zipfile.sizeFileHeader:
+            raise zipfile.BadZipFile(f"ZIP 本地文件头被截断: {info.filename}")
+        fields = struct.unpack(zipfile.structFileHeader, header)
+        if fields[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"ZIP 本地文件头无效: {info.filename}")
+        name_length = fields[zipfile._FH_FILENAME_LENGTH]
+        extra_length = fields[zipfile._FH_EXTRA_FIELD_LENGTH]
+        return info.header_offset + zipfile.sizeFileHeader + name_length + extra_length
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        fp = self.source.fp
+        fp.seek(self.position)
+        data = fp.read(size)
+        if not data:
+            raise zipfile.BadZipFile("ZIP 压缩数据被截断")
+        self.position += len(data)
+        self.remaining -= len(data)
+        return data
+
+
+def _can_append_raw(target: zipfile.ZipFile) -> bool:
+    return (
+        target.fp is not None
+        and getattr(target, "_seekable", False)
+        and not getattr(target, "_writing", False)
+    )
+
+
+def can_raw_copy(
+    source: zipfile.ZipFile, info: zipfile.ZipInfo, target: zipfile.ZipFile
+) -> bool:
+    return (
+        info.compress_type in RAW_COPY_COMPRESS_TYPES
+        and not info.is_dir()
+        and source.fp is not None
+        and _can_append_raw(target)
+    )
+
+
+def _append_raw_entry(
+    target: zipfile.ZipFile,
+    zinfo: zipfile.ZipInfo,
+    write_payload: Callable[[BinaryIO], None],
+) -> None:
+    """在持有目标归档锁时追加本地文件头与压缩数据，并登记到中央目录。"""
+    target.fp.seek(target.start_dir)
+    zinfo.header_offset = target.fp.tell()
+    target._writecheck(zinfo)
+    target._didModify = True
+    target.fp.write(zinfo.FileHeader())
+    write_payload(target.fp)
+    target.start_dir = target.fp.tell()
+    target.filelist.append(zinfo)
+    target.NameToInfo[zinfo.filename] = zinfo
+
+
+def copy_zip_entry(
+    source: zipfile.ZipFile,
+    member: str | zipfile.ZipInfo,
+    target: zipfile.ZipFile,
+    arcname: str | None = None,
+) -> bool:
+    """把源归档成员复制到目标归档，返回是否按压缩数据原样复制。
+
+    成员不存在时与 ``ZipFile.getinfo`` 一样抛出 ``KeyError``。
+    """
+    info = member if isinstance(member, zipfile.ZipInfo) else source.getinfo(member)
+    arcname = arcname or info.filename
+    if not can_raw_copy(source, info, target):
+        target.writestr(arcname, source.read(info), compress_type=zipfile.ZIP_DEFLATED)
+        return False
+
+    zinfo = zipfile.ZipInfo(arcname, date_time=info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.flag_bits = info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+    zinfo.CRC = info.CRC
+    zinfo.compress_size = info.compress_size
+    zinfo.file_size = info.file_size
+    zinfo.external_attr = info.external_attr or (0o600 << 16)
+    zinfo.internal_attr = info.internal_attr
+
+    def write_payload(fp: BinaryIO) -> None:
+        shutil.copyfileobj(reader, fp, COPY_CHUNK_SIZE)
+        if reader.remaining:
+            raise zipfile.BadZipFile(f"ZIP 压缩数据被截断: {info.filename}")
+
+    with source._lock, target._lock:
+        reader = _RawEntryReader(source, info)
+        _append_raw_entry(target, zinfo, write_payload)
+    return True
+
+
+@dataclass(slots=True)
+class DeflatedEntry:
+    """预先按 ``zipfile`` 默认参数 deflate 压缩的条目数据。"""
+
+    data: bytes
+    compressed: bytes
+    crc: int
+
+    @classmethod
+    def compress(cls, data: bytes) -> "DeflatedEntry":
+        # zlib 的压缩与 CRC 计算会释放 GIL，可在线程池中并行执行。
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        return cls(data=data, compressed=compressed, crc=zlib.crc32(data))
+
+
+def write_deflated_entry(
+    target: zipfile.ZipFile, arcname: str, entry: DeflatedEntry
+) -> bool:
+    """写入预先压缩的条目，返回是否直接追加了压缩数据。
+
+    目标归档不支持追加原始数据时回退为 ``writestr`` 重新压缩。
+    """
+    if not _can_append_raw(target):
+        target.writestr(arcname, entry.data, compress_type=zipfile.ZIP_DEFLATED)
+        return False
+
+    zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime(time.time())[:6])
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = entry.crc
+    zinfo.compress_size = len(entry.compressed)
+    zinfo.file_size = len(entry.data)
+    zinfo.external_attr = 0o600 << 16
+
+    with target._lock:
+        _append_raw_entry(target, zinfo, lambda fp: fp.write(entry.compressed))
+    return True
+
@@ -7,6 +7,7 @@ import zipfile
 from pathlib import Path
 from xml.etree import ElementTree
 
+from python_backend.epub_archive import copy_zip_entry
 
 TOOL_META_NAME = "generator"
 TOOL_META_CONTENT = "Epub Tool"
@@ -96,6 +97,25 @@ def add_tool_meta_to_opf(opf_text: str) -> tuple[str, bool]:
     raise RuntimeError("content.opf 缺少 package 节点，无法写入工具元数据")
 
 
+def mark_opf_generated_by_tool(opf_text: str) -> str:
+    """在任务写出 OPF 时直接加入工具元数据，收尾阶段即可跳过整本重新打包。
+
+    OPF 缺少 package 节点时原样返回，由 ``mark_epub_generated_by_tool`` 统一报错。
+    """
+    try:
+        return add_tool_meta_to_opf(opf_text)[0]
+    except RuntimeError:
+        return opf_text
+
+
+def mark_opf_bytes_generated_by_tool(opf_data: bytes) -> bytes:
+    opf_text = decode_xml(opf_data)
+    if has_tool_meta(opf_text):
+        return opf_data
+    marked = mark_opf_generated_by_tool(opf_text)
+    return opf_data if marked == opf_text else marked.encode("utf-8")
+
+
 def has_tool_meta(opf_text: str) -> bool:
     try:
         root = ElementTree.fromstring(opf_text)
@@ -189,12 +209,10 @@ def build_epub_with_replaced_opf(
     try:
         with zipfile.ZipFile(temp_path, "w") as target:
             for info in source.infolist():
-                content = (
-                    opf_text.encode("utf-8")
-                    if info.filename == opf_path
-                    else source.read(info)
-                )
-                target.writestr(info, content)
+                if info.filename == opf_path:
+                    target.writestr(info, opf_text.encode("utf-8"))
+                else:
+                    copy_zip_entry(source, info, target)
         return temp_path
     except Exception:
         if temp_path.exists():
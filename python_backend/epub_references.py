@@ -0,0 +1,471 @@
+"""EPUB 成员之间的引用索引。
+
+文档（XHTML、CSS、SVG、NCX）只扫描一次，记录每个引用指向的成员、所在属性
+与引用值在文档中的字节区间，并维护 目标成员 -> 引用它的文档 的反向映射。
+图片与封面任务替换资源路径时，据此只改写确实引用了被替换成员的文档，
+并且只拼接受影响的区间，不再对整本书的每个文档重跑全部正则替换。
+同一索引也用于找出从 spine、目录与封面出发不可达的资源（``unreachable_members``）。
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import TYPE_CHECKING
+from urllib.parse import quote, unquote
+
+from python_backend.epub_workspace import replace_reference_path, resolve_reference
+
+if TYPE_CHECKING:
+    from python_backend.epub_workspace import EpubWorkspace
+
+DOCUMENT_SUFFIXES = frozenset({".xhtml", ".html", ".htm", ".css", ".svg", ".ncx", ".smil"})
+# 无引用时可以安全删除的资源类型；其余成员（OPF、NCX、脚本等）总是保留，
+# 并作为可达性遍历的起点。
+PRUNABLE_SUFFIXES = frozenset(
+    {
+        ".xhtml", ".html", ".htm", ".css", ".svg",
+        ".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp",
+        ".ttf", ".otf", ".woff", ".woff2",
+        ".mp3", ".mp4",
+    }
+)
+REFERENCE_ATTRIBUTES_RE = re.compile(
+    rb"(?P<prefix>\b(?P<attribute>src|href|xlink:href|poster)\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])",
+    re.IGNORECASE,
+)
+SRCSET_RE = re.compile(rb"(?P<prefix>\bsrcset\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])", re.IGNORECASE)
+CSS_URL_RE = re.compile(rb"(?P<prefix>url\(\s*[\"']?)(?P<value>[^\"')]+)(?P<suffix>[\"']?\s*\))", re.IGNORECASE)
+# 建索引时在 ASCII 小写副本上匹配与上面等价的模式：字节区间与原文一致，而区分大小写
+# 的模式可以走字面前缀快速查找，比 IGNORECASE 快数倍。开头的 \b 由 _iter_word_matches 判断。
+SCAN_ATTRIBUTES_RE = re.compile(rb"(?P<attribute>src|href|xlink:href|poster)\s*=\s*[\"'](?P<value>[^\"']+)[\"']")
+SCAN_SRCSET_RE = re.compile(rb"srcset\s*=\s*[\"'](?P<value>[^\"']+)[\"']")
+SCAN_CSS_URL_RE = re.compile(rb"url\(\s*[\"']?(?P<value>[^\"')]+)[\"']?\s*\)")
+# ``@import "a.css"`` 只用于可达性；rewrite_document 不改写它，索引的 rewrite 也跳过。
+SCAN_CSS_IMPORT_RE = re.compile(rb"@import\s+[\"'](?P<value>[^\"']+)[\"']")
+WORD_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+# 可达性判断额外识别的链接：``<object data>`` 等属性，以及 HTML 允许的不带引号的属性值。
+# 这些引用只用于判断是否可以删除，不参与改写。
+LINK_ATTRIBUTES_RE = re.compile(
+    rb"(?<![\w:-])(?:src|href|xlink:href|poster|data|background|longdesc|altimg)\s*=\s*"
+    rb"(?:\"(?P<double>[^\"]*)\"|'(?P<single>[^']*)'|(?P<bare>[^\s\"'<>=`]+))"
+)
+# 脚本与文档正文中形如文件名的片段；可删除成员的文件名出现在其中即视为被引用。
+FILE_NAME_TOKEN_RE = re.compile(rb"[^\s\"'<>()\[\]{}\\/,;=|]+\.[0-9a-z]+")
+SCRIPT_SUFFIXES = frozenset({".js"})
+OPF_ITEM_RE = re.compile(rb"(?P<prefix><item\b)(?P<attributes>[^>]*)(?P<suffix>/?>)", re.IGNORECASE)
+OPF_HREF_RE = re.compile(
+    rb"(?P<prefix>\bhref\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])",
+    re.IGNORECASE,
+)
+OPF_ID_RE = re.compile(rb"(?<![\w:-])id\s*=\s*[\"'](?P<value>[^\"']+)[\"']", re.IGNORECASE)
+OPF_PROPERTIES_RE = re.compile(
+    rb"(?P<prefix>\bproperties\s*=\s*[\"'])(?P<value>[^\"']*)(?P<suffix>[\"'])",
+    re.IGNORECASE,
+)
+OPF_IDREF_RE = re.compile(rb"<itemref\b[^>]*\bidref\s*=\s*[\"'](?P<value>[^\"']+)[\"']", re.IGNORECASE)
+OPF_META_RE = re.compile(rb"<meta\b[^>]*>", re.IGNORECASE)
+OPF_COVER_NAME_RE = re.compile(rb"\bname\s*=\s*[\"']cover[\"']", re.IGNORECASE)
+OPF_META_CONTENT_RE = re.compile(
+    rb"(?P<prefix>\bcontent\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])",
+    re.IGNORECASE,
+)
+OPF_SPINE_TOC_RE = re.compile(rb"<spine\b[^>]*\btoc\s*=\s*[\"'](?P<value>[^\"']+)[\"']", re.IGNORECASE)
+OPF_GUIDE_HREF_RE = re.compile(rb"<reference\b[^>]*\bhref\s*=\s*[\"'](?P<value>[^\"']+)[\"']", re.IGNORECASE)
+OPF_ITEM_LINK_RE = re.compile(
+    rb"\b(?:fallback|media-overlay)\s*=\s*[\"'](?P<value>[^\"']+)[\"']", re.IGNORECASE
+)
+
+
+def is_document(name: str) -> bool:
+    return PurePosixPath(name).suffix.lower() in DOCUMENT_SUFFIXES
+
+
+def rewrite_reference(reference: str, document_path: str, replacements: dict[str, str]) -> str:
+    """若引用指向 ``replacements`` 中的成员，返回改指新路径的引用，否则原样返回。"""
+    try:
+        resolved = resolve_reference(document_path, reference)
+    except ValueError:
+        return reference
+    target = replacements.get(resolved or "")
+    if not target:
+        return reference
+    rewritten = replace_reference_path(reference, document_path, target)
+    path, marker, suffix = rewritten.partition("?")
+    if not marker:
+        path, marker, suffix = rewritten.partition("#")
+        return quote(path, safe="/.:@~!$&'()*+,;=-_") + (marker + suffix if marker else "")
+    return quote(path, safe="/.:@~!$&'()*+,;=-_") + marker + suffix
+
+
+def _iter_srcset_urls(value: str) -> Iterator[tuple[int, int]]:
+    """产出 srcset 中每个候选 URL 的字符区间，分隔符与宽度描述符不在区间内。"""
+    position = 0
+    while position < len(value):
+        while position < len(value) and (value[position].isspace() or value[position] == ","):
+            position += 1
+        if position >= len(value):
+            break
+
+        url_start = position
+        is_data_uri = value[position:].lower().startswith("data:")
+        while position < len(value) and not value[position].isspace() and (
+            is_data_uri or value[position] != ","
+        ):
+            position += 1
+        url_end = url_start + len(value[url_start:position].rstrip(","))
+        yield url_start, url_end
+        if url_end != position:
+            continue
+
+        parenthesis_depth = 0
+        while position < len(value):
+            char = value[position]
+            position += 1
+            if char == "(":
+                parenthesis_depth += 1
+            elif char == ")":
+                parenthesis_depth = max(0, parenthesis_depth - 1)
+            elif char == "," and parenthesis_depth == 0:
+                break
+
+
+def rewrite_document(data: bytes, document_path: str, replacements: dict[str, str]) -> bytes:
+    """对整个文档依次改写引用属性、srcset 与 CSS ``url()``。"""
+
+    def replace_attribute(match: re.Match[bytes]) -> bytes:
+        value = match.group("value").decode("utf-8", "surrogateescape")
+        rewritten = rewrite_reference(value, document_path, replacements)
+        return match.group("prefix") + rewritten.encode("utf-8", "surrogateescape") + match.group("suffix")
+
+    def replace_srcset(match: re.Match[bytes]) -> bytes:
+        value = match.group("value").decode("utf-8", "surrogateescape")
+        rewritten: list[str] = []
+        position = 0
+        for start, end in _iter_srcset_urls(value):
+            rewritten.append(value[position:start])
+            rewritten.append(rewrite_reference(value[start:end], document_path, replacements))
+            position = end
+        rewritten.append(value[position:])
+        encoded = "".join(rewritten).encode("utf-8", "surrogateescape")
+        return match.group("prefix") + encoded + match.group("suffix")
+
+    result = REFERENCE_ATTRIBUTES_RE.sub(replace_attribute, data)
+    result = SRCSET_RE.sub(replace_srcset, result)
+    return CSS_URL_RE.sub(replace_attribute, result)
+
+
+@dataclass(slots=True)
+class Reference:
+    """文档中的一处引用；``start``/``end`` 为引用值在文档中的字节区间。"""
+
+    source: str
+    target: str
+    attribute: str
+    start: int
+    end: int
+
+
+def _resolved(document_path: str, raw: bytes) -> str | None:
+    try:
+        return resolve_reference(document_path, raw.decode("utf-8", "surrogateescape"))
+    except ValueError:
+        return None
+
+
+def _iter_word_matches(pattern: re.Pattern[bytes], data: bytes) -> Iterator[re.Match[bytes]]:
+    """与在 ``pattern`` 前加 ``\\b`` 后 ``finditer`` 的结果相同。"""
+    position = 0
+    while (match := pattern.search(data, position)) is not None:
+        start = match.start()
+        if start and data[start - 1] in WORD_BYTES:
+            position = start + 1
+            continue
+        yield match
+        position = match.end()
+
+
+def scan_references(data: bytes, document_path: str) -> list[Reference]:
+    """按在文档中的位置顺序返回 ``rewrite_document`` 会处理的全部本地引用。"""
+    lowered = data.lower()
+    references: list[Reference] = []
+    for match in _iter_word_matches(SCAN_ATTRIBUTES_RE, lowered):
+        start, end = match.span("value")
+        target = _resolved(document_path, data[start:end])
+        if target:
+            references.append(
+                Reference(document_path, target, match.group("attribute").decode("ascii"), start, end)
+            )
+    for match in _iter_word_matches(SCAN_SRCSET_RE, lowered):
+        offset, end = match.span("value")
+        value = data[offset:end].decode("utf-8", "surrogateescape")
+        for start, end in _iter_srcset_urls(value):
+            target = _resolved(document_path, value[start:end].encode("utf-8", "surrogateescape"))
+            if target:
+                byte_start = offset + len(value[:start].encode("utf-8", "surrogateescape"))
+                byte_end = byte_start + len(value[start:end].encode("utf-8", "surrogateescape"))
+                references.append(Reference(document_path, target, "srcset", byte_start, byte_end))
+    for match in SCAN_CSS_URL_RE.finditer(lowered):
+        start, end = match.span("value")
+        target = _resolved(document_path, data[start:end])
+        if target:
+            references.append(Reference(document_path, target, "url", start, end))
+    for match in SCAN_CSS_IMPORT_RE.finditer(lowered):
+        start, end = match.span("value")
+        target = _resolved(document_path, data[start:end])
+        if target:
+            references.append(Reference(document_path, target, "import", start, end))
+    references.sort(key=lambda reference: reference.start)
+    return references
+
+
+class ReferenceIndex:
+    """文档到被引用成员的正向索引与反向索引。
+
+    通过 ``rewrite`` 改写的文档会自动重新索引；调用方若直接修改了文档内容，
+    需要调用 ``update`` 或 ``discard`` 保持索引与成员一致。
+    """
+
+    def __init__(self) -> None:
+        self.outgoing: dict[str, list[Reference]] = {}
+        self.incoming: dict[str, dict[str, None]] = {}
+        # 引用值区间互相重叠的文档（如 src="url(a.png)"）无法逐区间拼接，
+        # 改写时回退为整篇 rewrite_document。
+        self.overlapping: set[str] = set()
+
+    @classmethod
+    def build(cls, members: Mapping[str, bytes]) -> "ReferenceIndex":
+        index = cls()
+        for name in members:
+            if is_document(name):
+                index.update(name, members[name])
+        return index
+
+    def update(self, name: str, data: bytes) -> None:
+        """重新扫描文档；已索引的文档保持原有顺序。"""
+        self._unlink(name)
+        references = scan_references(data, name)
+        self.outgoing[name] = references
+        self.overlapping.discard(name)
+        end = 0
+        for reference in references:
+            self.incoming.setdefault(reference.target, {})[name] = None
+            if reference.start < end:
+                self.overlapping.add(name)
+            end = max(end, reference.end)
+
+    def discard(self, name: str) -> None:
+        """从索引中移除被删除的成员。"""
+        self._unlink(name)
+        self.outgoing.pop(name, None)
+        self.overlapping.discard(name)
+
+    def references_from(self, name: str) -> list[Reference]:
+        return list(self.outgoing.get(name, ()))
+
+    def references_to(self, target: str) -> list[Reference]:
+        return [
+            reference
+            for source in self.incoming.get(target, ())
+            for reference in self.outgoing[source]
+            if reference.target == target
+        ]
+
+    def referencing_documents(self, targets: Iterable[str]) -> list[str]:
+        """按成员顺序返回引用了任一目标成员的文档。"""
+        sources: set[str] = set()
+        for target in targets:
+            sources.update(self.incoming.get(target, ()))
+        return [name for name in self.outgoing if name in sources]
+
+    def rewrite(self, members: MutableMapping[str, bytes], replacements: dict[str, str]) -> list[str]:
+        """把引用了 ``replacements`` 中成员的文档改指新路径，返回实际改动的文档。"""
+        changed: list[str] = []
+        for name in self.referencing_documents(replacements):
+            if name not in members:
+                continue
+            data = members[name]
+            if name in self.overlapping:
+                rewritten = rewrite_document(data, name, replacements)
+            else:
+                pieces: list[bytes] = []
+                position = 0
+                for reference in self.outgoing[name]:
+                    if reference.target not in replacements or reference.attribute == "import":
+                        continue
+                    value = data[reference.start : reference.end].decode("utf-8", "surrogateescape")
+                    pieces.append(data[position : reference.start])
+                    pieces.append(
+                        rewrite_reference(value, name, replacements).encode("utf-8", "surrogateescape")
+                    )
+                    position = reference.end
+                pieces.append(data[position:])
+                rewritten = b"".join(pieces)
+            if rewritten != data:
+                members[name] = rewritten
+                self.update(name, rewritten)
+                changed.append(name)
+        return changed
+
+    def _unlink(self, name: str) -> None:
+        for reference in self.outgoing.get(name, ()):
+            sources = self.incoming.get(reference.target)
+            if sources is not None:
+                sources.pop(name, None)
+                if not sources:
+                    del self.incoming[reference.target]
+
+
+def manifest_items(opf_path: str, opf: bytes) -> dict[str, tuple[bytes, bytes]]:
+    """返回 成员路径 -> (item id, properties)。"""
+    items: dict[str, tuple[bytes, bytes]] = {}
+    for match in OPF_ITEM_RE.finditer(opf):
+        attributes = match.group("attributes")
+        href_match = OPF_HREF_RE.search(attributes)
+        id_match = OPF_ID_RE.search(attributes)
+        if href_match is None or id_match is None:
+            continue
+        path = _resolved(opf_path, href_match.group("value"))
+        if path:
+            properties_match = OPF_PROPERTIES_RE.search(attributes)
+            items[path] = (
+                id_match.group("value"),
+                properties_match.group("value") if properties_match else b"",
+            )
+    return items
+
+
+def prune_roots(opf_path: str, opf: bytes) -> list[str]:
+    """返回可达性遍历的起点成员。
+
+    包括 spine 与 NCX、导航文档、封面（``cover-image`` 属性或 ``<meta name="cover">``）、
+    guide 引用，以及 manifest 中 ``fallback``/``media-overlay`` 指向的条目。
+    """
+    items = manifest_items(opf_path, opf)
+    path_by_id = {item_id: path for path, (item_id, _properties) in items.items()}
+    root_ids = {match.group("value") for match in OPF_IDREF_RE.finditer(opf)}
+    root_ids.update(match.group("value") for match in OPF_SPINE_TOC_RE.finditer(opf))
+    root_ids.update(match.group("value") for match in OPF_ITEM_LINK_RE.finditer(opf))
+    for meta in OPF_META_RE.finditer(opf):
+        content_match = OPF_META_CONTENT_RE.search(meta.group(0))
+        if OPF_COVER_NAME_RE.search(meta.group(0)) and content_match is not None:
+            root_ids.add(content_match.group("value"))
+    roots = [path_by_id[item_id] for item_id in root_ids if item_id in path_by_id]
+    roots.extend(
+        path
+        for path, (_item_id, properties) in items.items()
+        if {b"nav", b"cover-image"} & set(properties.split())
+    )
+    for match in OPF_GUIDE_HREF_RE.finditer(opf):
+        path = _resolved(opf_path, match.group("value"))
+        if path:
+            roots.append(path)
+    return roots
+
+
+def _iter_linked_paths(data: bytes, document_path: str) -> Iterator[str]:
+    """产出索引之外、只用于可达性判断的链接目标（已转为小写）。"""
+    lowered = data.lower()
+    for match in LINK_ATTRIBUTES_RE.finditer(lowered):
+        group = next(name for name in ("double", "single", "bare") if match.group(name) is not None)
+        start, end = match.span(group)
+        target = _resolved(document_path, data[start:end].strip())
+        if target:
+            yield target.lower()
+
+
+def _file_name_tokens(data: bytes) -> set[str]:
+    tokens: set[str] = set()
+    for match in FILE_NAME_TOKEN_RE.finditer(data.lower()):
+        token = match.group(0).decode("utf-8", "surrogateescape")
+        tokens.add(token)
+        tokens.add(unquote(token))
+    return tokens
+
+
+def unreachable_members(
+    names: Iterable[str],
+    roots: Iterable[str],
+    index: ReferenceIndex,
+    texts: Mapping[str, bytes],
+) -> list[str]:
+    """按 ``names`` 的顺序返回从 ``roots`` 沿引用不可达的可删除成员。
+
+    不在 ``PRUNABLE_SUFFIXES`` 中的成员总是保留，也作为遍历起点。删除无法撤销，
+    判断一律偏向保留：除索引中的引用外，可达文档里 ``<object data>`` 等属性、
+    不带引号的属性值也算引用；可达文档或脚本（从 ``texts`` 读取）中只要出现了
+    成员的文件名，该成员也视为可达。路径与文件名比较都不区分大小写。
+    """
+    names = list(names)
+    members_by_lower: dict[str, list[str]] = {}
+    for name in names:
+        members_by_lower.setdefault(name.lower(), []).append(name)
+    for name in index.outgoing:
+        members_by_lower.setdefault(name.lower(), []).append(name)
+    # 尚未可达的可删除成员：文件名（小写）-> 成员路径（小写）。
+    unreached_by_file_name: dict[str, set[str]] = {}
+    for name in names:
+        if PurePosixPath(name).suffix.lower() in PRUNABLE_SUFFIXES:
+            lowered = name.lower()
+            unreached_by_file_name.setdefault(PurePosixPath(lowered).name, set()).add(lowered)
+
+    # 含空格等分隔符的文件名切不成单个片段，改为在全文中查找。
+    tokenizable = {
+        file_name
+        for file_name in unreached_by_file_name
+        if FILE_NAME_TOKEN_RE.fullmatch(file_name.encode("utf-8", "surrogateescape"))
+    }
+
+    pending = [root.lower() for root in roots]
+    pending.extend(
+        name.lower()
+        for name in names
+        if PurePosixPath(name).suffix.lower() not in PRUNABLE_SUFFIXES
+    )
+    reached: set[str] = set()
+    while pending:
+        current = pending.pop()
+        if current in reached:
+            continue
+        reached.add(current)
+        file_name = PurePosixPath(current).name
+        waiting = unreached_by_file_name.get(file_name)
+        if waiting is not None:
+            waiting.discard(current)
+            if not waiting:
+                del unreached_by_file_name[file_name]
+        for name in dict.fromkeys(members_by_lower.get(current, ())):
+            for reference in index.outgoing.get(name, ()):
+                pending.append(reference.target.lower())
+            suffix = PurePosixPath(name).suffix.lower()
+            if suffix not in DOCUMENT_SUFFIXES and suffix not in SCRIPT_SUFFIXES:
+                continue
+            data = texts.get(name)
+            if not data:
+                continue
+            pending.extend(_iter_linked_paths(data, name))
+            if not unreached_by_file_name:
+                continue
+            tokens = _file_name_tokens(data)
+            lowered_text = data.lower().decode("utf-8", "surrogateescape")
+            mentioned = [
+                file_name
+                for file_name in unreached_by_file_name
+                if file_name in tokens or (file_name not in tokenizable and file_name in lowered_text)
+            ]
+            for file_name in mentioned:
+                pending.extend(unreached_by_file_name.pop(file_name))
+    return [
+        name
+        for name in names
+        if PurePosixPath(name).suffix.lower() in PRUNABLE_SUFFIXES and name.lower() not in reached
+    ]
+
+
+def reference_index(workspace: EpubWorkspace) -> ReferenceIndex:
+    """返回工作区的引用索引；首次调用时扫描全部文档，之后复用。"""
+    if workspace.references is None:
+        workspace.references = ReferenceIndex.build(workspace.members)
+    return workspace.references
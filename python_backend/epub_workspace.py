@@ -2,19 +2,29 @@ from __future__ import annotations
 
 import os
 import posixpath
+import shutil
 import tempfile
+import time
 import zipfile
+from collections.abc import Iterator, MutableMapping
 from dataclasses import dataclass
 from pathlib import Path, PurePosixPath
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol
 from urllib.parse import unquote, urlsplit, urlunsplit
 from xml.etree import ElementTree
 
+from python_backend.epub_archive import copy_zip_entry
+from python_backend.epub_metadata import mark_opf_bytes_generated_by_tool
+
+if TYPE_CHECKING:
+    from python_backend.epub_references import ReferenceIndex
 
 MIMETYPE = b"application/epub+zip"
 MAX_MEMBER_SIZE = 128 * 1024 * 1024
 MAX_TOTAL_SIZE = 768 * 1024 * 1024
 MAX_COMPRESSION_RATIO = 1000
+LAZY_MEMORY_BUDGET = 64 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
 
 
 class LoggerLike(Protocol):
@@ -60,24 +70,134 @@ def media_type_for(path: str) -> str:
     }.get(PurePosixPath(path).suffix.lower(), "application/octet-stream")
 
 
+@dataclass(slots=True)
+class SpilledMember:
+    path: Path
+    size: int
+
+
+class LazyMembers(MutableMapping[str, bytes]):
+    """按需读取的 EPUB 成员映射。
+
+    未修改的成员只保留源归档中的 ``ZipInfo``，读取时临时解压且不缓存；
+    被赋值的成员先保存在内存中，超过 ``memory_budget`` 后转存到临时目录。
+    因此常驻内存只与修改量和单个最大成员相关，而不是整本书的解压大小。
+    """
+
+    def __init__(
+        self,
+        archive: zipfile.ZipFile,
+        entries: dict[str, zipfile.ZipInfo],
+        *,
+        memory_budget: int = LAZY_MEMORY_BUDGET,
+    ) -> None:
+        self.archive = archive
+        self.entries: dict[str, zipfile.ZipInfo | bytes | SpilledMember] = dict(entries)
+        self.memory_budget = memory_budget
+        self.memory_size = 0
+        self.spill_dir: tempfile.TemporaryDirectory[str] | None = None
+
+    def __getitem__(self, name: str) -> bytes:
+        entry = self.entries[name]
+        if isinstance(entry, zipfile.ZipInfo):
+            return self.archive.read(entry)
+        if isinstance(entry, SpilledMember):
+            return entry.path.read_bytes()
+        return entry
+
+    def __setitem__(self, name: str, data: bytes) -> None:
+        data = bytes(data)
+        self._release(name)
+        if self.memory_size + len(data) > self.memory_budget:
+            self.entries[name] = self._spill(data)
+        else:
+            self.entries[name] = data
+            self.memory_size += len(data)
+
+    def __delitem__(self, name: str) -> None:
+        self._release(name)
+        del self.entries[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def source_info(self, name: str) -> zipfile.ZipInfo | None:
+        """返回未修改成员在源归档中的 ZipInfo；已修改或新增成员返回 None。"""
+        entry = self.entries[name]
+        return entry if isinstance(entry, zipfile.ZipInfo) else None
+
+    def copy_to(self, name: str, target: zipfile.ZipFile) -> None:
+        """把成员写入目标归档：未修改成员原样复制压缩数据，转存成员流式压缩。"""
+        entry = self.entries[name]
+        if isinstance(entry, bytes):
+            target.writestr(name, entry, compress_type=zipfile.ZIP_DEFLATED)
+            return
+        if isinstance(entry, zipfile.ZipInfo):
+            copy_zip_entry(self.archive, entry, target, name)
+            return
+        info = zipfile.ZipInfo(name, date_time=time.localtime(time.time())[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.file_size = entry.size
+        with entry.path.open("rb") as source, target.open(info, "w") as destination:
+            shutil.copyfileobj(source, destination, COPY_CHUNK_SIZE)
+
+    def close(self) -> None:
+        self.archive.close()
+        if self.spill_dir is not None:
+            self.spill_dir.cleanup()
+            self.spill_dir = None
+
+    def _release(self, name: str) -> None:
+        entry = self.entries.get(name)
+        if isinstance(entry, bytes):
+            self.memory_size -= len(entry)
+        elif isinstance(entry, SpilledMember):
+            entry.path.unlink(missing_ok=True)
+
+    def _spill(self, data: bytes) -> SpilledMember:
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.TemporaryDirectory(prefix="epub-tool-workspace-")
+        fd, name = tempfile.mkstemp(dir=self.spill_dir.name)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        return SpilledMember(Path(name), len(data))
+
+
 @dataclass(slots=True)
 class EpubWorkspace:
     input_path: Path
-    members: dict[str, bytes]
+    members: dict[str, bytes] | LazyMembers
     opf_path: str
+    # 由 epub_references.reference_index 按需构建并缓存。
+    references: ReferenceIndex | None = None
 
     @classmethod
     def load(
-        cls, input_path: str | Path, *, logger: LoggerLike | None = None
+        cls,
+        input_path: str | Path,
+        *,
+        logger: LoggerLike | None = None,
+        lazy: bool = False,
     ) -> "EpubWorkspace":
+        """读取并校验 EPUB。
+
+        ``lazy=True`` 时成员内容不预先解压，源归档保持打开直到 ``close``；
+        调用方应使用 ``with`` 或显式关闭工作区。
+        """
         path = Path(input_path)
-        members: dict[str, bytes] = {}
+        infos: dict[str, zipfile.ZipInfo] = {}
         total_size = 0
         try:
             archive = zipfile.ZipFile(path)
         except (OSError, zipfile.BadZipFile) as exc:
             raise ValueError(f"无效 EPUB ZIP: {exc}") from exc
-        with archive:
+        try:
             entries = archive.infolist()
             mimetype_entry = next(
                 (entry for entry in entries if entry.filename == "mimetype"), None
@@ -96,7 +216,7 @@ class EpubWorkspace:
                 name = normalize_member_path(info.filename)
                 if info.is_dir():
                     continue
-                if name in members:
+                if name in infos:
                     raise ValueError(f"EPUB 包含重复成员: {name}")
                 if info.file_size > MAX_MEMBER_SIZE:
                     raise ValueError(f"EPUB 成员过大: {name}")
@@ -108,7 +228,23 @@ class EpubWorkspace:
                     or info.file_size / info.compress_size > MAX_COMPRESSION_RATIO
                 ):
                     raise ValueError(f"EPUB 成员压缩比异常: {name}")
-                members[name] = archive.read(info)
+                infos[name] = info
+            if lazy:
+                members: dict[str, bytes] | LazyMembers = LazyMembers(archive, infos)
+            else:
+                members = {name: archive.read(info) for name, info in infos.items()}
+            workspace = cls._validated(path, members)
+        except BaseException:
+            archive.close()
+            raise
+        if not lazy:
+            archive.close()
+        return workspace
+
+    @classmethod
+    def _validated(
+        cls, path: Path, members: dict[str, bytes] | LazyMembers
+    ) -> "EpubWorkspace":
         if members.get("mimetype") != MIMETYPE:
             raise ValueError("EPUB mimetype 缺失或内容不正确")
         container = members.get("META-INF/container.xml")
@@ -126,25 +262,47 @@ class EpubWorkspace:
             raise ValueError(f"EPUB 缺少 OPF 文件: {opf_path}")
         return cls(path, members, opf_path)
 
+    def close(self) -> None:
+        if isinstance(self.members, LazyMembers):
+            self.members.close()
+
+    def __enter__(self) -> "EpubWorkspace":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
     def write(self, output_path: str | Path, *, logger: LoggerLike | None = None) -> Path:
         target = Path(output_path)
         target.parent.mkdir(parents=True, exist_ok=True)
         if target.exists():
             if not target.is_file():
                 raise IsADirectoryError(f"输出路径已存在且不是文件: {target}")
+            if isinstance(self.members, LazyMembers) and os.path.samefile(
+                target, self.input_path
+            ):
+                raise ValueError(f"输出路径不能与输入 EPUB 相同: {target}")
             target.unlink()
             if logger is not None:
                 logger.write(f"已删除同名输出文件: {target}")
         fd, temporary_name = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=target.parent)
         os.close(fd)
         temporary = Path(temporary_name)
+        opf_data = mark_opf_bytes_generated_by_tool(self.members[self.opf_path])
         try:
             with zipfile.ZipFile(temporary, "w") as archive:
                 archive.writestr("mimetype", MIMETYPE, compress_type=zipfile.ZIP_STORED)
-                for name, data in self.members.items():
+                for name in self.members:
                     if name == "mimetype":
                         continue
-                    archive.writestr(name, data, compress_type=zipfile.ZIP_DEFLATED)
+                    if name == self.opf_path:
+                        archive.writestr(name, opf_data, compress_type=zipfile.ZIP_DEFLATED)
+                    elif isinstance(self.members, LazyMembers):
+                        self.members.copy_to(name, archive)
+                    else:
+                        archive.writestr(
+                            name, self.members[name], compress_type=zipfile.ZIP_DEFLATED
+                        )
             with zipfile.ZipFile(temporary) as check:
                 first = check.infolist()[0]
                 if first.filename != "mimetype" or first.compress_type != zipfile.ZIP_STORED:
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import json
+import sys
+import threading
 from typing import Any
 
+_STDOUT_LOCK = threading.Lock()
+
 
 def _normalize_string(value: str) -> str:
     """Replace lone UTF-16 surrogates while preserving valid surrogate pairs."""
@@ -29,3 +33,11 @@ def _normalize_strings(value: Any) -> Any:
 def dumps_json_line(payload: Any) -> str:
     """Serialize a payload that Rust's strict JSON parser can always decode."""
     return json.dumps(_normalize_strings(payload), ensure_ascii=True)
+
+
+def write_json_line(payload: Any) -> None:
+    """Write one JSON line to stdout; background threads share the same lock."""
+    line = dumps_json_line(payload) + "\n"
+    with _STDOUT_LOCK:
+        sys.stdout.write(line)
+        sys.stdout.flush()
@@ -0,0 +1,170 @@
+"""确定性任务的内容寻址输出缓存。
+
+格式化、文件解密、图片压缩、WebP 转图片、简繁转换与更换封面对同一输入和
+选项总是生成相同的输出。开启 ``output_cache`` 后，输出按
+(输入内容哈希, 任务类型, 规范化选项, 工具版本) 存入本地缓存目录；再次处理
+相同书籍时直接以硬链接（不支持时复制）生成输出文件。缓存按总大小上限淘汰
+最久未使用的条目，读写失败只视为未命中，不影响任务本身。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from python_backend.task_journal import RUNTIME_ONLY_OPTIONS
+
+OUTPUT_CACHE_DIR_NAME = "output_cache"
+OUTPUT_CACHE_DIR_ENV = "EPUB_TOOL_OUTPUT_CACHE_DIR"
+TOOL_VERSION_ENV = "EPUB_TOOL_VERSION"
+DEFAULT_OUTPUT_CACHE_MAX_MB = 2048
+OUTPUT_CACHE_SCHEMA_VERSION = 1
+CACHEABLE_TASK_TYPES = frozenset(
+    {
+        "reformat_epub",
+        "decrypt_epub",
+        "image_compress",
+        "webp_to_img",
+        "chinese_convert",
+        "replace_cover",
+    }
+)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str | os.PathLike[str]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def resolve_tool_version() -> str:
+    """返回参与缓存键的工具版本。
+
+    桌面端通过环境变量传入应用版本；开发环境没有版本号时，用后端源码的
+    大小与修改时间生成指纹，修改代码后旧缓存自然失效。
+    """
+    version = os.environ.get(TOOL_VERSION_ENV, "").strip()
+    if version:
+        return version
+    digest = hashlib.sha256()
+    backend_dir = Path(__file__).resolve().parent
+    for path in sorted(backend_dir.rglob("*.py")):
+        stat = path.stat()
+        digest.update(f"{path.relative_to(backend_dir)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return f"dev-{digest.hexdigest()[:16]}"
+
+
+def normalize_cache_options(
+    task_type: str, input_file: str, options: dict[str, Any]
+) -> dict[str, Any]:
+    """去掉只影响执行方式的选项；封面按当前书籍实际使用的图片内容参与缓存键。"""
+    if task_type == "replace_cover":
+        mapping = options.get("cover_path_by_file") or {}
+        cover_path = mapping.get(input_file) or mapping.get(os.path.normpath(input_file))
+        return {"cover_sha256": hash_file(cover_path) if cover_path else None}
+    return {key: value for key, value in options.items() if key not in RUNTIME_ONLY_OPTIONS}
+
+
+def resolve_output_cache_dir(options: dict[str, Any], default_dir: Path) -> Path:
+    explicit = options.get("output_cache_dir") or os.environ.get(OUTPUT_CACHE_DIR_ENV)
+    return Path(explicit).resolve() if explicit else default_dir
+
+
+def _link_or_copy(source: Path, target: Path) -> str:
+    """在 ``target`` 旁生成临时文件后原子替换，返回使用的方式。"""
+    temp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        try:
+            os.link(source, temp_path)
+            method = "hardlink"
+        except OSError:
+            # 跨文件系统或不支持硬链接时复制；Linux 上 copyfile 会优先使用
+            # copy_file_range，支持的文件系统可借此共享数据块。
+            shutil.copyfile(source, temp_path)
+            method = "copy"
+        os.replace(temp_path, target)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return method
+
+
+@dataclass(slots=True)
+class OutputCache:
+    directory: Path
+    max_bytes: int
+
+    @classmethod
+    def from_options(
+        cls, task_type: str, options: dict[str, Any], default_dir: Path
+    ) -> "OutputCache | None":
+        """仅在显式开启且任务输出确定时返回缓存实例。"""
+        if options.get("output_cache") is not True or task_type not in CACHEABLE_TASK_TYPES:
+            return None
+        directory = resolve_output_cache_dir(options, default_dir)
+        max_mb = options.get("output_cache_max_mb", DEFAULT_OUTPUT_CACHE_MAX_MB)
+        return cls(directory=directory, max_bytes=int(max_mb * 1024 * 1024))
+
+    def build_key(self, task_type: str, input_file: str, options: dict[str, Any]) -> str:
+        payload = {
+            "schema": OUTPUT_CACHE_SCHEMA_VERSION,
+            "input_sha256": hash_file(input_file),
+            "task_type": task_type,
+            "options": normalize_cache_options(task_type, input_file, options),
+            "tool_version": resolve_tool_version(),
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.epub"
+
+    def materialize(self, key: str, output_path: str) -> str | None:
+        """命中时生成输出文件并返回方式（hardlink/copy），未命中返回 None。"""
+        entry = self.entry_path(key)
+        if not entry.is_file():
+            return None
+        method = _link_or_copy(entry, Path(output_path))
+        # 以修改时间记录最近使用，供淘汰时排序。
+        os.utime(entry)
+        return method
+
+    def store(self, key: str, output_path: str) -> None:
+        entry = self.entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        _link_or_copy(Path(output_path), entry)
+        self.evict(keep=entry)
+
+    def evict(self, keep: Path | None = None) -> None:
+        """总大小超过上限时按最近使用时间从旧到新删除条目。"""
+        entries = []
+        total = 0
+        for path in self.directory.glob("*/*.epub"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -32,6 +32,7 @@ class TaskEvent:
     output_path: str | None = None
     level: str = "info"
     result: dict[str, Any] | None = None
+    cache: str | None = None
 
     def to_dict(self) -> dict[str, Any]:
         return asdict(self)
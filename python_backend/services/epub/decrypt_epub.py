@@ -20,6 +20,7 @@ from python_backend.services.epub.rewrite_engine import (
     EpubRewriteEngine,
     EpubTaskPolicy,
     RewritePolicy,
+    resolve_rewrite_workers,
     run_epub_task,
 )
 from python_backend.services.utils.log import logwriter
@@ -132,11 +133,7 @@ class EpubTool(EpubTaskBase):
         self._detect_encryption()
 
     def _detect_encryption(self):
-        enc_name = None
-        for name in self.namelist:
-            if name.lower() == "meta-inf/encryption.xml":
-                enc_name = name
-                break
+        enc_name = self.archive_index.resolve("META-INF/encryption.xml")
         if not enc_name:
             return
         try:
@@ -335,8 +332,20 @@ class EpubTool(EpubTaskBase):
 
     # 重构
     def restructure(self):
-        EpubRewriteEngine(self, DECRYPT_REWRITE_POLICY).run()
-
-
-def run(epub_src: str, output_path: str | None = None):
-    return run_epub_task(epub_src, output_path, EpubTool, logger, DECRYPT_TASK_POLICY)
+        EpubRewriteEngine(self, DECRYPT_REWRITE_POLICY, workers=self.rewrite_workers).run()
+
+
+def run(
+    epub_src: str,
+    output_path: str | None = None,
+    *,
+    options: dict[str, object] | None = None,
+):
+    return run_epub_task(
+        epub_src,
+        output_path,
+        EpubTool,
+        logger,
+        DECRYPT_TASK_POLICY,
+        workers=resolve_rewrite_workers(options),
+    )
@@ -4,6 +4,7 @@
 # 二改: cnwxi
 
 import re
+from collections import Counter
 from os import path
 from typing import Any
 from hashlib import md5 as hashlibmd5
@@ -18,6 +19,7 @@ from python_backend.services.epub.rewrite_engine import (
     EpubRewriteEngine,
     EpubTaskPolicy,
     RewritePolicy,
+    resolve_rewrite_workers,
     run_epub_task,
 )
 from python_backend.services.utils.log import logwriter
@@ -84,6 +86,9 @@ class EpubTool(EpubTaskBase):
             if item_mime and "image/" in item_mime and not is_slim:
                 image_id_by_href[base_href.lower()] = item_id
 
+        # 与 toc_rn 同步的目标文件名计数；条目被重新赋值时旧名称随之减一。
+        target_hrefs = Counter(self.toc_rn.values())
+
         # 生成新的href
         ############################################################
         def create_target_href(_id: str, _href: str, _mime: str) -> str:
@@ -105,11 +110,15 @@ class EpubTool(EpubTaskBase):
             )
             # 加_为了防止Windows系统异常
             new_href = f"_{new_href}{image_slim}{_file_extension.lower()}"
-            if new_href not in self.toc_rn.values():
-                self.toc_rn[_href] = new_href
+            duplicate = target_hrefs[new_href] > 0
+            previous_href = self.toc_rn.get(_href)
+            if previous_href is not None:
+                target_hrefs[previous_href] -= 1
+            self.toc_rn[_href] = new_href
+            target_hrefs[new_href] += 1
+            if not duplicate:
                 logger.write(f"encrypt href: {_id}:{_href} -> {self.toc_rn[_href]}")
             else:
-                self.toc_rn[_href] = new_href
                 logger.write(f"encrypt href: {_id}:{_href} -> {new_href} 重复")
             return new_href
 
@@ -123,8 +132,21 @@ class EpubTool(EpubTaskBase):
 
     # 重构
     def restructure(self):
-        EpubRewriteEngine(self, ENCRYPT_REWRITE_POLICY).run()
-
-
-def run(epub_src: str, output_path: str | None = None):
-    return run_epub_task(epub_src, output_path, EpubTool, logger, ENCRYPT_TASK_POLICY)
+        EpubRewriteEngine(self, ENCRYPT_REWRITE_POLICY, workers=self.rewrite_workers).run()
+
+
+def run(
+    epub_src: str,
+    output_path: str | None = None,
+    *,
+    options: dict[str, object] | None = None,
+):
+    return run_epub_task(
+        epub_src,
+        output_path,
+        EpubTool,
+        logger,
+        ENCRYPT_TASK_POLICY,
+        workers=resolve_rewrite_workers(options),
+        prune=bool((options or {}).get("prune_unreferenced", False)),
+    )
@@ -15,6 +15,7 @@ from python_backend.services.epub.rewrite_engine import (
     EpubRewriteEngine,
     EpubTaskPolicy,
     RewritePolicy,
+    resolve_rewrite_workers,
     run_epub_task,
 )
 from python_backend.services.utils.log import logwriter
@@ -74,8 +75,21 @@ class EpubTool(EpubTaskBase):
 
     # 重构
     def restructure(self):
-        EpubRewriteEngine(self, REFORMAT_REWRITE_POLICY).run()
-
-
-def run(epub_src: str, output_path: str | None = None):
-    return run_epub_task(epub_src, output_path, EpubTool, logger, REFORMAT_TASK_POLICY)
+        EpubRewriteEngine(self, REFORMAT_REWRITE_POLICY, workers=self.rewrite_workers).run()
+
+
+def run(
+    epub_src: str,
+    output_path: str | None = None,
+    *,
+    options: dict[str, object] | None = None,
+):
+    return run_epub_task(
+        epub_src,
+        output_path,
+        EpubTool,
+        logger,
+        REFORMAT_TASK_POLICY,
+        workers=resolve_rewrite_workers(options),
+        prune=bool((options or {}).get("prune_unreferenced", False)),
+    )
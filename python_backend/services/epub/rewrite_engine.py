@@ -7,13 +7,18 @@ EPUB 格式化任务需要保留对畸形 container/OPF 的既有容错路径。
 
 from __future__ import annotations
 
+import os
 import re
 import zipfile
-from collections.abc import Callable
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from os import path
-from typing import Protocol
+from typing import Protocol, TypeVar
 
+from python_backend.epub_archive import DeflatedEntry, copy_zip_entry, write_deflated_entry
+from python_backend.epub_metadata import mark_opf_generated_by_tool
 from python_backend.services.epub.task_base import (
     build_resource_path_maps,
     get_bookpath,
@@ -58,11 +63,14 @@ class EpubRunTask(RewriteTask, Protocol):
 
     output_suffix: str
     encrypted: bool
+    rewrite_workers: int
     errorOPF_log: list[tuple[str, str]]
     errorLink_log: dict[str, list[tuple[str, str | None]]]
 
     def set_output_path(self, output_path: str | None) -> None: ...
 
+    def prune_unreferenced(self) -> list[str]: ...
+
     def restructure(self) -> object: ...
 
     def fail_del_target(self) -> None: ...
@@ -118,15 +126,123 @@ IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".svg")
 HREF_IMAGE_EXTENSIONS = IMAGE_EXTENSIONS[:-1]
 FONT_EXTENSIONS = (".ttf", ".otf")
 
+# (扩展名, 资源类型, 相对目录) 规则，按顺序取第一个匹配的扩展名。
+ResourceTargets = tuple[tuple[tuple[str, ...], str, str], ...]
+
+SRC_TARGETS: ResourceTargets = (
+    (IMAGE_EXTENSIONS, "image", "../Images/"),
+    ((".mp3",), "audio", "../Audio/"),
+    ((".mp4",), "video", "../Video/"),
+    ((".js",), "other", "../Misc/"),
+)
+# 原先逐趟替换的属性顺序：同一标签内每类只改写最后一个属性，链接问题也
+# 按该顺序归并，``url()`` 排在最后。
+XHTML_LINK_TARGETS: dict[str, ResourceTargets] = {
+    "href": (
+        (HREF_IMAGE_EXTENSIONS, "image", "../Images/"),
+        ((".css",), "css", "../Styles/"),
+        ((".xhtml", ".html"), "text", ""),
+    ),
+    "src": SRC_TARGETS,
+    "poster": ((IMAGE_EXTENSIONS, "image", "../Images/"),),
+    "placeholder": SRC_TARGETS,
+    "activestate": SRC_TARGETS,
+    "zy-cover-pic": SRC_TARGETS,
+}
+XHTML_LINK_ATTRIBUTES = tuple(XHTML_LINK_TARGETS)
+REFERENCE_TARGETS: dict[str, ResourceTargets] = {
+    **XHTML_LINK_TARGETS,
+    "url": (
+        (FONT_EXTENSIONS, "font", "../Fonts/"),
+        (IMAGE_EXTENSIONS, "image", "../Images/"),
+    ),
+}
+
+URL_REFERENCE_RE = re.compile(r"(url\([\'\"]?)(.*?)([\'\"]?\))")
+# 只有可能带链接属性的标签进入回调，其余标签由正则引擎直接跳过。
+XHTML_LINK_TAG_RE = re.compile(
+    r"<[^>]*?(?:href|src|poster|placeholder|activestate|zy-cover-pic)=[\'\"][^>]*>"
+)
+XHTML_ATTRIBUTE_RE = re.compile(
+    r"(?P<lead>\s?)(?P<name>[^\s=<>\'\"/]+)=(?P<quote>[\'\"])(?P<value>.*?)(?P=quote)"
+)
+CSS_IMPORT_RES = {
+    permissive: re.compile(
+        rf"@import {whitespace}(?P<quote>[\'\"])(?P<quoted>.*?)(?P=quote)"
+        rf"|@import {whitespace}url\([\'\"]?(?P<import_url>.*?)[\'\"]?\)"
+    )
+    for permissive, whitespace in ((True, "+"), (False, ""))
+}
+
+
+DEFAULT_REWRITE_WORKERS = 4
+
+LinkErrors = list[tuple[str, str | None]]
+_Job = TypeVar("_Job")
+_Result = TypeVar("_Result")
+
+
+def resolve_rewrite_workers(options: dict[str, object] | None) -> int:
+    """返回单本书内并行改写 XHTML/CSS 的线程数。
+
+    与图片任务一致：未显式指定且任务已在多个进程间并行处理多本书时逐个改写。
+    """
+    options = options or {}
+    workers = options.get("rewrite_workers")
+    if workers is not None:
+        return int(workers)
+    if int(options.get("max_workers") or 1) > 1:
+        return 1
+    return min(DEFAULT_REWRITE_WORKERS, os.cpu_count() or 1)
+
+
+def _iter_ordered(
+    jobs: Iterable[_Job], func: Callable[[_Job], _Result], workers: int
+) -> Iterator[tuple[_Job, _Result]]:
+    """按输入顺序产出 (job, 结果)；并行时最多预取 2 倍线程数的文档。"""
+    if workers <= 1:
+        for job in jobs:
+            yield job, func(job)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for job in jobs:
+            pending.append((job, pool.submit(func, job)))
+            if len(pending) >= workers * 2:
+                done_job, future = pending.popleft()
+                yield done_job, future.result()
+        while pending:
+            done_job, future = pending.popleft()
+            yield done_job, future.result()
+
+
+@dataclass(slots=True)
+class RewrittenMember:
+    """线程池中改写并压缩完成、等待按序写出的文档。"""
+
+    arcname: str
+    entry: DeflatedEntry
+    link_errors: LinkErrors
+
 
 class EpubRewriteEngine:
-    """执行三个 EPUB 任务共享的重写生命周期。"""
+    """执行三个 EPUB 任务共享的重写生命周期。
 
-    def __init__(self, task: RewriteTask, policy: RewritePolicy) -> None:
+    XHTML 与 CSS 的读取、改写、编码与压缩在 ``workers`` 个线程中并行，
+    归档仍由当前线程按路径映射顺序写出，链接问题按文档顺序归并。
+    """
+
+    def __init__(
+        self, task: RewriteTask, policy: RewritePolicy, workers: int = 1
+    ) -> None:
         self.task = task
         self.policy = policy
+        self.workers = workers
         self.path_maps: dict[str, dict[str, str]] = {}
         self.lower_to_original: dict[str, str] = {}
+        self._reference_cache: dict[
+            tuple[str, str, str], tuple[tuple[str, str | None] | None, str | None, str | None]
+        ] = {}
 
     def run(self) -> None:
         if self.policy.prepare:
@@ -174,23 +290,32 @@ class EpubRewriteEngine:
         )
 
     def _check_link(
-        self, filename: str, book_path: str, href: str, target_id: str = ""
+        self,
+        filename: str,
+        book_path: str,
+        href: str,
+        target_id: str = "",
+        errors: LinkErrors | None = None,
     ) -> str | None:
+        """校验链接并返回实际归档路径；传入 ``errors`` 时问题先暂存其中。"""
         if href == "" or href.startswith(("http://", "https://", "res:/", "file:/", "data:")):
             return None
         original = self.lower_to_original.get(book_path.lower())
-        if original is None:
-            self.task.errorLink_log.setdefault(filename, []).append((href + target_id, None))
-            return None
         if book_path != original:
-            self.task.errorLink_log.setdefault(filename, []).append((href + target_id, original))
+            if errors is None:
+                errors = self.task.errorLink_log.setdefault(filename, [])
+            errors.append((href + target_id, original))
         return original
 
     def _resolve_link(
-        self, filename: str, reference: str, target_id: str = ""
+        self,
+        filename: str,
+        reference: str,
+        target_id: str = "",
+        errors: LinkErrors | None = None,
     ) -> str | None:
         return self._check_link(
-            filename, get_bookpath(reference, filename), reference, target_id
+            filename, get_bookpath(reference, filename), reference, target_id, errors
         )
 
     def _write_toc(self) -> None:
@@ -215,163 +340,217 @@ class EpubRewriteEngine:
                 ) from error
             raise
 
-    def _write_text_resources(self) -> None:
-        for source_path, new_name in self.path_maps["text"].items():
-            text = self._read_text_resource(source_path, "text")
-            if not text.startswith("<?xml"):
-                text = '<?xml version="1.0" encoding="utf-8"?>\n' + text
-            if not re.match(r"(?s).*<!DOCTYPE html", text):
-                text = re.sub(
-                    r"(<\?xml.*?>)\n*",
-                    r'\1\n<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN"\n  "http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd">\n',
-                    text,
-                    count=1,
+    def _write_rewritten_members(
+        self,
+        resource_type: str,
+        rewrite: Callable[[str, str], RewrittenMember | None],
+    ) -> None:
+        for (source_path, _new_name), member in _iter_ordered(
+            self.path_maps[resource_type].items(),
+            lambda item: rewrite(*item),
+            self.workers,
+        ):
+            if member is None:
+                continue
+            if member.link_errors:
+                self.task.errorLink_log.setdefault(source_path, []).extend(
+                    member.link_errors
                 )
-            text = self._rewrite_xhtml(text, source_path)
-            self.target.writestr(
-                f"OEBPS/Text/{new_name}", text.encode("utf-8"), zipfile.ZIP_DEFLATED
-            )
+            write_deflated_entry(self.target, member.arcname, member.entry)
 
-    def _rewrite_xhtml(self, text: str, source_path: str) -> str:
-        def rewrite_href(match: re.Match[str]) -> str:
-            reference, fragment = split_file_reference(match.group(3))
-            book_path = self._resolve_link(source_path, reference, fragment)
-            if not book_path:
-                return match.group()
-            suffix = reference.lower()
-            if suffix.endswith(HREF_IMAGE_EXTENSIONS):
-                resource_type, directory = "image", "../Images/"
-            elif suffix.endswith(".css"):
-                resource_type, directory = "css", "../Styles/"
-            elif suffix.endswith((".xhtml", ".html")):
-                resource_type, directory = "text", ""
-            else:
-                return match.group()
-            name = self.path_maps.get(resource_type, {}).get(book_path)
-            if name is None:
-                return match.group()
-            if resource_type == "css":
-                return f'<link href="{directory}{name}{fragment}" type="text/css" rel="stylesheet"/>'
-            return match.group(1) + directory + name + fragment + match.group(4)
-
-        def rewrite_src(match: re.Match[str]) -> str:
-            reference, fragment = split_file_reference(match.group(3))
-            book_path = self._resolve_link(source_path, reference, fragment)
-            if not book_path:
-                return match.group()
-            suffix = reference.lower()
-            if suffix.endswith(IMAGE_EXTENSIONS):
-                resource_type, directory = "image", "../Images/"
-            elif suffix.endswith(".mp3"):
-                resource_type, directory = "audio", "../Audio/"
-            elif suffix.endswith(".mp4"):
-                resource_type, directory = "video", "../Video/"
-            elif suffix.endswith(".js"):
-                resource_type, directory = "other", "../Misc/"
-            else:
-                return match.group()
-            name = self.path_maps.get(resource_type, {}).get(book_path)
-            return match.group() if name is None else match.group(1) + directory + name + fragment + match.group(4)
-
-        def rewrite_url(match: re.Match[str]) -> str:
-            reference, fragment = split_file_reference(match.group(2))
-            book_path = self._resolve_link(source_path, reference, fragment)
-            if not book_path:
-                return match.group()
-            suffix = reference.lower()
-            if suffix.endswith(FONT_EXTENSIONS):
-                resource_type, directory = "font", "../Fonts/"
-            elif suffix.endswith(IMAGE_EXTENSIONS):
-                resource_type, directory = "image", "../Images/"
-            else:
-                return match.group()
-            name = self.path_maps.get(resource_type, {}).get(book_path)
-            return match.group() if name is None else match.group(1) + directory + name + fragment + match.group(3)
-
-        text = re.sub(r"(<[^>]*href=([\'\"]))(.*?)(\2[^>]*>)", rewrite_href, text)
-        def rewrite_poster(match: re.Match[str]) -> str:
-            reference, fragment = split_file_reference(match.group(3))
-            book_path = self._resolve_link(source_path, reference, fragment)
-            if not book_path or not reference.lower().endswith(IMAGE_EXTENSIONS):
-                return match.group()
-            name = self.path_maps["image"].get(book_path)
-            return match.group() if name is None else match.group(1) + "../Images/" + name + fragment + match.group(4)
+    def _write_text_resources(self) -> None:
+        self._write_rewritten_members("text", self._rewrite_text_member)
 
-        text = re.sub(r"(<[^>]* src=([\'\"]))(.*?)(\2[^>]*>)", rewrite_src, text)
-        text = re.sub(r"(<[^>]* poster=([\'\"]))(.*?)(\2[^>]*>)", rewrite_poster, text)
-        for attribute in ("placeholder", "activestate", "zy-cover-pic"):
+    def _rewrite_text_member(self, source_path: str, new_name: str) -> RewrittenMember:
+        text = self._read_text_resource(source_path, "text")
+        if not text.startswith("<?xml"):
+            text = '<?xml version="1.0" encoding="utf-8"?>\n' + text
+        if not re.match(r"(?s).*<!DOCTYPE html", text):
             text = re.sub(
-                rf"(<[^>]* {attribute}=([\'\"]))(.*?)(\2[^>]*>)", rewrite_src, text
+                r"(<\?xml.*?>)\n*",
+                r'\1\n<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.1//EN"\n  "http://www.w3.org/TR/xhtml11/DTD/xhtml11.dtd">\n',
+                text,
+                count=1,
             )
-        return re.sub(r"(url\([\'\"]?)(.*?)([\'\"]?\))", rewrite_url, text)
+        text, link_errors = self._rewrite_xhtml(text, source_path)
+        return RewrittenMember(
+            f"OEBPS/Text/{new_name}",
+            DeflatedEntry.compress(text.encode("utf-8")),
+            link_errors,
+        )
 
-    def _write_css_resources(self) -> None:
-        for source_path, new_name in self.path_maps["css"].items():
-            try:
-                css = self._read_text_resource(source_path, "css")
-            except (KeyError, UnicodeDecodeError):
-                if self.policy.strict_text_and_css_reads:
-                    raise
+    def _rewrite_xhtml(self, text: str, source_path: str) -> tuple[str, LinkErrors]:
+        """改写 XHTML 中的资源链接，返回改写结果与链接问题。
+
+        每个含链接属性的标签只扫描一次，按属性名分派改写；同一标签内每类
+        属性仍只改写最后一个。``url()`` 随后单独扫描一趟，链接问题按原先
+        逐属性替换的顺序归并。与原先逐属性正则相比有两处有意的差异：其他
+        属性值中形如 ``href='…'`` 的文本不再被改写；引号未闭合时不再跨标签
+        匹配，也就不再报告由此产生的虚假链接问题。
+        """
+        errors: list[LinkErrors] = [
+            [] for _ in range(len(XHTML_LINK_ATTRIBUTES) + 1)
+        ]
+        text = XHTML_LINK_TAG_RE.sub(
+            lambda match: self._rewrite_xhtml_tag(match.group(), source_path, errors),
+            text,
+        )
+        text = URL_REFERENCE_RE.sub(
+            lambda match: self._rewrite_url_reference(match, source_path, errors[-1]),
+            text,
+        )
+        return text, [entry for group in errors for entry in group]
+
+    def _rewrite_xhtml_tag(
+        self,
+        tag: str,
+        source_path: str,
+        errors: list[LinkErrors],
+    ) -> str:
+        selected: dict[str, re.Match[str]] = {}
+        for attribute in XHTML_ATTRIBUTE_RE.finditer(tag):
+            name = attribute.group("name")
+            if name.endswith("href"):
+                selected["href"] = attribute
+            elif name in XHTML_LINK_ATTRIBUTES and attribute.group("lead") == " ":
+                selected[name] = attribute
+        if not selected:
+            return tag
+
+        replacements: list[tuple[int, int, str]] = []
+        for index, attribute_name in enumerate(XHTML_LINK_ATTRIBUTES):
+            attribute = selected.get(attribute_name)
+            if attribute is None:
                 continue
-            css = self._rewrite_css(css, source_path)
-            self.target.writestr(
-                f"OEBPS/Styles/{new_name}", css.encode("utf-8"), zipfile.ZIP_DEFLATED
+            error, resource_type, value = self._lookup_reference(
+                source_path, attribute.group("value"), attribute_name
             )
-
-    def _rewrite_css(self, css: str, source_path: str) -> str:
-        def rewrite_import(match: re.Match[str]) -> str:
-            raw_reference = match.group(2) if match.group(2) else match.group(3)
-            reference, fragment = split_file_reference(raw_reference)
-            if not reference.lower().endswith(".css"):
-                return match.group()
-            name = path.basename(reference)
-            if self.policy.mapped_css_imports:
-                book_path = self._resolve_link(source_path, reference, fragment)
-                if not book_path:
-                    return match.group()
-                name = self.path_maps["css"].get(book_path, name)
-            if self.policy.normalize_css_import_to_quotes or match.group(2):
-                return f'@import "{name}{fragment}"'
-            return f'@import url("{name}{fragment}")'
-
-        def rewrite_url(match: re.Match[str]) -> str:
-            reference, fragment = split_file_reference(match.group(2))
-            book_path = self._resolve_link(source_path, reference, fragment)
-            if not book_path:
-                return match.group()
+            if error is not None:
+                errors[index].append(error)
+            if value is None:
+                continue
+            if resource_type == "css":
+                # 样式表链接整体替换为规范的 link 标签，其余属性随之丢弃。
+                return f'<link href="{value}" type="text/css" rel="stylesheet"/>'
+            replacements.append((attribute.start("value"), attribute.end("value"), value))
+
+        for start, end, value in sorted(replacements, reverse=True):
+            tag = tag[:start] + value + tag[end:]
+        return tag
+
+    def _rewrite_url_reference(
+        self,
+        match: re.Match[str],
+        source_path: str,
+        errors: LinkErrors,
+    ) -> str:
+        """改写 ``url()``；匹配的三个分组依次为开头、引用与结尾。"""
+        error, _resource_type, value = self._lookup_reference(
+            source_path, match.group(2), "url"
+        )
+        if error is not None:
+            errors.append(error)
+        if value is None:
+            return match.group()
+        return match.group(1) + value + match.group(3)
+
+    def _lookup_reference(
+        self, source_path: str, raw_reference: str, kind: str
+    ) -> tuple[tuple[str, str | None] | None, str | None, str | None]:
+        """解析一个引用，返回 (链接问题, 资源类型, 改写后的引用)。
+
+        同一文档内同一引用的结果不变，按 (文档, 引用, 规则) 缓存；链接问题
+        仍由调用方在每次出现时各记录一次。
+        """
+        key = (source_path, raw_reference, kind)
+        cached = self._reference_cache.get(key)
+        if cached is not None:
+            return cached
+        errors: LinkErrors = []
+        reference, fragment = split_file_reference(raw_reference)
+        book_path = self._resolve_link(source_path, reference, fragment, errors)
+        error = errors[0] if errors else None
+        cached = (error, None, None)
+        if book_path:
             suffix = reference.lower()
-            if suffix.endswith(FONT_EXTENSIONS):
-                resource_type, directory = "font", "../Fonts/"
-            elif suffix.endswith(IMAGE_EXTENSIONS):
-                resource_type, directory = "image", "../Images/"
-            else:
-                return match.group()
-            name = self.path_maps.get(resource_type, {}).get(book_path)
-            return match.group() if name is None else match.group(1) + directory + name + fragment + match.group(3)
+            for extensions, resource_type, directory in REFERENCE_TARGETS[kind]:
+                if suffix.endswith(extensions):
+                    name = self.path_maps.get(resource_type, {}).get(book_path)
+                    if name is not None:
+                        cached = (error, resource_type, directory + name + fragment)
+                    break
+        self._reference_cache[key] = cached
+        return cached
+
+    def _write_css_resources(self) -> None:
+        self._write_rewritten_members("css", self._rewrite_css_member)
+
+    def _rewrite_css_member(
+        self, source_path: str, new_name: str
+    ) -> RewrittenMember | None:
+        try:
+            css = self._read_text_resource(source_path, "css")
+        except (KeyError, UnicodeDecodeError):
+            if self.policy.strict_text_and_css_reads:
+                raise
+            return None
+        css, link_errors = self._rewrite_css(css, source_path)
+        return RewrittenMember(
+            f"OEBPS/Styles/{new_name}",
+            DeflatedEntry.compress(css.encode("utf-8")),
+            link_errors,
+        )
 
-        whitespace = "+" if self.policy.permissive_css_import_whitespace else ""
-        css = re.sub(
-            rf"@import {whitespace}([\'\"])(.*?)\1|@import {whitespace}url\([\'\"]?(.*?)[\'\"]?\)",
-            rewrite_import,
+    def _rewrite_css(self, css: str, source_path: str) -> tuple[str, LinkErrors]:
+        """先改写 ``@import``，再改写全部 ``url()``，链接问题按此顺序归并。"""
+        import_errors: LinkErrors = []
+        url_errors: LinkErrors = []
+        css = CSS_IMPORT_RES[self.policy.permissive_css_import_whitespace].sub(
+            lambda match: self._rewrite_css_import(match, source_path, import_errors),
+            css,
+        )
+        css = URL_REFERENCE_RE.sub(
+            lambda match: self._rewrite_url_reference(match, source_path, url_errors),
             css,
         )
-        return re.sub(r"(url\([\'\"]?)(.*?)([\'\"]?\))", rewrite_url, css)
+        return css, import_errors + url_errors
+
+    def _rewrite_css_import(
+        self,
+        match: re.Match[str],
+        source_path: str,
+        errors: LinkErrors,
+    ) -> str:
+        quoted = match.group("quoted")
+        raw_reference = quoted if quoted else match.group("import_url")
+        reference, fragment = split_file_reference(raw_reference)
+        if not reference.lower().endswith(".css"):
+            return match.group()
+        name = path.basename(reference)
+        if self.policy.mapped_css_imports:
+            book_path = self._resolve_link(source_path, reference, fragment, errors)
+            if not book_path:
+                return match.group()
+            name = self.path_maps["css"].get(book_path, name)
+        if self.policy.normalize_css_import_to_quotes or quoted:
+            return f'@import "{name}{fragment}"'
+        return f'@import url("{name}{fragment}")'
 
     def _write_binary_resources(self) -> None:
         for resource_type in ("image", "font", "audio", "video", "other"):
             for source_path, new_name in self.path_maps[resource_type].items():
                 try:
-                    content = self.task.epub.read(source_path)
+                    copy_zip_entry(
+                        self.task.epub,
+                        source_path,
+                        self.target,
+                        f"OEBPS/{RESOURCE_DIRECTORIES[resource_type]}/{new_name}",
+                    )
                 except KeyError:
                     continue
-                self.target.writestr(
-                    f"OEBPS/{RESOURCE_DIRECTORIES[resource_type]}/{new_name}",
-                    content,
-                    zipfile.ZIP_DEFLATED,
-                )
 
     def _write_opf(self) -> None:
-        manifest = "<manifest>"
+        manifest_lines = ["<manifest>"]
         for item_id, href, mime, properties in self.task.manifest_list:
             book_path = get_bookpath(href, self.task.opfpath)
             output_id = item_id
@@ -379,15 +558,18 @@ class EpubRewriteEngine:
                 output_id = self.policy.output_manifest_id(self.task, item_id)
             prop = f' properties="{properties}"' if properties else ""
             if item_id == self.task.tocid:
-                manifest += f'\n    <item id="{output_id}" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+                manifest_lines.append(
+                    f'    <item id="{output_id}" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+                )
                 continue
             resource_type = self._resource_type(href, mime)
             name = self.path_maps[resource_type][book_path]
-            manifest += (
-                f'\n    <item id="{output_id}" href="{RESOURCE_DIRECTORIES[resource_type]}/{name}" '
+            manifest_lines.append(
+                f'    <item id="{output_id}" href="{RESOURCE_DIRECTORIES[resource_type]}/{name}" '
                 f'media-type="{mime}"{prop}/>'
             )
-        manifest += "\n  </manifest>"
+        manifest_lines.append("  </manifest>")
+        manifest = "\n".join(manifest_lines)
         opf = re.sub(r"(?s)<manifest.*?>.*?</manifest>", manifest, self.task.opf, count=1)
         if self.policy.transform_opf:
             opf = self.policy.transform_opf(self.task, opf)
@@ -397,6 +579,7 @@ class EpubRewriteEngine:
                 lambda match: self.policy.rewrite_opf_reference(self.task, match),
                 opf,
             )
+        opf = mark_opf_generated_by_tool(opf)
         self.target.writestr("OEBPS/content.opf", opf.encode("utf-8"), zipfile.ZIP_DEFLATED)
 
     def _resource_type(self, href: str, mime: str) -> str:
@@ -421,6 +604,8 @@ def run_epub_task(
     task_factory: type[EpubRunTask],
     logger: _Logger,
     policy: EpubTaskPolicy,
+    workers: int = 1,
+    prune: bool = False,
 ) -> int | str | Exception:
     """运行共享 EPUB 任务入口，并保留任务策略定义的可见行为。"""
     task: EpubRunTask | None = None
@@ -431,6 +616,7 @@ def run_epub_task(
             return "skip"
 
         task = task_factory(epub_src)
+        task.rewrite_workers = workers
         task.set_output_path(output_path)
         if (
             policy.skip_when_encrypted is not None
@@ -440,6 +626,12 @@ def run_epub_task(
             task.close_files()
             task.fail_del_target()
             return "skip"
+        if prune:
+            pruned = task.prune_unreferenced()
+            if pruned:
+                logger.write(f"删除未引用资源 {len(pruned)} 个")
+                for name in pruned:
+                    logger.write(f"已删除未引用资源: {name}")
         if task.restructure() == "skip":
             return "skip"
         _write_task_report(task, logger, policy)
@@ -16,6 +16,15 @@ from xml.etree import ElementTree
 import zipfile
 from os import path
 
+from python_backend.epub_references import (
+    SCRIPT_SUFFIXES,
+    ReferenceIndex,
+    is_document,
+    prune_roots,
+    unreachable_members,
+)
+from python_backend.epub_workspace import normalize_member_path
+
 
 class _LogWriter(Protocol):
     def write(self, message: str) -> None: ...
@@ -73,6 +82,59 @@ def split_slim_href(href: str) -> tuple[str, str, bool]:
     return path.join(href_dir, href_stem + href_extension), href_extension, is_slim
 
 
+class ArchiveIndex:
+    """归档成员名的大小写不敏感索引。
+
+    忽略大小写后重名的成员只保留归档中的第一个，与逐个比较小写名称列表的
+    结果一致，但查询为 O(1)。
+    """
+
+    __slots__ = ("names", "_by_lower")
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names = list(names)
+        self._by_lower: dict[str, str] = {}
+        for name in self.names:
+            self._by_lower.setdefault(name.lower(), name)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and name.lower() in self._by_lower
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, name: str) -> str | None:
+        """返回与 ``name`` 忽略大小写相同的实际成员名。"""
+        return self._by_lower.get(name.lower())
+
+
+class NameAllocator:
+    """按 ``{stem}_{n}{suffix}`` 规则分配不重复名称。
+
+    已占用名称保存在集合中，并记住每个 ``(stem, suffix)`` 上次分配到的序号；
+    名称只增不减，因此跳过的序号必然仍被占用，结果与从 0 逐个尝试一致。
+    """
+
+    __slots__ = ("_used", "_next_index")
+
+    def __init__(self, used: Iterable[str] = ()) -> None:
+        self._used = set(used)
+        self._next_index: dict[tuple[str, str], int] = {}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._used
+
+    def allocate(self, stem: str, suffix: str) -> str:
+        index = self._next_index.get((stem, suffix), 0)
+        candidate = f"{stem}_{index}{suffix}" if index else stem + suffix
+        while candidate in self._used:
+            index += 1
+            candidate = f"{stem}_{index}{suffix}"
+        self._next_index[(stem, suffix)] = index
+        self._used.add(candidate)
+        return candidate
+
+
 def build_resource_path_maps(
     opf_path: str,
     resource_groups: Mapping[str, Iterable[tuple[str, ...]]],
@@ -83,7 +145,7 @@ def build_resource_path_maps(
     目标 href。三个任务已经使用同一结构，因此可共享重名消解规则。
     """
     path_maps = {resource_type: {} for resource_type in resource_groups}
-    used_basenames = {resource_type: [] for resource_type in resource_groups}
+    allocators = {resource_type: NameAllocator() for resource_type in resource_groups}
     lower_to_original: dict[str, str] = {}
 
     for resource_type, resources in resource_groups.items():
@@ -91,13 +153,7 @@ def build_resource_path_maps(
             item_id, href = resource[:2]
             target_href = resource[-1]
             filename, extension = path.splitext(path.basename(target_href))
-            candidate = filename
-            index = 0
-            while candidate + extension in used_basenames[resource_type]:
-                index += 1
-                candidate = f"{filename}_{index}"
-            basename = candidate + extension
-            used_basenames[resource_type].append(basename)
+            basename = allocators[resource_type].allocate(filename, extension)
 
             book_path = get_bookpath(href, opf_path)
             path_maps[resource_type][book_path] = basename
@@ -116,6 +172,7 @@ class EpubTaskBase:
     _logger: _LogWriter
     output_suffix: str
     preserve_raw_manifest_hrefs = False
+    rewrite_workers = 1
 
     def __init__(self, epub_src: str, logger: _LogWriter) -> None:
         self._logger = logger
@@ -164,6 +221,7 @@ class EpubTaskBase:
 
     def _init_namelist(self) -> None:
         self.namelist = self.epub.namelist()
+        self.archive_index = ArchiveIndex(self.namelist)
 
     def _init_mime_map(self) -> None:
         self.mime_map = {
@@ -575,22 +633,22 @@ class EpubTaskBase:
             self.spine_list.append((sid, linear, properties))
 
     def _clear_duplicate_id_href(self) -> None:
-        id_used = [item_id for item_id, _, _ in self.spine_list]
+        id_used = {item_id for item_id, _, _ in self.spine_list}
         if self.metadata["cover"]:
-            id_used.append(self.metadata["cover"])
+            id_used.add(self.metadata["cover"])
 
-        deleted_ids = []
+        # 以字典保存待删除 ID：既能 O(1) 去重，又保留报告顺序。
+        deleted_ids: dict[str, None] = {}
         for item_id, href in self.id_to_href.items():
             if self.href_to_id[href] == item_id:
                 continue
             if item_id in id_used and self.href_to_id[href] not in id_used:
-                if self.href_to_id[href] not in deleted_ids:
-                    deleted_ids.append(self.href_to_id[href])
+                deleted_ids.setdefault(self.href_to_id[href])
                 self.href_to_id[href] = item_id
             elif item_id in id_used and self.href_to_id[href] in id_used:
                 continue
-            elif item_id not in deleted_ids:
-                deleted_ids.append(item_id)
+            else:
+                deleted_ids.setdefault(item_id)
 
         for item_id in deleted_ids:
             self.errorOPF_log.append(("duplicate_id", item_id))
@@ -603,16 +661,16 @@ class EpubTaskBase:
             if not self.id_to_h_m_p.get(item_id):
                 self.errorOPF_log.append(("invalid_idref", item_id))
 
+        referenced_ids = set(spine_idrefs)
         for item_id, _, mime, _ in self.manifest_list:
-            if mime == "application/xhtml+xml" and item_id not in spine_idrefs:
+            if mime == "application/xhtml+xml" and item_id not in referenced_ids:
                 self.errorOPF_log.append(("xhtml_not_in_spine", item_id))
 
     def _parse_hrefs_not_in_epub(self) -> None:
         deleted_ids = []
-        namelist = [item.lower() for item in self.epub.namelist()]
         for item_id, href in self.id_to_href.items():
             book_path = get_bookpath(href, self.opfpath)
-            if book_path.lower() not in namelist:
+            if book_path not in self.archive_index:
                 deleted_ids.append(item_id)
                 del self.href_to_id[href]
         for item_id in deleted_ids:
@@ -652,14 +710,9 @@ class EpubTaskBase:
                 new_id = basename
             else:
                 new_id = "x" + basename
-            prefix, suffix = path.splitext(new_id)
-            candidate_prefix = prefix
-            index = 0
-            while candidate_prefix + suffix in self.id_to_href:
-                index += 1
-                candidate_prefix = f"{prefix}_{index}"
-            return candidate_prefix + suffix
+            return id_allocator.allocate(*path.splitext(new_id))
 
+        id_allocator = NameAllocator(self.id_to_href)
         id_seed = getattr(self, "missing_manifest_id_seed", None)
         for href in hrefs_not_in_opf:
             new_id = allocate_id(id_seed or href)
@@ -669,6 +722,61 @@ class EpubTaskBase:
             mime = self.mime_map.get(extension, "text/plain")
             self.id_to_h_m_p[new_id] = (href, mime, "")
 
+    def prune_unreferenced(self) -> list[str]:
+        """删除从 spine、目录、封面与 guide 出发沿引用不可达的 manifest 项，返回其归档路径。
+
+        起点与可达性规则和图片任务的 ``prune_unreferenced`` 相同，见
+        :func:`python_backend.epub_references.prune_roots` 与
+        :func:`python_backend.epub_references.unreachable_members`。
+        """
+        book_paths = {
+            item_id: get_bookpath(href, self.opfpath)
+            for item_id, href, _mime, _properties in self.manifest_list
+        }
+        index = ReferenceIndex()
+        texts: dict[str, bytes] = {}
+        for info in self.epub.infolist():
+            if info.is_dir():
+                continue
+            suffix = path.splitext(info.filename)[1].lower()
+            if not is_document(info.filename) and suffix not in SCRIPT_SUFFIXES:
+                continue
+            try:
+                name = normalize_member_path(info.filename)
+            except ValueError:
+                continue
+            texts[name] = self.epub.read(info)
+            if is_document(name):
+                index.update(name, texts[name])
+        unreachable = unreachable_members(
+            book_paths.values(),
+            prune_roots(self.opfpath, self.opf.encode("utf-8")),
+            index,
+            texts,
+        )
+        removed_paths = set(unreachable)
+        removed_ids = {
+            item_id for item_id, book_path in book_paths.items() if book_path in removed_paths
+        }
+        if not removed_ids:
+            return []
+
+        for item_id in removed_ids:
+            href, _mime, _properties = self.id_to_h_m_p.pop(item_id)
+            self.href_to_id.pop(self.id_to_href.pop(item_id, href.lower()), None)
+        self.manifest_list = [item for item in self.manifest_list if item[0] not in removed_ids]
+        for resources in (
+            self.text_list,
+            self.css_list,
+            self.image_list,
+            self.font_list,
+            self.audio_list,
+            self.video_list,
+            self.other_list,
+        ):
+            resources[:] = [item for item in resources if item[0] not in removed_ids]
+        return unreachable
+
     def create_tgt_epub(self) -> zipfile.ZipFile:
         output_path = self.output_path
         self._logger.write(f"输出路径: {output_path}")
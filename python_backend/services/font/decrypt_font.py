@@ -4,6 +4,7 @@ import os
 import posixpath
 import re
 import sys
+import threading
 import traceback
 import unicodedata
 import uuid
@@ -12,20 +13,40 @@ from dataclasses import dataclass
 from io import BytesIO
 from xml.etree import ElementTree
 
-import cssselect2
-from bs4 import BeautifulSoup, Comment, NavigableString
-from fontTools.ttLib import TTFont
-from PIL import Image, ImageDraw, ImageFont
-from tinycss2 import (
-    parse_component_value_list,
-    parse_declaration_list,
-    parse_stylesheet,
-    parse_rule_list,
-    serialize,
-)
 
+from python_backend.epub_archive import copy_zip_entry
+from python_backend.epub_metadata import mark_opf_generated_by_tool
+from python_backend.services.font.document_cache import (
+    DOCUMENT_TREE_COST_FACTOR,
+    HtmlDocument,
+    HtmlDocumentCache,
+    resolve_document_cache_budget,
+)
+from python_backend.services.font.stylesheet_cache import (
+    CompiledCssRule,
+    CompiledStylesheet,
+    CssLayerStatement,
+    compile_selector_list,
+)
+from python_backend.services.font.ocr_cache import (
+    DEFAULT_OCR_CACHE_MAX_ENTRIES,
+    GlyphOcrCache,
+    GlyphOutlineHasher,
+    build_glyph_cache_key,
+    resolve_ocr_cache_path,
+)
+from python_backend.services.utils.lazy_import import LazyModule
 from python_backend.services.utils.log import logwriter
 
+# 解析与字体依赖在首次处理内容时才导入，见 lazy_import 模块说明。
+bs4 = LazyModule("bs4", globals())
+cssselect2 = LazyModule("cssselect2", globals())
+tinycss2 = LazyModule("tinycss2", globals())
+ttLib = LazyModule("fontTools.ttLib", globals())
+Image = LazyModule("PIL.Image", globals())
+ImageDraw = LazyModule("PIL.ImageDraw", globals())
+ImageFont = LazyModule("PIL.ImageFont", globals())
+
 logger = logwriter()
 
 DEFAULT_OCR_MODEL_NAME = "PP-OCRv6_small_rec"
@@ -35,7 +56,9 @@ if not OCR_MODEL_NAME:
 ONNX_OCR_MODEL_NAME = f"{OCR_MODEL_NAME}_onnx"
 ONNX_MODEL_FILE_NAME = "inference.onnx"
 ONNX_LOG_SEVERITY_ERROR = 3
+DEFAULT_OCR_BATCH_SIZE = 16
 _OCR_BACKEND_CACHE = {}
+_OCR_BACKEND_LOCK = threading.Lock()
 OCR_PASSTHROUGH_PUNCTUATION_CHARS = frozenset(
     "。，、；：？！“”‘’（）《》〈〉【】〔〕…—·"
 )
@@ -143,6 +166,16 @@ class OcrTextResult:
     confidence: float | None = None
 
 
+@dataclass(slots=True)
+class OcrGlyphResult:
+    char: str
+    image: object = None
+    result: OcrTextResult | None = None
+    error: Exception | None = None
+    period_like_glyph: bool = False
+    cached: bool = False
+
+
 def format_ocr_progress(processed_count, total_count):
     if total_count <= 0:
         return ""
@@ -150,6 +183,11 @@ def format_ocr_progress(processed_count, total_count):
     return f"，进度 {processed_count}/{total_count} ({percent:.1f}%)"
 
 
+def resolve_ocr_batch_size(options=None):
+    options = options or {}
+    return max(1, int(options.get("onnx_batch_size") or DEFAULT_OCR_BATCH_SIZE))
+
+
 def create_onnx_session_options(ort):
     session_options = ort.SessionOptions()
     session_options.log_severity_level = ONNX_LOG_SEVERITY_ERROR
@@ -184,6 +222,8 @@ class OnnxGlyphOcrBackend:
         self.image_shape = self.config["image_shape"]
         self.image_mode = self.config["img_mode"]
         self.max_img_width = int(options.get("onnx_max_image_width") or 3200)
+        self.batch_size = resolve_ocr_batch_size(options)
+        self.model_name = os.path.basename(os.path.normpath(self.model_dir))
 
     def recognize(self, image, hint_char=""):
         tensor = self.preprocess_image(image)
@@ -192,19 +232,40 @@ class OnnxGlyphOcrBackend:
             return OcrTextResult("")
         return self.decode_prediction(outputs[0])
 
-    def preprocess_image(self, image):
-        img_c, img_h, img_w = self.image_shape
+    def recognize_batch(self, images, hint_chars=None, batch_size=None):
+        """按批次识别多个字形；同一批次内的张量补齐到共享宽度后一次推理。"""
+        images = list(images)
+        batch_size = max(1, int(batch_size or self.batch_size))
+        results = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start : start + batch_size]
+            tensor = self.preprocess_batch(chunk)
+            outputs = self.session.run(None, {self.input_name: tensor})
+            if not outputs:
+                results.extend(OcrTextResult("") for _ in chunk)
+                continue
+            results.extend(self.decode_predictions(outputs[0])[: len(chunk)])
+        return results
+
+    def prepare_rgb_image(self, image):
+        img_c = self.image_shape[0]
         if img_c != 3:
             raise RuntimeError(f"暂不支持非 3 通道 OCR 输入: {self.image_shape}")
-
         rgb_image = image.convert("RGB")
         w, h = rgb_image.size
         if h <= 0 or w <= 0:
             raise RuntimeError(f"OCR 输入图像尺寸无效: {w}x{h}")
+        return rgb_image
+
+    def target_width(self, ratios):
+        _, img_h, img_w = self.image_shape
+        max_wh_ratio = max([img_w / float(img_h), *ratios])
+        return min(self.max_img_width, int(img_h * max_wh_ratio))
 
+    def resize_normalize(self, rgb_image, target_w):
+        img_c, img_h, _ = self.image_shape
+        w, h = rgb_image.size
         ratio = w / float(h)
-        max_wh_ratio = max(img_w / float(img_h), ratio)
-        target_w = min(self.max_img_width, int(img_h * max_wh_ratio))
         resized_w = min(target_w, max(1, int(round(img_h * ratio))))
         resample_filter = getattr(Image, "Resampling", Image).BILINEAR
         resized_image = rgb_image.resize((resized_w, img_h), resample_filter)
@@ -218,16 +279,32 @@ class OnnxGlyphOcrBackend:
 
         padded = self.np.zeros((img_c, img_h, target_w), dtype=self.np.float32)
         padded[:, :, :resized_w] = resized
-        return self.np.expand_dims(padded, axis=0)
+        return padded
+
+    def preprocess_image(self, image):
+        return self.preprocess_batch([image])
+
+    def preprocess_batch(self, images):
+        rgb_images = [self.prepare_rgb_image(image) for image in images]
+        target_w = self.target_width(
+            [image.size[0] / float(image.size[1]) for image in rgb_images]
+        )
+        return self.np.stack(
+            [self.resize_normalize(image, target_w) for image in rgb_images]
+        )
 
     def decode_prediction(self, prediction):
+        return self.decode_predictions(prediction)[0]
+
+    def decode_predictions(self, prediction):
         preds = self.np.array(prediction)
         if preds.ndim == 2:
             preds = self.np.expand_dims(preds, axis=0)
         if preds.ndim != 3:
             raise RuntimeError(f"OCR ONNX 输出维度无效: {preds.shape}")
+        return [self.decode_row(pred) for pred in preds]
 
-        pred = preds[0]
+    def decode_row(self, pred):
         token_ids = pred.argmax(axis=-1)
         token_scores = pred.max(axis=-1)
         chars = []
@@ -276,7 +353,7 @@ class FontGlyphRenderer:
 
     def _normalize_font_bytes(self, font_bytes):
         try:
-            font = TTFont(BytesIO(font_bytes))
+            font = ttLib.TTFont(BytesIO(font_bytes))
             if font.flavor:
                 font.flavor = None
                 stream = BytesIO()
@@ -335,6 +412,15 @@ class FontGlyphRenderer:
             padding = self.small_glyph_padding
         return font, bbox, padding
 
+    def cache_signature(self):
+        return (
+            self.font_size,
+            self.padding,
+            self.small_glyph_font_size,
+            self.small_glyph_padding,
+            self.small_glyph_threshold,
+        )
+
     def render(self, char):
         font, bbox, padding = self.render_spec(char)
         width = max(1, bbox[2] - bbox[0]) + padding * 2
@@ -469,11 +555,14 @@ def create_ocr_backend(options=None):
     config_path = resolve_onnx_ocr_config_path(model_dir, options)
     providers = tuple(options.get("onnx_providers") or ["CPUExecutionProvider"])
     max_image_width = int(options.get("onnx_max_image_width") or 3200)
-    cache_key = (model_dir, config_path, providers, max_image_width)
-    backend = _OCR_BACKEND_CACHE.get(cache_key)
-    if backend is None:
-        backend = OnnxGlyphOcrBackend(options)
-        _OCR_BACKEND_CACHE[cache_key] = backend
+    batch_size = resolve_ocr_batch_size(options)
+    cache_key = (model_dir, config_path, providers, max_image_width, batch_size)
+    # 常驻 worker 可能正在后台预热同一模型，等待其完成而不是重复创建会话。
+    with _OCR_BACKEND_LOCK:
+        backend = _OCR_BACKEND_CACHE.get(cache_key)
+        if backend is None:
+            backend = OnnxGlyphOcrBackend(options)
+            _OCR_BACKEND_CACHE[cache_key] = backend
     return backend
 
 
@@ -682,10 +771,10 @@ class FontDecrypt:
             token for token in tokens if not self.is_css_ignored_token(token)
         ]
         if self.contains_css_var_function(meaningful_tokens):
-            return serialize(tokens).strip().strip("'\"")
+            return tinycss2.serialize(tokens).strip().strip("'\"")
         if not all(token.type == "ident" for token in meaningful_tokens):
             return ""
-        return serialize(tokens).strip().strip("'\"")
+        return tinycss2.serialize(tokens).strip().strip("'\"")
 
     def extract_font_family_candidates_from_tokens(self, tokens):
         candidates = []
@@ -750,7 +839,7 @@ class FontDecrypt:
             elif self.contains_css_var_function(
                 value_tokens
             ) or self.get_css_global_keyword(value_tokens):
-                raw = serialize(value_tokens).strip().strip("'\"")
+                raw = tinycss2.serialize(value_tokens).strip().strip("'\"")
                 if raw:
                     candidates.append(raw)
 
@@ -899,7 +988,7 @@ class FontDecrypt:
         for font in self.fonts:
             aliases = {self.normalize_font_name(os.path.splitext(os.path.basename(font))[0])}
             try:
-                tt = TTFont(BytesIO(self.epub.read(font)))
+                tt = ttLib.TTFont(BytesIO(self.epub.read(font)))
                 for record in tt["name"].names:
                     if record.nameID in (1, 4, 6):
                         try:
@@ -959,7 +1048,7 @@ class FontDecrypt:
         if depth > 8:
             return 0, 0, 0
         try:
-            tokens = parse_component_value_list(selector or "")
+            tokens = tinycss2.parse_component_value_list(selector or "")
         except Exception:
             return 0, 0, 0
         result = (0, 0, 0)
@@ -973,7 +1062,7 @@ class FontDecrypt:
                     break
             if of_index is None:
                 continue
-            selector_text = serialize(function.arguments[of_index + 1 :]).strip()
+            selector_text = tinycss2.serialize(function.arguments[of_index + 1 :]).strip()
             selector_specificity = self.max_selector_specificity(
                 self.calculate_selector_specificity(item, depth + 1)
                 for item in self.split_css_selector_list(selector_text)
@@ -982,8 +1071,15 @@ class FontDecrypt:
         return result
 
     def calculate_selector_specificity(self, selector, depth=0):
+        cache = getattr(self, "_selector_specificity_cache", None)
+        if cache is None:
+            cache = {}
+            self._selector_specificity_cache = cache
+        key = (selector, depth)
+        if key in cache:
+            return cache[key]
         try:
-            selectors = cssselect2.compile_selector_list(selector or "")
+            selectors = compile_selector_list(selector or "")
         except cssselect2.SelectorError:
             base_specificity = (0, 0, 0)
         else:
@@ -991,7 +1087,8 @@ class FontDecrypt:
                 compiled.specificity for compiled in selectors
             )
         nth_of_specificity = self.calculate_nth_child_of_specificity(selector, depth)
-        return self.add_selector_specificity(base_specificity, nth_of_specificity)
+        cache[key] = self.add_selector_specificity(base_specificity, nth_of_specificity)
+        return cache[key]
 
     def record_css_selector_font_rule(
         self,
@@ -1163,7 +1260,7 @@ class FontDecrypt:
     def normalize_css_condition_text(self, value):
         if isinstance(value, list):
             if all(hasattr(item, "type") for item in value):
-                raw = serialize(value)
+                raw = tinycss2.serialize(value)
             else:
                 raw = " ".join(str(item) for item in value)
         else:
@@ -1441,7 +1538,7 @@ class FontDecrypt:
     def css_supports_declaration_applies(self, text):
         declarations = [
             declaration
-            for declaration in parse_declaration_list(text)
+            for declaration in tinycss2.parse_declaration_list(text)
             if declaration.type == "declaration"
         ]
         if len(declarations) != 1:
@@ -1454,7 +1551,7 @@ class FontDecrypt:
         if selector_text is None:
             return True
         try:
-            cssselect2.compile_selector_list(selector_text)
+            compile_selector_list(selector_text)
         except cssselect2.SelectorError:
             return False
         return True
@@ -1510,23 +1607,48 @@ class FontDecrypt:
             if name
         ]
 
-    def build_css_layer_name(self, parent_layer, layer_name):
-        if not parent_layer:
-            return layer_name
-        if not layer_name:
-            return parent_layer
-        return f"{parent_layer}.{layer_name}"
-
-    def iter_css_qualified_rules(
+    def resolve_compiled_css_layer_order(self, layer_path, anonymous_layer_names):
+        if not layer_path:
+            return None
+        names = []
+        for segment in layer_path:
+            if isinstance(segment, int):
+                if segment not in anonymous_layer_names:
+                    anonymous_layer_names[segment] = self.next_anonymous_css_layer_name()
+                segment = anonymous_layer_names[segment]
+            names.append(segment)
+        return self.ensure_css_layer_order(".".join(names))
+
+    def compile_css_qualified_rules(
         self,
         rules,
+        items,
         scope_contexts=None,
-        layer_name=None,
+        layer_path=(),
+        anonymous_layer_count=None,
     ):
         scope_contexts = scope_contexts or [{"prefix": "", "limit_selectors": []}]
+        if anonymous_layer_count is None:
+            anonymous_layer_count = [0]
         for rule in rules:
             if rule.type == "qualified-rule":
-                yield rule, scope_contexts, self.ensure_css_layer_order(layer_name)
+                selector = tinycss2.serialize(rule.prelude).strip()
+                if not selector:
+                    items.append(CssLayerStatement(layer_path))
+                    continue
+                items.append(
+                    CompiledCssRule(
+                        selector=selector,
+                        selectors=[
+                            one_selector.strip()
+                            for one_selector in self.split_css_selector_list(selector)
+                            if one_selector.strip()
+                        ],
+                        scope_contexts=scope_contexts,
+                        layer_path=layer_path,
+                        declarations=tinycss2.parse_declaration_list(rule.content),
+                    )
+                )
             elif (
                 rule.type == "at-rule"
                 and rule.content
@@ -1545,20 +1667,15 @@ class FontDecrypt:
                     continue
                 if rule.lower_at_keyword == "container":
                     continue
-                nested_layer_name = layer_name
+                nested_layer_path = layer_path
                 if rule.lower_at_keyword == "layer":
                     layer_names = self.extract_css_layer_names(rule.prelude)
                     if layer_names:
-                        nested_layer_name = self.build_css_layer_name(
-                            layer_name,
-                            layer_names[0],
-                        )
+                        nested_layer_path = layer_path + (layer_names[0],)
                     else:
-                        nested_layer_name = self.build_css_layer_name(
-                            layer_name,
-                            self.next_anonymous_css_layer_name(),
-                        )
-                    self.ensure_css_layer_order(nested_layer_name)
+                        anonymous_layer_count[0] += 1
+                        nested_layer_path = layer_path + (anonymous_layer_count[0],)
+                    items.append(CssLayerStatement(nested_layer_path))
                 nested_scope_contexts = scope_contexts
                 if rule.lower_at_keyword == "scope":
                     scope_roots, scope_limits = self.extract_scope_selectors(rule.prelude)
@@ -1569,10 +1686,12 @@ class FontDecrypt:
                         scope_roots,
                         scope_limits,
                     )
-                yield from self.iter_css_qualified_rules(
-                    parse_rule_list(rule.content),
+                self.compile_css_qualified_rules(
+                    tinycss2.parse_rule_list(rule.content),
+                    items,
                     nested_scope_contexts,
-                    nested_layer_name,
+                    nested_layer_path,
+                    anonymous_layer_count,
                 )
             elif (
                 rule.type == "at-rule"
@@ -1580,9 +1699,7 @@ class FontDecrypt:
                 and rule.lower_at_keyword == "layer"
             ):
                 for layer_name_item in self.extract_css_layer_names(rule.prelude):
-                    self.ensure_css_layer_order(
-                        self.build_css_layer_name(layer_name, layer_name_item)
-                    )
+                    items.append(CssLayerStatement(layer_path + (layer_name_item,)))
 
     def iter_css_font_face_rules(self, rules):
         for rule in rules:
@@ -1606,10 +1723,41 @@ class FontDecrypt:
                     continue
                 if rule.lower_at_keyword == "container":
                     continue
-                yield from self.iter_css_font_face_rules(parse_rule_list(rule.content))
+                yield from self.iter_css_font_face_rules(tinycss2.parse_rule_list(rule.content))
+
+    def compile_css_stylesheet(self, css_text):
+        cache = getattr(self, "_compiled_stylesheets", None)
+        if cache is None:
+            cache = {}
+            self._compiled_stylesheets = cache
+        stylesheet = cache.get(css_text)
+        if stylesheet is None:
+            rules = tinycss2.parse_stylesheet(css_text)
+            stylesheet = CompiledStylesheet(rules, list(self.iter_css_import_hrefs(rules)))
+            self.compile_css_qualified_rules(rules, stylesheet.items)
+            cache[css_text] = stylesheet
+        return stylesheet
+
+    def read_css_text(self, css_path):
+        cache = getattr(self, "_css_text_cache", None)
+        if cache is None:
+            cache = {}
+            self._css_text_cache = cache
+        if css_path not in cache:
+            try:
+                cache[css_path] = self.epub.read(css_path).decode("utf-8")
+            except Exception:
+                cache[css_path] = None
+        return cache[css_path]
 
     def iter_css_import_paths(self, css_text, base_path):
-        for rule in parse_stylesheet(css_text):
+        for href in self.compile_css_stylesheet(css_text).import_hrefs:
+            import_path = self.resolve_book_path(base_path, href)
+            if import_path:
+                yield import_path
+
+    def iter_css_import_hrefs(self, rules):
+        for rule in rules:
             if rule.type in ("whitespace", "comment"):
                 continue
             if rule.type != "at-rule":
@@ -1620,7 +1768,7 @@ class FontDecrypt:
                 break
             if rule.content:
                 break
-            prelude = serialize(rule.prelude).strip()
+            prelude = tinycss2.serialize(rule.prelude).strip()
             match = re.search(
                 r"url\(\s*['\"]?([^'\")]+)['\"]?\s*\)|['\"]([^'\"]+)['\"]",
                 prelude,
@@ -1632,9 +1780,7 @@ class FontDecrypt:
             media_text = prelude[match.end() :].strip()
             if not self.css_import_media_applies_to_epub(media_text):
                 continue
-            import_path = self.resolve_book_path(base_path, href)
-            if import_path:
-                yield import_path
+            yield href
 
     def split_css_selector_list(self, selector):
         selectors = []
@@ -1682,11 +1828,8 @@ class FontDecrypt:
             return
         seen.add(css_path)
         for import_path in self.iter_css_import_paths(css_text, css_path):
-            if import_path not in self.epub.namelist():
-                continue
-            try:
-                import_text = self.epub.read(import_path).decode("utf-8")
-            except Exception:
+            import_text = self.read_css_text(import_path)
+            if import_text is None:
                 continue
             yield from self.iter_css_text_with_imports(import_path, import_text, seen)
         yield css_path, css_text
@@ -1714,14 +1857,20 @@ class FontDecrypt:
             if "stylesheet" not in rel_values and not href.lower().endswith(".css"):
                 continue
             css_path = self.resolve_book_path(html_path, href)
-            if css_path not in self.epub.namelist():
-                continue
-            try:
-                css_text = self.epub.read(css_path).decode("utf-8")
-            except Exception:
+            css_text = self.read_css_text(css_path)
+            if css_text is None:
                 continue
             yield from self.iter_css_text_with_imports(css_path, css_text)
 
+    def resolve_compiled_css_font_declaration(self, item):
+        """同一轮规则收集内字体映射不变，共享样式表的字体声明只需解析一次。"""
+        cache = getattr(self, "_css_font_declaration_cache", None)
+        if cache is None:
+            return self.resolve_css_font_declaration(item.declarations)
+        if id(item) not in cache:
+            cache[id(item)] = self.resolve_css_font_declaration(item.declarations)
+        return cache[id(item)]
+
     def parse_css_selector_mapping(
         self,
         css_text,
@@ -1731,12 +1880,16 @@ class FontDecrypt:
         rule_list=None,
         order_counter=None,
     ):
-        rules = parse_stylesheet(css_text)
-        for rule, scope_contexts, layer_order in self.iter_css_qualified_rules(rules):
-            selector = serialize(rule.prelude).strip()
-            if not selector:
+        anonymous_layer_names = {}
+        for item in self.compile_css_stylesheet(css_text).items:
+            layer_order = self.resolve_compiled_css_layer_order(
+                item.layer_path,
+                anonymous_layer_names,
+            )
+            if isinstance(item, CssLayerStatement):
                 continue
-            declarations = parse_declaration_list(rule.content)
+            scope_contexts = item.scope_contexts
+            declarations = item.declarations
             if order_counter is None:
                 self._css_selector_rule_order += 1
                 rule_order = self._css_selector_rule_order
@@ -1749,10 +1902,7 @@ class FontDecrypt:
                     or not declaration.lower_name.startswith("--")
                 ):
                     continue
-                for one_selector in self.split_css_selector_list(selector):
-                    one_selector = one_selector.strip()
-                    if not one_selector:
-                        continue
+                for one_selector in item.selectors:
                     for scope_context in scope_contexts:
                         self.record_css_custom_property_rule(
                             one_selector,
@@ -1780,52 +1930,48 @@ class FontDecrypt:
                 candidates,
                 declaration_name,
                 value_tokens,
-            ) = (
-                self.resolve_css_font_declaration(declarations)
-            )
+            ) = self.resolve_compiled_css_font_declaration(item)
             if not font_file and not candidates:
                 continue
-            for one_selector in self.split_css_selector_list(selector):
-                one_selector = one_selector.strip()
-                if one_selector:
-                    for scope_context in scope_contexts:
-                        self.record_css_selector_font_rule(
+            for one_selector in item.selectors:
+                for scope_context in scope_contexts:
+                    self.record_css_selector_font_rule(
+                        one_selector,
+                        font_file,
+                        mapping,
+                        rule_order,
+                        matched_family=matched_family,
+                        is_blocker=font_file is None,
+                        is_inherit=font_file is FONT_RULE_INHERIT,
+                        is_revert_layer=font_file is FONT_RULE_REVERT_LAYER,
+                        important=important,
+                        source_path=source_path,
+                        html_path=html_path,
+                        match_selector=self.build_scoped_match_selector(
                             one_selector,
-                            font_file,
-                            mapping,
-                            rule_order,
-                            matched_family=matched_family,
-                            is_blocker=font_file is None,
-                            is_inherit=font_file is FONT_RULE_INHERIT,
-                            is_revert_layer=font_file is FONT_RULE_REVERT_LAYER,
-                            important=important,
-                            source_path=source_path,
-                            html_path=html_path,
-                            match_selector=self.build_scoped_match_selector(
-                                one_selector,
-                                scope_context.get("prefix", ""),
-                            ),
-                            scope_root_selector=scope_context.get("prefix", "") or None,
-                            scope_limit_selectors=scope_context.get(
-                                "limit_selectors",
-                                [],
-                            ),
-                            layer_order=layer_order,
-                            declaration_name=declaration_name,
-                            value_tokens=value_tokens,
-                            rule_list=rule_list,
-                        )
+                            scope_context.get("prefix", ""),
+                        ),
+                        scope_root_selector=scope_context.get("prefix", "") or None,
+                        scope_limit_selectors=scope_context.get(
+                            "limit_selectors",
+                            [],
+                        ),
+                        layer_order=layer_order,
+                        declaration_name=declaration_name,
+                        value_tokens=value_tokens,
+                        rule_list=rule_list,
+                    )
 
     def find_local_fonts_mapping(self):
         mapping = self.build_font_name_to_file_mapping()
         for css in self.css:
             try:
                 content = self.epub.read(css).decode("utf-8")
-                rules = parse_stylesheet(content)
+                rules = self.compile_css_stylesheet(content).rules
             except Exception:
                 continue
             for rule in self.iter_css_font_face_rules(rules):
-                declarations = parse_declaration_list(rule.content)
+                declarations = tinycss2.parse_declaration_list(rule.content)
                 font_family = None
                 src_urls = []
                 for declaration in declarations:
@@ -1838,7 +1984,7 @@ class FontDecrypt:
                         if candidates:
                             font_family = candidates[0]
                     elif declaration.lower_name == "src":
-                        src_text = serialize(declaration.value)
+                        src_text = tinycss2.serialize(declaration.value)
                         src_urls.extend(
                             re.findall(r"url\((.*?)\)", src_text, flags=re.IGNORECASE)
                         )
@@ -1857,15 +2003,18 @@ class FontDecrypt:
         self.css_selector_font_rules = []
         self.css_custom_property_rules = []
         self._css_selector_rule_order = 0
+        self._css_font_declaration_cache = {}
         for one_html in self.htmls:
             try:
-                html_content = self.epub.read(one_html).decode("utf-8")
+                document = self.load_html_document(one_html)
             except Exception:
                 continue
-            soup = BeautifulSoup(html_content, "html.parser")
-            for source_path, css_text in self.iter_document_css_texts(soup, one_html):
+            for source_path, css_text in self.iter_document_css_texts(
+                document.soup,
+                one_html,
+            ):
                 self.parse_css_selector_mapping(
-                    css_text,
+                    document.restore_placeholders(css_text),
                     mapping,
                     source_path=source_path,
                     html_path=one_html,
@@ -1874,6 +2023,7 @@ class FontDecrypt:
         self.css_selector_to_font_mapping = dict(
             sorted(mapping.items(), key=lambda item: len(item[0]), reverse=True)
         )
+        self._css_font_declaration_cache = None
 
     def remove_duplicates(self, s):
         seen = set()
@@ -1886,9 +2036,9 @@ class FontDecrypt:
 
     def iter_direct_text_nodes(self, tag):
         for child in tag.children:
-            if not isinstance(child, NavigableString):
+            if not isinstance(child, bs4.NavigableString):
                 continue
-            if isinstance(child, Comment):
+            if isinstance(child, bs4.Comment):
                 continue
             if not child.strip():
                 continue
@@ -1986,7 +2136,7 @@ class FontDecrypt:
     def build_inline_font_rule_record(self, tag):
         if not tag or not tag.has_attr("style"):
             return None
-        declarations = parse_declaration_list(tag.get("style", ""))
+        declarations = tinycss2.parse_declaration_list(tag.get("style", ""))
         (
             font_file,
             _,
@@ -2121,7 +2271,7 @@ class FontDecrypt:
         for rule in rules:
             match_selector = rule.get("match_selector", rule["selector"])
             try:
-                selectors = cssselect2.compile_selector_list(match_selector)
+                selectors = compile_selector_list(match_selector)
             except cssselect2.SelectorError:
                 fallback_rules.append(rule)
                 continue
@@ -2159,7 +2309,7 @@ class FontDecrypt:
         if not tag or not tag.has_attr("style"):
             return []
         records = []
-        declarations = parse_declaration_list(tag.get("style", ""))
+        declarations = tinycss2.parse_declaration_list(tag.get("style", ""))
         for declaration_order, declaration in enumerate(declarations, 1):
             if (
                 declaration.type != "declaration"
@@ -2328,7 +2478,7 @@ class FontDecrypt:
         for rule in rules:
             match_selector = rule.get("match_selector", rule["selector"])
             try:
-                selectors = cssselect2.compile_selector_list(match_selector)
+                selectors = compile_selector_list(match_selector)
             except cssselect2.SelectorError:
                 fallback_rules.append(rule)
                 continue
@@ -2408,40 +2558,94 @@ class FontDecrypt:
             current = current.parent
         return None
 
+    def get_document_cache(self):
+        cache = getattr(self, "_document_cache", None)
+        if cache is None:
+            options = getattr(self, "ocr_options", None) or {}
+            cache = HtmlDocumentCache(
+                resolve_document_cache_budget(options.get("document_cache_mb"))
+            )
+            self._document_cache = cache
+        return cache
+
+    def parse_html_document(self, one_html):
+        content = self.epub.read(one_html).decode("utf-8")
+        protected_content, placeholder_map = self.protect_escaped_angle_entities(content)
+        marked_content, marker_attr = self.inject_cssselect2_markers(protected_content)
+        self.get_document_cache().parses += 1
+        return HtmlDocument(
+            path=one_html,
+            soup=bs4.BeautifulSoup(marked_content, "html.parser"),
+            marked_content=marked_content,
+            marker_attr=marker_attr,
+            placeholder_map=placeholder_map,
+            cost=len(marked_content) * DOCUMENT_TREE_COST_FACTOR,
+        )
+
+    def load_html_document(self, one_html):
+        cache = self.get_document_cache()
+        document = cache.get(one_html)
+        if document is None:
+            document = self.parse_html_document(one_html)
+            cache.put(document)
+        return document
+
+    def take_html_document(self, one_html):
+        """写出阶段是文档的最后一次使用，取出后释放缓存占用。"""
+        document = self.get_document_cache().pop(one_html)
+        if document is None:
+            document = self.parse_html_document(one_html)
+        return document
+
+    def resolve_document_effective_fonts(self, document):
+        if document.effective_fonts is None:
+            css_font_rule_index = self.build_css_font_rule_index(
+                document.soup,
+                document.path,
+                document.marked_content,
+                document.marker_attr,
+            )
+            self.remove_cssselect2_markers(document.soup, document.marker_attr)
+            # 自定义属性索引只对当前文档有效，必须在处理下一份文档前算完全部元素。
+            document.effective_fonts = [
+                (tag, self.get_effective_font_file(tag, css_font_rule_index))
+                for tag in document.soup.find_all(True)
+            ]
+        return document.effective_fonts
+
+    def log_document_cache_stats(self):
+        cache = self.get_document_cache()
+        logger.write(f"XHTML 文档解析 {cache.parses} 次，复用解析结果 {cache.hits} 次")
+        cache.clear()
+
     def find_char_mapping(self):
         mapping = {}
         for one_html in self.htmls:
             try:
-                content = self.epub.read(one_html).decode("utf-8")
+                document = self.load_html_document(one_html)
             except Exception:
                 continue
-            marked_content, marker_attr = self.inject_cssselect2_markers(content)
-            soup = BeautifulSoup(marked_content, "html.parser")
-            css_font_rule_index = self.build_css_font_rule_index(
-                soup,
-                one_html,
-                marked_content,
-                marker_attr,
-            )
-            self.remove_cssselect2_markers(soup, marker_attr)
-            for tag in soup.find_all(True):
-                font_file = self.get_effective_font_file(tag, css_font_rule_index)
+            for tag, font_file in self.resolve_document_effective_fonts(document):
                 if not font_file or not self.is_target_font_file(font_file):
                     continue
                 text = "".join(
                     text_node.strip()
                     for text_node in self.iter_direct_text_nodes(tag)
                 )
-                self.add_text_to_font_mapping(mapping, font_file, text)
+                self.add_text_to_font_mapping(
+                    mapping,
+                    font_file,
+                    document.restore_placeholders(text, decode=True),
+                )
         self.font_to_char_mapping = mapping
 
     def get_mapping(self):
         self.find_local_fonts_mapping()
         self.find_selector_to_font_mapping()
         self.find_char_mapping()
-        logger.write(f"字体文件映射: {self.font_to_font_family_mapping}")
-        logger.write(f"CSS选择器映射: {self.css_selector_to_font_mapping}")
-        logger.write(f"字体文件到混淆字符映射: {self.font_to_char_mapping}")
+        logger.debug("字体文件映射: %s", self.font_to_font_family_mapping)
+        logger.debug("CSS选择器映射: %s", self.css_selector_to_font_mapping)
+        logger.debug("字体文件到混淆字符映射: %s", self.font_to_char_mapping)
 
     def is_encrypt_obfuscated_char(self, char):
         if is_ascii_latin_alnum(char) or is_fullwidth_latin_alnum(char):
@@ -2512,7 +2716,7 @@ class FontDecrypt:
         if font_path in self.font_cmap_cache:
             return self.font_cmap_cache[font_path]
         try:
-            font = TTFont(BytesIO(self.epub.read(font_path)))
+            font = ttLib.TTFont(BytesIO(self.epub.read(font_path)))
             cmap = font.getBestCmap() or {}
         except Exception:
             cmap = None
@@ -2546,7 +2750,7 @@ class FontDecrypt:
                 "".join(char for char in text if self.should_ocr_char(char))
             )
             self.font_to_char_mapping[key] = self.filter_text_by_font_cmap(key, ocr_text)
-        logger.write(f"清理后的待OCR字符: {self.font_to_char_mapping}")
+        logger.debug("清理后的待OCR字符: %s", self.font_to_char_mapping)
 
     def get_ocr_backend(self):
         if self.ocr_backend is None:
@@ -2650,6 +2854,175 @@ class FontDecrypt:
         )
         return placeholder
 
+    def get_ocr_batch_size(self, backend):
+        batch_size = getattr(backend, "batch_size", None)
+        if batch_size is None:
+            batch_size = resolve_ocr_batch_size(self.ocr_options)
+        return max(1, int(batch_size))
+
+    def get_ocr_cache(self, backend):
+        """仅对声明了模型名的后端启用持久化缓存，避免不同识别器的结果互相污染。"""
+        if getattr(backend, "model_name", None) is None:
+            return None
+        cache = getattr(self, "ocr_cache", None)
+        if cache is False:
+            return None
+        if cache is None:
+            cache_path = resolve_ocr_cache_path(self.ocr_options)
+            if not cache_path:
+                self.ocr_cache = False
+                return None
+            cache = GlyphOcrCache(
+                cache_path,
+                self.ocr_options.get("ocr_cache_max_entries")
+                or DEFAULT_OCR_CACHE_MAX_ENTRIES,
+            )
+            self.ocr_cache = cache
+        return cache
+
+    def disable_ocr_cache(self, exc):
+        cache = getattr(self, "ocr_cache", None)
+        if cache:
+            try:
+                cache.close()
+            except Exception:
+                pass
+        self.ocr_cache = False
+        logger.write(f"字体OCR缓存不可用，本次任务停用缓存: {exc}")
+
+    def build_ocr_cache_keys(self, backend, renderer, font_path, font_bytes, chars):
+        try:
+            hasher = GlyphOutlineHasher(
+                getattr(renderer, "normalized_font_bytes", font_bytes)
+            )
+        except Exception as exc:
+            logger.write(f"字体{font_path}无法计算字形轮廓哈希，跳过OCR缓存: {exc}")
+            return {}
+        signature = renderer.cache_signature()
+        cache_keys = {}
+        for char in chars:
+            try:
+                outline_hash = hasher.outline_hash(char)
+            except Exception:
+                outline_hash = None
+            if outline_hash:
+                cache_keys[char] = build_glyph_cache_key(
+                    outline_hash,
+                    signature,
+                    backend.model_name,
+                    getattr(backend, "max_img_width", None),
+                )
+        return cache_keys
+
+    def lookup_ocr_cache(self, cache, cache_keys, chars):
+        keys = [cache_keys[char] for char in chars if char in cache_keys]
+        if not keys:
+            return {}
+        try:
+            found = cache.get_many(keys)
+        except Exception as exc:
+            self.disable_ocr_cache(exc)
+            return {}
+        cached = {}
+        for char in chars:
+            entry = found.get(cache_keys.get(char))
+            if entry is not None:
+                text, confidence, period_like = entry
+                cached[char] = OcrGlyphResult(
+                    char,
+                    result=OcrTextResult(text, confidence),
+                    period_like_glyph=period_like,
+                    cached=True,
+                )
+        return cached
+
+    def store_ocr_cache(self, cache, cache_keys, glyphs):
+        entries = [
+            (
+                cache_keys[glyph.char],
+                glyph.result.text,
+                glyph.result.confidence,
+                glyph.period_like_glyph,
+            )
+            for glyph in glyphs
+            if glyph.char in cache_keys and glyph.error is None and glyph.result is not None
+        ]
+        if not entries:
+            return
+        try:
+            cache.put_many(entries)
+        except Exception as exc:
+            self.disable_ocr_cache(exc)
+
+    def iter_ocr_glyph_results(self, backend, renderer, chars, cache=None, cache_keys=None):
+        """分批渲染并识别字形，按原顺序产出 OcrGlyphResult。
+
+        命中缓存的字形不再渲染和推理；后端提供 recognize_batch 时整批推理，
+        整批失败则逐字回退，以便把异常准确归到具体字符上。
+        """
+        recognize_batch = getattr(backend, "recognize_batch", None)
+        batch_size = self.get_ocr_batch_size(backend) if recognize_batch else 1
+        cache_keys = cache_keys or {}
+        chars = list(chars)
+        for start in range(0, len(chars), batch_size):
+            chunk = chars[start : start + batch_size]
+            glyphs = {}
+            if cache is not None and cache_keys:
+                glyphs.update(self.lookup_ocr_cache(cache, cache_keys, chunk))
+                if getattr(self, "ocr_cache", None) is False:
+                    cache = None
+            pending_chars = [char for char in chunk if char not in glyphs]
+
+            images = {}
+            for char in pending_chars:
+                try:
+                    images[char] = renderer.render(char)
+                except Exception as exc:
+                    glyphs[char] = OcrGlyphResult(char, error=exc)
+
+            rendered_chars = [char for char in pending_chars if char in images]
+            results = {}
+            if recognize_batch is not None and rendered_chars:
+                try:
+                    batch_results = recognize_batch(
+                        [images[char] for char in rendered_chars],
+                        hint_chars=rendered_chars,
+                        batch_size=batch_size,
+                    )
+                    if len(batch_results) == len(rendered_chars):
+                        results = dict(zip(rendered_chars, batch_results))
+                except Exception:
+                    results = {}
+            recognized = []
+            for char in rendered_chars:
+                glyph = OcrGlyphResult(char, image=images[char])
+                glyphs[char] = glyph
+                try:
+                    glyph.result = results.get(char)
+                    if glyph.result is None:
+                        glyph.result = backend.recognize(images[char], hint_char=char)
+                    glyph.period_like_glyph = renderer.is_period_like_image(images[char])
+                    recognized.append(glyph)
+                except Exception as exc:
+                    glyph.error = exc
+
+            if cache is not None and cache_keys:
+                self.store_ocr_cache(cache, cache_keys, recognized)
+                if getattr(self, "ocr_cache", None) is False:
+                    cache = None
+            for char in chunk:
+                yield glyphs[char]
+
+    @staticmethod
+    def get_ocr_glyph_image(renderer, glyph):
+        """命中缓存的字形没有渲染图，仅在需要记录失败图片时补渲染。"""
+        if glyph.image is None and glyph.cached:
+            try:
+                glyph.image = renderer.render(glyph.char)
+            except Exception:
+                return None
+        return glyph.image
+
     def build_ocr_mapping(self):
         backend = self.get_ocr_backend()
         threshold = self.get_min_ocr_confidence()
@@ -2665,20 +3038,35 @@ class FontDecrypt:
             font_bytes = self.epub.read(font_path)
             font_hash = hashlib.sha1(font_bytes).hexdigest()[:8]
             renderer = FontGlyphRenderer(font_bytes, font_path, self.ocr_options)
+            cache = self.get_ocr_cache(backend)
+            cache_keys = (
+                self.build_ocr_cache_keys(backend, renderer, font_path, font_bytes, chars)
+                if cache is not None
+                else {}
+            )
+            hits_before = cache.hits if cache is not None else 0
+            misses_before = cache.misses if cache is not None else 0
             replace_table = {}
             failure_table = {}
-            for char in chars:
+            glyph_results = self.iter_ocr_glyph_results(
+                backend,
+                renderer,
+                chars,
+                cache=cache,
+                cache_keys=cache_keys,
+            )
+            for glyph in glyph_results:
+                char = glyph.char
+                result = glyph.result
                 processed_count += 1
                 progress_text = format_ocr_progress(processed_count, total_chars)
-                image = None
                 try:
-                    image = renderer.render(char)
-                    result = backend.recognize(image, hint_char=char)
-                    period_like_glyph = renderer.is_period_like_image(image)
+                    if glyph.error is not None:
+                        raise glyph.error
                     text = self.normalize_ocr_text(
                         result.text,
                         hint_char=char,
-                        period_like_glyph=period_like_glyph,
+                        period_like_glyph=glyph.period_like_glyph,
                     )
                     if not text:
                         replace_table[char] = self.record_ocr_failure(
@@ -2689,7 +3077,7 @@ class FontDecrypt:
                             progress_text,
                             font_path=font_path,
                             font_hash=font_hash,
-                            glyph_image=image,
+                            glyph_image=self.get_ocr_glyph_image(renderer, glyph),
                         )
                         continue
                     if len(text) != 1:
@@ -2701,7 +3089,7 @@ class FontDecrypt:
                             progress_text,
                             font_path=font_path,
                             font_hash=font_hash,
-                            glyph_image=image,
+                            glyph_image=self.get_ocr_glyph_image(renderer, glyph),
                         )
                         continue
                     if result.confidence is not None and result.confidence < threshold:
@@ -2716,7 +3104,7 @@ class FontDecrypt:
                             progress_text,
                             font_path=font_path,
                             font_hash=font_hash,
-                            glyph_image=image,
+                            glyph_image=self.get_ocr_glyph_image(renderer, glyph),
                         )
                         continue
                     replace_table[char] = text
@@ -2725,8 +3113,10 @@ class FontDecrypt:
                         if result.confidence is not None
                         else ""
                     )
+                    cached_text = "（缓存）" if glyph.cached else ""
                     logger.write(
-                        f"字体{font_path}字符 U+{ord(char):04X} -> {text}{confidence_text}{progress_text}"
+                        f"字体{font_path}字符 U+{ord(char):04X} -> {text}{confidence_text}"
+                        f"{cached_text}{progress_text}"
                     )
                 except Exception as exc:
                     replace_table[char] = self.record_ocr_failure(
@@ -2737,13 +3127,25 @@ class FontDecrypt:
                         progress_text,
                         font_path=font_path,
                         font_hash=font_hash,
-                        glyph_image=image,
+                        glyph_image=self.get_ocr_glyph_image(renderer, glyph),
                     )
             self.font_to_replace_mapping[font_path] = replace_table
             self.font_to_ocr_failure_mapping[font_path] = failure_table
+            if cache is not None and cache_keys:
+                logger.write(
+                    f"字体{font_path} OCR 缓存命中 {cache.hits - hits_before} 个，"
+                    f"未命中 {cache.misses - misses_before} 个"
+                )
 
-        logger.write(f"字体OCR反混淆映射: {self.font_to_replace_mapping}")
-        logger.write(f"字体OCR失败字符映射: {self.font_to_ocr_failure_mapping}")
+        cache = getattr(self, "ocr_cache", None)
+        if cache:
+            logger.write(
+                f"字体OCR缓存统计: 命中 {cache.hits} 个，未命中 {cache.misses} 个，"
+                f"缓存文件 {cache.path}"
+            )
+            cache.close()
+        logger.debug("字体OCR反混淆映射: %s", self.font_to_replace_mapping)
+        logger.debug("字体OCR失败字符映射: %s", self.font_to_ocr_failure_mapping)
 
     def create_target_epub(self):
         self.target_epub = zipfile.ZipFile(
@@ -2839,7 +3241,7 @@ class FontDecrypt:
 
         def flush_text_buffer():
             if text_buffer:
-                fragments.append(NavigableString("".join(text_buffer)))
+                fragments.append(bs4.NavigableString("".join(text_buffer)))
                 text_buffer.clear()
 
         for char in text:
@@ -2854,7 +3256,7 @@ class FontDecrypt:
                 )
                 inserted_failure_markup = True
             else:
-                fragments.append(NavigableString(replace_table[char]))
+                fragments.append(bs4.NavigableString(replace_table[char]))
 
         flush_text_buffer()
         for fragment in fragments:
@@ -2885,7 +3287,7 @@ class FontDecrypt:
                 yield book_path
 
     def parse_font_face_reference(self, css_path, font_face_body):
-        declarations = parse_declaration_list(font_face_body)
+        declarations = tinycss2.parse_declaration_list(font_face_body)
         family_names = set()
         source_paths = set()
         for declaration in declarations:
@@ -2898,7 +3300,7 @@ class FontDecrypt:
                         family_names.add(normalized)
             elif declaration.lower_name == "src":
                 source_paths.update(
-                    self.iter_css_url_book_paths(css_path, serialize(declaration.value))
+                    self.iter_css_url_book_paths(css_path, tinycss2.serialize(declaration.value))
                 )
         return family_names, source_paths
 
@@ -3173,21 +3575,11 @@ class FontDecrypt:
         target_font_families = self.get_decrypt_target_font_families(target_font_files)
 
         for one_html in self.htmls:
-            content = self.epub.read(one_html).decode("utf-8")
-            protected_content, placeholder_map = self.protect_escaped_angle_entities(content)
-            marked_content, marker_attr = self.inject_cssselect2_markers(protected_content)
-            soup = BeautifulSoup(marked_content, "html.parser")
+            document = self.take_html_document(one_html)
+            soup = document.soup
             has_ocr_failure_markup = False
-            css_font_rule_index = self.build_css_font_rule_index(
-                soup,
-                one_html,
-                marked_content,
-                marker_attr,
-            )
-            self.remove_cssselect2_markers(soup, marker_attr)
 
-            for tag in soup.find_all(True):
-                font_file = self.get_effective_font_file(tag, css_font_rule_index)
+            for tag, font_file in self.resolve_document_effective_fonts(document):
                 if not font_file or not self.is_target_font_file(font_file):
                     continue
                 replace_table = self.font_to_replace_mapping.get(font_file, {})
@@ -3215,15 +3607,21 @@ class FontDecrypt:
             if has_ocr_failure_markup:
                 self.ensure_ocr_failure_style(soup)
             formatted_html = soup.decode(formatter="minimal")
-            restored_html = self.restore_escaped_angle_entities(formatted_html, placeholder_map)
+            restored_html = self.restore_escaped_angle_entities(
+                formatted_html,
+                document.placeholder_map,
+            )
             self.target_epub.writestr(
                 one_html,
                 restored_html.encode("utf-8"),
                 zipfile.ZIP_DEFLATED,
             )
 
+        self.log_document_cache_stats()
+
+        source_names = set(self.epub.namelist())
         for item in self.ori_files:
-            if item == "mimetype" or item not in self.epub.namelist():
+            if item == "mimetype" or item not in source_names:
                 continue
             if item in getattr(self, "ocr_failure_image_bytes", {}):
                 logger.write(f"跳过原始同名 OCR 失败字形图片: {item}")
@@ -3238,6 +3636,7 @@ class FontDecrypt:
                     target_font_files,
                 )
                 cleaned_opf = self.add_opf_manifest_ocr_failure_images(cleaned_opf)
+                cleaned_opf = mark_opf_generated_by_tool(cleaned_opf)
                 self.target_epub.writestr(item, cleaned_opf.encode("utf-8"), zipfile.ZIP_DEFLATED)
                 continue
             if item in self.css:
@@ -3250,7 +3649,7 @@ class FontDecrypt:
                 )
                 self.target_epub.writestr(item, cleaned_css.encode("utf-8"), zipfile.ZIP_DEFLATED)
                 continue
-            self.target_epub.writestr(item, self.epub.read(item), zipfile.ZIP_DEFLATED)
+            copy_zip_entry(self.epub, item, self.target_epub)
         self.write_ocr_failure_images()
         self.close_file()
         logger.write(f"EPUB文件处理完成，输出文件路径: {self.file_write_path}")
@@ -3296,7 +3695,7 @@ def run(
         fd.write_epub()
         logger.write("EPUB字体OCR反混淆成功")
     except Exception as e:
-        logger.write(f"EPUB字体OCR反混淆失败，错误信息: {e}")
+        logger.error(f"EPUB字体OCR反混淆失败，错误信息: {e}")
         traceback.print_exc()
         fd.close_file()
         fd.fail_del_target()
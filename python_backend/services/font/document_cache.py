@@ -0,0 +1,92 @@
+"""字体任务内按书复用的 XHTML 文档模型缓存。
+
+字体加密与反混淆都会对同一批 XHTML 依次执行 CSS 规则收集、字符映射统计与
+写出三个阶段。缓存保存首次解析得到的 BeautifulSoup 树、cssselect2 标记信息、
+转义尖括号占位符以及逐元素的生效字体，后续阶段直接复用。解析树按源码长度
+估算内存占用，超出预算的文档不进入缓存，由调用方在下一阶段重新解析。
+"""
+
+from dataclasses import dataclass, field
+
+DEFAULT_DOCUMENT_CACHE_MB = 256
+# html.parser 构建的解析树通常是源码字符数的十倍以上，按保守系数估算。
+DOCUMENT_TREE_COST_FACTOR = 12
+
+
+def resolve_document_cache_budget(value=None):
+    """把以 MB 为单位的预算换算为字节；0 表示关闭缓存。"""
+    if value is None:
+        value = DEFAULT_DOCUMENT_CACHE_MB
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError("document_cache_mb 必须是非负数字")
+    return int(value * 1024 * 1024)
+
+
+@dataclass(slots=True)
+class HtmlDocument:
+    """一份 XHTML 的解析结果。
+
+    ``soup`` 由保护过 ``&lt;``/``&gt;`` 的源码解析而来，写出时需要用
+    ``placeholder_map`` 还原；``effective_fonts`` 按文档顺序记录每个元素的
+    生效字体文件，首次计算后不再依赖 cssselect2 标记。
+    """
+
+    path: str
+    soup: object
+    marked_content: str
+    marker_attr: str | None
+    placeholder_map: dict[str, str]
+    effective_fonts: list[tuple[object, object]] | None = None
+    cost: int = 0
+
+    def restore_placeholders(self, text, *, decode=False):
+        """把文本中的占位符换回实体，``decode=True`` 时换成对应的尖括号。"""
+        if not self.placeholder_map or not text:
+            return text
+        for placeholder, entity in self.placeholder_map.items():
+            if placeholder in text:
+                replacement = entity
+                if decode:
+                    replacement = "<" if entity == "&lt;" else ">"
+                text = text.replace(placeholder, replacement)
+        return text
+
+
+@dataclass(slots=True)
+class HtmlDocumentCache:
+    budget: int = DEFAULT_DOCUMENT_CACHE_MB * 1024 * 1024
+    used: int = 0
+    hits: int = 0
+    parses: int = 0
+    documents: dict[str, HtmlDocument] = field(default_factory=dict)
+
+    def get(self, path):
+        document = self.documents.get(path)
+        if document is not None:
+            self.hits += 1
+        return document
+
+    def put(self, document):
+        """预算允许时缓存文档，返回是否已缓存。
+
+        各阶段都按书内顺序遍历文档，淘汰旧文档只会让后面的访问同样落空，
+        因此超出预算时直接拒绝新文档，保证已缓存的部分在每个阶段都能命中。
+        """
+        if document.path in self.documents:
+            return True
+        if self.used + document.cost > self.budget:
+            return False
+        self.documents[document.path] = document
+        self.used += document.cost
+        return True
+
+    def pop(self, path):
+        document = self.documents.pop(path, None)
+        if document is not None:
+            self.used -= document.cost
+            self.hits += 1
+        return document
+
+    def clear(self):
+        self.documents.clear()
+        self.used = 0
@@ -2,19 +2,9 @@ import zipfile
 import os
 import posixpath
 import codecs
-import cssselect2
-from bs4 import BeautifulSoup, Comment, NavigableString
-from tinycss2 import (
-    parse_component_value_list,
-    parse_stylesheet,
-    serialize,
-    parse_declaration_list,
-    parse_rule_list,
-)
 # import emoji
 import re
 from xml.etree import ElementTree
-from fontTools.ttLib import TTFont
 from io import BytesIO
 import random
 import traceback
@@ -22,8 +12,33 @@ from datetime import datetime
 import unicodedata
 import uuid
 
+from python_backend.epub_archive import copy_zip_entry
+from python_backend.epub_metadata import mark_opf_generated_by_tool
+from python_backend.services.font.document_cache import (
+    DOCUMENT_TREE_COST_FACTOR,
+    HtmlDocument,
+    HtmlDocumentCache,
+    resolve_document_cache_budget,
+)
+from python_backend.services.font.font_face_scanner import (
+    EPUB_FONT_FILE_EXTENSIONS,
+    list_epub_font_families,
+)
+from python_backend.services.font.stylesheet_cache import (
+    CompiledCssRule,
+    CompiledStylesheet,
+    CssLayerStatement,
+    compile_selector_list,
+)
+from python_backend.services.utils.lazy_import import LazyModule
 from python_backend.services.utils.log import logwriter
 
+# 解析与字体依赖在首次处理内容时才导入，见 lazy_import 模块说明。
+bs4 = LazyModule("bs4", globals())
+cssselect2 = LazyModule("cssselect2", globals())
+tinycss2 = LazyModule("tinycss2", globals())
+ttLib = LazyModule("fontTools.ttLib", globals())
+
 logger = logwriter()
 
 FONT_OBFUSCATION_EAST_ASIAN_WIDTHS = frozenset({"W", "F"})
@@ -53,7 +68,6 @@ CSS_CUSTOM_PROPERTY_MISSING = object()
 CSS_WIDE_KEYWORDS = frozenset(
     {"inherit", "initial", "unset", "revert", "revert-layer"}
 )
-EPUB_FONT_FILE_EXTENSIONS = (".ttf", ".otf", ".woff", ".woff2")
 GENERIC_FONT_FAMILIES = frozenset(
     {
         "serif",
@@ -116,65 +130,7 @@ def is_fullwidth_latin_alnum(char):
 
 
 def list_epub_font_encrypt_targets(epub_path):
-    if not os.path.exists(epub_path):
-        raise Exception("EPUB文件不存在")
-
-    with zipfile.ZipFile(epub_path) as epub:
-        names = epub.namelist()
-        css_files = [item for item in names if item.lower().endswith(".css")]
-        font_file_names = {
-            os.path.basename(item).lower()
-            for item in names
-            if item.lower().endswith(EPUB_FONT_FILE_EXTENSIONS)
-        }
-        if not css_files or not font_file_names:
-            return {"font_families": []}
-
-        font_families = set()
-
-        for css in css_files:
-            try:
-                content_bytes = epub.read(css)
-                if b"@font-face" not in content_bytes.lower():
-                    continue
-                content = content_bytes.decode("utf-8")
-                rules = parse_stylesheet(content)
-            except Exception:
-                continue
-
-            for rule in rules:
-                if rule.type != "at-rule" or rule.lower_at_keyword != "font-face":
-                    continue
-                declarations = parse_declaration_list(rule.content)
-                font_family = None
-                src_value = None
-                for declaration in declarations:
-                    if declaration.type != "declaration":
-                        continue
-                    if declaration.lower_name == "font-family":
-                        values = [
-                            token.value
-                            for token in declaration.value
-                            if token.type == "string" or token.type == "ident"
-                        ]
-                        if values:
-                            font_family = " ".join(values).strip().strip("'\"")
-                    elif declaration.lower_name == "src":
-                        src_value = serialize(declaration.value)
-
-                if not font_family or not src_value:
-                    continue
-
-                font_urls = re.findall(r"url\((.*?)\)", src_value, flags=re.IGNORECASE)
-                for one_url in font_urls:
-                    cleaned = (
-                        one_url.strip().strip("'\"").split("#")[0].split("?")[0]
-                    )
-                    if os.path.basename(cleaned).lower() in font_file_names:
-                        font_families.add(font_family)
-                        break
-
-    return {"font_families": sorted(font_families, key=str.lower)}
+    return list_epub_font_families(epub_path)
 
 
 class FontEncrypt:
@@ -184,6 +140,7 @@ class FontEncrypt:
         epub_path,
         output_path,
         target_font_families=None,
+        document_cache_mb=None,
     ):
         if not os.path.exists(epub_path):
             raise Exception("EPUB文件不存在")
@@ -217,6 +174,7 @@ class FontEncrypt:
         self._css_selector_rule_order = 0
         self.font_to_char_mapping = {}
         self.font_to_passthrough_char_mapping = {}
+        self.document_cache_mb = document_cache_mb
         self.target_font_families = (
             {
                 item.strip().strip("'\"").lower()
@@ -408,10 +366,10 @@ class FontEncrypt:
             token for token in tokens if not self.is_css_ignored_token(token)
         ]
         if self.contains_css_var_function(meaningful_tokens):
-            return serialize(tokens).strip().strip("'\"")
+            return tinycss2.serialize(tokens).strip().strip("'\"")
         if not all(token.type == "ident" for token in meaningful_tokens):
             return ""
-        return serialize(tokens).strip().strip("'\"")
+        return tinycss2.serialize(tokens).strip().strip("'\"")
 
     def extract_font_family_candidates_from_tokens(self, tokens):
         candidates = []
@@ -476,7 +434,7 @@ class FontEncrypt:
             elif self.contains_css_var_function(
                 value_tokens
             ) or self.get_css_global_keyword(value_tokens):
-                raw = serialize(value_tokens).strip().strip("'\"")
+                raw = tinycss2.serialize(value_tokens).strip().strip("'\"")
                 if raw:
                     candidates.append(raw)
 
@@ -625,7 +583,7 @@ class FontEncrypt:
         for font in self.fonts:
             aliases = {self.normalize_font_name(os.path.splitext(os.path.basename(font))[0])}
             try:
-                tt = TTFont(BytesIO(self.epub.read(font)))
+                tt = ttLib.TTFont(BytesIO(self.epub.read(font)))
                 for record in tt["name"].names:
                     if record.nameID in (1, 4, 6):
                         try:
@@ -685,7 +643,7 @@ class FontEncrypt:
         if depth > 8:
             return 0, 0, 0
         try:
-            tokens = parse_component_value_list(selector or "")
+            tokens = tinycss2.parse_component_value_list(selector or "")
         except Exception:
             return 0, 0, 0
         result = (0, 0, 0)
@@ -699,7 +657,7 @@ class FontEncrypt:
                     break
             if of_index is None:
                 continue
-            selector_text = serialize(function.arguments[of_index + 1 :]).strip()
+            selector_text = tinycss2.serialize(function.arguments[of_index + 1 :]).strip()
             selector_specificity = self.max_selector_specificity(
                 self.calculate_selector_specificity(item, depth + 1)
                 for item in self.split_css_selector_list(selector_text)
@@ -708,8 +666,15 @@ class FontEncrypt:
         return result
 
     def calculate_selector_specificity(self, selector, depth=0):
+        cache = getattr(self, "_selector_specificity_cache", None)
+        if cache is None:
+            cache = {}
+            self._selector_specificity_cache = cache
+        key = (selector, depth)
+        if key in cache:
+            return cache[key]
         try:
-            selectors = cssselect2.compile_selector_list(selector or "")
+            selectors = compile_selector_list(selector or "")
         except cssselect2.SelectorError:
             base_specificity = (0, 0, 0)
         else:
@@ -717,7 +682,8 @@ class FontEncrypt:
                 compiled.specificity for compiled in selectors
             )
         nth_of_specificity = self.calculate_nth_child_of_specificity(selector, depth)
-        return self.add_selector_specificity(base_specificity, nth_of_specificity)
+        cache[key] = self.add_selector_specificity(base_specificity, nth_of_specificity)
+        return cache[key]
 
     def record_css_selector_font_rule(
         self,
@@ -889,7 +855,7 @@ class FontEncrypt:
     def normalize_css_condition_text(self, value):
         if isinstance(value, list):
             if all(hasattr(item, "type") for item in value):
-                raw = serialize(value)
+                raw = tinycss2.serialize(value)
             else:
                 raw = " ".join(str(item) for item in value)
         else:
@@ -1167,7 +1133,7 @@ class FontEncrypt:
     def css_supports_declaration_applies(self, text):
         declarations = [
             declaration
-            for declaration in parse_declaration_list(text)
+            for declaration in tinycss2.parse_declaration_list(text)
             if declaration.type == "declaration"
         ]
         if len(declarations) != 1:
@@ -1180,7 +1146,7 @@ class FontEncrypt:
         if selector_text is None:
             return True
         try:
-            cssselect2.compile_selector_list(selector_text)
+            compile_selector_list(selector_text)
         except cssselect2.SelectorError:
             return False
         return True
@@ -1236,23 +1202,48 @@ class FontEncrypt:
             if name
         ]
 
-    def build_css_layer_name(self, parent_layer, layer_name):
-        if not parent_layer:
-            return layer_name
-        if not layer_name:
-            return parent_layer
-        return f"{parent_layer}.{layer_name}"
-
-    def iter_css_qualified_rules(
+    def resolve_compiled_css_layer_order(self, layer_path, anonymous_layer_names):
+        if not layer_path:
+            return None
+        names = []
+        for segment in layer_path:
+            if isinstance(segment, int):
+                if segment not in anonymous_layer_names:
+                    anonymous_layer_names[segment] = self.next_anonymous_css_layer_name()
+                segment = anonymous_layer_names[segment]
+            names.append(segment)
+        return self.ensure_css_layer_order(".".join(names))
+
+    def compile_css_qualified_rules(
         self,
         rules,
+        items,
         scope_contexts=None,
-        layer_name=None,
+        layer_path=(),
+        anonymous_layer_count=None,
     ):
         scope_contexts = scope_contexts or [{"prefix": "", "limit_selectors": []}]
+        if anonymous_layer_count is None:
+            anonymous_layer_count = [0]
         for rule in rules:
             if rule.type == "qualified-rule":
-                yield rule, scope_contexts, self.ensure_css_layer_order(layer_name)
+                selector = tinycss2.serialize(rule.prelude).strip()
+                if not selector:
+                    items.append(CssLayerStatement(layer_path))
+                    continue
+                items.append(
+                    CompiledCssRule(
+                        selector=selector,
+                        selectors=[
+                            one_selector.strip()
+                            for one_selector in self.split_css_selector_list(selector)
+                            if one_selector.strip()
+                        ],
+                        scope_contexts=scope_contexts,
+                        layer_path=layer_path,
+                        declarations=tinycss2.parse_declaration_list(rule.content),
+                    )
+                )
             elif (
                 rule.type == "at-rule"
                 and rule.content
@@ -1271,20 +1262,15 @@ class FontEncrypt:
                     continue
                 if rule.lower_at_keyword == "container":
                     continue
-                nested_layer_name = layer_name
+                nested_layer_path = layer_path
                 if rule.lower_at_keyword == "layer":
                     layer_names = self.extract_css_layer_names(rule.prelude)
                     if layer_names:
-                        nested_layer_name = self.build_css_layer_name(
-                            layer_name,
-                            layer_names[0],
-                        )
+                        nested_layer_path = layer_path + (layer_names[0],)
                     else:
-                        nested_layer_name = self.build_css_layer_name(
-                            layer_name,
-                            self.next_anonymous_css_layer_name(),
-                        )
-                    self.ensure_css_layer_order(nested_layer_name)
+                        anonymous_layer_count[0] += 1
+                        nested_layer_path = layer_path + (anonymous_layer_count[0],)
+                    items.append(CssLayerStatement(nested_layer_path))
                 nested_scope_contexts = scope_contexts
                 if rule.lower_at_keyword == "scope":
                     scope_roots, scope_limits = self.extract_scope_selectors(rule.prelude)
@@ -1295,10 +1281,12 @@ class FontEncrypt:
                         scope_roots,
                         scope_limits,
                     )
-                yield from self.iter_css_qualified_rules(
-                    parse_rule_list(rule.content),
+                self.compile_css_qualified_rules(
+                    tinycss2.parse_rule_list(rule.content),
+                    items,
                     nested_scope_contexts,
-                    nested_layer_name,
+                    nested_layer_path,
+                    anonymous_layer_count,
                 )
             elif (
                 rule.type == "at-rule"
@@ -1306,9 +1294,7 @@ class FontEncrypt:
                 and rule.lower_at_keyword == "layer"
             ):
                 for layer_name_item in self.extract_css_layer_names(rule.prelude):
-                    self.ensure_css_layer_order(
-                        self.build_css_layer_name(layer_name, layer_name_item)
-                    )
+                    items.append(CssLayerStatement(layer_path + (layer_name_item,)))
 
     def iter_css_font_face_rules(self, rules):
         for rule in rules:
@@ -1332,10 +1318,41 @@ class FontEncrypt:
                     continue
                 if rule.lower_at_keyword == "container":
                     continue
-                yield from self.iter_css_font_face_rules(parse_rule_list(rule.content))
+                yield from self.iter_css_font_face_rules(tinycss2.parse_rule_list(rule.content))
+
+    def compile_css_stylesheet(self, css_text):
+        cache = getattr(self, "_compiled_stylesheets", None)
+        if cache is None:
+            cache = {}
+            self._compiled_stylesheets = cache
+        stylesheet = cache.get(css_text)
+        if stylesheet is None:
+            rules = tinycss2.parse_stylesheet(css_text)
+            stylesheet = CompiledStylesheet(rules, list(self.iter_css_import_hrefs(rules)))
+            self.compile_css_qualified_rules(rules, stylesheet.items)
+            cache[css_text] = stylesheet
+        return stylesheet
+
+    def read_css_text(self, css_path):
+        cache = getattr(self, "_css_text_cache", None)
+        if cache is None:
+            cache = {}
+            self._css_text_cache = cache
+        if css_path not in cache:
+            try:
+                cache[css_path] = self.epub.read(css_path).decode("utf-8")
+            except Exception:
+                cache[css_path] = None
+        return cache[css_path]
 
     def iter_css_import_paths(self, css_text, base_path):
-        for rule in parse_stylesheet(css_text):
+        for href in self.compile_css_stylesheet(css_text).import_hrefs:
+            import_path = self.resolve_book_path(base_path, href)
+            if import_path:
+                yield import_path
+
+    def iter_css_import_hrefs(self, rules):
+        for rule in rules:
             if rule.type in ("whitespace", "comment"):
                 continue
             if rule.type != "at-rule":
@@ -1346,7 +1363,7 @@ class FontEncrypt:
                 break
             if rule.content:
                 break
-            prelude = serialize(rule.prelude).strip()
+            prelude = tinycss2.serialize(rule.prelude).strip()
             match = re.search(
                 r"url\(\s*['\"]?([^'\")]+)['\"]?\s*\)|['\"]([^'\"]+)['\"]",
                 prelude,
@@ -1358,9 +1375,7 @@ class FontEncrypt:
             media_text = prelude[match.end() :].strip()
             if not self.css_import_media_applies_to_epub(media_text):
                 continue
-            import_path = self.resolve_book_path(base_path, href)
-            if import_path:
-                yield import_path
+            yield href
 
     def split_css_selector_list(self, selector):
         selectors = []
@@ -1408,12 +1423,8 @@ class FontEncrypt:
             return
         seen.add(css_path)
         for import_path in self.iter_css_import_paths(css_text, css_path):
-            if import_path not in self.epub.namelist():
-                continue
-            try:
-                with self.epub.open(import_path) as f:
-                    import_text = f.read().decode("utf-8")
-            except Exception:
+            import_text = self.read_css_text(import_path)
+            if import_text is None:
                 continue
             yield from self.iter_css_text_with_imports(import_path, import_text, seen)
         yield css_path, css_text
@@ -1441,15 +1452,20 @@ class FontEncrypt:
             if "stylesheet" not in rel_values and not href.lower().endswith(".css"):
                 continue
             css_path = self.resolve_book_path(html_path, href)
-            if css_path not in self.epub.namelist():
-                continue
-            try:
-                with self.epub.open(css_path) as f:
-                    css_text = f.read().decode("utf-8")
-            except Exception:
+            css_text = self.read_css_text(css_path)
+            if css_text is None:
                 continue
             yield from self.iter_css_text_with_imports(css_path, css_text)
 
+    def resolve_compiled_css_font_declaration(self, item):
+        """同一轮规则收集内字体映射不变，共享样式表的字体声明只需解析一次。"""
+        cache = getattr(self, "_css_font_declaration_cache", None)
+        if cache is None:
+            return self.resolve_css_font_declaration(item.declarations)
+        if id(item) not in cache:
+            cache[id(item)] = self.resolve_css_font_declaration(item.declarations)
+        return cache[id(item)]
+
     def parse_css_selector_mapping(
         self,
         css_text,
@@ -1459,12 +1475,16 @@ class FontEncrypt:
         rule_list=None,
         order_counter=None,
     ):
-        rules = parse_stylesheet(css_text)
-        for rule, scope_contexts, layer_order in self.iter_css_qualified_rules(rules):
-            selector = serialize(rule.prelude).strip()
-            if not selector:
+        anonymous_layer_names = {}
+        for item in self.compile_css_stylesheet(css_text).items:
+            layer_order = self.resolve_compiled_css_layer_order(
+                item.layer_path,
+                anonymous_layer_names,
+            )
+            if isinstance(item, CssLayerStatement):
                 continue
-            declarations = parse_declaration_list(rule.content)
+            scope_contexts = item.scope_contexts
+            declarations = item.declarations
             if order_counter is None:
                 self._css_selector_rule_order += 1
                 rule_order = self._css_selector_rule_order
@@ -1477,10 +1497,7 @@ class FontEncrypt:
                     or not declaration.lower_name.startswith("--")
                 ):
                     continue
-                for one_selector in self.split_css_selector_list(selector):
-                    one_selector = one_selector.strip()
-                    if not one_selector:
-                        continue
+                for one_selector in item.selectors:
                     for scope_context in scope_contexts:
                         self.record_css_custom_property_rule(
                             one_selector,
@@ -1508,41 +1525,37 @@ class FontEncrypt:
                 candidates,
                 declaration_name,
                 value_tokens,
-            ) = (
-                self.resolve_css_font_declaration(declarations)
-            )
+            ) = self.resolve_compiled_css_font_declaration(item)
             if not font_file and not candidates:
                 continue
-            for one_selector in self.split_css_selector_list(selector):
-                one_selector = one_selector.strip()
-                if one_selector:
-                    for scope_context in scope_contexts:
-                        self.record_css_selector_font_rule(
+            for one_selector in item.selectors:
+                for scope_context in scope_contexts:
+                    self.record_css_selector_font_rule(
+                        one_selector,
+                        font_file,
+                        mapping,
+                        rule_order,
+                        matched_family=matched_family,
+                        is_blocker=font_file is None,
+                        is_inherit=font_file is FONT_RULE_INHERIT,
+                        is_revert_layer=font_file is FONT_RULE_REVERT_LAYER,
+                        important=important,
+                        source_path=source_path,
+                        html_path=html_path,
+                        match_selector=self.build_scoped_match_selector(
                             one_selector,
-                            font_file,
-                            mapping,
-                            rule_order,
-                            matched_family=matched_family,
-                            is_blocker=font_file is None,
-                            is_inherit=font_file is FONT_RULE_INHERIT,
-                            is_revert_layer=font_file is FONT_RULE_REVERT_LAYER,
-                            important=important,
-                            source_path=source_path,
-                            html_path=html_path,
-                            match_selector=self.build_scoped_match_selector(
-                                one_selector,
-                                scope_context.get("prefix", ""),
-                            ),
-                            scope_root_selector=scope_context.get("prefix", "") or None,
-                            scope_limit_selectors=scope_context.get(
-                                "limit_selectors",
-                                [],
-                            ),
-                            layer_order=layer_order,
-                            declaration_name=declaration_name,
-                            value_tokens=value_tokens,
-                            rule_list=rule_list,
-                        )
+                            scope_context.get("prefix", ""),
+                        ),
+                        scope_root_selector=scope_context.get("prefix", "") or None,
+                        scope_limit_selectors=scope_context.get(
+                            "limit_selectors",
+                            [],
+                        ),
+                        layer_order=layer_order,
+                        declaration_name=declaration_name,
+                        value_tokens=value_tokens,
+                        rule_list=rule_list,
+                    )
 
     def create_target_epub(self):
         self.target_epub = zipfile.ZipFile(
@@ -1556,9 +1569,9 @@ class FontEncrypt:
         for css in self.css:
             with self.epub.open(css) as f:
                 content = f.read().decode("utf-8")
-                rules = parse_stylesheet(content)
+                rules = self.compile_css_stylesheet(content).rules
                 for rule in self.iter_css_font_face_rules(rules):
-                    declarations = parse_declaration_list(rule.content)
+                    declarations = tinycss2.parse_declaration_list(rule.content)
                     font_family = None
                     src_urls = []
                     for declaration in declarations:
@@ -1571,7 +1584,7 @@ class FontEncrypt:
                             if candidates:
                                 font_family = candidates[0]
                         elif declaration.lower_name == "src":
-                            src_text = serialize(declaration.value)
+                            src_text = tinycss2.serialize(declaration.value)
                             src_urls.extend(
                                 re.findall(r"url\((.*?)\)", src_text, flags=re.IGNORECASE)
                             )
@@ -1590,13 +1603,15 @@ class FontEncrypt:
         self.css_selector_font_rules = []
         self.css_custom_property_rules = []
         self._css_selector_rule_order = 0
+        self._css_font_declaration_cache = {}
         for one_html in self.htmls:
-            with self.epub.open(one_html) as f:
-                html_content = f.read().decode("utf-8")
-            soup = BeautifulSoup(html_content, "html.parser")
-            for source_path, css_text in self.iter_document_css_texts(soup, one_html):
+            document = self.load_html_document(one_html)
+            for source_path, css_text in self.iter_document_css_texts(
+                document.soup,
+                one_html,
+            ):
                 self.parse_css_selector_mapping(
-                    css_text,
+                    document.restore_placeholders(css_text),
                     source_path,
                     mapping,
                     html_path=one_html,
@@ -1605,6 +1620,7 @@ class FontEncrypt:
         self.css_selector_to_font_mapping = dict(
             sorted(mapping.items(), key=lambda item: len(item[0]), reverse=True)
         )
+        self._css_font_declaration_cache = None
 
     def remove_duplicates(self, s):
         seen = set()
@@ -1736,9 +1752,9 @@ class FontEncrypt:
 
     def iter_direct_text_nodes(self, tag):
         for child in tag.children:
-            if not isinstance(child, NavigableString):
+            if not isinstance(child, bs4.NavigableString):
                 continue
-            if isinstance(child, Comment):
+            if isinstance(child, bs4.Comment):
                 continue
             if not child.strip():
                 continue
@@ -1755,7 +1771,7 @@ class FontEncrypt:
     def build_inline_font_rule_record(self, tag):
         if not tag or not tag.has_attr("style"):
             return None
-        declarations = parse_declaration_list(tag.get("style", ""))
+        declarations = tinycss2.parse_declaration_list(tag.get("style", ""))
         (
             font_file,
             _,
@@ -1890,7 +1906,7 @@ class FontEncrypt:
         for rule in rules:
             match_selector = rule.get("match_selector", rule["selector"])
             try:
-                selectors = cssselect2.compile_selector_list(match_selector)
+                selectors = compile_selector_list(match_selector)
             except cssselect2.SelectorError:
                 fallback_rules.append(rule)
                 continue
@@ -1928,7 +1944,7 @@ class FontEncrypt:
         if not tag or not tag.has_attr("style"):
             return []
         records = []
-        declarations = parse_declaration_list(tag.get("style", ""))
+        declarations = tinycss2.parse_declaration_list(tag.get("style", ""))
         for declaration_order, declaration in enumerate(declarations, 1):
             if (
                 declaration.type != "declaration"
@@ -2097,7 +2113,7 @@ class FontEncrypt:
         for rule in rules:
             match_selector = rule.get("match_selector", rule["selector"])
             try:
-                selectors = cssselect2.compile_selector_list(match_selector)
+                selectors = compile_selector_list(match_selector)
             except cssselect2.SelectorError:
                 fallback_rules.append(rule)
                 continue
@@ -2177,38 +2193,90 @@ class FontEncrypt:
             current = current.parent
         return None
 
+    def get_document_cache(self):
+        cache = getattr(self, "_document_cache", None)
+        if cache is None:
+            cache = HtmlDocumentCache(
+                resolve_document_cache_budget(getattr(self, "document_cache_mb", None))
+            )
+            self._document_cache = cache
+        return cache
+
+    def parse_html_document(self, one_html):
+        content = self.epub.read(one_html).decode("utf-8")
+        protected_content, placeholder_map = self.protect_escaped_angle_entities(content)
+        marked_content, marker_attr = self.inject_cssselect2_markers(protected_content)
+        self.get_document_cache().parses += 1
+        return HtmlDocument(
+            path=one_html,
+            soup=bs4.BeautifulSoup(marked_content, "html.parser"),
+            marked_content=marked_content,
+            marker_attr=marker_attr,
+            placeholder_map=placeholder_map,
+            cost=len(marked_content) * DOCUMENT_TREE_COST_FACTOR,
+        )
+
+    def load_html_document(self, one_html):
+        cache = self.get_document_cache()
+        document = cache.get(one_html)
+        if document is None:
+            document = self.parse_html_document(one_html)
+            cache.put(document)
+        return document
+
+    def take_html_document(self, one_html):
+        """写出阶段是文档的最后一次使用，取出后释放缓存占用。"""
+        document = self.get_document_cache().pop(one_html)
+        if document is None:
+            document = self.parse_html_document(one_html)
+        return document
+
+    def resolve_document_effective_fonts(self, document):
+        if document.effective_fonts is None:
+            css_font_rule_index = self.build_css_font_rule_index(
+                document.soup,
+                document.path,
+                document.marked_content,
+                document.marker_attr,
+            )
+            self.remove_cssselect2_markers(document.soup, document.marker_attr)
+            # 自定义属性索引只对当前文档有效，必须在处理下一份文档前算完全部元素。
+            document.effective_fonts = [
+                (tag, self.get_effective_font_file(tag, css_font_rule_index))
+                for tag in document.soup.find_all(True)
+            ]
+        return document.effective_fonts
+
+    def log_document_cache_stats(self):
+        cache = self.get_document_cache()
+        logger.write(f"XHTML 文档解析 {cache.parses} 次，复用解析结果 {cache.hits} 次")
+        cache.clear()
+
     def find_char_mapping(self):
         mapping = {}
         for one_html in self.htmls:
-            with self.epub.open(one_html) as f:
-                content = f.read().decode("utf-8")
-                marked_content, marker_attr = self.inject_cssselect2_markers(content)
-                soup = BeautifulSoup(marked_content, "html.parser")
-                css_font_rule_index = self.build_css_font_rule_index(
-                    soup,
-                    one_html,
-                    marked_content,
-                    marker_attr,
+            document = self.load_html_document(one_html)
+            for tag, font_file in self.resolve_document_effective_fonts(document):
+                if not font_file or not self.is_target_font_file(font_file):
+                    continue
+                text = "".join(
+                    text_node.strip()
+                    for text_node in self.iter_direct_text_nodes(tag)
+                )
+                self.add_text_to_font_mapping(
+                    mapping,
+                    font_file,
+                    document.restore_placeholders(text, decode=True),
                 )
-                self.remove_cssselect2_markers(soup, marker_attr)
-                for tag in soup.find_all(True):
-                    font_file = self.get_effective_font_file(tag, css_font_rule_index)
-                    if not font_file or not self.is_target_font_file(font_file):
-                        continue
-                    text = "".join(
-                        text_node.strip()
-                        for text_node in self.iter_direct_text_nodes(tag)
-                    )
-                    self.add_text_to_font_mapping(mapping, font_file, text)
         self.font_to_char_mapping = mapping
 
     def get_mapping(self):
         self.find_local_fonts_mapping()
         self.find_selector_to_font_mapping()
         self.find_char_mapping()
-        logger.write(f"字体文件映射: {self.font_to_font_family_mapping}")
-        logger.write(f"CSS选择器映射: {self.css_selector_to_font_mapping}")
-        logger.write(f"字体文件到字符映射: {self.font_to_char_mapping}")
+        logger.debug("字体文件映射: %s", self.font_to_font_family_mapping)
+        logger.debug("CSS选择器映射: %s", self.css_selector_to_font_mapping)
+        logger.debug("字体文件到字符映射: %s", self.font_to_char_mapping)
         return (
             self.font_to_font_family_mapping,
             self.css_selector_to_font_mapping,
@@ -2339,8 +2407,8 @@ class FontEncrypt:
             self.font_to_char_mapping[key] = self.remove_duplicates("".join(obfuscation_chars))
             passthrough_mapping[key] = self.remove_duplicates("".join(passthrough_chars))
         self.font_to_passthrough_char_mapping = passthrough_mapping
-        logger.write(f"清理后的文本: {self.font_to_char_mapping}")
-        logger.write(f"保留原码位的文本: {self.font_to_passthrough_char_mapping}")
+        logger.debug("清理后的文本: %s", self.font_to_char_mapping)
+        logger.debug("保留原码位的文本: %s", self.font_to_passthrough_char_mapping)
 
     # 修改自https://github.com/solarhell/fontObfuscator
     def ensure_cmap_has_all_text(self, cmap: dict, s: str) -> bool:
@@ -2396,7 +2464,7 @@ class FontEncrypt:
         for i, (font_path, plain_text) in enumerate(self.font_to_char_mapping.items()):
             try:
                 original_bytes = self.epub.read(font_path)
-                original_font = TTFont(BytesIO(original_bytes))
+                original_font = ttLib.TTFont(BytesIO(original_bytes))
                 original_cmap: dict = original_font.getBestCmap() or {}
                 miss_char, plain_text = self.ensure_cmap_has_all_text(
                     original_cmap, plain_text
@@ -2439,9 +2507,9 @@ class FontEncrypt:
                     font_path, font_stream.getvalue(), zipfile.ZIP_DEFLATED
                 )
                 self.font_to_char_mapping[font_path] = replace_table
-                logger.write(f"字体文件{font_path}的加密映射: \n{replace_table}")
+                logger.debug("字体文件%s的加密映射: \n%s", font_path, replace_table)
             except Exception as e:
-                logger.write(f"字体文件{font_path}混淆失败，保留原字体，错误信息: {e}")
+                logger.warning(f"字体文件{font_path}混淆失败，保留原字体，错误信息: {e}")
                 self.target_epub.writestr(font_path, self.epub.read(font_path), zipfile.ZIP_DEFLATED)
                 self.font_to_char_mapping[font_path] = {}
 
@@ -2460,21 +2528,10 @@ class FontEncrypt:
 
     def read_html(self):
         for one_html in self.htmls:
-            with self.epub.open(one_html) as f:
-                content = f.read().decode("utf-8")
-            protected_content, placeholder_map = self.protect_escaped_angle_entities(content)
-            marked_content, marker_attr = self.inject_cssselect2_markers(protected_content)
-            soup = BeautifulSoup(marked_content, "html.parser")
-            css_font_rule_index = self.build_css_font_rule_index(
-                soup,
-                one_html,
-                marked_content,
-                marker_attr,
-            )
-            self.remove_cssselect2_markers(soup, marker_attr)
+            document = self.take_html_document(one_html)
+            soup = document.soup
 
-            for tag in soup.find_all(True):
-                font_file = self.get_effective_font_file(tag, css_font_rule_index)
+            for tag, font_file in self.resolve_document_effective_fonts(document):
                 if not font_file or not self.is_target_font_file(font_file):
                     continue
                 replace_table = self.font_to_char_mapping.get(font_file, {})
@@ -2491,10 +2548,14 @@ class FontEncrypt:
             # 1) 会对文本中的 < / & 等进行最小必要转义，避免 &lt;script&gt; 变回真实标签导致 XHTML 结构损坏；
             # 2) 不会像 html formatter 那样把 … / — 等字符广泛替换为命名实体。
             formatted_html = soup.decode(formatter="minimal")
-            restored_html = self.restore_escaped_angle_entities(formatted_html, placeholder_map)
+            restored_html = self.restore_escaped_angle_entities(
+                formatted_html,
+                document.placeholder_map,
+            )
             self.target_epub.writestr(
                 one_html, restored_html.encode("utf-8"), zipfile.ZIP_DEFLATED
             )
+        self.log_document_cache_stats()
         # 保留未参与混淆的字体文件，避免被遗漏导致阅读器缺字
         untouched_fonts = [
             font_file
@@ -2502,14 +2563,18 @@ class FontEncrypt:
             if font_file not in self.font_to_char_mapping
         ]
         for font_file in untouched_fonts:
-            with self.epub.open(font_file) as f:
-                content = f.read()
-            self.target_epub.writestr(font_file, content, zipfile.ZIP_DEFLATED)
+            copy_zip_entry(self.epub, font_file, self.target_epub)
+        source_names = set(self.epub.namelist())
         for item in self.ori_files:
-            if item in self.epub.namelist():
-                with self.epub.open(item) as f:
-                    content = f.read()
-                self.target_epub.writestr(item, content, zipfile.ZIP_DEFLATED)
+            if item == self.opf_path:
+                opf_text = self._decode_xml_bytes(self.epub.read(item))
+                self.target_epub.writestr(
+                    item,
+                    mark_opf_generated_by_tool(opf_text).encode("utf-8"),
+                    zipfile.ZIP_DEFLATED,
+                )
+            elif item in source_names:
+                copy_zip_entry(self.epub, item, self.target_epub)
         self.close_file()
         logger.write(f"EPUB文件处理完成，输出文件路径: {self.file_write_path}")
 
@@ -2521,12 +2586,14 @@ def run(
     epub_path,
     output_path=None,
     target_font_families=None,
+    document_cache_mb=None,
 ):
     logger.write(f"\n正在尝试加密EPUB字体: {epub_path}")
     fe = FontEncrypt(
         epub_path,
         output_path,
         target_font_families=target_font_families,
+        document_cache_mb=document_cache_mb,
     )
     if len(fe.fonts) == 0:
         logger.write("没有找到字体文件，退出")
@@ -2539,7 +2606,7 @@ def run(
         fe.encrypt_font()
         logger.write("字体加密成功")
     except Exception as e:
-        logger.write(f"字体加密失败，错误信息: {e}")
+        logger.error(f"字体加密失败，错误信息: {e}")
         traceback.print_exc()
         fe.close_file()
         fe.fail_del_target()
@@ -2549,7 +2616,7 @@ def run(
         logger.write("EPUB文件处理成功")
         fe.close_file()
     except Exception as e:
-        logger.write(f"EPUB文件处理失败，错误信息: {e}")
+        logger.error(f"EPUB文件处理失败，错误信息: {e}")
         fe.close_file()
         fe.fail_del_target()
         return e
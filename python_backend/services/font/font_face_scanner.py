@@ -0,0 +1,236 @@
+"""轻量的 ``@font-face`` 字体 family 扫描。
+
+界面拖入一批书籍时会调用 ``list-fonts-batch`` 读取可选字体，这一步只需要
+样式表顶层 ``@font-face`` 的 ``font-family`` 与 ``src``。本模块只依赖标准库，
+按 CSS 词法跳过注释、字符串与其他规则块，不解析完整样式表，也不导入字体
+处理模块的 tinycss2/cssselect2/fontTools 依赖。函数无共享状态，可在线程池中
+并发扫描多本书。结果与 tinycss2 ``parse_stylesheet`` 的顶层规则语义保持一致。
+"""
+
+import os
+import re
+import zipfile
+
+EPUB_FONT_FILE_EXTENSIONS = (".ttf", ".otf", ".woff", ".woff2")
+
+_FONT_FACE_NAME = "font-face"
+_CLOSING_BRACKETS = {"{": "}", "(": ")", "[": "]"}
+_STRING_PATTERN = re.compile(r"""(?:"(?:[^"\\\n]|\\.)*|'(?:[^'\\\n]|\\.)*)["'\n]?""", re.DOTALL)
+_TOP_LEVEL_SPECIAL_PATTERN = re.compile(r"""["'\\{(\[@]""")
+# 一次跳过顶层普通文本与不含字符串、括号嵌套的简单规则块，减少逐字符处理。
+_TOP_LEVEL_SKIP_PATTERN = re.compile(r"""(?:[^"'\\{(\[@]+|\{[^{}"'\\()\[\]]*\})*""")
+_BLOCK_SPECIAL_PATTERN = re.compile(r"""["'\\{}()\[\]]""")
+_PRELUDE_SPECIAL_PATTERN = re.compile(r"""["'\\{;(\[]""")
+_DECLARATION_SPECIAL_PATTERN = re.compile(r"""["'\\;{(\[]""")
+_AT_KEYWORD_PATTERN = re.compile(r"(?:[\w-]|\\.)*", re.DOTALL)
+_DECLARATION_NAME_PATTERN = re.compile(r"-?[A-Za-z_][\w-]*")
+_COMMENT_PATTERN = re.compile(
+    r"""("(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)|/\*.*?(?:\*/|\Z)""",
+    re.DOTALL,
+)
+_ESCAPE = r"\\(?:[0-9A-Fa-f]{1,6}[ \t\n]?|.)"
+_NAME_START = rf"(?:[A-Za-z_]|[^\x00-\x7f]|{_ESCAPE})"
+_NAME_CHAR = rf"(?:[\w-]|[^\x00-\x7f]|{_ESCAPE})"
+_VALUE_TOKEN_PATTERN = re.compile(
+    rf"""
+    (?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)
+    |(?P<number>[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?(?:%|-?{_NAME_START}{_NAME_CHAR}*)?)
+    |(?P<hash>[#@]{_NAME_CHAR}+)
+    |(?P<ident>(?:--|-?{_NAME_START}){_NAME_CHAR}*)
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_ESCAPE_PATTERN = re.compile(r"\\(?:([0-9A-Fa-f]{1,6})[ \t\n]?|(.))", re.DOTALL)
+_IMPORTANT_PATTERN = re.compile(r"!\s*important\s*$", re.IGNORECASE)
+_URL_PATTERN = re.compile(r"url\((.*?)\)", re.IGNORECASE)
+
+
+def _unescape(text):
+    def replace(match):
+        if match.group(1):
+            codepoint = int(match.group(1), 16)
+            if codepoint == 0 or codepoint > 0x10FFFF or 0xD800 <= codepoint <= 0xDFFF:
+                return "�"
+            return chr(codepoint)
+        return "" if match.group(2) == "\n" else match.group(2)
+
+    return _ESCAPE_PATTERN.sub(replace, text) if "\\" in text else text
+
+
+def _skip_string(text, index):
+    match = _STRING_PATTERN.match(text, index)
+    return match.end()
+
+
+def _find_block_end(text, start):
+    """返回与 ``text[start]`` 处左括号匹配的右括号之后的位置。"""
+    stack = [_CLOSING_BRACKETS[text[start]]]
+    index = start + 1
+    while stack:
+        match = _BLOCK_SPECIAL_PATTERN.search(text, index)
+        if match is None:
+            return len(text)
+        char = match.group()
+        index = match.end()
+        if char in "\"'":
+            index = _skip_string(text, match.start())
+        elif char == "\\":
+            index += 1
+        elif char in _CLOSING_BRACKETS:
+            stack.append(_CLOSING_BRACKETS[char])
+        elif char == stack[-1]:
+            stack.pop()
+    return index
+
+
+def iter_font_face_blocks(css_text):
+    """按顺序产出样式表顶层 ``@font-face`` 块的内容文本。"""
+    text = css_text
+    if "/*" in text:
+        text = _COMMENT_PATTERN.sub(lambda match: match.group(1) or " ", text)
+    index = 0
+    while True:
+        index = _TOP_LEVEL_SKIP_PATTERN.match(text, index).end()
+        match = _TOP_LEVEL_SPECIAL_PATTERN.search(text, index)
+        if match is None:
+            return
+        char = match.group()
+        index = match.end()
+        if char in "\"'":
+            index = _skip_string(text, match.start())
+        elif char == "\\":
+            index += 1
+        elif char in _CLOSING_BRACKETS:
+            index = _find_block_end(text, match.start())
+        elif char == "@":
+            keyword = _AT_KEYWORD_PATTERN.match(text, index).group()
+            prelude_end = _find_at_rule_prelude_end(text, index)
+            if prelude_end < len(text) and text[prelude_end] == "{":
+                block_end = _find_block_end(text, prelude_end)
+                if keyword.lower() == _FONT_FACE_NAME:
+                    body_end = block_end - 1 if text[block_end - 1] == "}" else block_end
+                    yield text[prelude_end + 1 : body_end]
+                index = block_end
+            else:
+                index = prelude_end + 1
+
+
+def _find_at_rule_prelude_end(text, index):
+    """返回 at-rule 前导部分之后第一个 ``{`` 或 ``;`` 的位置。"""
+    while True:
+        match = _PRELUDE_SPECIAL_PATTERN.search(text, index)
+        if match is None:
+            return len(text)
+        char = match.group()
+        if char in "{;":
+            return match.start()
+        if char in "\"'":
+            index = _skip_string(text, match.start())
+        elif char == "\\":
+            index = match.end() + 1
+        else:
+            index = _find_block_end(text, match.start())
+
+
+def iter_declarations(block_text):
+    """拆分声明块，产出 ``(小写属性名, 去掉 !important 的值文本)``。"""
+    start = 0
+    index = 0
+    while True:
+        match = _DECLARATION_SPECIAL_PATTERN.search(block_text, index)
+        end = match.start() if match else len(block_text)
+        char = match.group() if match else ";"
+        if char == ";":
+            name, separator, value = block_text[start:end].partition(":")
+            name = name.strip()
+            if separator and _DECLARATION_NAME_PATTERN.fullmatch(name):
+                yield name.lower(), _IMPORTANT_PATTERN.sub("", value).strip()
+            if match is None:
+                return
+            start = index = match.end()
+        elif char in "\"'":
+            index = _skip_string(block_text, end)
+        elif char == "\\":
+            index = match.end() + 1
+        else:
+            index = _find_block_end(block_text, end)
+
+
+def extract_font_family(value_text):
+    """按 tinycss2 的词法取出 font-family 值中的字符串与标识符并以空格连接。
+
+    值中没有字符串或标识符时返回 None。
+    """
+    values = []
+    index = 0
+    length = len(value_text)
+    while index < length:
+        match = _VALUE_TOKEN_PATTERN.match(value_text, index)
+        index = match.end()
+        kind = match.lastgroup
+        if kind == "string":
+            token = match.group("string")
+            body = token[1:-1] if len(token) > 1 and token[-1] == token[0] else token[1:]
+            values.append(_unescape(body))
+        elif kind == "ident":
+            if index < length and value_text[index] == "(":
+                index = _find_block_end(value_text, index)
+                continue
+            values.append(_unescape(match.group("ident")))
+        elif kind == "other" and match.group("other") in "([{":
+            index = _find_block_end(value_text, match.start())
+    if not values:
+        return None
+    return " ".join(values).strip().strip("'\"")
+
+
+def scan_css_font_faces(css_text):
+    """产出样式表中带 ``src`` 的 ``@font-face`` 的 ``(font_family, src 文本)``。"""
+    for block_text in iter_font_face_blocks(css_text):
+        font_family = None
+        src_value = None
+        for name, value in iter_declarations(block_text):
+            if name == "font-family":
+                family = extract_font_family(value)
+                if family is not None:
+                    font_family = family
+            elif name == "src":
+                src_value = value
+        if font_family and src_value:
+            yield font_family, src_value
+
+
+def list_epub_font_families(epub_path):
+    if not os.path.exists(epub_path):
+        raise Exception("EPUB文件不存在")
+
+    with zipfile.ZipFile(epub_path) as epub:
+        names = epub.namelist()
+        css_files = [item for item in names if item.lower().endswith(".css")]
+        font_file_names = {
+            os.path.basename(item).lower()
+            for item in names
+            if item.lower().endswith(EPUB_FONT_FILE_EXTENSIONS)
+        }
+        if not css_files or not font_file_names:
+            return {"font_families": []}
+
+        font_families = set()
+        for css in css_files:
+            try:
+                content_bytes = epub.read(css)
+                if b"@font-face" not in content_bytes.lower():
+                    continue
+                content = content_bytes.decode("utf-8")
+            except Exception:
+                continue
+
+            for font_family, src_value in scan_css_font_faces(content):
+                for one_url in _URL_PATTERN.findall(src_value):
+                    cleaned = one_url.strip().strip("'\"").split("#")[0].split("?")[0]
+                    if os.path.basename(cleaned).lower() in font_file_names:
+                        font_families.add(font_family)
+                        break
+
+    return {"font_families": sorted(font_families, key=str.lower)}
@@ -0,0 +1,157 @@
+"""字形 OCR 结果的本地持久化缓存。
+
+缓存键由字形轮廓哈希、渲染参数与 OCR 模型名组成，同一出版方在不同书籍中
+复用的混淆字形只需识别一次。结果保存在 SQLite 文件中，按最近使用时间做
+条目数上限淘汰。缓存只是加速手段：任何读写失败都只记录并停用缓存，
+不影响字体反混淆任务本身。
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from io import BytesIO
+
+from python_backend.services.utils.lazy_import import LazyModule
+
+recordingPen = LazyModule("fontTools.pens.recordingPen", globals())
+ttLib = LazyModule("fontTools.ttLib", globals())
+
+OCR_CACHE_FILE_NAME = "ocr_cache.sqlite3"
+DEFAULT_OCR_CACHE_MAX_ENTRIES = 200000
+OCR_CACHE_SCHEMA_VERSION = 1
+
+
+def resolve_ocr_cache_path(options=None):
+    """返回缓存文件路径；显式关闭或无法确定位置时返回 None。"""
+    options = options or {}
+    if options.get("ocr_cache") is False:
+        return None
+    explicit = options.get("ocr_cache_path") or os.environ.get("EPUB_TOOL_OCR_CACHE_PATH")
+    if explicit:
+        return os.path.abspath(explicit)
+    log_path = os.environ.get("EPUB_TOOL_LOG_PATH", "").strip()
+    if not log_path:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(log_path)), OCR_CACHE_FILE_NAME)
+
+
+def build_glyph_cache_key(outline_hash, renderer_signature, model_name, max_image_width=None):
+    """``max_image_width`` 决定字形条缩放与分批方式，会影响识别结果，也计入缓存键。"""
+    payload = repr(
+        (
+            OCR_CACHE_SCHEMA_VERSION,
+            outline_hash,
+            tuple(renderer_signature),
+            model_name,
+            max_image_width,
+        )
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GlyphOutlineHasher:
+    """按字符计算字体中对应字形的轮廓哈希，兼容 glyf 与 CFF 字体。"""
+
+    def __init__(self, font_bytes):
+        self.font = ttLib.TTFont(BytesIO(font_bytes), lazy=True)
+        self.cmap = self.font.getBestCmap() or {}
+        self.glyph_set = self.font.getGlyphSet()
+        self.units_per_em = self.font["head"].unitsPerEm
+        self.hmtx = self.font["hmtx"] if "hmtx" in self.font else None
+
+    def outline_hash(self, char):
+        glyph_name = self.cmap.get(ord(char))
+        if glyph_name is None or glyph_name not in self.glyph_set:
+            return None
+        pen = recordingPen.DecomposingRecordingPen(self.glyph_set)
+        self.glyph_set[glyph_name].draw(pen)
+        advance_width = self.hmtx[glyph_name][0] if self.hmtx else None
+        payload = repr((self.units_per_em, advance_width, pen.value))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GlyphOcrCache:
+    def __init__(self, path, max_entries=DEFAULT_OCR_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS glyph_ocr ("
+                "key TEXT PRIMARY KEY, "
+                "text TEXT NOT NULL, "
+                "confidence REAL, "
+                "period_like INTEGER NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS glyph_ocr_last_used ON glyph_ocr(last_used)"
+            )
+            self.connection.commit()
+        return self.connection
+
+    def get_many(self, keys):
+        """返回 {key: (text, confidence, period_like)}，并刷新命中条目的使用时间。"""
+        keys = [key for key in dict.fromkeys(keys) if key]
+        if not keys:
+            return {}
+        connection = self.connect()
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = connection.execute(
+                "SELECT key, text, confidence, period_like FROM glyph_ocr "
+                f"WHERE key IN ({placeholders})",
+                chunk,
+            ).fetchall()
+            for key, text, confidence, period_like in rows:
+                found[key] = (text, confidence, bool(period_like))
+        if found:
+            now = time.time()
+            connection.executemany(
+                "UPDATE glyph_ocr SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            connection.commit()
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries):
+        """写入 [(key, text, confidence, period_like)]，超过上限时淘汰最久未用的条目。"""
+        entries = [entry for entry in entries if entry[0]]
+        if not entries:
+            return
+        connection = self.connect()
+        now = time.time()
+        connection.executemany(
+            "INSERT OR REPLACE INTO glyph_ocr "
+            "(key, text, confidence, period_like, last_used) VALUES (?, ?, ?, ?, ?)",
+            [
+                (key, text, confidence, int(bool(period_like)), now)
+                for key, text, confidence, period_like in entries
+            ],
+        )
+        (count,) = connection.execute("SELECT COUNT(*) FROM glyph_ocr").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            connection.execute(
+                "DELETE FROM glyph_ocr WHERE key IN "
+                "(SELECT key FROM glyph_ocr ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+        connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
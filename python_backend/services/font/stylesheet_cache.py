@@ -0,0 +1,56 @@
+"""字体任务共享的 CSS 样式表编译缓存。
+
+同一份样式表通常被书中每个 XHTML 链接一次。这里把 tinycss2 解析结果、
+``@import`` 目标与展开后的限定规则序列编译为与文档无关的
+``CompiledStylesheet``，按样式表文本缓存；各文档只需按顺序重放规则，
+再补上规则序号与 ``@layer`` 排序。匿名层在编译结果中以局部序号表示，
+重放时按首次出现顺序申请全局名称，与逐文档重新解析的行为一致。
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from python_backend.services.utils.lazy_import import LazyModule
+
+cssselect2 = LazyModule("cssselect2", globals())
+
+SELECTOR_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def _compile_selector_list(selector):
+    try:
+        return tuple(cssselect2.compile_selector_list(selector)), None
+    except cssselect2.SelectorError as exc:
+        return None, exc.args
+
+
+def compile_selector_list(selector):
+    """带缓存的 ``cssselect2.compile_selector_list``，非法选择器同样抛出 SelectorError。"""
+    selectors, error_args = _compile_selector_list(selector or "")
+    if selectors is None:
+        raise cssselect2.SelectorError(*error_args)
+    return selectors
+
+
+@dataclass(slots=True)
+class CssLayerStatement:
+    """只影响层排序的条目；``layer_path`` 中的整数表示样式表内的匿名层序号。"""
+
+    layer_path: tuple
+
+
+@dataclass(slots=True)
+class CompiledCssRule:
+    selector: str
+    selectors: list[str]
+    scope_contexts: list[dict]
+    layer_path: tuple
+    declarations: list
+
+
+@dataclass(slots=True)
+class CompiledStylesheet:
+    rules: list
+    import_hrefs: list[str] = field(default_factory=list)
+    items: list = field(default_factory=list)
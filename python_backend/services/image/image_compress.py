@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from python_backend.services.image.image_processing import process_images
+from python_backend.services.image.image_processing import process_images, resolve_image_workers
 from python_backend.services.utils.log import logwriter
 
 
@@ -22,5 +22,10 @@ def run(input_file: str, output_dir: str | None, *, options: dict[str, object])
         webp_quality=webp_quality,
         png_to_jpg=bool(options.get("png_to_jpg", False)),
         png_quantize=bool(options.get("png_quantize", False)),
+        max_dimension=options.get("max_dimension"),
+        max_pixels=options.get("max_pixels"),
+        dedupe=bool(options.get("dedupe_images", False)),
+        prune=bool(options.get("prune_unreferenced", False)),
+        workers=resolve_image_workers(options),
         logger=logger,
     )
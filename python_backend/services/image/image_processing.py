@@ -1,18 +1,38 @@
 from __future__ import annotations
 
+import hashlib
 import io
+import math
+import os
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path, PurePosixPath
-from urllib.parse import quote
 
-from PIL import Image, ImageOps, UnidentifiedImageError
-
-from python_backend.epub_workspace import (
-    EpubWorkspace,
-    media_type_for,
-    replace_reference_path,
-    resolve_reference,
+from python_backend.epub_references import (
+    OPF_COVER_NAME_RE,
+    OPF_HREF_RE,
+    OPF_ID_RE,
+    OPF_IDREF_RE,
+    OPF_ITEM_LINK_RE,
+    OPF_ITEM_RE,
+    OPF_META_CONTENT_RE,
+    OPF_META_RE,
+    OPF_PROPERTIES_RE,
+    manifest_items,
+    prune_roots,
+    reference_index,
+    rewrite_document,
+    rewrite_reference,
+    unreachable_members,
 )
+from python_backend.epub_workspace import EpubWorkspace, LazyMembers, media_type_for, resolve_reference
+from python_backend.services.utils.lazy_import import LazyModule
+
+# Pillow 只在实际转换图片时导入，见 lazy_import 模块说明。
+Image = LazyModule("PIL.Image", globals())
+ImageOps = LazyModule("PIL.ImageOps", globals())
 
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
@@ -24,22 +44,14 @@ IMAGE_FORMAT_BY_EXTENSION = {
     ".bmp": "BMP",
 }
 MAX_IMAGE_PIXELS = 40_000_000
+# Pillow 在解码、编码与量化时释放 GIL，单本书内的图片用线程池并行转换。
+DEFAULT_IMAGE_WORKERS = 4
 BYTES_PER_MEBIBYTE = 1024 * 1024
-REFERENCE_ATTRIBUTES_RE = re.compile(
-    rb"(?P<prefix>\b(?:src|href|xlink:href|poster)\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])",
-    re.IGNORECASE,
-)
-SRCSET_RE = re.compile(rb"(?P<prefix>\bsrcset\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])", re.IGNORECASE)
-CSS_URL_RE = re.compile(rb"(?P<prefix>url\(\s*[\"']?)(?P<value>[^\"')]+)(?P<suffix>[\"']?\s*\))", re.IGNORECASE)
-OPF_ITEM_RE = re.compile(rb"(?P<prefix><item\b)(?P<attributes>[^>]*)(?P<suffix>/?>)", re.IGNORECASE)
-OPF_HREF_RE = re.compile(
-    rb"(?P<prefix>\bhref\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])",
-    re.IGNORECASE,
-)
 OPF_MEDIA_TYPE_RE = re.compile(
     rb"(?P<prefix>\bmedia-type\s*=\s*[\"'])(?P<value>[^\"']+)(?P<suffix>[\"'])",
     re.IGNORECASE,
 )
+OPF_REFINES_RE = re.compile(rb"\brefines\s*=\s*[\"']#(?P<value>[^\"']+)[\"']", re.IGNORECASE)
 
 
 def format_size_mb(size_bytes: int) -> str:
@@ -57,74 +69,6 @@ def _converted_path(source: str, extension: str, existing: set[str]) -> str:
     return candidate
 
 
-def _rewrite_one(reference: str, document_path: str, replacements: dict[str, str]) -> str:
-    try:
-        resolved = resolve_reference(document_path, reference)
-    except ValueError:
-        return reference
-    target = replacements.get(resolved or "")
-    if not target:
-        return reference
-    rewritten = replace_reference_path(reference, document_path, target)
-    path, marker, suffix = rewritten.partition("?")
-    if not marker:
-        path, marker, suffix = rewritten.partition("#")
-        return quote(path, safe="/.:@~!$&'()*+,;=-_") + (marker + suffix if marker else "")
-    return quote(path, safe="/.:@~!$&'()*+,;=-_") + marker + suffix
-
-
-def _rewrite_document(data: bytes, document_path: str, replacements: dict[str, str]) -> bytes:
-    def replace_attribute(match: re.Match[bytes]) -> bytes:
-        value = match.group("value").decode("utf-8", "surrogateescape")
-        rewritten = _rewrite_one(value, document_path, replacements)
-        return match.group("prefix") + rewritten.encode("utf-8", "surrogateescape") + match.group("suffix")
-
-    def replace_srcset(match: re.Match[bytes]) -> bytes:
-        value = match.group("value").decode("utf-8", "surrogateescape")
-        rewritten: list[str] = []
-        position = 0
-        while position < len(value):
-            while position < len(value) and (
-                value[position].isspace() or value[position] == ","
-            ):
-                rewritten.append(value[position])
-                position += 1
-            if position >= len(value):
-                break
-
-            url_start = position
-            is_data_uri = value[position:].lower().startswith("data:")
-            while position < len(value) and not value[position].isspace() and (
-                is_data_uri or value[position] != ","
-            ):
-                position += 1
-            raw_url = value[url_start:position]
-            url = raw_url.rstrip(",")
-            rewritten.append(_rewrite_one(url, document_path, replacements))
-            rewritten.append(raw_url[len(url) :])
-            if len(url) != len(raw_url):
-                continue
-
-            parenthesis_depth = 0
-            while position < len(value):
-                char = value[position]
-                rewritten.append(char)
-                position += 1
-                if char == "(":
-                    parenthesis_depth += 1
-                elif char == ")":
-                    parenthesis_depth = max(0, parenthesis_depth - 1)
-                elif char == "," and parenthesis_depth == 0:
-                    break
-
-        encoded = "".join(rewritten).encode("utf-8", "surrogateescape")
-        return match.group("prefix") + encoded + match.group("suffix")
-
-    result = REFERENCE_ATTRIBUTES_RE.sub(replace_attribute, data)
-    result = SRCSET_RE.sub(replace_srcset, result)
-    return CSS_URL_RE.sub(replace_attribute, result)
-
-
 def _update_opf(workspace: EpubWorkspace, replacements: dict[str, str]) -> None:
     def replace_item(match: re.Match[bytes]) -> bytes:
         attributes = match.group("attributes")
@@ -141,7 +85,7 @@ def _update_opf(workspace: EpubWorkspace, replacements: dict[str, str]) -> None:
         if target is None:
             return match.group(0)
 
-        rewritten_href = _rewrite_one(href, workspace.opf_path, replacements)
+        rewritten_href = rewrite_reference(href, workspace.opf_path, replacements)
         attributes = (
             attributes[: href_match.start("value")]
             + rewritten_href.encode("utf-8", "surrogateescape")
@@ -159,11 +103,149 @@ def _update_opf(workspace: EpubWorkspace, replacements: dict[str, str]) -> None:
     updated = OPF_ITEM_RE.sub(
         replace_item, workspace.members[workspace.opf_path]
     )
-    workspace.members[workspace.opf_path] = _rewrite_document(
+    workspace.members[workspace.opf_path] = rewrite_document(
         updated, workspace.opf_path, replacements
     )
 
 
+def _manifest_items(workspace: EpubWorkspace) -> dict[str, tuple[bytes, bytes]]:
+    """返回 成员路径 -> (item id, properties)。"""
+    return manifest_items(workspace.opf_path, workspace.members[workspace.opf_path])
+
+
+def dedupe_images(workspace: EpubWorkspace) -> tuple[dict[str, str], int]:
+    """按内容哈希合并重复图片，返回 (重复成员 -> 保留成员, 删除的字节数)。
+
+    每组内容相同的图片保留成员顺序中的第一个，删除其余成员及其 manifest
+    条目；被删除条目的 properties（如 cover-image）并入保留条目，指向它的
+    ``<meta name="cover">`` 改指保留条目。未列入 manifest、被 spine 引用，或 id
+    被其他条目的 ``fallback``/``media-overlay`` 与元数据的 ``refines`` 引用的图片
+    不会被删除，以免 OPF 中留下悬空的 id。文档中的引用由调用方通过替换表统一改写。
+    """
+    items = _manifest_items(workspace)
+    opf = workspace.members[workspace.opf_path]
+    spine_ids = {match.group("value") for match in OPF_IDREF_RE.finditer(opf)}
+    linked_ids = {match.group("value") for match in OPF_ITEM_LINK_RE.finditer(opf)}
+    linked_ids.update(match.group("value") for match in OPF_REFINES_RE.finditer(opf))
+    canonical_by_hash: dict[bytes, str] = {}
+    duplicates: dict[str, str] = {}
+    removed_bytes = 0
+    for name in list(workspace.members):
+        if PurePosixPath(name).suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        item = items.get(name)
+        if item is None or item[0] in spine_ids:
+            continue
+        data = workspace.members[name]
+        canonical = canonical_by_hash.setdefault(hashlib.sha256(data).digest(), name)
+        if canonical != name and item[0] not in linked_ids:
+            duplicates[name] = canonical
+            removed_bytes += len(data)
+    if not duplicates:
+        return duplicates, 0
+
+    dropped_ids = {items[duplicate][0]: items[canonical][0] for duplicate, canonical in duplicates.items()}
+    merged_properties: dict[bytes, list[bytes]] = {}
+    for duplicate, canonical in duplicates.items():
+        canonical_id = items[canonical][0]
+        tokens = merged_properties.setdefault(canonical_id, items[canonical][1].split())
+        for token in items[duplicate][1].split():
+            if token not in tokens:
+                tokens.append(token)
+
+    def replace_item(match: re.Match[bytes]) -> bytes:
+        attributes = match.group("attributes")
+        id_match = OPF_ID_RE.search(attributes)
+        item_id = id_match.group("value") if id_match else None
+        if item_id in dropped_ids:
+            return b""
+        tokens = merged_properties.get(item_id)
+        if not tokens:
+            return match.group(0)
+        value = b" ".join(tokens)
+        properties_match = OPF_PROPERTIES_RE.search(attributes)
+        if properties_match is None:
+            # OPF_ITEM_RE 的 attributes 会带上自闭合标签的 "/"，新属性插在它之前。
+            body = attributes.rstrip()
+            closing = b"/" if body.endswith(b"/") else b""
+            body = body[: len(body) - len(closing)].rstrip()
+            attributes = body + b' properties="' + value + b'"' + closing
+        else:
+            attributes = (
+                attributes[: properties_match.start("value")]
+                + value
+                + attributes[properties_match.end("value") :]
+            )
+        return match.group("prefix") + attributes + match.group("suffix")
+
+    def replace_meta(match: re.Match[bytes]) -> bytes:
+        meta = match.group(0)
+        content_match = OPF_META_CONTENT_RE.search(meta)
+        if (
+            OPF_COVER_NAME_RE.search(meta) is None
+            or content_match is None
+            or content_match.group("value") not in dropped_ids
+        ):
+            return meta
+        return (
+            meta[: content_match.start("value")]
+            + dropped_ids[content_match.group("value")]
+            + meta[content_match.end("value") :]
+        )
+
+    opf = OPF_ITEM_RE.sub(replace_item, opf)
+    workspace.members[workspace.opf_path] = OPF_META_RE.sub(replace_meta, opf)
+    for duplicate in duplicates:
+        del workspace.members[duplicate]
+    return duplicates, removed_bytes
+
+
+def prune_unreferenced(workspace: EpubWorkspace) -> tuple[list[str], int]:
+    """删除从 spine、目录、封面与 guide 出发沿引用不可达的资源，返回 (删除的成员, 删除的字节数)。
+
+    起点见 :func:`python_backend.epub_references.prune_roots`，可达性规则见
+    :func:`python_backend.epub_references.unreachable_members`。被删除成员的
+    manifest 条目一并移除。
+    """
+    opf = workspace.members[workspace.opf_path]
+    roots = prune_roots(workspace.opf_path, opf)
+    index = reference_index(workspace)
+    unreachable = unreachable_members(
+        (name for name in workspace.members if name != workspace.opf_path),
+        roots,
+        index,
+        workspace.members,
+    )
+    if not unreachable:
+        return unreachable, 0
+    removed = set(unreachable)
+
+    def replace_item(match: re.Match[bytes]) -> bytes:
+        href_match = OPF_HREF_RE.search(match.group("attributes"))
+        if href_match is None:
+            return match.group(0)
+        try:
+            path = resolve_reference(
+                workspace.opf_path, href_match.group("value").decode("utf-8", "surrogateescape")
+            )
+        except ValueError:
+            return match.group(0)
+        return b"" if path in removed else match.group(0)
+
+    workspace.members[workspace.opf_path] = OPF_ITEM_RE.sub(replace_item, opf)
+    removed_bytes = 0
+    for name in unreachable:
+        source_info = (
+            workspace.members.source_info(name)
+            if isinstance(workspace.members, LazyMembers)
+            else None
+        )
+        removed_bytes += source_info.file_size if source_info else len(workspace.members[name])
+        del workspace.members[name]
+        index.discard(name)
+    return unreachable, removed_bytes
+
+
 def _has_transparency(image: Image.Image) -> bool:
     if "A" in image.getbands():
         alpha = image.getchannel("A")
@@ -175,6 +257,145 @@ def _quantize_png(image: Image.Image) -> Image.Image:
     return image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
 
 
+@dataclass(slots=True)
+class TranscodedImage:
+    """单张图片的转换结论：converted 为新内容，kept 为保留原图，failed 为无法处理。"""
+
+    status: str
+    target_extension: str = ""
+    data: bytes = b""
+    error: str = ""
+    resized: bool = False
+
+
+def resolve_image_workers(options: dict[str, object]) -> int:
+    """返回单本书内并行转换图片的线程数。
+
+    未显式指定时，若任务已在多个进程间并行处理多本书，则每本书内逐张处理，
+    避免线程数成倍超出 CPU 核数。
+    """
+    workers = options.get("image_workers")
+    if workers is not None:
+        return int(workers)
+    if int(options.get("max_workers") or 1) > 1:
+        return 1
+    return min(DEFAULT_IMAGE_WORKERS, os.cpu_count() or 1)
+
+
+def _downscaled_size(
+    width: int, height: int, max_dimension: int | None, max_pixels: int | None
+) -> tuple[int, int] | None:
+    """返回满足最长边与像素数上限的等比缩小尺寸；无需缩小时返回 None。"""
+    scale = 1.0
+    if max_dimension:
+        scale = min(scale, max_dimension / max(width, height))
+    if max_pixels:
+        scale = min(scale, math.sqrt(max_pixels / (width * height)))
+    if scale >= 1:
+        return None
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def transcode_image(
+    original: bytes,
+    extension: str,
+    *,
+    mode: str,
+    quality: int,
+    webp_quality: int | None = None,
+    png_to_jpg: bool = False,
+    png_quantize: bool = False,
+    max_dimension: int | None = None,
+    max_pixels: int | None = None,
+) -> TranscodedImage:
+    """解码、变换并重新编码一张图片，不访问工作区，可在线程池中执行。"""
+    try:
+        with Image.open(io.BytesIO(original)) as image:
+            detected_format = (image.format or "").upper()
+            native_pixels = image.width * image.height
+            target_size = _downscaled_size(image.width, image.height, max_dimension, max_pixels)
+            if mode == "webp" and extension == ".webp" and target_size is None:
+                return TranscodedImage("kept")
+            if target_size is not None and detected_format == "JPEG":
+                # JPEG 在 DCT 阶段按 1/2、1/4、1/8 缩小解码，大尺寸扫描图无需先
+                # 解码到原始分辨率；draft 保证解码尺寸不小于目标尺寸。
+                image.draft(image.mode, target_size)
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                raise ValueError("图片像素数超过安全限制")
+            image.load()
+            image = ImageOps.exif_transpose(image)
+            if target_size is not None:
+                # draft 解码的尺寸只是不小于目标尺寸，按实际尺寸再精确缩放。
+                target_size = _downscaled_size(
+                    image.width, image.height, max_dimension, max_pixels
+                )
+            if target_size is not None:
+                if image.mode in {"1", "P"}:
+                    image = image.convert("RGBA" if _has_transparency(image) else "RGB")
+                image = image.resize(target_size, Image.Resampling.LANCZOS)
+            resized = image.width * image.height < native_pixels
+            target_extension = extension
+            target_format = (
+                "JPEG"
+                if detected_format == "JPG"
+                else detected_format or IMAGE_FORMAT_BY_EXTENSION[extension]
+            )
+            save_options: dict[str, object] = {"optimize": True}
+            if mode == "webp":
+                target_extension = ".webp"
+                target_format = "WEBP"
+                save_options["quality"] = quality
+            elif mode == "webp_to_image":
+                if _has_transparency(image):
+                    target_extension = ".png"
+                    target_format = "PNG"
+                    if png_quantize:
+                        image = _quantize_png(image)
+                else:
+                    target_extension = ".jpg"
+                    target_format = "JPEG"
+                    save_options["quality"] = quality
+            elif extension in {".jpg", ".jpeg", ".webp"}:
+                save_options["quality"] = webp_quality if extension == ".webp" and webp_quality is not None else quality
+            elif extension == ".png" and png_to_jpg and "A" not in image.getbands():
+                target_extension = ".jpg"
+                target_format = "JPEG"
+                save_options["quality"] = quality
+            elif extension == ".png" and png_quantize:
+                image = _quantize_png(image)
+            elif extension == ".bmp" and not resized:
+                return TranscodedImage("kept")
+            if target_format == "JPEG" and image.mode not in {"RGB", "L"}:
+                image = image.convert("RGB")
+            if "icc_profile" in image.info:
+                save_options["icc_profile"] = image.info["icc_profile"]
+            buffer = io.BytesIO()
+            image.save(buffer, format=target_format, **save_options)
+            return TranscodedImage(
+                "converted", target_extension, buffer.getvalue(), resized=resized
+            )
+    except (Image.UnidentifiedImageError, OSError, ValueError) as exc:
+        return TranscodedImage("failed", error=str(exc))
+
+
+def _iter_transcoded(jobs, transcode, workers: int):
+    """按输入顺序产出 (job, 结果)；并行时最多预读 2 倍线程数的图片，限制内存占用。"""
+    if workers <= 1:
+        for job in jobs:
+            yield job, transcode(job)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+        for job in jobs:
+            pending.append((job, pool.submit(transcode, job)))
+            if len(pending) >= workers * 2:
+                done_job, future = pending.popleft()
+                yield done_job, future.result()
+        while pending:
+            done_job, future = pending.popleft()
+            yield done_job, future.result()
+
+
 def process_images(
     input_file: str,
     output_path: str,
@@ -184,100 +405,107 @@ def process_images(
     webp_quality: int | None = None,
     png_to_jpg: bool = False,
     png_quantize: bool = False,
+    max_dimension: int | None = None,
+    max_pixels: int | None = None,
+    dedupe: bool = False,
+    prune: bool = False,
+    workers: int = 1,
     logger,
 ) -> int | str:
-    workspace = EpubWorkspace.load(input_file, logger=logger)
-    replacements: dict[str, str] = {}
-    candidates = processed = kept = failed = saved = 0
-    existing = set(workspace.members)
-    for source, original in list(workspace.members.items()):
-        extension = PurePosixPath(source).suffix.lower()
-        if extension not in IMAGE_EXTENSIONS:
-            continue
-        if mode == "webp_to_image" and extension != ".webp":
-            continue
-        candidates += 1
-        if mode == "webp" and extension == ".webp":
-            kept += 1
-            continue
-        try:
-            with Image.open(io.BytesIO(original)) as image:
-                if image.width * image.height > MAX_IMAGE_PIXELS:
-                    raise ValueError("图片像素数超过安全限制")
-                detected_format = (image.format or "").upper()
-                image.load()
-                image = ImageOps.exif_transpose(image)
-                target_extension = extension
-                target_format = (
-                    "JPEG"
-                    if detected_format == "JPG"
-                    else detected_format or IMAGE_FORMAT_BY_EXTENSION[extension]
+    with EpubWorkspace.load(input_file, logger=logger, lazy=True) as workspace:
+        replacements: dict[str, str] = {}
+        if prune:
+            # 先删除不可达资源，后续的去重与转换都不再处理它们。
+            pruned, pruned_bytes = prune_unreferenced(workspace)
+            if pruned:
+                logger.write(
+                    f"删除未引用资源 {len(pruned)} 个，节省 {format_size_mb(pruned_bytes)}"
                 )
-                save_options: dict[str, object] = {"optimize": True}
-                if mode == "webp":
-                    target_extension = ".webp"
-                    target_format = "WEBP"
-                    save_options["quality"] = quality
-                elif mode == "webp_to_image":
-                    if _has_transparency(image):
-                        target_extension = ".png"
-                        target_format = "PNG"
-                        if png_quantize:
-                            image = _quantize_png(image)
-                    else:
-                        target_extension = ".jpg"
-                        target_format = "JPEG"
-                        save_options["quality"] = quality
-                elif extension in {".jpg", ".jpeg", ".webp"}:
-                    save_options["quality"] = webp_quality if extension == ".webp" and webp_quality is not None else quality
-                elif extension == ".png" and png_to_jpg and "A" not in image.getbands():
-                    target_extension = ".jpg"
-                    target_format = "JPEG"
-                    save_options["quality"] = quality
-                elif extension == ".png" and png_quantize:
-                    image = _quantize_png(image)
-                elif extension == ".bmp":
+                for name in pruned:
+                    logger.write(f"已删除未引用资源: {name}")
+        duplicates: dict[str, str] = {}
+        if dedupe:
+            # 先合并重复图片，后续每张不同的图片只转换一次。
+            duplicates, removed_bytes = dedupe_images(workspace)
+            if duplicates:
+                logger.write(
+                    f"图片去重：合并 {len(duplicates)} 个重复图片，节省 {format_size_mb(removed_bytes)}"
+                )
+        candidates = processed = kept = failed = saved = resized = 0
+        downscaling = bool(max_dimension or max_pixels)
+        existing = set(workspace.members)
+
+        def iter_jobs():
+            nonlocal candidates, kept
+            for source in list(workspace.members):
+                extension = PurePosixPath(source).suffix.lower()
+                if extension not in IMAGE_EXTENSIONS:
+                    continue
+                if mode == "webp_to_image" and extension != ".webp":
+                    continue
+                candidates += 1
+                if mode == "webp" and extension == ".webp" and not downscaling:
                     kept += 1
                     continue
-                if target_format == "JPEG" and image.mode not in {"RGB", "L"}:
-                    image = image.convert("RGB")
-                if "icc_profile" in image.info:
-                    save_options["icc_profile"] = image.info["icc_profile"]
-                buffer = io.BytesIO()
-                image.save(buffer, format=target_format, **save_options)
-                converted = buffer.getvalue()
-        except (UnidentifiedImageError, OSError, ValueError) as exc:
-            failed += 1
-            logger.write(f"跳过无法处理的图片 {source}: {exc}")
-            continue
-        if mode == "compress" and len(converted) >= len(original):
-            kept += 1
-            continue
-        target = source
-        if target_extension != extension:
-            target = _converted_path(source, target_extension, existing)
-            replacements[source] = target
-            del workspace.members[source]
-            existing.discard(source)
-            existing.add(target)
-        workspace.members[target] = converted
-        processed += 1
-        saved += len(original) - len(converted)
-    if mode == "webp_to_image":
-        if candidates == 0:
-            logger.write("没有找到需要转换的 WebP 图片")
-            return "skip"
-        if failed:
-            raise RuntimeError(f"WebP 图片转换失败：{failed} 个文件无法处理")
-    if replacements:
-        for name, data in list(workspace.members.items()):
-            suffix = PurePosixPath(name).suffix.lower()
-            if suffix in {".xhtml", ".html", ".htm", ".css", ".svg", ".ncx"}:
-                workspace.members[name] = _rewrite_document(data, name, replacements)
-        _update_opf(workspace, replacements)
-    workspace.write(output_path, logger=logger)
+                yield source, extension, workspace.members[source]
+
+        def transcode(job: tuple[str, str, bytes]) -> TranscodedImage:
+            _source, extension, original = job
+            return transcode_image(
+                original,
+                extension,
+                mode=mode,
+                quality=quality,
+                webp_quality=webp_quality,
+                png_to_jpg=png_to_jpg,
+                png_quantize=png_quantize,
+                max_dimension=max_dimension,
+                max_pixels=max_pixels,
+            )
+
+        # 工作区只在当前线程读写，线程池只负责编解码；结果按成员顺序合并，
+        # 输出与逐张处理完全一致。
+        for (source, extension, original), result in _iter_transcoded(
+            iter_jobs(), transcode, workers
+        ):
+            if result.status == "kept":
+                kept += 1
+                continue
+            if result.status == "failed":
+                failed += 1
+                logger.write(f"跳过无法处理的图片 {source}: {result.error}")
+                continue
+            converted = result.data
+            target_extension = result.target_extension
+            if mode == "compress" and len(converted) >= len(original):
+                kept += 1
+                continue
+            target = source
+            if target_extension != extension:
+                target = _converted_path(source, target_extension, existing)
+                replacements[source] = target
+                del workspace.members[source]
+                existing.discard(source)
+                existing.add(target)
+            workspace.members[target] = converted
+            processed += 1
+            resized += result.resized
+            saved += len(original) - len(converted)
+        if mode == "webp_to_image":
+            if candidates == 0:
+                logger.write("没有找到需要转换的 WebP 图片")
+                return "skip"
+            if failed:
+                raise RuntimeError(f"WebP 图片转换失败：{failed} 个文件无法处理")
+        for duplicate, canonical in duplicates.items():
+            replacements[duplicate] = replacements.get(canonical, canonical)
+        if replacements:
+            reference_index(workspace).rewrite(workspace.members, replacements)
+            _update_opf(workspace, replacements)
+        workspace.write(output_path, logger=logger)
     logger.write(
         f"图片处理完成：处理 {processed}，保留 {kept}，失败 {failed}，"
         f"节省 {format_size_mb(saved)}"
+        + (f"，缩小尺寸 {resized}" if resized else "")
     )
     return 0
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from python_backend.services.image.image_processing import process_images
+from python_backend.services.image.image_processing import process_images, resolve_image_workers
 from python_backend.services.utils.log import logwriter
 
 
@@ -21,5 +21,8 @@ def run(
         mode="webp_to_image",
         quality=int(options.get("quality", 82)),
         png_quantize=bool(options.get("png_quantize", False)),
+        dedupe=bool(options.get("dedupe_images", False)),
+        prune=bool(options.get("prune_unreferenced", False)),
+        workers=resolve_image_workers(options),
         logger=logger,
     )
@@ -4,12 +4,10 @@ import codecs
 import re
 from pathlib import Path, PurePosixPath
 
-from opencc import OpenCC
-
 from python_backend.epub_workspace import EpubWorkspace
+from python_backend.services.text.conversion_engine import load_conversion_engine
 from python_backend.services.utils.log import logwriter
 
-
 logger = logwriter()
 TAG_RE = re.compile(r"(?s)(<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[^>]+>)")
 VISIBLE_ATTRIBUTE_RE = re.compile(
@@ -56,50 +54,67 @@ def _as_utf8_xml(text: str) -> bytes:
     return normalized.encode("utf-8")
 
 
-def _convert_xml(data: bytes, converter: OpenCC) -> tuple[bytes, bool]:
+def _convert_xml(data: bytes, engine) -> tuple[bytes, bool]:
+    """转换文本节点与 alt/title 属性值；全部片段收集后交给引擎一次转换。"""
     pieces = TAG_RE.split(_decode_xml(data))
     blocked_depth = 0
-    output: list[str] = []
+    # 字符串原样输出，整数为待转换片段在 segments 中的下标。
+    output: list[str | int] = []
+    segments: list[str] = []
     for piece in pieces:
         if piece.startswith("<"):
             lowered = piece.lstrip().lower()
             if lowered.startswith(("<script", "<style")) and not lowered.startswith(("</script", "</style")):
                 blocked_depth += 1
             if blocked_depth == 0 and not lowered.startswith(("<!--", "<![cdata[")):
-                def replace_attribute(match: re.Match[str]) -> str:
-                    converted = converter.convert(match.group("value"))
-                    return match.group("prefix") + match.group("quote") + converted + match.group("quote")
-
-                piece = VISIBLE_ATTRIBUTE_RE.sub(replace_attribute, piece)
-            output.append(piece)
+                position = 0
+                for match in VISIBLE_ATTRIBUTE_RE.finditer(piece):
+                    output.append(piece[position : match.start("value")])
+                    output.append(len(segments))
+                    segments.append(match.group("value"))
+                    position = match.end("value")
+                output.append(piece[position:])
+            else:
+                output.append(piece)
             if lowered.startswith(("</script", "</style")):
                 blocked_depth = max(0, blocked_depth - 1)
             continue
         if blocked_depth or not piece:
             output.append(piece)
             continue
-        output.append(converter.convert(piece))
-    converted = _as_utf8_xml("".join(output))
+        output.append(len(segments))
+        segments.append(piece)
+    converted_segments = engine.convert_many(segments)
+    converted = _as_utf8_xml(
+        "".join(
+            converted_segments[item] if isinstance(item, int) else item for item in output
+        )
+    )
     return converted, converted != data
 
 
+def warmup() -> None:
+    for conversion in ("s2t", "t2s"):
+        load_conversion_engine(conversion)
+
+
 def run(input_file: str, output_dir: str | None, *, options: dict[str, object]) -> int:
     direction = str(options["direction"])
-    converter = OpenCC("s2t" if direction == "s2t" else "t2s")
-    workspace = EpubWorkspace.load(input_file, logger=logger)
+    engine = load_conversion_engine("s2t" if direction == "s2t" else "t2s")
     changed_files = 0
-    for name, data in list(workspace.members.items()):
-        if PurePosixPath(name).suffix.lower() not in {".xhtml", ".html", ".htm", ".opf", ".ncx"}:
-            continue
-        converted, changed = _convert_xml(data, converter)
-        if changed:
-            workspace.members[name] = converted
-            changed_files += 1
-    suffix = "tc" if direction == "s2t" else "sc"
-    target_dir = Path(output_dir) if output_dir else Path(input_file).parent
-    workspace.write(
-        target_dir / f"{Path(input_file).stem}_chinese_convert_{suffix}.epub",
-        logger=logger,
-    )
+    with EpubWorkspace.load(input_file, logger=logger, lazy=True) as workspace:
+        for name in list(workspace.members):
+            if PurePosixPath(name).suffix.lower() not in {".xhtml", ".html", ".htm", ".opf", ".ncx"}:
+                continue
+            converted, changed = _convert_xml(workspace.members[name], engine)
+            if changed:
+                workspace.members[name] = converted
+                changed_files += 1
+        suffix = "tc" if direction == "s2t" else "sc"
+        target_dir = Path(output_dir) if output_dir else Path(input_file).parent
+        workspace.write(
+            target_dir / f"{Path(input_file).stem}_chinese_convert_{suffix}.epub",
+            logger=logger,
+        )
     logger.write(f"简繁转换完成：更新 {changed_files} 个文本文件")
     return 0
@@ -0,0 +1,403 @@
+"""简繁转换引擎。
+
+``opencc-python-reimplemented`` 每次调用 ``OpenCC.convert`` 都会重新切分字符串，
+并在每个片段上以逐个长度、逐个位置的方式查询词典，长篇小说的转换大部分时间
+耗在这里。本模块在进程内按转换方向只编译一次词典：记录词条的全部前缀以便逐字延长匹配
+时尽早停止，并汇总所有可转换字符用于快速放行不含可转换字符的片段。
+
+转换结果与 ``OpenCC.convert`` 一致：片段按同样的分隔符切分，词典组内先在片段
+中选取最长（同长取最左）的词条，再对两侧剩余文本递归处理，未匹配部分交给组内
+下一个词典；词条有多个候选时取第一个。
+"""
+
+from __future__ import annotations
+
+import gc
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import re
+import struct
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from python_backend.services.utils.lazy_import import LazyModule
+
+opencc = LazyModule("opencc", globals())
+
+# 与 opencc-python 相同的分隔符，词条不会跨越这些字符。额外加入的 \x00 用于
+# 把一个文档的全部文本片段拼接后一次切分；正常的 XML 文本中不会出现该字符。
+SEGMENT_SEPARATOR = "\x00"
+SPLIT_RE = re.compile(
+    r"([\s\x00\-,.?!*　，。、；：？！…“”‘’『』「」﹁﹂—－（）《》〈〉～．／＼︒︑︔︓︿﹀︹︺︙︐［﹇］﹈︕︖︰︳︴︽︾︵︶｛︷｝︸﹃﹄【︻】︼]+)"
+)
+# 标题、页眉等短片段会在同一本书中反复出现，转换结果按片段缓存。
+MEMO_MAX_CHARS = 32
+MEMO_MAX_ENTRIES = 65536
+
+# 编译后的词典以 marshal 快照保存：构建 sidecar 时随程序打包，或首次使用时
+# 写入日志同目录的缓存目录。快照头记录格式版本与源词典指纹，任一不符即重新编译。
+SNAPSHOT_MAGIC = b"EPTCONV\x00"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_DIR_NAME = "conversion_snapshots"
+SNAPSHOT_DIR_ENV = "EPUB_TOOL_CONVERSION_SNAPSHOT_DIR"
+SNAPSHOT_CONVERSIONS = ("s2t", "t2s")
+BUNDLED_SNAPSHOT_DIR = Path(__file__).resolve().parent / SNAPSHOT_DIR_NAME
+
+_ENGINES: dict[str, "ConversionEngine | OpenCCConverter"] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+@dataclass(slots=True)
+class CompiledDictionary:
+    mapping: dict[str, str]
+    # 词条的全部真前缀，逐字延长匹配时据此提前结束。
+    prefixes: frozenset[str]
+    first_chars: frozenset[str]
+    max_length: int
+    # 只含单字词条时的 str.translate 映射表。
+    translation: dict[int, str] | None = None
+
+    @classmethod
+    def from_pairs(cls, pairs: dict[str, str]) -> "CompiledDictionary":
+        prefixes = {key[:length] for key in pairs for length in range(1, len(key))}
+        max_length = max((len(key) for key in pairs), default=0)
+        return cls(
+            mapping=pairs,
+            prefixes=frozenset(prefixes),
+            first_chars=frozenset(key[0] for key in pairs),
+            max_length=max_length,
+            translation=str.maketrans(pairs) if max_length == 1 else None,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "CompiledDictionary":
+        pairs: dict[str, str] = {}
+        with path.open("r", encoding="utf-8") as file:
+            for line in file:
+                key, value = line.strip().split("\t")
+                # 多个候选时与 opencc-python 一样取第一个。
+                pairs[key] = value.split(" ")[0]
+        return cls.from_pairs(pairs)
+
+    def segment(self, text: str, parts: list[tuple[str, bool]]) -> None:
+        """把 ``text`` 切分为 (文本, 是否已转换) 片段追加到 ``parts``。
+
+        逐层选取区间内最长、同长取最左的词条，等价于按 (长度降序, 位置升序)
+        依次接受不与已选词条重叠的匹配。
+        """
+        if self.max_length == 1:
+            self._segment_characters(text, parts)
+            return
+        mapping = self.mapping
+        prefixes = self.prefixes
+        first_chars = self.first_chars
+        text_length = len(text)
+        matches: list[tuple[int, int]] = []
+        for index, char in enumerate(text):
+            if char not in first_chars:
+                continue
+            if char in mapping:
+                matches.append((-1, index))
+            if char not in prefixes:
+                continue
+            for end in range(index + 2, text_length + 1):
+                candidate = text[index:end]
+                if candidate in mapping:
+                    matches.append((index - end, index))
+                if candidate not in prefixes:
+                    break
+        if not matches:
+            parts.append((text, False))
+            return
+
+        matches.sort()
+        occupied = bytearray(text_length)
+        accepted: list[tuple[int, int]] = []
+        for negative_length, index in matches:
+            end = index - negative_length
+            if occupied.find(1, index, end) == -1:
+                occupied[index:end] = b"\x01" * (end - index)
+                accepted.append((index, end))
+        accepted.sort()
+        position = 0
+        for index, end in accepted:
+            if index > position:
+                parts.append((text[position:index], False))
+            parts.append((mapping[text[index:end]], True))
+            position = end
+        if position < text_length:
+            parts.append((text[position:], False))
+
+    def _segment_characters(self, text: str, parts: list[tuple[str, bool]]) -> None:
+        mapping = self.mapping
+        pending_start = 0
+        for index, char in enumerate(text):
+            value = mapping.get(char)
+            if value is None:
+                continue
+            if index > pending_start:
+                parts.append((text[pending_start:index], False))
+            parts.append((value, True))
+            pending_start = index + 1
+        if pending_start < len(text):
+            parts.append((text[pending_start:], False))
+
+
+@dataclass(slots=True)
+class ConversionEngine:
+    # 转换链：依次应用的词典组，组内词典只处理前面词典未匹配的文本。
+    chain: list[list[CompiledDictionary]]
+    convertible_chars: frozenset[str]
+    memo: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_chain(cls, chain: list[list[CompiledDictionary]]) -> "ConversionEngine":
+        convertible: set[str] = set()
+        for group in chain:
+            for dictionary in group:
+                convertible.update(dictionary.first_chars)
+        return cls(chain=chain, convertible_chars=frozenset(convertible))
+
+    def convert(self, text: str) -> str:
+        return self._convert_text(text)
+
+    def convert_many(self, segments: list[str]) -> list[str]:
+        """一次切分并转换一个文档的全部文本片段，返回与输入一一对应的结果。
+
+        片段本身含分隔符（常见于损坏书籍中的畸形 XHTML）时无法拼接后再拆回，
+        改为逐片段转换。
+        """
+        if not segments:
+            return []
+        if any(SEGMENT_SEPARATOR in segment for segment in segments):
+            return [self._convert_text(segment) for segment in segments]
+        converted = self._convert_text(SEGMENT_SEPARATOR.join(segments)).split(SEGMENT_SEPARATOR)
+        if len(converted) != len(segments):
+            raise RuntimeError("简繁转换后文本片段数量不一致")
+        return converted
+
+    def _convert_text(self, text: str) -> str:
+        pieces = SPLIT_RE.split(text)
+        convert_piece = self._convert_piece
+        for index in range(0, len(pieces), 2):
+            if pieces[index]:
+                pieces[index] = convert_piece(pieces[index])
+        return "".join(pieces)
+
+    def _convert_piece(self, text: str) -> str:
+        if self.convertible_chars.isdisjoint(text):
+            return text
+        memoize = len(text) <= MEMO_MAX_CHARS
+        if memoize:
+            cached = self.memo.get(text)
+            if cached is not None:
+                return cached
+        converted = text
+        for group in self.chain:
+            parts: list[tuple[str, bool]] = [(converted, False)]
+            for position, dictionary in enumerate(group):
+                if dictionary.translation is not None and position == len(group) - 1:
+                    # 组内最后一个单字词典无需再区分已转换片段，直接整段映射。
+                    translation = dictionary.translation
+                    parts = [
+                        (value if done else value.translate(translation), True)
+                        for value, done in parts
+                    ]
+                    continue
+                next_parts: list[tuple[str, bool]] = []
+                for value, done in parts:
+                    if done:
+                        next_parts.append((value, done))
+                    else:
+                        dictionary.segment(value, next_parts)
+                parts = next_parts
+            converted = "".join(value for value, _done in parts)
+        if memoize:
+            if len(self.memo) >= MEMO_MAX_ENTRIES:
+                self.memo.clear()
+            self.memo[text] = converted
+        return converted
+
+
+class OpenCCConverter:
+    """opencc 包不带可读取的词典文件时，退回逐片段调用 ``OpenCC.convert``。"""
+
+    def __init__(self, conversion: str) -> None:
+        self.converter = opencc.OpenCC(conversion)
+
+    def convert(self, text: str) -> str:
+        return self.converter.convert(text)
+
+    def convert_many(self, segments: list[str]) -> list[str]:
+        return [self.converter.convert(segment) for segment in segments]
+
+
+def resolve_opencc_data_dir() -> Path:
+    return Path(opencc.__file__).resolve().parent
+
+
+def _collect_dictionary_files(entry: dict, data_dir: Path) -> list[Path]:
+    if entry.get("type") == "group":
+        return [
+            path for item in entry.get("dicts", []) for path in _collect_dictionary_files(item, data_dir)
+        ]
+    if entry.get("type") == "txt":
+        return [data_dir / "dictionary" / entry["file"]]
+    raise ValueError(f"不支持的 OpenCC 词典类型: {entry.get('type')}")
+
+
+def read_conversion_sources(
+    conversion: str, data_dir: Path | None = None
+) -> tuple[list[list[Path]], str]:
+    """返回转换链各组的词典文件与源数据指纹（配置与词典内容的哈希）。"""
+    data_dir = data_dir or resolve_opencc_data_dir()
+    config_bytes = (data_dir / "config" / f"{conversion}.json").read_bytes()
+    config = json.loads(config_bytes.decode("utf-8"))
+    groups = [
+        _collect_dictionary_files(item["dict"], data_dir)
+        for item in config.get("conversion_chain", [])
+    ]
+    digest = hashlib.sha256(f"{SNAPSHOT_VERSION}:{conversion}:".encode())
+    digest.update(config_bytes)
+    for path in (path for group in groups for path in group):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return groups, digest.hexdigest()
+
+
+def compile_conversion_engine(conversion: str, data_dir: Path | None = None) -> ConversionEngine:
+    groups, _fingerprint = read_conversion_sources(conversion, data_dir)
+    return ConversionEngine.from_chain(
+        [[CompiledDictionary.load(path) for path in group] for group in groups]
+    )
+
+
+def write_conversion_snapshot(engine: ConversionEngine, path: Path, fingerprint: str) -> None:
+    payload = marshal.dumps(
+        [
+            [
+                (
+                    dictionary.mapping,
+                    dictionary.prefixes,
+                    dictionary.first_chars,
+                    dictionary.max_length,
+                    dictionary.translation,
+                )
+                for dictionary in group
+            ]
+            for group in engine.chain
+        ]
+    )
+    header = SNAPSHOT_MAGIC + struct.pack("<I", SNAPSHOT_VERSION) + bytes.fromhex(fingerprint)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        temp_path.write_bytes(header + payload)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def read_conversion_snapshot(path: Path, fingerprint: str) -> ConversionEngine | None:
+    """内存映射读取快照；文件缺失、版本或源数据指纹不符时返回 None。"""
+    header_size = len(SNAPSHOT_MAGIC) + 4 + 32
+    try:
+        with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if (
+                mapped[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC
+                or struct.unpack_from("<I", mapped, len(SNAPSHOT_MAGIC))[0] != SNAPSHOT_VERSION
+                or mapped[len(SNAPSHOT_MAGIC) + 4 : header_size].hex() != fingerprint
+            ):
+                return None
+            # 反序列化会一次创建十余万个字符串对象，期间暂停循环垃圾回收，
+            # 避免反复触发无意义的全量扫描。
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                with memoryview(mapped)[header_size:] as view:
+                    groups = marshal.loads(view)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    return ConversionEngine.from_chain(
+        [
+            [
+                CompiledDictionary(
+                    mapping=mapping,
+                    prefixes=prefixes,
+                    first_chars=first_chars,
+                    max_length=max_length,
+                    translation=translation,
+                )
+                for mapping, prefixes, first_chars, max_length, translation in group
+            ]
+            for group in groups
+        ]
+    )
+
+
+def resolve_snapshot_cache_dir() -> Path | None:
+    explicit = os.environ.get(SNAPSHOT_DIR_ENV, "").strip()
+    if explicit:
+        return Path(explicit).resolve()
+    log_path = os.environ.get("EPUB_TOOL_LOG_PATH", "").strip()
+    if not log_path:
+        return None
+    return Path(log_path).resolve().parent / SNAPSHOT_DIR_NAME
+
+
+def build_conversion_snapshots(directory: Path) -> list[Path]:
+    """供打包脚本在构建时生成全部转换方向的快照。"""
+    paths = []
+    for conversion in SNAPSHOT_CONVERSIONS:
+        _groups, fingerprint = read_conversion_sources(conversion)
+        path = directory / f"{conversion}{SNAPSHOT_SUFFIX}"
+        write_conversion_snapshot(compile_conversion_engine(conversion), path, fingerprint)
+        paths.append(path)
+    return paths
+
+
+def _load_engine(conversion: str) -> "ConversionEngine | OpenCCConverter":
+    try:
+        _groups, fingerprint = read_conversion_sources(conversion)
+    except FileNotFoundError:
+        return OpenCCConverter(conversion)
+    cache_dir = resolve_snapshot_cache_dir()
+    for directory in (BUNDLED_SNAPSHOT_DIR, cache_dir):
+        if directory is None:
+            continue
+        engine = read_conversion_snapshot(directory / f"{conversion}{SNAPSHOT_SUFFIX}", fingerprint)
+        if engine is not None:
+            return engine
+    engine = compile_conversion_engine(conversion)
+    if cache_dir is not None:
+        # 快照只是加速手段，写入失败时下次启动重新编译即可。
+        try:
+            write_conversion_snapshot(
+                engine, cache_dir / f"{conversion}{SNAPSHOT_SUFFIX}", fingerprint
+            )
+        except OSError:
+            pass
+    return engine
+
+
+def load_conversion_engine(conversion: str) -> "ConversionEngine | OpenCCConverter":
+    """返回进程内共享的转换引擎。
+
+    依次尝试随程序打包的快照与本地缓存目录中的快照，都不可用时编译词典并
+    写入缓存目录，同一进程内每个转换方向只加载一次。
+    """
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(conversion)
+        if engine is None:
+            engine = _load_engine(conversion)
+            _ENGINES[conversion] = engine
+        return engine
@@ -0,0 +1,37 @@
+"""服务模块重依赖的延迟导入。
+
+sidecar 冷启动时只需要导入被请求的任务模块，bs4、cssselect2、tinycss2、
+fontTools、PIL 等依赖在任务真正处理内容时才需要。``LazyModule`` 占位于模块
+全局命名空间，首次访问属性时导入真实模块，并把全局名称替换为真实模块，
+之后的访问与普通 ``import`` 没有差别。
+"""
+
+from importlib import import_module
+
+
+class LazyModule:
+    __slots__ = ("_name", "_namespace", "_alias")
+
+    def __init__(self, name, namespace, alias=None):
+        self._name = name
+        self._namespace = namespace
+        self._alias = alias or name.rpartition(".")[2]
+
+    def load(self):
+        module = import_module(self._name)
+        if self._namespace.get(self._alias) is self:
+            self._namespace[self._alias] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+def load_lazy_modules(namespace):
+    """导入命名空间中全部尚未加载的 ``LazyModule``，供常驻 worker 预热使用。"""
+    for value in list(namespace.values()):
+        if isinstance(value, LazyModule):
+            value.load()
@@ -1,24 +1,169 @@
+import atexit
 import os
+import threading
 import time
 
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LOG_LEVEL_ENV = "EPUB_TOOL_LOG_LEVEL"
+DEFAULT_LOG_LEVEL = "info"
+# 日志先写入内存缓冲，累计到一定大小或距上次落盘超过一定时间再追加到文件。
+LOG_BUFFER_BYTES = 64 * 1024
+LOG_FLUSH_INTERVAL = 1.0
 
-class logwriter:
-    def __init__(self):
+
+def resolve_log_level(value=None):
+    """返回规范化的日志级别名称，未指定时读取 ``EPUB_TOOL_LOG_LEVEL``。"""
+    if value is None:
+        value = os.environ.get(LOG_LEVEL_ENV, "").strip() or DEFAULT_LOG_LEVEL
+    level = str(value).strip().lower()
+    if level not in LOG_LEVELS:
+        raise ValueError(f"不支持的日志级别: {value}")
+    return level
+
+
+class BufferedLogFile:
+    """按大小或时间阈值批量追加写入的日志文件，同一路径在进程内共享。"""
+
+    def __init__(
+        self,
+        path,
+        buffer_bytes=LOG_BUFFER_BYTES,
+        flush_interval=LOG_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.lines = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+        self.started = False
+        self.lock = threading.Lock()
+
+    def start(self, header):
+        """进程内首次使用该日志文件时写入 ``header``，之后不再清空文件。
+
+        服务模块可能在任务执行中途才被导入（例如常驻 worker 的后台预热），
+        重复清空会丢失当前任务已写入的日志。
+        """
+        if not self.started:
+            self.reset(header)
+
+    def reset(self, header):
+        """丢弃未写出的缓冲并用 ``header`` 覆盖日志文件。"""
+        with self.lock:
+            self.started = True
+            self.lines.clear()
+            self.size = 0
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(f"{header}\n")
+            self.last_flush = time.monotonic()
+
+    def append(self, text, flush=False):
+        with self.lock:
+            self.lines.append(f"{text}\n")
+            self.size += len(text) + 1
+            if (
+                flush
+                or self.size >= self.buffer_bytes
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self._flush_locked()
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self.lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(self.lines)
+            self.lines.clear()
+            self.size = 0
+        self.last_flush = time.monotonic()
+
+
+_LOG_FILES = {}
+_LOG_FILES_LOCK = threading.Lock()
+
+
+def get_log_file(path):
+    path = os.path.abspath(path)
+    with _LOG_FILES_LOCK:
+        log_file = _LOG_FILES.get(path)
+        if log_file is None:
+            log_file = _LOG_FILES[path] = BufferedLogFile(path)
+        return log_file
+
+
+@atexit.register
+def flush_log_files():
+    with _LOG_FILES_LOCK:
+        log_files = list(_LOG_FILES.values())
+    for log_file in log_files:
+        log_file.flush()
+
+
+class LevelLogger:
+    """带级别过滤的 logger 接口，子类实现 ``handle(level, text)``。
+
+    ``debug`` 等方法按 ``%`` 格式延迟拼接参数，低于当前级别时不会格式化，
+    适合输出体积较大的映射表。``write`` 保留旧接口，默认按 info 级别记录。
+    """
+
+    level = DEFAULT_LOG_LEVEL
+
+    def is_enabled_for(self, level):
+        return LOG_LEVELS[level] >= LOG_LEVELS[self.level]
+
+    def log(self, level, message, *args):
+        if not self.is_enabled_for(level):
+            return
+        text = str(message) % args if args else str(message)
+        self.handle(level, text.rstrip("\n"))
+
+    def write(self, text, level="info"):
+        self.log(level, text)
+
+    def debug(self, message, *args):
+        self.log("debug", message, *args)
+
+    def info(self, message, *args):
+        self.log("info", message, *args)
+
+    def warning(self, message, *args):
+        self.log("warning", message, *args)
+
+    def error(self, message, *args):
+        self.log("error", message, *args)
+
+    def handle(self, level, text):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+
+class logwriter(LevelLogger):
+    def __init__(self, level=None):
         env_path = os.environ.get("EPUB_TOOL_LOG_PATH", "").strip()
         if env_path:
             self.path = os.path.abspath(env_path)
         else:
             self.path = os.path.join(os.getcwd(), "log.txt")
         os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        with open(self.path, "w", encoding="utf-8") as f:
-            current_time = time.strftime(
-                "%Y-%m-%d %H:%M:%S", time.localtime(time.time())
-            )
-            f.write(f"time: {current_time}\n")
-
-    def write(self, text):
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(f"{text}\n")
+        self.level = resolve_log_level(level)
+        self.file = get_log_file(self.path)
+        if os.environ.get("EPUB_TOOL_LOG_WORKER"):
+            # 进程池 worker 的日志由主进程统一写入，导入模块时不能清空日志文件。
+            return
+        current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
+        self.file.start(f"time: {current_time}")
+
+    def handle(self, level, text):
+        self.file.append(text, flush=level == "error")
+
+    def flush(self):
+        self.file.flush()
 
 
 if __name__ == "__main__":
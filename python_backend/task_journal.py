@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+JOURNAL_DIR_NAME = "task_journals"
+JOURNAL_KEEP_COUNT = 50
+# 只影响执行方式、不影响输出内容的选项，不参与选项哈希。
+RUNTIME_ONLY_OPTIONS = frozenset(
+    {
+        "max_workers",
+        "image_workers",
+        "rewrite_workers",
+        "resume",
+        "log_level",
+        "document_cache_mb",
+        "ocr_cache",
+        "ocr_cache_path",
+        "ocr_cache_max_entries",
+        "output_cache",
+        "output_cache_dir",
+        "output_cache_max_mb",
+    }
+)
+
+
+def build_options_hash(task_type: str, options: dict[str, Any]) -> str:
+    payload = {
+        "task_type": task_type,
+        "options": {
+            key: value for key, value in options.items() if key not in RUNTIME_ONLY_OPTIONS
+        },
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def snapshot_input(input_file: str) -> tuple[int, int] | None:
+    """返回输入文件的 (大小, 纳秒级修改时间)，文件不存在时返回 None。"""
+    try:
+        stat = os.stat(input_file)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def resolve_journal_path(directory: Path, task_id: str) -> Path:
+    safe_id = re.sub(r"[^\w.-]", "_", task_id)[:120] or "task"
+    return directory / f"{safe_id}.jsonl"
+
+
+def prune_journals(
+    directory: Path, keep: int = JOURNAL_KEEP_COUNT, keep_path: Path | None = None
+) -> None:
+    """只保留最近修改的 ``keep`` 份日志与当前任务的日志，避免目录无限增长。"""
+    try:
+        journals = sorted(
+            (path for path in directory.glob("*.jsonl") if path != keep_path),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+    except OSError:
+        return
+    for path in journals[keep:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+@dataclass(slots=True)
+class TaskJournal:
+    """按 task_id 追加写入的批量任务日志。
+
+    每处理完一个文件追加一行 JSON，记录处理结论、输出路径、输入文件大小与
+    修改时间以及选项哈希。sidecar 中途退出后，以相同 task_id 和 ``resume``
+    选项重新执行时，可跳过输入与选项均未变化且输出仍存在的已完成文件。
+    末尾因进程中断而写了一半的行会被忽略。
+    """
+
+    path: Path
+    task_type: str
+    options_hash: str
+    entries: dict[str, dict[str, Any]] = field(default_factory=dict)
+    needs_newline: bool = False
+
+    @classmethod
+    def open(
+        cls,
+        directory: Path,
+        task_id: str,
+        task_type: str,
+        options: dict[str, Any],
+    ) -> "TaskJournal":
+        directory.mkdir(parents=True, exist_ok=True)
+        journal = cls(
+            path=resolve_journal_path(directory, task_id),
+            task_type=task_type,
+            options_hash=build_options_hash(task_type, options),
+        )
+        journal.load()
+        return journal
+
+    def load(self) -> None:
+        self.entries.clear()
+        self.needs_newline = False
+        try:
+            with self.path.open("r", encoding="utf-8") as file:
+                for line in file:
+                    self.needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(entry, dict) and isinstance(entry.get("input_file"), str):
+                        self.entries[entry["input_file"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def record(
+        self,
+        input_file: str,
+        status: str,
+        message: str,
+        output_path: str | None,
+    ) -> None:
+        snapshot = snapshot_input(input_file)
+        entry = {
+            "input_file": input_file,
+            "status": status,
+            "message": message,
+            "output_path": output_path,
+            "input_size": snapshot[0] if snapshot else None,
+            "input_mtime_ns": snapshot[1] if snapshot else None,
+            "task_type": self.task_type,
+            "options_hash": self.options_hash,
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        if self.needs_newline:
+            # 上次进程在写入中途退出，先结束残缺的行。
+            line = "\n" + line
+            self.needs_newline = False
+        with self.path.open("a", encoding="utf-8") as file:
+            file.write(line)
+            file.flush()
+        self.entries[input_file] = entry
+
+    def completed_output(self, input_file: str, expected_output: str | None) -> str | None:
+        """输入、选项与输出都未变化时返回上次成功生成的输出路径。"""
+        entry = self.entries.get(input_file)
+        if (
+            entry is None
+            or entry.get("status") != "success"
+            or entry.get("task_type") != self.task_type
+            or entry.get("options_hash") != self.options_hash
+        ):
+            return None
+        output_path = entry.get("output_path")
+        if not output_path or output_path != expected_output or not os.path.isfile(output_path):
+            return None
+        snapshot = snapshot_input(input_file)
+        if snapshot is None or snapshot != (entry.get("input_size"), entry.get("input_mtime_ns")):
+            return None
+        return output_path
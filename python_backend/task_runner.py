@@ -3,15 +3,20 @@ from __future__ import annotations
 import os
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from importlib import import_module
 from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Callable
 
 from python_backend.epub_metadata import mark_epub_generated_by_tool
-from python_backend.json_output import dumps_json_line
+from python_backend.json_output import write_json_line
+from python_backend.output_cache import OUTPUT_CACHE_DIR_NAME, OutputCache
 from python_backend.protocol import TaskEvent, TaskRequest, TaskResult
+from python_backend.services.utils.log import LevelLogger, get_log_file, resolve_log_level
+from python_backend.task_journal import JOURNAL_DIR_NAME, TaskJournal, prune_journals
 
 
 def resolve_default_log_path() -> Path:
@@ -28,6 +33,11 @@ def resolve_default_log_path() -> Path:
 LOG_PATH = resolve_default_log_path()
 LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
 os.environ.setdefault("EPUB_TOOL_LOG_PATH", str(LOG_PATH))
+LOG_WORKER_ENV = "EPUB_TOOL_LOG_WORKER"
+JOURNAL_DIR = LOG_PATH.parent / JOURNAL_DIR_NAME
+OUTPUT_CACHE_DIR = LOG_PATH.parent / OUTPUT_CACHE_DIR_NAME
+# 界面日志事件的最小间隔（秒），高频 info 日志只写入日志文件。
+LOG_EVENT_MIN_INTERVAL = 0.05
 TASK_SUFFIX = {
     "reformat_epub": "_reformat_epub.epub",
     "decrypt_epub": "_decrypt_epub.epub",
@@ -69,28 +79,55 @@ _LOADED_MODULES: dict[str, Any] = {}
 
 class JsonLineEmitter:
     def emit(self, event: TaskEvent) -> None:
-        sys.stdout.write(dumps_json_line(event.to_dict()) + "\n")
-        sys.stdout.flush()
+        write_json_line(event.to_dict())
 
 
-class BroadcastLogger:
+class BroadcastLogger(LevelLogger):
+    """任务 logger：完整日志缓冲写入日志文件，同时限速向界面推送 ``task.log``。
+
+    debug 日志只写入文件；info 日志相邻两条事件间隔不足 ``event_interval`` 秒时
+    只写文件并计数，计数附在下一条推送的事件上；warning/error 总是推送。
+    """
+
     def __init__(
         self,
         emitter: JsonLineEmitter,
         task_id: str,
         context_provider: Callable[[], dict[str, Any]],
+        level: str | None = None,
+        event_interval: float = LOG_EVENT_MIN_INTERVAL,
     ):
         self.emitter = emitter
         self.task_id = task_id
         self.context_provider = context_provider
+        self.level = resolve_log_level(level)
+        self.event_interval = event_interval
+        self.last_event_at: float | None = None
+        self.suppressed = 0
         self.path = str(LOG_PATH)
+        self.file = get_log_file(self.path)
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        LOG_PATH.write_text(f"time: {current_time}\n", encoding="utf-8")
-
-    def write(self, text: str) -> None:
-        text = str(text).rstrip("\n")
-        with LOG_PATH.open("a", encoding="utf-8") as file:
-            file.write(f"{text}\n")
+        self.file.reset(f"time: {current_time}")
+
+    def handle(self, level: str, text: str) -> None:
+        self.file.append(text, flush=level == "error")
+        if level == "debug":
+            return
+        now = time.monotonic()
+        if (
+            level == "info"
+            and self.last_event_at is not None
+            and now - self.last_event_at < self.event_interval
+        ):
+            self.suppressed += 1
+            return
+        if self.suppressed:
+            text = f"{text}（另有 {self.suppressed} 条日志仅写入日志文件）"
+            self.suppressed = 0
+        self.last_event_at = now
+        self.emit_log_event(level, text)
+
+    def emit_log_event(self, level: str, text: str) -> None:
         context = self.context_provider()
         self.emitter.emit(
             TaskEvent(
@@ -103,10 +140,19 @@ class BroadcastLogger:
                 current_index=context["current_index"],
                 total_files=context["total_files"],
                 output_path=context["output_path"],
-                level="info",
+                level=level,
             )
         )
 
+    def flush(self) -> None:
+        """把缓冲日志写入文件，并报告尚未推送的被限速日志数量。"""
+        self.file.flush()
+        if self.suppressed:
+            count = self.suppressed
+            self.suppressed = 0
+            self.last_event_at = time.monotonic()
+            self.emit_log_event("info", f"另有 {count} 条日志仅写入日志文件: {self.path}")
+
 
 def load_module(task_type: str) -> Any:
     """按任务惰性加载服务模块，并在当前进程内复用。
@@ -189,6 +235,44 @@ def _validate_quality(options: dict[str, Any], key: str, default: int = 82) -> i
 def validate_task_options(task_type: str, options: dict[str, Any]) -> None:
     if not isinstance(options, dict):
         raise ValueError("options 必须是对象")
+    if "max_workers" in options:
+        max_workers = options["max_workers"]
+        if isinstance(max_workers, bool) or not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError("max_workers 必须是大于 0 的整数")
+    if "log_level" in options:
+        resolve_log_level(options["log_level"])
+    if "resume" in options and not isinstance(options["resume"], bool):
+        raise ValueError("resume 必须是布尔值")
+    if "output_cache" in options and not isinstance(options["output_cache"], bool):
+        raise ValueError("output_cache 必须是布尔值")
+    if "output_cache_dir" in options and not isinstance(options["output_cache_dir"], str):
+        raise ValueError("output_cache_dir 必须是路径字符串")
+    if "output_cache_max_mb" in options:
+        cache_mb = options["output_cache_max_mb"]
+        if isinstance(cache_mb, bool) or not isinstance(cache_mb, (int, float)) or cache_mb < 0:
+            raise ValueError("output_cache_max_mb 必须是非负数字")
+    if task_type in {"reformat_epub", "decrypt_epub", "encrypt_epub"} and "rewrite_workers" in options:
+        rewrite_workers = options["rewrite_workers"]
+        if isinstance(rewrite_workers, bool) or not isinstance(rewrite_workers, int) or rewrite_workers < 1:
+            raise ValueError("rewrite_workers 必须是大于 0 的整数")
+    if (
+        task_type in {"reformat_epub", "encrypt_epub", "image_compress", "image_to_webp", "webp_to_img"}
+        and "prune_unreferenced" in options
+        and not isinstance(options["prune_unreferenced"], bool)
+    ):
+        raise ValueError("prune_unreferenced 必须是布尔值")
+    if task_type in {"image_compress", "image_to_webp", "webp_to_img"}:
+        if "image_workers" in options:
+            image_workers = options["image_workers"]
+            if isinstance(image_workers, bool) or not isinstance(image_workers, int) or image_workers < 1:
+                raise ValueError("image_workers 必须是大于 0 的整数")
+        if "dedupe_images" in options and not isinstance(options["dedupe_images"], bool):
+            raise ValueError("dedupe_images 必须是布尔值")
+    if task_type in {"image_compress", "image_to_webp"}:
+        for key in ("max_dimension", "max_pixels"):
+            value = options.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+                raise ValueError(f"{key} 必须是大于 0 的整数")
     if task_type == "image_compress":
         _validate_quality(options, "jpeg_quality")
         _validate_quality(options, "webp_quality")
@@ -200,6 +284,11 @@ def validate_task_options(task_type: str, options: dict[str, Any]) -> None:
         _validate_quality(options, "quality")
         if task_type == "webp_to_img" and "png_quantize" in options and not isinstance(options["png_quantize"], bool):
             raise ValueError("png_quantize 必须是布尔值")
+    elif task_type in {"encrypt_font", "decrypt_font"}:
+        if "document_cache_mb" in options:
+            cache_mb = options["document_cache_mb"]
+            if isinstance(cache_mb, bool) or not isinstance(cache_mb, (int, float)) or cache_mb < 0:
+                raise ValueError("document_cache_mb 必须是非负数字")
     elif task_type == "chinese_convert":
         if options.get("direction") not in {"s2t", "t2s"}:
             raise ValueError("direction 必须是 s2t 或 t2s")
@@ -231,8 +320,9 @@ def normalize_target_map(raw_map: Any) -> dict[str, list[str]]:
 
 
 def list_font_targets(epub_path: str) -> dict[str, Any]:
-    font_module = load_module("encrypt_font")
-    result = font_module.list_epub_font_encrypt_targets(epub_path)
+    """读取可选字体 family；只导入轻量的 @font-face 扫描模块。"""
+    scanner = import_module("python_backend.services.font.font_face_scanner")
+    result = scanner.list_epub_font_families(epub_path)
     return {
         "ok": True,
         "input_file": os.path.normpath(epub_path),
@@ -240,31 +330,75 @@ def list_font_targets(epub_path: str) -> dict[str, Any]:
     }
 
 
-def iter_font_targets(epub_paths: list[str]):
-    """逐本产生字体列表结果，使 CLI 能在一个 sidecar 中推送批量进度。"""
+def validate_font_target_workers(max_workers: Any) -> None:
+    if max_workers is None:
+        return
+    if isinstance(max_workers, bool) or not isinstance(max_workers, int) or max_workers < 1:
+        raise ValueError("max_workers 必须是大于 0 的整数")
+
+
+def read_font_target_result(epub_path: str) -> dict[str, Any]:
+    normalized_path = os.path.normpath(epub_path)
+    try:
+        return list_font_targets(normalized_path)
+    except Exception as exc:
+        return {
+            "ok": False,
+            "input_file": normalized_path,
+            "font_families": [],
+            "error": str(exc),
+        }
+
+
+def iter_font_targets(epub_paths: list[str], max_workers: int | None = None):
+    """逐本产生字体列表结果，使 CLI 能在一个 sidecar 中推送批量进度。
+
+    ``max_workers`` 大于 1 时在有界线程池中并发扫描，事件按完成顺序产出，
+    ``current_index`` 仍指向输入顺序，调用方可据此还原最终结果顺序。
+    """
+    validate_font_target_workers(max_workers)
     total_files = len(epub_paths)
-    for index, epub_path in enumerate(epub_paths, start=1):
-        normalized_path = os.path.normpath(epub_path)
-        try:
-            result = list_font_targets(normalized_path)
-        except Exception as exc:
-            result = {
-                "ok": False,
-                "input_file": normalized_path,
-                "font_families": [],
-                "error": str(exc),
-            }
-        yield {
+
+    def build_event(index: int, result: dict[str, Any]) -> dict[str, Any]:
+        return {
             "event": "font-targets.progress",
             "current_index": index,
             "total_files": total_files,
             "result": result,
         }
 
+    if not max_workers or max_workers == 1 or total_files <= 1:
+        for index, epub_path in enumerate(epub_paths, start=1):
+            yield build_event(index, read_font_target_result(epub_path))
+        return
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, total_files),
+        thread_name_prefix="epub-tool-font-targets",
+    )
+    try:
+        futures = {
+            executor.submit(read_font_target_result, epub_path): index
+            for index, epub_path in enumerate(epub_paths, start=1)
+        }
+        for future in as_completed(futures):
+            yield build_event(futures[future], future.result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def collect_font_target_results(events) -> list[dict[str, Any]]:
+    """按输入顺序整理 ``iter_font_targets`` 的结果。"""
+    indexed = sorted((event["current_index"], event["result"]) for event in events)
+    return [result for _, result in indexed]
 
-def list_font_targets_batch(epub_paths: list[str]) -> list[dict[str, Any]]:
+
+def list_font_targets_batch(
+    epub_paths: list[str],
+    max_workers: int | None = None,
+) -> list[dict[str, Any]]:
     """保留可复用的批量 API，供 CLI 和测试调用。"""
-    return [event["result"] for event in iter_font_targets(epub_paths)]
+    return collect_font_target_results(iter_font_targets(epub_paths, max_workers))
 
 
 def execute_task(
@@ -287,9 +421,19 @@ def execute_task(
         kwargs = {"target_font_families": targets}
         if task_type == "decrypt_font":
             kwargs["ocr_options"] = options
+        elif options.get("document_cache_mb") is not None:
+            kwargs["document_cache_mb"] = options["document_cache_mb"]
         return func(input_file, output_dir, **kwargs)
 
-    if task_type in {"webp_to_img", "image_compress", "image_to_webp", "chinese_convert"}:
+    if task_type in {
+        "reformat_epub",
+        "decrypt_epub",
+        "encrypt_epub",
+        "webp_to_img",
+        "image_compress",
+        "image_to_webp",
+        "chinese_convert",
+    }:
         return func(input_file, output_dir, options=options)
 
     if task_type == "replace_cover":
@@ -305,6 +449,152 @@ def execute_task(
     return func(input_file, output_dir)
 
 
+@dataclass(slots=True)
+class FileOutcome:
+    """单个输入文件的处理结论，可在进程池与主进程之间传递。"""
+
+    status: str
+    message: str
+    level: str = "info"
+    output_path: str | None = None
+    cache: str | None = None
+
+
+class BufferedTaskLogger(LevelLogger):
+    """进程池 worker 内的任务 logger，日志由主进程按文件顺序回放。"""
+
+    def __init__(self, level: str | None = None) -> None:
+        self.level = resolve_log_level(level)
+        self.messages: list[tuple[str, str]] = []
+
+    def handle(self, level: str, text: str) -> None:
+        self.messages.append((level, text))
+
+
+def process_input_file(
+    task_type: str,
+    input_file: str,
+    output_dir: str | None,
+    options: dict[str, Any],
+) -> FileOutcome:
+    """执行单个输入文件并把结果、跳过和异常统一折叠为 FileOutcome。"""
+    normalized_input = os.path.normpath(input_file)
+    expected_output = build_request_output_path(
+        normalized_input, task_type, output_dir, options
+    )
+    output_existed_before = bool(expected_output and os.path.exists(expected_output))
+    start_at = time.perf_counter()
+    skip_message = "该文件在当前模式下无需处理，或未选择字体目标。"
+    try:
+        if not normalized_input.lower().endswith(".epub"):
+            raise ValueError("当前只支持 .epub 文件")
+        if not os.path.exists(normalized_input):
+            raise FileNotFoundError(f"EPUB文件不存在: {normalized_input}")
+        if input_has_task_output_suffix(normalized_input, task_type, options):
+            suffix = get_task_output_suffix(task_type, options)
+            skip_message = f"文件名已包含当前任务输出后缀 {suffix}，为避免重复执行已跳过。"
+            return FileOutcome("skip", skip_message, level="warning")
+
+        cache = OutputCache.from_options(task_type, options, OUTPUT_CACHE_DIR)
+        cache_key = None
+        if cache is not None and expected_output:
+            # 缓存读写失败只按未命中处理，不影响正常执行。
+            try:
+                cache_key = cache.build_key(task_type, normalized_input, options)
+                method = cache.materialize(cache_key, expected_output)
+            except OSError:
+                method = None
+            if method is not None:
+                duration_ms = int((time.perf_counter() - start_at) * 1000)
+                label = "硬链接" if method == "hardlink" else "复制"
+                return FileOutcome(
+                    "success",
+                    f"命中输出缓存（{label}），用时 {duration_ms}ms",
+                    output_path=expected_output,
+                    cache="hit",
+                )
+
+        ret = execute_task(task_type, normalized_input, output_dir, options)
+        duration_ms = int((time.perf_counter() - start_at) * 1000)
+
+        if ret == 0:
+            if not expected_output or not os.path.isfile(expected_output):
+                raise RuntimeError("处理服务未生成预期输出文件")
+            if expected_output.lower().endswith(".epub"):
+                mark_epub_generated_by_tool(expected_output)
+            if cache_key is not None:
+                try:
+                    cache.store(cache_key, expected_output)
+                except OSError:
+                    pass
+            return FileOutcome(
+                "success",
+                f"处理成功，用时 {duration_ms}ms",
+                output_path=expected_output,
+                cache="miss" if cache is not None else None,
+            )
+        if ret == "skip":
+            return FileOutcome("skip", skip_message, level="warning")
+        return FileOutcome("error", str(ret), level="error")
+    except Exception as exc:
+        error_message = str(exc)
+        if expected_output and not output_existed_before:
+            try:
+                Path(expected_output).unlink(missing_ok=True)
+            except OSError as cleanup_exc:
+                error_message = f"{error_message}；清理失败产物失败: {cleanup_exc}"
+        return FileOutcome("error", error_message, level="error")
+
+
+def _init_pool_worker() -> None:
+    """进程池 worker 只向主进程回传日志，不重置共享的日志文件。"""
+    os.environ[LOG_WORKER_ENV] = "1"
+
+
+def _process_input_file_in_worker(
+    task_type: str,
+    input_file: str,
+    output_dir: str | None,
+    options: dict[str, Any],
+) -> tuple[FileOutcome, list[tuple[str, str]]]:
+    logger = BufferedTaskLogger(options.get("log_level"))
+    with patched_logger(task_type, logger):
+        outcome = process_input_file(task_type, input_file, output_dir, options)
+    return outcome, logger.messages
+
+
+def resolve_max_workers(options: dict[str, Any], total_files: int) -> int:
+    return max(1, min(int(options.get("max_workers") or 1), total_files))
+
+
+def can_run_in_parallel(request: TaskRequest) -> bool:
+    """输出路径互不冲突时才允许并行，避免两个进程写同一个目标文件。"""
+    expected_outputs = [
+        build_request_output_path(
+            os.path.normpath(input_file),
+            request.task_type,
+            request.output_dir,
+            request.options,
+        )
+        for input_file in request.input_files
+    ]
+    normalized = [os.path.normcase(item) for item in expected_outputs if item]
+    return len(normalized) == len(set(normalized))
+
+
+def open_task_journal(request: TaskRequest, logger: BroadcastLogger) -> TaskJournal | None:
+    """打开当前 task_id 的续跑日志；日志目录不可写时仅提示，不影响任务执行。"""
+    try:
+        journal = TaskJournal.open(
+            JOURNAL_DIR, request.task_id, request.task_type, request.options
+        )
+        prune_journals(JOURNAL_DIR, keep_path=journal.path)
+        return journal
+    except OSError as exc:
+        logger.warning(f"无法打开任务续跑日志，本次任务不支持续跑: {exc}")
+        return None
+
+
 def run_task(request: TaskRequest) -> TaskResult:
     if request.task_type not in MODULE_PATHS:
         raise ValueError(f"不支持的任务类型: {request.task_type}")
@@ -323,12 +613,45 @@ def run_task(request: TaskRequest) -> TaskResult:
         "progress": 0.0,
         "output_path": None,
     }
-    logger = BroadcastLogger(emitter, request.task_id, lambda: context.copy())
+    logger = BroadcastLogger(
+        emitter,
+        request.task_id,
+        lambda: context.copy(),
+        level=request.options.get("log_level"),
+    )
 
     outputs: list[str] = []
     errors: list[dict[str, str]] = []
     skipped: list[dict[str, str]] = []
     success_count = 0
+    journal = open_task_journal(request, logger)
+    resume = bool(request.options.get("resume")) and journal is not None
+
+    def resumed_outcome(input_file: str) -> FileOutcome | None:
+        if not resume:
+            return None
+        normalized_input = os.path.normpath(input_file)
+        expected_output = build_request_output_path(
+            normalized_input, request.task_type, request.output_dir, request.options
+        )
+        output_path = journal.completed_output(normalized_input, expected_output)
+        if output_path is None:
+            return None
+        return FileOutcome(
+            "success", "上次运行已完成且输入与选项未变化，跳过重复处理", output_path=output_path
+        )
+
+    def record_outcome(normalized_input: str, outcome: FileOutcome) -> None:
+        nonlocal journal
+        if journal is None:
+            return
+        try:
+            journal.record(
+                normalized_input, outcome.status, outcome.message, outcome.output_path
+            )
+        except OSError as exc:
+            logger.warning(f"写入任务续跑日志失败，本次任务不再记录: {exc}")
+            journal = None
 
     emitter.emit(
         TaskEvent(
@@ -343,146 +666,117 @@ def run_task(request: TaskRequest) -> TaskResult:
         )
     )
 
-    with patched_logger(request.task_type, logger):
-        for index, input_file in enumerate(request.input_files, start=1):
-            normalized_input = os.path.normpath(input_file)
-            expected_output = build_request_output_path(
-                normalized_input, request.task_type, request.output_dir, request.options
+    def start_file(index: int, input_file: str) -> str:
+        normalized_input = os.path.normpath(input_file)
+        expected_output = build_request_output_path(
+            normalized_input, request.task_type, request.output_dir, request.options
+        )
+        context.update(
+            {
+                "current_file": normalized_input,
+                "current_index": index,
+                "progress": build_progress(index - 1, total_files),
+                "output_path": expected_output,
+            }
+        )
+        emitter.emit(
+            TaskEvent(
+                event="task.file.started",
+                task_id=request.task_id,
+                status="running",
+                progress=context["progress"],
+                message=f"开始处理 {os.path.basename(normalized_input)}",
+                current_file=normalized_input,
+                current_index=index,
+                total_files=total_files,
+                output_path=expected_output,
             )
-            output_existed_before = bool(expected_output and os.path.exists(expected_output))
-            context.update(
-                {
-                    "current_file": normalized_input,
-                    "current_index": index,
-                    "progress": build_progress(index - 1, total_files),
-                    "output_path": expected_output,
-                }
+        )
+        return normalized_input
+
+    def finish_file(index: int, normalized_input: str, outcome: FileOutcome) -> None:
+        nonlocal success_count
+        context["progress"] = build_progress(index, total_files)
+        if outcome.status == "success":
+            success_count += 1
+            if outcome.output_path and outcome.output_path not in outputs:
+                outputs.append(outcome.output_path)
+        elif outcome.status == "skip":
+            skipped.append({"input_file": normalized_input, "message": outcome.message})
+        else:
+            errors.append({"input_file": normalized_input, "message": outcome.message})
+        logger.flush()
+        emitter.emit(
+            TaskEvent(
+                event="task.file.finished",
+                task_id=request.task_id,
+                status=outcome.status,
+                progress=context["progress"],
+                message=outcome.message,
+                current_file=normalized_input,
+                current_index=index,
+                total_files=total_files,
+                output_path=context["output_path"],
+                level=outcome.level,
+                cache=outcome.cache,
             )
+        )
 
-            emitter.emit(
-                TaskEvent(
-                    event="task.file.started",
-                    task_id=request.task_id,
-                    status="running",
-                    progress=context["progress"],
-                    message=f"开始处理 {os.path.basename(normalized_input)}",
-                    current_file=normalized_input,
-                    current_index=index,
-                    total_files=total_files,
-                    output_path=expected_output,
+    max_workers = resolve_max_workers(request.options, total_files)
+    if max_workers > 1 and not can_run_in_parallel(request):
+        logger.write("多个输入文件会生成同名输出文件，本次改为逐个处理。")
+        max_workers = 1
+
+    if max_workers > 1:
+        # 子进程只缓存日志；主进程按输入顺序回放事件，保证 stdout 协议顺序不变。
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_pool_worker
+        ) as pool:
+            resumed = [resumed_outcome(input_file) for input_file in request.input_files]
+            futures = [
+                None
+                if resumed_file is not None
+                else pool.submit(
+                    _process_input_file_in_worker,
+                    request.task_type,
+                    input_file,
+                    request.output_dir,
+                    request.options,
                 )
-            )
-
-            start_at = time.perf_counter()
-            skip_message = "该文件在当前模式下无需处理，或未选择字体目标。"
-            try:
-                if not normalized_input.lower().endswith(".epub"):
-                    raise ValueError("当前只支持 .epub 文件")
-                if not os.path.exists(normalized_input):
-                    raise FileNotFoundError(f"EPUB文件不存在: {normalized_input}")
-                if input_has_task_output_suffix(
-                    normalized_input, request.task_type, request.options
-                ):
-                    suffix = get_task_output_suffix(request.task_type, request.options)
-                    skip_message = f"文件名已包含当前任务输出后缀 {suffix}，为避免重复执行已跳过。"
-                    ret = "skip"
-                else:
-                    ret = execute_task(
+                for input_file, resumed_file in zip(request.input_files, resumed)
+            ]
+            for index, (input_file, future) in enumerate(
+                zip(request.input_files, futures), start=1
+            ):
+                normalized_input = start_file(index, input_file)
+                if future is None:
+                    finish_file(index, normalized_input, resumed[index - 1])
+                    continue
+                try:
+                    outcome, messages = future.result()
+                except Exception as exc:
+                    outcome = FileOutcome(
+                        "error", f"处理进程异常退出: {exc}", level="error"
+                    )
+                    messages = []
+                for level, message in messages:
+                    logger.log(level, message)
+                record_outcome(normalized_input, outcome)
+                finish_file(index, normalized_input, outcome)
+    else:
+        with patched_logger(request.task_type, logger):
+            for index, input_file in enumerate(request.input_files, start=1):
+                normalized_input = start_file(index, input_file)
+                outcome = resumed_outcome(normalized_input)
+                if outcome is None:
+                    outcome = process_input_file(
                         request.task_type,
                         normalized_input,
                         request.output_dir,
                         request.options,
                     )
-                duration_ms = int((time.perf_counter() - start_at) * 1000)
-                context["progress"] = build_progress(index, total_files)
-
-                if ret == 0:
-                    actual_output = expected_output
-                    if not actual_output or not os.path.isfile(actual_output):
-                        raise RuntimeError("处理服务未生成预期输出文件")
-                    if actual_output.lower().endswith(".epub"):
-                        mark_epub_generated_by_tool(actual_output)
-                    success_count += 1
-                    if actual_output and actual_output not in outputs:
-                        outputs.append(actual_output)
-                    emitter.emit(
-                        TaskEvent(
-                            event="task.file.finished",
-                            task_id=request.task_id,
-                            status="success",
-                            progress=context["progress"],
-                            message=f"处理成功，用时 {duration_ms}ms",
-                            current_file=normalized_input,
-                            current_index=index,
-                            total_files=total_files,
-                            output_path=expected_output,
-                        )
-                    )
-                elif ret == "skip":
-                    skipped.append(
-                        {
-                            "input_file": normalized_input,
-                            "message": skip_message,
-                        }
-                    )
-                    emitter.emit(
-                        TaskEvent(
-                            event="task.file.finished",
-                            task_id=request.task_id,
-                            status="skip",
-                            progress=context["progress"],
-                            message=skip_message,
-                            current_file=normalized_input,
-                            current_index=index,
-                            total_files=total_files,
-                            output_path=expected_output,
-                            level="warning",
-                        )
-                    )
-                else:
-                    errors.append(
-                        {
-                            "input_file": normalized_input,
-                            "message": str(ret),
-                        }
-                    )
-                    emitter.emit(
-                        TaskEvent(
-                            event="task.file.finished",
-                            task_id=request.task_id,
-                            status="error",
-                            progress=context["progress"],
-                            message=str(ret),
-                            current_file=normalized_input,
-                            current_index=index,
-                            total_files=total_files,
-                            output_path=expected_output,
-                            level="error",
-                        )
-                    )
-            except Exception as exc:
-                error_message = str(exc)
-                if expected_output and not output_existed_before:
-                    try:
-                        Path(expected_output).unlink(missing_ok=True)
-                    except OSError as cleanup_exc:
-                        error_message = f"{error_message}；清理失败产物失败: {cleanup_exc}"
-                context["progress"] = build_progress(index, total_files)
-                errors.append({"input_file": normalized_input, "message": error_message})
-                emitter.emit(
-                    TaskEvent(
-                        event="task.file.finished",
-                        task_id=request.task_id,
-                        status="error",
-                        progress=context["progress"],
-                        message=error_message,
-                        current_file=normalized_input,
-                        current_index=index,
-                        total_files=total_files,
-                        output_path=expected_output,
-                        level="error",
-                    )
-                )
+                    record_outcome(normalized_input, outcome)
+                finish_file(index, normalized_input, outcome)
 
     total = total_files
     success = success_count
@@ -511,6 +805,7 @@ def run_task(request: TaskRequest) -> TaskResult:
         log_path=str(LOG_PATH),
     )
 
+    logger.flush()
     emitter.emit(
         TaskEvent(
             event="task.finished",
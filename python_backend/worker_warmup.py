@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from python_backend.services.utils.lazy_import import load_lazy_modules
+from python_backend.task_runner import MODULE_PATHS, load_module
+
+OCR_BACKEND_RESOURCE = "ocr_backend"
+DEFAULT_WARMUP_TARGETS = ("decrypt_font", "encrypt_font", OCR_BACKEND_RESOURCE)
+
+
+def resolve_warmup_targets(targets: list[str] | None) -> list[str]:
+    """校验预热目标并去重；未指定时返回默认目标。"""
+    if not targets:
+        return list(DEFAULT_WARMUP_TARGETS)
+    if not isinstance(targets, list):
+        raise ValueError("warmup 的 targets 必须是数组")
+    resolved: list[str] = []
+    for target in targets:
+        if target != OCR_BACKEND_RESOURCE and target not in MODULE_PATHS:
+            raise ValueError(f"不支持的预热目标: {target}")
+        if target not in resolved:
+            resolved.append(target)
+    return resolved
+
+
+def load_warmup_target(target: str) -> None:
+    if target == OCR_BACKEND_RESOURCE:
+        load_module("decrypt_font").create_ocr_backend()
+    else:
+        # 服务模块的重依赖是延迟导入的，预热时一并加载；模块可另外提供
+        # warmup() 预先构建词典等进程级资源。
+        module = load_module(target)
+        load_lazy_modules(vars(module))
+        warmup = getattr(module, "warmup", None)
+        if callable(warmup):
+            warmup()
+
+
+@dataclass(slots=True)
+class WorkerWarmup:
+    """常驻 worker 的后台预热状态。
+
+    预热在后台线程中按顺序加载任务模块与默认 OCR 会话，每个目标在加载期间
+    对应一个未完成的 ``threading.Event``。请求只等待自己需要且仍在加载的目标，
+    其他请求照常执行。
+    """
+
+    loader: Callable[[str], None] = load_warmup_target
+    pending: dict[str, threading.Event] = field(default_factory=dict)
+    loaded: set[str] = field(default_factory=set)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def start(
+        self,
+        targets: list[str],
+        on_finished: Callable[[dict[str, Any]], None],
+    ) -> threading.Thread:
+        with self.lock:
+            scheduled = [
+                target
+                for target in targets
+                if target not in self.pending and target not in self.loaded
+            ]
+            for target in scheduled:
+                self.pending[target] = threading.Event()
+        thread = threading.Thread(
+            target=self._run,
+            args=(targets, scheduled, on_finished),
+            name="epub-tool-warmup",
+            daemon=True,
+        )
+        thread.start()
+        return thread
+
+    def _run(
+        self,
+        targets: list[str],
+        scheduled: list[str],
+        on_finished: Callable[[dict[str, Any]], None],
+    ) -> None:
+        start_at = time.perf_counter()
+        resources = []
+        for target in targets:
+            if target not in scheduled:
+                # 已加载或正由先前的预热加载，等待后按结果报告。
+                self.wait_for([target])
+                resources.append(
+                    {"name": target, "ok": target in self.loaded, "duration_ms": 0, "cached": True}
+                )
+                continue
+            target_start_at = time.perf_counter()
+            record: dict[str, Any] = {"name": target, "ok": True}
+            try:
+                self.loader(target)
+            except Exception as exc:
+                record["ok"] = False
+                record["error"] = str(exc)
+            record["duration_ms"] = int((time.perf_counter() - target_start_at) * 1000)
+            with self.lock:
+                if record["ok"]:
+                    self.loaded.add(target)
+                event = self.pending.pop(target)
+            event.set()
+            resources.append(record)
+        on_finished(
+            {
+                "ok": all(record["ok"] for record in resources),
+                "resources": resources,
+                "duration_ms": int((time.perf_counter() - start_at) * 1000),
+            }
+        )
+
+    def wait_for(self, targets: list[str]) -> None:
+        """等待仍在预热中的目标完成；未预热或已完成的目标不会阻塞。"""
+        for target in targets:
+            with self.lock:
+                event = self.pending.get(target)
+            if event is not None:
+                event.wait()
+
+
+def request_warmup_targets(task_type: str, options: dict[str, Any]) -> list[str]:
+    """任务请求执行前需要等待的预热目标。
+
+    OCR 会话只在真正需要识别字形时才创建，``create_ocr_backend`` 内部的锁会让
+    它等待后台预热中的同一模型，因此单进程任务只等待任务模块本身。多进程任务
+    会 fork 子进程，需先等待全部预热结束，避免子进程继承加载到一半的导入状态。
+    """
+    max_workers = options.get("max_workers") if isinstance(options, dict) else None
+    if isinstance(max_workers, int) and max_workers > 1:
+        return [*MODULE_PATHS, OCR_BACKEND_RESOURCE]
+    return [task_type] if task_type in MODULE_PATHS else []
@@ -13,6 +13,7 @@ ENTRYPOINT = REPO_ROOT / "python_backend" / "cli.py"
 DIST_DIR = REPO_ROOT / "src-tauri" / "binaries"
 WORK_ROOT = REPO_ROOT / "build" / "python-sidecar"
 CONFIG_DIR = WORK_ROOT / "cache"
+CONVERSION_SNAPSHOT_DIR = WORK_ROOT / "conversion_snapshots"
 SIDECAR_STEM = "epub-tool-python"
 SIDE_CAR_NAME = f"{SIDECAR_STEM}.exe" if sys.platform == "win32" else SIDECAR_STEM
 PYINSTALLER_MODE = "--onedir"
@@ -21,6 +22,7 @@ BASE_REQUIRED_MODULES = [
     "emoji",
     "fontTools",
     "tinycss2",
+    "cssselect2",
     "tqdm",
     "PIL",
     "yaml",
@@ -41,6 +43,20 @@ BASE_REQUIRED_MODULES = [
 ONNX_REQUIRED_MODULES = [
     "onnxruntime",
 ]
+# 服务模块通过 lazy_import.LazyModule 按名称延迟导入这些依赖，PyInstaller
+# 的静态分析看不到，需要显式声明。
+LAZY_IMPORTED_MODULES = [
+    "bs4",
+    "cssselect2",
+    "tinycss2",
+    "fontTools.ttLib",
+    "fontTools.pens.recordingPen",
+    "PIL.Image",
+    "PIL.ImageDraw",
+    "PIL.ImageFont",
+    "PIL.ImageOps",
+    "opencc",
+]
 REQUIRED_MODULES = [
     *BASE_REQUIRED_MODULES,
     *ONNX_REQUIRED_MODULES,
@@ -113,9 +129,22 @@ def sidecar_is_current() -> bool:
     return True
 
 
+def build_conversion_snapshots() -> Path:
+    """预先编译简繁转换词典快照，随 sidecar 打包以免首次转换时再编译。"""
+    from python_backend.services.text.conversion_engine import (
+        build_conversion_snapshots as write_snapshots,
+    )
+
+    if CONVERSION_SNAPSHOT_DIR.exists():
+        shutil.rmtree(CONVERSION_SNAPSHOT_DIR)
+    write_snapshots(CONVERSION_SNAPSHOT_DIR)
+    return CONVERSION_SNAPSHOT_DIR
+
+
 def build_sidecar() -> Path:
     ensure_pyinstaller()
     ensure_runtime_dependencies()
+    snapshot_dir = build_conversion_snapshots()
 
     DIST_DIR.mkdir(parents=True, exist_ok=True)
     work_dir = WORK_ROOT / "work"
@@ -152,7 +181,10 @@ def build_sidecar() -> Path:
         "python_backend",
         "--collect-data",
         "opencc",
+        "--add-data",
+        f"{snapshot_dir}{os.pathsep}python_backend/services/text/conversion_snapshots",
         *PYINSTALLER_ONNX_ARGS,
+        *(arg for module in LAZY_IMPORTED_MODULES for arg in ("--hidden-import", module)),
         "--collect-submodules",
         "bidi",
         "--copy-metadata",
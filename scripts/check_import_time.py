@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import argparse
+import compileall
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# 冷导入预算（毫秒）。服务模块的重依赖应延迟到首次处理内容时才导入，
+# 导入本身只包含标准库与 python_backend 内部模块。
+DEFAULT_BUDGET_MS = 150
+MODULE_BUDGET_MS: dict[str, int] = {}
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def parse_import_times(stderr: str) -> list[tuple[str, int, int, int]]:
+    """解析 ``-X importtime`` 输出，返回 (模块, 自身微秒, 累计微秒, 嵌套深度)。"""
+    records = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def measure_module(module_path: str, log_dir: str) -> tuple[int, list[tuple[str, int, int, int]]]:
+    """在全新解释器中导入模块，返回其累计导入耗时（微秒）与全部导入记录。"""
+    env = os.environ.copy()
+    env["EPUB_TOOL_LOG_PATH"] = str(Path(log_dir) / "log.txt")
+    # 冻结的 sidecar 直接加载字节码，测量时同样不计入源码编译耗时。
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_path}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"导入 {module_path} 失败:\n{completed.stderr[-2000:]}")
+    records = parse_import_times(completed.stderr)
+    cumulative = next(
+        (cumulative for name, _self, cumulative, _depth in records if name == module_path),
+        None,
+    )
+    if cumulative is None:
+        raise SystemExit(f"未在 importtime 输出中找到 {module_path}")
+    return cumulative, records
+
+
+def format_slowest(records: list[tuple[str, int, int, int]], module_path: str, limit: int) -> str:
+    children = [
+        (cumulative, name)
+        for name, _self, cumulative, _depth in records
+        if name != module_path and not name.startswith("python_backend")
+    ]
+    children.sort(reverse=True)
+    return ", ".join(f"{name} {cumulative / 1000:.1f}ms" for cumulative, name in children[:limit])
+
+
+def main(argv: list[str] | None = None) -> int:
+    from python_backend.task_runner import MODULE_PATHS
+
+    parser = argparse.ArgumentParser(description="检查任务服务模块的冷启动导入耗时预算")
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS, help="默认预算（毫秒）")
+    parser.add_argument(
+        "--module-budget",
+        action="append",
+        default=[],
+        metavar="TASK=MS",
+        help="覆盖单个任务模块的预算，例如 decrypt_font=200",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块测量次数，取最小值")
+    parser.add_argument("--top", type=int, default=5, help="超预算时列出的最慢依赖数量")
+    args = parser.parse_args(argv)
+
+    budgets = dict(MODULE_BUDGET_MS)
+    for item in args.module_budget:
+        task_type, separator, value = item.partition("=")
+        if not separator or task_type not in MODULE_PATHS or not value.isdigit():
+            raise SystemExit(f"无效的模块预算: {item}")
+        budgets[task_type] = int(value)
+
+    compileall.compile_dir(REPO_ROOT / "python_backend", quiet=1)
+    failures = []
+    with tempfile.TemporaryDirectory() as log_dir:
+        for task_type, module_path in MODULE_PATHS.items():
+            samples = [measure_module(module_path, log_dir) for _ in range(max(1, args.repeat))]
+            cumulative, records = min(samples, key=lambda sample: sample[0])
+            budget_ms = budgets.get(task_type, args.budget_ms)
+            elapsed_ms = cumulative / 1000
+            status = "ok" if elapsed_ms <= budget_ms else "OVER"
+            print(f"{status:4} {task_type:16} {elapsed_ms:8.1f}ms / {budget_ms}ms  {module_path}")
+            if status != "ok":
+                failures.append(task_type)
+                print(f"     最慢依赖: {format_slowest(records, module_path, args.top)}")
+
+    if failures:
+        print(f"以下模块超出冷导入预算: {', '.join(failures)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -40,6 +40,7 @@ const FALLBACK_OCR_MODEL_NAME: &str = "PP-OCRv6_small_rec";
 const WORKER_STDERR_MAX_LINES: usize = 100;
 const PARENT_LIVENESS_ACCEPT_TIMEOUT: Duration = Duration::from_secs(30);
 const COVER_PREVIEW_MAX_BYTES: u64 = 20 * 1024 * 1024;
+const FONT_TARGET_SCAN_WORKERS: usize = 4;
 
 #[cfg(target_os = "windows")]
 const CREATE_NO_WINDOW: u32 = 0x0800_0000;
@@ -540,6 +541,7 @@ fn default_ocr_model_name() -> &'static str {
 
 fn configure_backend_command(command: &mut Command, log_path: &Path, ocr_model_dir: Option<&Path>) {
     command.env("EPUB_TOOL_LOG_PATH", log_path);
+    command.env("EPUB_TOOL_VERSION", env!("CARGO_PKG_VERSION"));
     if let Some(ocr_model_dir) = ocr_model_dir {
         command.env("EPUB_TOOL_OCR_ONNX_MODEL_DIR", ocr_model_dir);
     }
@@ -653,6 +655,8 @@ fn terminate_worker_process_tree(child: &mut Child) -> Result<(), String> {
 
 fn start_python_worker(app: &AppHandle) -> Result<PythonWorker, String> {
     let mut command = build_backend_command(app, "serve")?;
+    // 后台预热字体任务模块与 OCR 会话，首次字体处理无需等待依赖导入。
+    command.arg("--preload");
     let (liveness_listener, liveness_address, liveness_token) = create_parent_liveness_listener()?;
     command
         .stdin(Stdio::piped())
@@ -1021,6 +1025,10 @@ fn execute_worker_request(
                     .unwrap_or("Python worker 返回未知错误");
                 return Err(error.to_string());
             }
+            if payload.get("event").and_then(Value::as_str) == Some("worker.warmup") {
+                // 后台预热完成通知与当前请求无关，不转发给请求的事件通道。
+                continue;
+            }
 
             on_event
                 .send(payload)
@@ -1249,6 +1257,7 @@ async fn list_font_targets_batch(
                 "request_id": worker_request_id("font-targets"),
                 "command": "list-fonts-batch",
                 "input_files": file_paths,
+                "max_workers": FONT_TARGET_SCAN_WORKERS,
             }),
             &on_event,
         )?;
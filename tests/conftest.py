@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """日志默认写在仓库根目录的 log.txt。
+
+    服务模块在导入时就创建 logger 并确定日志路径，而测试模块在收集阶段即被导入，
+    早于任何 fixture，因此日志路径必须在这里、导入 python_backend 之前改到临时目录。
+    """
+    log_dir = tempfile.mkdtemp(prefix="epub-tool-tests-")
+
+    def remove_log_dir() -> None:
+        # 先写出缓冲的日志，否则退出时的 flush_log_files 会找不到已删除的目录。
+        from python_backend.services.utils.log import flush_log_files
+
+        flush_log_files()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+    config.add_cleanup(remove_log_dir)
+    os.environ["EPUB_TOOL_LOG_PATH"] = os.path.join(log_dir, "log.txt")
+
+
+@pytest.fixture(autouse=True)
+def isolate_task_state_dirs(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> None:
+    """任务日志与输出缓存默认写在日志目录旁（开发环境下即仓库根目录），测试中改到临时目录。"""
+    from python_backend import task_runner
+
+    state_dir = tmp_path_factory.mktemp("task_state")
+    monkeypatch.setattr(task_runner, "JOURNAL_DIR", state_dir / task_runner.JOURNAL_DIR_NAME)
+    monkeypatch.setattr(task_runner, "OUTPUT_CACHE_DIR", state_dir / task_runner.OUTPUT_CACHE_DIR_NAME)
+
+
+@pytest.fixture(autouse=True)
+def isolate_conversion_snapshots(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch) -> None:
+    """转换快照默认同样写在日志目录旁，测试中改到临时目录。"""
+    from python_backend.services.text import conversion_engine
+
+    monkeypatch.setenv(
+        conversion_engine.SNAPSHOT_DIR_ENV, str(tmp_path_factory.mktemp(conversion_engine.SNAPSHOT_DIR_NAME))
+    )
@@ -0,0 +1,408 @@
+"""性能基准测试。
+
+默认跳过；设置环境变量 EPUB_TOOL_RUN_BENCHMARKS=1 后运行，并用
+``pytest -s tests/test_benchmarks.py`` 查看输出的耗时数据。
+"""
+
+import os
+import time
+
+import pytest
+from PIL import Image, ImageDraw
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("EPUB_TOOL_RUN_BENCHMARKS"),
+    reason="设置 EPUB_TOOL_RUN_BENCHMARKS=1 后运行性能基准",
+)
+
+
+def report(title, rows):
+    print(f"\n[benchmark] {title}")
+    for row in rows:
+        print("  " + row)
+
+
+def test_onnx_ocr_per_glyph_latency_by_batch_size():
+    from python_backend.services.font.decrypt_font import (
+        create_ocr_backend,
+        resolve_onnx_ocr_model_dir,
+    )
+
+    if resolve_onnx_ocr_model_dir(required=False) is None:
+        pytest.skip("未找到 ONNX OCR 模型")
+
+    glyph_count = 256
+    images = []
+    for index in range(glyph_count):
+        image = Image.new("RGB", (96, 96), (255, 255, 255))
+        ImageDraw.Draw(image).text((24, 24), chr(ord("A") + index % 26), fill=(0, 0, 0))
+        images.append(image)
+
+    rows = []
+    for batch_size in (1, 16, 64):
+        backend = create_ocr_backend({"onnx_batch_size": batch_size})
+        backend.recognize_batch(images[:batch_size])
+        start = time.perf_counter()
+        results = backend.recognize_batch(images)
+        elapsed = time.perf_counter() - start
+        assert len(results) == glyph_count
+        rows.append(
+            f"batch={batch_size:<3} {elapsed * 1000 / glyph_count:.3f} ms/glyph"
+        )
+    report(f"ONNX 字形 OCR（{glyph_count} 个字形）", rows)
+
+
+def test_zip_raw_copy_vs_recompress(tmp_path):
+    import zipfile
+
+    from python_backend.epub_archive import copy_zip_entry
+
+    source_path = tmp_path / "images.epub"
+    with zipfile.ZipFile(source_path, "w") as source:
+        for index in range(64):
+            source.writestr(
+                f"OEBPS/Images/{index}.png",
+                os.urandom(512 * 1024),
+                compress_type=zipfile.ZIP_DEFLATED,
+            )
+
+    rows = []
+    with zipfile.ZipFile(source_path) as source:
+        for label, copy in (
+            (
+                "recompress",
+                lambda info, target: target.writestr(
+                    info.filename, source.read(info), compress_type=zipfile.ZIP_DEFLATED
+                ),
+            ),
+            ("raw copy", lambda info, target: copy_zip_entry(source, info, target)),
+        ):
+            start = time.perf_counter()
+            with zipfile.ZipFile(tmp_path / f"{label}.epub", "w") as target:
+                for info in source.infolist():
+                    copy(info, target)
+            rows.append(f"{label:<10} {time.perf_counter() - start:.3f} s")
+    report("复制 64 个 512 KB 图片成员", rows)
+
+
+def test_shared_stylesheet_compile_cache(tmp_path):
+    import zipfile
+
+    from python_backend.services.font.encrypt_font import FontEncrypt
+
+    rules = "\n".join(
+        f".c{index} p > span.s{index} {{ font-family: serif; --v{index}: 1; }}"
+        for index in range(100)
+    )
+    epub_path = tmp_path / "book.epub"
+    with zipfile.ZipFile(epub_path, "w") as epub:
+        epub.writestr(
+            "OEBPS/Styles/main.css",
+            '@font-face { font-family: T; src: url("../Fonts/t.ttf"); }\n'
+            + rules
+            + "\n.body { font-family: T; }",
+        )
+        for index in range(300):
+            epub.writestr(
+                f"OEBPS/Text/{index}.xhtml",
+                '<html><head><link rel="stylesheet" href="../Styles/main.css"/></head>'
+                f'<body><p class="body">第{index}章</p></body></html>',
+            )
+        epub.writestr("OEBPS/Fonts/t.ttf", b"font")
+
+    rows = []
+    for label, shared in (("per document", False), ("shared", True)):
+        font_encrypt = FontEncrypt(str(epub_path), str(tmp_path), target_font_families=["T"])
+        if not shared:
+            compile_stylesheet = font_encrypt.compile_css_stylesheet
+
+            def compile_uncached(css_text, compile_stylesheet=compile_stylesheet):
+                font_encrypt._compiled_stylesheets = {}
+                return compile_stylesheet(css_text)
+
+            font_encrypt.compile_css_stylesheet = compile_uncached
+        font_encrypt.find_local_fonts_mapping()
+        start = time.perf_counter()
+        font_encrypt.find_selector_to_font_mapping()
+        rows.append(f"{label:<12} {time.perf_counter() - start:.3f} s")
+        font_encrypt.close_file()
+    report("300 章共用 main.css 的 CSS 规则收集", rows)
+
+
+def test_font_target_scan_cold_start_and_per_book_latency(tmp_path):
+    import subprocess
+    import sys
+    import zipfile
+
+    from python_backend.services.font.font_face_scanner import list_epub_font_families
+
+    css_text = "\n".join(
+        [f'@font-face {{ font-family: "F{index}"; src: url("../Fonts/f{index}.ttf"); }}' for index in range(8)]
+        + [f".c{index} {{ font-family: F{index % 8}, serif; margin: 0 }}" for index in range(2000)]
+    )
+    book_paths = []
+    for index in range(1000):
+        book_path = tmp_path / f"book{index}.epub"
+        with zipfile.ZipFile(book_path, "w", zipfile.ZIP_DEFLATED) as epub:
+            epub.writestr("OEBPS/Styles/main.css", css_text)
+            epub.writestr("OEBPS/Text/chapter.xhtml", "<html><body><p>正文</p></body></html>")
+            for font_index in range(8):
+                epub.writestr(f"OEBPS/Fonts/f{font_index}.ttf", b"font")
+        book_paths.append(str(book_path))
+
+    rows = []
+    for label, module in (
+        ("scanner", "python_backend.services.font.font_face_scanner"),
+        ("encrypt_font", "python_backend.services.font.encrypt_font"),
+    ):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+        rows.append(f"cold import {label:<13} {time.perf_counter() - start:.3f} s")
+
+    start = time.perf_counter()
+    for book_path in book_paths:
+        assert len(list_epub_font_families(book_path)["font_families"]) == 8
+    elapsed = time.perf_counter() - start
+    rows.append(f"scan 1000 books      {elapsed:.3f} s ({elapsed:.3f} ms/book)")
+    report("字体 family 扫描", rows)
+
+
+def test_chinese_conversion_throughput(tmp_path):
+    import random
+
+    import opencc
+
+    from python_backend.services.text.conversion_engine import (
+        compile_conversion_engine,
+        read_conversion_snapshot,
+        read_conversion_sources,
+        resolve_opencc_data_dir,
+        write_conversion_snapshot,
+    )
+
+    dictionary_dir = resolve_opencc_data_dir() / "dictionary"
+    with (dictionary_dir / "STPhrases.txt").open(encoding="utf-8") as file:
+        phrases = [line.split("\t", 1)[0] for line in file]
+    with (dictionary_dir / "STCharacters.txt").open(encoding="utf-8") as file:
+        characters = [line.split("\t", 1)[0] for line in file]
+    rng = random.Random(0)
+    segments = []
+    for index in range(3000):
+        words = [
+            rng.choice(phrases) if rng.random() < 0.2 else rng.choice(characters) + "的"
+            for _ in range(rng.randint(20, 80))
+        ]
+        sentence = "".join(words)
+        segments.append(f"{sentence[:30]}，{sentence[30:]}。")
+        if index % 20 == 0:
+            segments.append(f"第{index // 20}章 天下大势")
+    total_chars = sum(len(segment) for segment in segments)
+
+    rows = []
+    converter = opencc.OpenCC("s2t")
+    start = time.perf_counter()
+    expected = [converter.convert(segment) for segment in segments]
+    elapsed = time.perf_counter() - start
+    rows.append(f"OpenCC.convert 逐片段 {total_chars / elapsed:12,.0f} chars/s")
+
+    start = time.perf_counter()
+    engine = compile_conversion_engine("s2t")
+    rows.append(f"编译词典               {time.perf_counter() - start:.3f} s")
+    _groups, fingerprint = read_conversion_sources("s2t")
+    snapshot_path = tmp_path / "s2t.snapshot"
+    write_conversion_snapshot(engine, snapshot_path, fingerprint)
+    start = time.perf_counter()
+    assert read_conversion_snapshot(snapshot_path, fingerprint) is not None
+    rows.append(f"加载快照               {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    assert engine.convert_many(segments) == expected
+    elapsed = time.perf_counter() - start
+    rows.append(f"转换引擎 单次批量     {total_chars / elapsed:12,.0f} chars/s")
+    report(f"简繁转换吞吐（{total_chars} 字）", rows)
+
+
+def build_synthetic_manifest_epub(epub_path, item_count):
+    """生成含 ``item_count`` 个 manifest 项的 EPUB；图片按 100 个一组重名。"""
+    import zipfile
+
+    chapter_count = max(1, item_count // 20)
+    items = []
+    members = []
+    for index in range(chapter_count):
+        items.append(
+            f'<item id="c{index}" href="Text/c{index}.xhtml" media-type="application/xhtml+xml"/>'
+        )
+        members.append((f"OEBPS/Text/c{index}.xhtml", b"<html><body><p>x</p></body></html>"))
+    for index in range(item_count - chapter_count):
+        href = f"Images/d{index % 100}/p{index // 100}.png"
+        items.append(f'<item id="i{index}" href="{href}" media-type="image/png"/>')
+        members.append((f"OEBPS/{href}", b"png"))
+    spine = "".join(f'<itemref idref="c{index}"/>' for index in range(chapter_count))
+    with zipfile.ZipFile(epub_path, "w", zipfile.ZIP_STORED) as epub:
+        epub.writestr("mimetype", "application/epub+zip")
+        epub.writestr(
+            "META-INF/container.xml",
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+            'media-type="application/oebps-package+xml"/></rootfiles></container>',
+        )
+        epub.writestr(
+            "OEBPS/content.opf",
+            '<package version="3.0" xmlns="http://www.idpf.org/2007/opf"><metadata/>'
+            f"<manifest>{''.join(items)}</manifest><spine>{spine}</spine></package>",
+        )
+        for name, data in members:
+            epub.writestr(name, data)
+
+
+def test_epub_manifest_index_scaling(tmp_path):
+    from python_backend.services.epub.reformat_epub import EpubTool
+
+    rows = []
+    for item_count in (1_000, 10_000, 50_000):
+        epub_path = tmp_path / f"book_{item_count}.epub"
+        build_synthetic_manifest_epub(epub_path, item_count)
+        start = time.perf_counter()
+        tool = EpubTool(str(epub_path))
+        parsed = time.perf_counter() - start
+        tool.set_output_path(str(tmp_path))
+        start = time.perf_counter()
+        tool.restructure()
+        rewritten = time.perf_counter() - start
+        assert len(tool.manifest_list) == item_count
+        rows.append(
+            f"{item_count:>6} 项 解析 {parsed:7.3f} s  重写 {rewritten:7.3f} s  "
+            f"{(parsed + rewritten) * 1e6 / item_count:6.1f} us/项"
+        )
+    report("EPUB manifest 规模", rows)
+
+
+def test_link_rewrite_throughput():
+    import random
+
+    from test_link_rewriter import (
+        POLICIES,
+        XHTML_REFERENCES,
+        LegacyRewriteEngine,
+        build_engine,
+    )
+    from python_backend.services.epub.rewrite_engine import EpubRewriteEngine
+
+    rng = random.Random(0)
+    paragraphs = []
+    for index in range(20_000):
+        paragraphs.append(
+            f'<p class="p{index % 7}" id="p{index}">{"正文内容" * rng.randint(10, 60)}</p>'
+        )
+        if index % 10 == 0:
+            paragraphs.append(f'<img src="{rng.choice(XHTML_REFERENCES)}" alt=""/>')
+        if index % 25 == 0:
+            paragraphs.append(f'<a href="{rng.choice(XHTML_REFERENCES)}">注</a>')
+    chapter = (
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+        '<link href="../Styles/main.css" rel="stylesheet" type="text/css"/></head><body>'
+        + "\n".join(paragraphs)
+        + "</body></html>"
+    )
+    megabytes = len(chapter.encode("utf-8")) / 1024 / 1024
+
+    rows = []
+    outputs = []
+    for label, engine_type in (("逐趟正则", LegacyRewriteEngine), ("按标签扫描", EpubRewriteEngine)):
+        engine = build_engine(engine_type, POLICIES[1])
+        start = time.perf_counter()
+        output = engine._rewrite_xhtml(chapter, "OEBPS/Text/c1.xhtml")
+        outputs.append(output[0] if isinstance(output, tuple) else output)
+        elapsed = time.perf_counter() - start
+        rows.append(f"{label} {megabytes / elapsed:8.1f} MB/s")
+    assert outputs[0] == outputs[1]
+    report(f"XHTML 链接改写（{megabytes:.1f} MB 章节）", rows)
+
+
+def test_reformat_rewrite_workers(tmp_path):
+    import zipfile
+
+    from python_backend.services.epub.reformat_epub import run
+
+    epub_path = tmp_path / "book.epub"
+    chapter_count = 200
+    body = "\n".join(
+        f'<p id="p{index}">{"正文内容" * 40}</p><img src="../Images/pic.png" alt=""/>'
+        for index in range(300)
+    )
+    items = "".join(
+        f'<item id="c{index}" href="Text/c{index}.xhtml" media-type="application/xhtml+xml"/>'
+        for index in range(chapter_count)
+    )
+    spine = "".join(f'<itemref idref="c{index}"/>' for index in range(chapter_count))
+    with zipfile.ZipFile(epub_path, "w", zipfile.ZIP_DEFLATED) as epub:
+        epub.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        epub.writestr(
+            "META-INF/container.xml",
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+            'media-type="application/oebps-package+xml"/></rootfiles></container>',
+        )
+        epub.writestr(
+            "OEBPS/content.opf",
+            '<package version="3.0" xmlns="http://www.idpf.org/2007/opf"><metadata/>'
+            f'<manifest>{items}<item id="pic" href="Images/pic.png" media-type="image/png"/>'
+            f"</manifest><spine>{spine}</spine></package>",
+        )
+        for index in range(chapter_count):
+            epub.writestr(
+                f"OEBPS/Text/c{index}.xhtml",
+                '<html xmlns="http://www.w3.org/1999/xhtml"><body>' + body + "</body></html>",
+            )
+        epub.writestr("OEBPS/Images/pic.png", b"png")
+
+    rows = []
+    outputs = []
+    for workers in (1, 2, 4):
+        output_dir = tmp_path / str(workers)
+        output_dir.mkdir()
+        start = time.perf_counter()
+        assert run(str(epub_path), str(output_dir), options={"rewrite_workers": workers}) == 0
+        elapsed = time.perf_counter() - start
+        with zipfile.ZipFile(output_dir / "book_reformat_epub.epub") as epub:
+            outputs.append([(name, epub.read(name)) for name in epub.namelist()])
+        rows.append(f"{workers} 线程 {elapsed:7.3f} s")
+    assert all(output == outputs[0] for output in outputs)
+    report(f"reformat_epub 文档改写（{chapter_count} 章）", rows)
+
+
+def test_reference_index_rewrite_touches_only_affected_documents():
+    from python_backend.epub_references import ReferenceIndex, rewrite_document
+
+    body = "\n".join(
+        f'<p id="p{index}" style="text-indent:2em">{"正文内容" * 30}</p>' for index in range(400)
+    )
+    members = {
+        f"OEBPS/Text/c{index}.xhtml": (
+            '<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+            '<link href="../Styles/main.css" rel="stylesheet"/></head><body>'
+            f'<img src="../Images/p{index}.jpg"/>{body}</body></html>'
+        ).encode("utf-8")
+        for index in range(300)
+    }
+    replacements = {"OEBPS/Images/p7.jpg": "OEBPS/Images/p7.webp"}
+
+    rows = []
+    full = dict(members)
+    start = time.perf_counter()
+    for name in list(full):
+        rewritten = rewrite_document(full[name], name, replacements)
+        if rewritten != full[name]:
+            full[name] = rewritten
+    rows.append(f"逐文档正则替换 {time.perf_counter() - start:7.3f} s")
+
+    indexed = dict(members)
+    start = time.perf_counter()
+    index = ReferenceIndex.build(indexed)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    changed = index.rewrite(indexed, replacements)
+    rows.append(f"建立引用索引 {built:7.3f} s  按索引改写 {time.perf_counter() - start:7.3f} s")
+    assert changed == ["OEBPS/Text/c7.xhtml"]
+    assert indexed == full
+    report(f"替换单张图片引用（{len(members)} 个文档）", rows)
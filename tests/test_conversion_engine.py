@@ -0,0 +1,140 @@
+import random
+
+import opencc
+import pytest
+
+from python_backend.services.text import chinese_convert
+from python_backend.services.text.conversion_engine import (
+    CompiledDictionary,
+    ConversionEngine,
+    load_conversion_engine,
+    resolve_opencc_data_dir,
+)
+
+
+def read_keys(file_name: str) -> list[str]:
+    path = resolve_opencc_data_dir() / "dictionary" / file_name
+    with path.open(encoding="utf-8") as file:
+        return [line.split("\t", 1)[0] for line in file]
+
+
+@pytest.mark.parametrize(
+    ("conversion", "phrase_file", "character_file"),
+    [
+        ("s2t", "STPhrases.txt", "STCharacters.txt"),
+        ("t2s", "TSPhrases.txt", "TSCharacters.txt"),
+    ],
+)
+def test_engine_matches_opencc_on_random_text(
+    conversion: str, phrase_file: str, character_file: str
+) -> None:
+    phrases = read_keys(phrase_file)
+    characters = read_keys(character_file)
+    fillers = ["，", "。", " ", "\n", "a1", "的", "了", "——", "「"]
+    rng = random.Random(20240601)
+    reference = opencc.OpenCC(conversion)
+    engine = load_conversion_engine(conversion)
+
+    samples = []
+    for _ in range(500):
+        pieces = []
+        for _ in range(rng.randint(1, 12)):
+            roll = rng.random()
+            pool = phrases if roll < 0.4 else characters if roll < 0.7 else fillers
+            pieces.append(rng.choice(pool))
+        text = "".join(pieces)
+        # 去掉首字制造跨词条边界的重叠匹配。
+        samples.append(text[1:] if rng.random() < 0.3 else text)
+
+    assert engine.convert_many(samples) == [reference.convert(sample) for sample in samples]
+
+
+def test_engine_prefers_longest_then_leftmost_phrase() -> None:
+    engine = ConversionEngine.from_chain(
+        [
+            [
+                CompiledDictionary.from_pairs({"ab": "X", "bcd": "Y", "cd": "Z"}),
+                CompiledDictionary.from_pairs({"a": "1", "e": "5"}),
+            ]
+        ]
+    )
+
+    assert engine.convert("abcde") == "1Y5"
+    assert engine.convert("abce") == "Xc5"
+
+
+def test_convert_many_preserves_segment_boundaries_and_memoizes() -> None:
+    engine = ConversionEngine.from_chain(
+        [[CompiledDictionary.from_pairs({"后": "後", "头发": "頭髮"})]]
+    )
+
+    assert engine.convert_many(["头", "发", "", "头发", "后 后", "abc"]) == [
+        "头",
+        "发",
+        "",
+        "頭髮",
+        "後 後",
+        "abc",
+    ]
+    # 不含可转换字符的片段直接放行，不进入缓存。
+    assert engine.memo == {"头": "头", "头发": "頭髮", "后": "後"}
+
+
+def test_convert_many_falls_back_per_segment_when_segments_contain_separator() -> None:
+    engine = ConversionEngine.from_chain([[CompiledDictionary.from_pairs({"后": "後"})]])
+
+    assert engine.convert_many(["后\x00后", "", "后"]) == ["後\x00後", "", "後"]
+    assert engine.convert("后\x00后") == "後\x00後"
+
+
+def test_chinese_convert_xml_batches_text_and_visible_attributes() -> None:
+    data = (
+        '<html><head><title>头发</title><style>.x{content:"头发"}</style></head>'
+        '<body><img alt="后面" src="后.png"/><p title="头发">后来</p></body></html>'
+    ).encode("utf-8")
+
+    converted, changed = chinese_convert._convert_xml(data, load_conversion_engine("s2t"))
+
+    assert changed
+    assert converted.decode("utf-8") == (
+        '<html><head><title>頭髮</title><style>.x{content:"头发"}</style></head>'
+        '<body><img alt="後面" src="后.png"/><p title="頭髮">後來</p></body></html>'
+    )
+
+
+def test_snapshot_round_trip_and_rejects_stale_fingerprint(tmp_path) -> None:
+    from python_backend.services.text import conversion_engine
+
+    _groups, fingerprint = conversion_engine.read_conversion_sources("t2s")
+    path = tmp_path / "t2s.snapshot"
+    conversion_engine.write_conversion_snapshot(
+        conversion_engine.compile_conversion_engine("t2s"), path, fingerprint
+    )
+
+    engine = conversion_engine.read_conversion_snapshot(path, fingerprint)
+    assert engine is not None
+    assert engine.convert("頭髮後來") == "头发后来"
+    assert conversion_engine.read_conversion_snapshot(path, "0" * 64) is None
+    path.write_bytes(path.read_bytes()[:100])
+    assert conversion_engine.read_conversion_snapshot(path, fingerprint) is None
+
+
+def test_load_engine_writes_snapshot_to_cache_dir_and_reuses_it(tmp_path, monkeypatch) -> None:
+    from python_backend.services.text import conversion_engine
+
+    monkeypatch.setenv(conversion_engine.SNAPSHOT_DIR_ENV, str(tmp_path))
+    monkeypatch.setattr(conversion_engine, "BUNDLED_SNAPSHOT_DIR", tmp_path / "missing")
+    monkeypatch.setattr(conversion_engine, "_ENGINES", {})
+
+    first = conversion_engine.load_conversion_engine("t2s")
+    assert (tmp_path / "t2s.snapshot").is_file()
+    assert conversion_engine.load_conversion_engine("t2s") is first
+
+    compiled = []
+    monkeypatch.setattr(conversion_engine, "_ENGINES", {})
+    monkeypatch.setattr(
+        conversion_engine, "compile_conversion_engine", lambda *args: compiled.append(args)
+    )
+    reloaded = conversion_engine.load_conversion_engine("t2s")
+    assert compiled == []
+    assert reloaded.convert("後來") == "后来"
@@ -2,6 +2,7 @@ import os
 import tempfile
 import unittest
 import zipfile
+from unittest import mock
 
 from python_backend.services.epub.encrypt_epub import EpubTool as EncryptEpubTool
 from python_backend.services.epub.encrypt_epub import run as run_encrypt
@@ -184,6 +185,32 @@ class EncryptDuokanSlimTest(unittest.TestCase):
 
             self.assertNotIn("~slim", filenames["f4_slim"])
 
+    def test_duplicate_check_forgets_reassigned_target_names(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epub_path = os.path.join(temp_dir, "book.epub")
+            build_safe_duokan_slim_epub(epub_path)
+            epub = EncryptEpubTool(epub_path)
+            epub.close_files()
+
+            def classify(create_target_href, on_item=None):
+                mime = "application/xhtml+xml"
+                create_target_href("c1", "Text/a.xhtml", mime)
+                # a.xhtml 改名后，c1 对应的目标名不再被占用。
+                create_target_href("c2", "Text/a.xhtml", mime)
+                create_target_href("c1", "Text/b.xhtml", mime)
+                create_target_href("c2", "Text/c.xhtml", mime)
+
+            epub.toc_rn = {}
+            epub._classify_manifest_resources = classify
+            epub._check_manifest_and_spine = lambda: None
+            with mock.patch("python_backend.services.epub.encrypt_epub.logger") as logger:
+                epub._configure_resources()
+
+            messages = [call.args[0] for call in logger.write.call_args_list]
+            self.assertEqual(
+                [message.endswith("重复") for message in messages], [False, False, False, True]
+            )
+
 
 class FragmentRewriteTest(unittest.TestCase):
     def assert_fragments_preserved(self, output_path):
@@ -243,3 +270,328 @@ class FragmentRewriteTest(unittest.TestCase):
             self.assert_fragments_preserved(
                 os.path.join(temp_dir, "book_reformat_epub.epub")
             )
+
+
+class ArchiveIndexTest(unittest.TestCase):
+    def test_name_allocator_matches_sequential_probing(self):
+        from python_backend.services.epub.task_base import NameAllocator
+
+        def probe(used, stem, suffix):
+            candidate = stem
+            index = 0
+            while candidate + suffix in used:
+                index += 1
+                candidate = f"{stem}_{index}"
+            used.append(candidate + suffix)
+            return candidate + suffix
+
+        requests = [("a", ".png"), ("a_1", ".png"), ("a", ".png"), ("a", ".jpg")]
+        requests += [("a", ".png")] * 3 + [("a_3", ".png"), ("a", ".png")]
+        allocator = NameAllocator(["a_2.png"])
+        used = ["a_2.png"]
+        for stem, suffix in requests:
+            self.assertEqual(allocator.allocate(stem, suffix), probe(used, stem, suffix))
+
+    def test_archive_index_is_case_insensitive_and_keeps_first_member(self):
+        from python_backend.services.epub.task_base import ArchiveIndex
+
+        index = ArchiveIndex(["OEBPS/Text/A.xhtml", "oebps/text/a.xhtml", "mimetype"])
+        self.assertIn("oebps/TEXT/a.XHTML", index)
+        self.assertNotIn("OEBPS/Text/b.xhtml", index)
+        self.assertEqual(index.resolve("oebps/text/a.xhtml"), "OEBPS/Text/A.xhtml")
+        self.assertEqual(len(index), 3)
+
+    def test_reformat_allocates_unique_names_for_colliding_basenames(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epub_path = os.path.join(temp_dir, "book.epub")
+            manifest = "\n".join(
+                f'<item id="img{index}" href="Images/d{index}/pic.png" media-type="image/png"/>'
+                for index in range(3)
+            )
+            with zipfile.ZipFile(epub_path, "w") as epub:
+                epub.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+                epub.writestr(
+                    "META-INF/container.xml",
+                    """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>""",
+                )
+                epub.writestr(
+                    "OEBPS/content.opf",
+                    f"""<?xml version="1.0" encoding="UTF-8"?>
+<package version="3.0" xmlns="http://www.idpf.org/2007/opf">
+  <metadata/>
+  <manifest>
+    {manifest}
+    <item id="chapter" href="Text/chapter.xhtml" media-type="application/xhtml+xml"/>
+    <item id="missing" href="Text/missing.xhtml" media-type="application/xhtml+xml"/>
+  </manifest>
+  <spine><itemref idref="chapter"/></spine>
+</package>""",
+                )
+                epub.writestr(
+                    "OEBPS/Text/chapter.xhtml",
+                    """<html xmlns="http://www.w3.org/1999/xhtml"><body>
+<img src="../images/D2/PIC.png"/>
+</body></html>""",
+                )
+                for index in range(3):
+                    epub.writestr(f"OEBPS/Images/d{index}/pic.png", f"image-{index}")
+                epub.writestr("OEBPS/Images/pic.png", b"orphan")
+
+            self.assertEqual(run_reformat(epub_path, temp_dir), 0)
+
+            with zipfile.ZipFile(os.path.join(temp_dir, "book_reformat_epub.epub")) as epub:
+                self.assertEqual(
+                    [
+                        epub.read(f"OEBPS/Images/{name}")
+                        for name in ("pic.png", "pic_1.png", "pic_2.png", "pic_3.png")
+                    ],
+                    [b"image-0", b"image-1", b"image-2", b"orphan"],
+                )
+                text = epub.read("OEBPS/Text/chapter.xhtml").decode("utf-8")
+                self.assertIn('src="../Images/pic_2.png"', text)
+                opf = epub.read("OEBPS/content.opf").decode("utf-8")
+                self.assertNotIn("missing.xhtml", opf)
+                self.assertIn('href="Images/pic_3.png"', opf)
+
+
+class ParallelRewriteTest(unittest.TestCase):
+    def build_multi_chapter_epub(self, epub_path, chapters=12):
+        manifest = "\n".join(
+            f'<item id="c{index}" href="Text/c{index}.xhtml" media-type="application/xhtml+xml"/>'
+            for index in range(chapters)
+        )
+        spine = "".join(f'<itemref idref="c{index}"/>' for index in range(chapters))
+        with zipfile.ZipFile(epub_path, "w") as epub:
+            epub.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+            epub.writestr(
+                "META-INF/container.xml",
+                """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>""",
+            )
+            epub.writestr(
+                "OEBPS/content.opf",
+                f"""<?xml version="1.0" encoding="UTF-8"?>
+<package version="3.0" xmlns="http://www.idpf.org/2007/opf">
+  <metadata/>
+  <manifest>
+    {manifest}
+    <item id="style" href="Styles/style.css" media-type="text/css"/>
+    <item id="image" href="Images/pic.png" media-type="image/png"/>
+  </manifest>
+  <spine>{spine}</spine>
+</package>""",
+            )
+            for index in range(chapters):
+                epub.writestr(
+                    f"OEBPS/Text/c{index}.xhtml",
+                    f"""<html xmlns="http://www.w3.org/1999/xhtml"><head>
+<link href="../Styles/style.css" rel="stylesheet"/>
+</head><body>
+<img src="../images/PIC.png"/>
+<img src="../Images/missing{index}.png"/>
+<a href="c{(index + 1) % chapters}.xhtml#top">next</a>
+{"<p>正文</p>" * 200}
+</body></html>""",
+                )
+            epub.writestr(
+                "OEBPS/Styles/style.css",
+                'body { background: url("../Images/pic.png"); }',
+            )
+            epub.writestr("OEBPS/Images/pic.png", b"image")
+
+    def read_archive(self, output_path):
+        with zipfile.ZipFile(output_path) as epub:
+            self.assertIsNone(epub.testzip())
+            return [(name, epub.read(name)) for name in epub.namelist()]
+
+    def test_parallel_rewrite_output_matches_sequential(self):
+        for task_name, run in (("reformat_epub", run_reformat), ("encrypt_epub", run_encrypt)):
+            with self.subTest(task=task_name), tempfile.TemporaryDirectory() as temp_dir:
+                epub_path = os.path.join(temp_dir, "book.epub")
+                self.build_multi_chapter_epub(epub_path)
+                outputs = []
+                for workers in (1, 4):
+                    output_dir = os.path.join(temp_dir, str(workers))
+                    os.mkdir(output_dir)
+                    self.assertEqual(
+                        run(epub_path, output_dir, options={"rewrite_workers": workers}), 0
+                    )
+                    outputs.append(
+                        self.read_archive(os.path.join(output_dir, f"book_{task_name}.epub"))
+                    )
+
+                self.assertEqual(outputs[0], outputs[1])
+
+
+class PruneUnreferencedTest(unittest.TestCase):
+    def build_epub(self, epub_path):
+        with zipfile.ZipFile(epub_path, "w") as epub:
+            epub.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+            epub.writestr(
+                "META-INF/container.xml",
+                """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>""",
+            )
+            epub.writestr(
+                "OEBPS/content.opf",
+                """<?xml version="1.0" encoding="UTF-8"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf">
+  <metadata><meta name="cover" content="cover"/></metadata>
+  <manifest>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="chapter" href="Text/chapter.xhtml" media-type="application/xhtml+xml"/>
+    <item id="note" href="Text/note.xhtml" media-type="application/xhtml+xml"/>
+    <item id="unused-text" href="Text/unused.xhtml" media-type="application/xhtml+xml"/>
+    <item id="style" href="Styles/style.css" media-type="text/css"/>
+    <item id="cover" href="Images/cover.jpg" media-type="image/jpeg"/>
+    <item id="used" href="Images/used.jpg" media-type="image/jpeg"/>
+    <item id="unused" href="Images/unused.jpg" media-type="image/jpeg"/>
+  </manifest>
+  <spine toc="ncx"><itemref idref="chapter"/></spine>
+</package>""",
+            )
+            epub.writestr(
+                "OEBPS/toc.ncx",
+                '<ncx><navMap><navPoint><content src="Text/chapter.xhtml"/></navPoint></navMap></ncx>',
+            )
+            epub.writestr(
+                "OEBPS/Text/chapter.xhtml",
+                """<html xmlns="http://www.w3.org/1999/xhtml"><head>
+<link href="../Styles/style.css" rel="stylesheet"/>
+</head><body><a href="note.xhtml#n1">note</a></body></html>""",
+            )
+            epub.writestr(
+                "OEBPS/Text/note.xhtml",
+                '<html xmlns="http://www.w3.org/1999/xhtml"><body><img src="../Images/used.jpg"/></body></html>',
+            )
+            epub.writestr(
+                "OEBPS/Text/unused.xhtml",
+                '<html xmlns="http://www.w3.org/1999/xhtml"><body><img src="../Images/unused.jpg"/></body></html>',
+            )
+            epub.writestr("OEBPS/Styles/style.css", "@font-face { src: url(../Fonts/font.ttf); }")
+            epub.writestr("OEBPS/Fonts/font.ttf", b"font")
+            epub.writestr("OEBPS/Fonts/orphan.otf", b"orphan-font")
+            for name in ("cover", "used", "unused", "orphan"):
+                epub.writestr(f"OEBPS/Images/{name}.jpg", name.encode())
+
+    def test_reformat_drops_unreachable_members_only_when_requested(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epub_path = os.path.join(temp_dir, "book.epub")
+            self.build_epub(epub_path)
+            outputs = {}
+            for prune in (False, True):
+                output_dir = os.path.join(temp_dir, str(prune))
+                os.mkdir(output_dir)
+                self.assertEqual(
+                    run_reformat(epub_path, output_dir, options={"prune_unreferenced": prune}), 0
+                )
+                with zipfile.ZipFile(os.path.join(output_dir, "book_reformat_epub.epub")) as epub:
+                    outputs[prune] = (
+                        set(epub.namelist()),
+                        epub.read("OEBPS/content.opf").decode("utf-8"),
+                    )
+
+        kept = {
+            "OEBPS/Text/chapter.xhtml",
+            "OEBPS/Text/note.xhtml",
+            "OEBPS/Styles/style.css",
+            "OEBPS/Fonts/font.ttf",
+            "OEBPS/Images/cover.jpg",
+            "OEBPS/Images/used.jpg",
+            "OEBPS/toc.ncx",
+        }
+        pruned = {
+            "OEBPS/Text/unused.xhtml",
+            "OEBPS/Fonts/orphan.otf",
+            "OEBPS/Images/unused.jpg",
+            "OEBPS/Images/orphan.jpg",
+        }
+        names, opf = outputs[False]
+        self.assertTrue(kept | pruned <= names)
+        names, opf = outputs[True]
+        self.assertTrue(kept <= names)
+        self.assertFalse(pruned & names)
+        self.assertNotIn("unused", opf)
+        self.assertNotIn("orphan", opf)
+        self.assertIn("font.ttf", opf)
+
+    def test_reformat_keeps_guide_fallback_and_loosely_linked_members(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epub_path = os.path.join(temp_dir, "book.epub")
+            with zipfile.ZipFile(epub_path, "w") as epub:
+                epub.writestr("mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+                epub.writestr(
+                    "META-INF/container.xml",
+                    '<container><rootfiles><rootfile full-path="OEBPS/content.opf"/></rootfiles></container>',
+                )
+                epub.writestr(
+                    "OEBPS/content.opf",
+                    """<?xml version="1.0" encoding="UTF-8"?>
+<package version="2.0" xmlns="http://www.idpf.org/2007/opf">
+  <metadata/>
+  <manifest>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="cover-page" href="Text/cover.xhtml" media-type="application/xhtml+xml"/>
+    <item id="chapter" href="Text/chapter.xhtml" media-type="application/xhtml+xml"/>
+    <item id="script" href="Misc/app.js" media-type="application/javascript"/>
+    <item id="svg" href="Images/pic.svg" media-type="image/svg+xml" fallback="svg-png"/>
+    <item id="svg-png" href="Images/pic.png" media-type="image/png"/>
+    <item id="unquoted" href="Images/unq.png" media-type="image/png"/>
+    <item id="scripted" href="Images/scripted.png" media-type="image/png"/>
+    <item id="unused" href="Images/unused.png" media-type="image/png"/>
+  </manifest>
+  <spine toc="ncx"><itemref idref="chapter"/></spine>
+  <guide><reference type="cover" title="封面" href="Text/cover.xhtml"/></guide>
+</package>""",
+                )
+                epub.writestr(
+                    "OEBPS/toc.ncx",
+                    '<ncx><navMap><navPoint><content src="Text/chapter.xhtml"/></navPoint></navMap></ncx>',
+                )
+                epub.writestr("OEBPS/Text/cover.xhtml", "<html><body><p>封面</p></body></html>")
+                epub.writestr(
+                    "OEBPS/Text/chapter.xhtml",
+                    """<html><head><script src="../Misc/app.js"></script></head><body>
+<object data="../Images/pic.svg" type="image/svg+xml"></object>
+<img src=../Images/unq.png alt=x></body></html>""",
+                )
+                epub.writestr("OEBPS/Misc/app.js", 'new Image().src = "../Images/" + "scripted.png";')
+                epub.writestr("OEBPS/Images/pic.svg", "<svg/>")
+                for name in ("pic", "unq", "scripted", "unused"):
+                    epub.writestr(f"OEBPS/Images/{name}.png", name.encode())
+            output_dir = os.path.join(temp_dir, "out")
+            os.mkdir(output_dir)
+
+            self.assertEqual(
+                run_reformat(epub_path, output_dir, options={"prune_unreferenced": True}), 0
+            )
+            with zipfile.ZipFile(os.path.join(output_dir, "book_reformat_epub.epub")) as epub:
+                names = set(epub.namelist())
+                opf = epub.read("OEBPS/content.opf").decode("utf-8")
+
+        for name in (
+            "OEBPS/Text/cover.xhtml",
+            "OEBPS/Images/pic.svg",
+            "OEBPS/Images/pic.png",
+            "OEBPS/Images/unq.png",
+            "OEBPS/Images/scripted.png",
+        ):
+            self.assertIn(name, names)
+        self.assertNotIn("OEBPS/Images/unused.png", names)
+        self.assertNotIn("unused", opf)
+        self.assertIn('id="svg-png"', opf)
+        self.assertIn("cover.xhtml", opf)
+
@@ -0,0 +1,97 @@
+import io
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from python_backend.epub_archive import DeflatedEntry, copy_zip_entry, write_deflated_entry
+
+
+class NonSeekableBuffer(io.RawIOBase):
+    def __init__(self) -> None:
+        self.buffer = io.BytesIO()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self.buffer.write(data)
+
+
+def test_copy_zip_entry_reuses_compressed_bytes_and_crc(tmp_path: Path) -> None:
+    source_path = tmp_path / "source.zip"
+    target_path = tmp_path / "target.zip"
+    payload = os.urandom(4096) + b"text" * 4096
+    with zipfile.ZipFile(source_path, "w") as source:
+        source.writestr("OEBPS/Fonts/a.ttf", payload, compress_type=zipfile.ZIP_DEFLATED)
+        source.writestr("OEBPS/Images/a.jpg", b"jpeg", compress_type=zipfile.ZIP_STORED)
+
+    with zipfile.ZipFile(source_path) as source, zipfile.ZipFile(target_path, "w") as target:
+        target.writestr("mimetype", b"application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        assert copy_zip_entry(source, "OEBPS/Fonts/a.ttf", target, "OEBPS/Fonts/b.ttf")
+        assert copy_zip_entry(source, source.getinfo("OEBPS/Images/a.jpg"), target)
+        target.writestr("OEBPS/after.txt", b"after")
+        with pytest.raises(KeyError):
+            copy_zip_entry(source, "missing", target)
+        source_info = source.getinfo("OEBPS/Fonts/a.ttf")
+
+    with zipfile.ZipFile(target_path) as target:
+        assert target.testzip() is None
+        assert target.namelist() == [
+            "mimetype",
+            "OEBPS/Fonts/b.ttf",
+            "OEBPS/Images/a.jpg",
+            "OEBPS/after.txt",
+        ]
+        copied = target.getinfo("OEBPS/Fonts/b.ttf")
+        assert (copied.CRC, copied.compress_size) == (source_info.CRC, source_info.compress_size)
+        assert target.read("OEBPS/Fonts/b.ttf") == payload
+        assert target.getinfo("OEBPS/Images/a.jpg").compress_type == zipfile.ZIP_STORED
+
+
+def test_copy_zip_entry_handles_data_descriptors_and_recompresses_other_methods(
+    tmp_path: Path,
+) -> None:
+    stream = NonSeekableBuffer()
+    with zipfile.ZipFile(stream, "w") as source:
+        source.writestr("streamed.txt", b"streamed" * 100, compress_type=zipfile.ZIP_DEFLATED)
+        source.writestr("bzip.txt", b"bzip" * 100, compress_type=zipfile.ZIP_BZIP2)
+    target_path = tmp_path / "target.zip"
+
+    with zipfile.ZipFile(io.BytesIO(stream.buffer.getvalue())) as source:
+        assert source.getinfo("streamed.txt").flag_bits & 0x08
+        with zipfile.ZipFile(target_path, "w") as target:
+            assert copy_zip_entry(source, "streamed.txt", target)
+            assert not copy_zip_entry(source, "bzip.txt", target)
+
+    with zipfile.ZipFile(target_path) as target:
+        assert target.testzip() is None
+        assert target.read("streamed.txt") == b"streamed" * 100
+        assert target.getinfo("bzip.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert target.read("bzip.txt") == b"bzip" * 100
+
+
+def test_write_deflated_entry_matches_writestr_and_falls_back_when_streaming(
+    tmp_path: Path,
+) -> None:
+    payload = "正文".encode("utf-8") * 5000
+    entry = DeflatedEntry.compress(payload)
+    target_path = tmp_path / "target.zip"
+    with zipfile.ZipFile(target_path, "w") as target:
+        target.writestr("a.xhtml", payload, compress_type=zipfile.ZIP_DEFLATED)
+        assert write_deflated_entry(target, "b.xhtml", entry)
+        target.writestr("c.txt", b"after")
+
+    with zipfile.ZipFile(target_path) as target:
+        assert target.testzip() is None
+        written, expected = target.getinfo("b.xhtml"), target.getinfo("a.xhtml")
+        assert (written.CRC, written.compress_size) == (expected.CRC, expected.compress_size)
+        assert target.read("b.xhtml") == payload
+        assert target.namelist() == ["a.xhtml", "b.xhtml", "c.txt"]
+
+    stream = NonSeekableBuffer()
+    with zipfile.ZipFile(stream, "w") as target:
+        assert not write_deflated_entry(target, "b.xhtml", entry)
+    with zipfile.ZipFile(io.BytesIO(stream.buffer.getvalue())) as target:
+        assert target.read("b.xhtml") == payload
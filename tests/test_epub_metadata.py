@@ -12,7 +12,9 @@ from python_backend.epub_metadata import (
     TOOL_META_NAME,
     add_tool_meta_to_opf,
     mark_epub_generated_by_tool,
+    mark_opf_bytes_generated_by_tool,
 )
+from python_backend.epub_workspace import EpubWorkspace
 from python_backend.protocol import TaskEvent, TaskRequest
 from python_backend.task_runner import JsonLineEmitter
 
@@ -116,6 +118,49 @@ class EpubMetadataTest(unittest.TestCase):
             with zipfile.ZipFile(epub_path) as epub:
                 self.assertEqual(epub.namelist().count("OEBPS/content.opf"), 1)
 
+    def test_mark_epub_generated_by_tool_raw_copies_other_members(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            epub_path = os.path.join(temp_dir, "book.epub")
+            build_minimal_epub(
+                epub_path,
+                """<package version="3.0" xmlns="http://www.idpf.org/2007/opf"><metadata/></package>""",
+            )
+            with zipfile.ZipFile(epub_path, "a") as epub:
+                epub.writestr("OEBPS/font.ttf", os.urandom(2048), zipfile.ZIP_DEFLATED)
+            with zipfile.ZipFile(epub_path) as epub:
+                before = epub.getinfo("OEBPS/font.ttf")
+
+            self.assertTrue(mark_epub_generated_by_tool(epub_path))
+
+            with zipfile.ZipFile(epub_path) as epub:
+                after = epub.getinfo("OEBPS/font.ttf")
+                self.assertIsNone(epub.testzip())
+            self.assertEqual(
+                (after.CRC, after.compress_size, after.date_time),
+                (before.CRC, before.compress_size, before.date_time),
+            )
+
+    def test_workspace_write_injects_tool_meta_so_finalizer_skips_rezip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = os.path.join(temp_dir, "book.epub")
+            output_path = os.path.join(temp_dir, "output.epub")
+            build_minimal_epub(
+                source_path,
+                """<package version="3.0" xmlns="http://www.idpf.org/2007/opf"><metadata/></package>""",
+            )
+
+            with EpubWorkspace.load(source_path, lazy=True) as workspace:
+                workspace.write(output_path)
+
+            self.assertIn(f'name="{TOOL_META_NAME}"', read_opf(output_path))
+            self.assertFalse(mark_epub_generated_by_tool(output_path))
+
+    def test_mark_opf_bytes_keeps_marked_or_unmarkable_opf_unchanged(self):
+        marked = add_tool_meta_to_opf("<package><metadata/></package>")[0].encode("utf-8")
+
+        self.assertIs(mark_opf_bytes_generated_by_tool(marked), marked)
+        self.assertEqual(mark_opf_bytes_generated_by_tool(b"<broken/>"), b"<broken/>")
+
     def test_task_runner_marks_successful_output_epub(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             input_path = Path(temp_dir) / "book.epub"
@@ -0,0 +1,181 @@
+import random
+
+from python_backend.epub_references import (
+    ReferenceIndex,
+    rewrite_document,
+    scan_references,
+    unreachable_members,
+)
+
+REFERENCES = [
+    "../Images/a.png",
+    "../Images/a.png?v=1#hero",
+    "../Images/b%20c.jpg",
+    "../Images/图.png",
+    "../Images/d.webp",
+    "../Styles/s.css",
+    "chapter2.xhtml#note",
+    "https://example.com/a.png",
+    "data:image/png;base64,AAAA",
+    "#local",
+    "../../outside.png",
+]
+TEMPLATES = [
+    '<img src="{0}" alt="图"/>',
+    "<img class='c' src='{0}'/>",
+    '<a href="{0}">注</a>',
+    '<image xlink:href="{0}" width="1"/>',
+    '<video poster="{0}" src="{1}"></video>',
+    '<img srcset="{0} 1x, {1} 2x" src="{2}"/>',
+    '<img srcset="{0} 100w,{1}"/>',
+    '<div style="background:url({0})">',
+    "<p style=\"background: url('{0}')\">正文</p>",
+    '<img src="url({0})"/>',
+    '<IMG SRC="{0}" data-src="{1}" xsrc="{2}"/>',
+    "<img SrcSet='{0} 2x' Poster = '{1}'/>",
+    '<p style="background:URL( \'{0}\' )">',
+    "<img asrcset='{0} 1x, {1}'/><a xlink:href=\"{2}\">x</a>",
+    "<p>没有引用的段落</p>",
+]
+MEMBERS = [
+    "OEBPS/Images/a.png",
+    "OEBPS/Images/b c.jpg",
+    "OEBPS/Images/图.png",
+    "OEBPS/Images/d.webp",
+    "OEBPS/Styles/s.css",
+]
+
+
+def random_document(rng: random.Random) -> bytes:
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        template = rng.choice(TEMPLATES)
+        parts.append(template.format(*(rng.choice(REFERENCES) for _ in range(3))))
+        parts.append(rng.choice(["\n", " ", ""]))
+    return "".join(parts).encode("utf-8")
+
+
+def test_index_rewrite_matches_full_document_rewrite() -> None:
+    rng = random.Random(24)
+    for _ in range(200):
+        members = {
+            f"OEBPS/Text/c{index}.xhtml": random_document(rng) for index in range(5)
+        }
+        replacements = {
+            source: source.rsplit(".", 1)[0] + rng.choice([".webp", "-2.jpg", " new.png"])
+            for source in rng.sample(MEMBERS, rng.randint(1, 3))
+        }
+        original = dict(members)
+        expected = {
+            name: rewrite_document(data, name, replacements) for name, data in members.items()
+        }
+        index = ReferenceIndex.build(members)
+
+        changed = index.rewrite(members, replacements)
+
+        assert members == expected
+        assert changed == [name for name in members if expected[name] != original[name]]
+        assert index.outgoing == ReferenceIndex.build(members).outgoing
+
+
+def test_index_records_attributes_spans_and_reverse_references() -> None:
+    chapter = (
+        '<img src="../Images/a.png"/><img srcset="../Images/图.png 1x, ../Images/a.png 2x"/>'
+        "<p style=\"background:url('../Images/d.webp')\"/><a href=\"https://example.com/\">x</a>"
+    ).encode("utf-8")
+    members = {
+        "OEBPS/Text/c1.xhtml": chapter,
+        "OEBPS/Styles/s.css": b"p { background: url(../Images/a.png); }",
+        "OEBPS/Images/a.png": b"png",
+    }
+    index = ReferenceIndex.build(members)
+
+    references = index.references_from("OEBPS/Text/c1.xhtml")
+    assert [(reference.attribute, reference.target) for reference in references] == [
+        ("src", "OEBPS/Images/a.png"),
+        ("srcset", "OEBPS/Images/图.png"),
+        ("srcset", "OEBPS/Images/a.png"),
+        ("url", "OEBPS/Images/d.webp"),
+    ]
+    for reference in references:
+        assert chapter[reference.start : reference.end].decode("utf-8").endswith(
+            reference.target.rsplit("/", 1)[1]
+        )
+    assert [reference.source for reference in index.references_to("OEBPS/Images/a.png")] == [
+        "OEBPS/Text/c1.xhtml",
+        "OEBPS/Text/c1.xhtml",
+        "OEBPS/Styles/s.css",
+    ]
+    assert index.referencing_documents(["OEBPS/Images/d.webp"]) == ["OEBPS/Text/c1.xhtml"]
+    assert "OEBPS/Images/a.png" not in index.outgoing
+
+    assert index.rewrite(members, {"OEBPS/Images/d.webp": "OEBPS/Images/d.jpg"}) == [
+        "OEBPS/Text/c1.xhtml"
+    ]
+    assert b"url('../Images/d.jpg')" in members["OEBPS/Text/c1.xhtml"]
+    assert index.referencing_documents(["OEBPS/Images/d.webp"]) == []
+    assert index.referencing_documents(["OEBPS/Images/d.jpg"]) == ["OEBPS/Text/c1.xhtml"]
+
+    index.discard("OEBPS/Styles/s.css")
+    assert index.referencing_documents(["OEBPS/Images/a.png"]) == ["OEBPS/Text/c1.xhtml"]
+
+
+def test_overlapping_references_fall_back_to_full_rewrite() -> None:
+    members = {"OEBPS/Text/c1.xhtml": b'<img src="url(../Images/a.png)"/>'}
+    index = ReferenceIndex.build(members)
+    assert scan_references(members["OEBPS/Text/c1.xhtml"], "OEBPS/Text/c1.xhtml")
+    assert "OEBPS/Text/c1.xhtml" in index.overlapping
+    replacements = {"OEBPS/Images/a.png": "OEBPS/Images/a.webp"}
+    expected = rewrite_document(members["OEBPS/Text/c1.xhtml"], "OEBPS/Text/c1.xhtml", replacements)
+
+    index.rewrite(members, replacements)
+
+    assert members["OEBPS/Text/c1.xhtml"] == expected
+
+
+def test_unreachable_members_follow_imports_and_ignore_case() -> None:
+    members = {
+        "OEBPS/Text/c1.xhtml": b'<link href="../Styles/A.css" rel="stylesheet"/>',
+        "OEBPS/Text/orphan.xhtml": b'<img src="../Images/orphan.png"/>',
+        "OEBPS/Styles/a.css": b'@import "b.css";',
+        "OEBPS/Styles/b.css": b"@font-face { src: url(../Fonts/f.ttf); }",
+        "OEBPS/Fonts/f.ttf": b"font",
+        "OEBPS/Images/orphan.png": b"png",
+        "OEBPS/Misc/s.js": b"",
+        "OEBPS/toc.ncx": b'<content src="Text/c1.xhtml"/>',
+    }
+    index = ReferenceIndex.build(members)
+
+    assert unreachable_members(members, [], index, members) == [
+        "OEBPS/Text/orphan.xhtml",
+        "OEBPS/Images/orphan.png",
+    ]
+    assert [reference.attribute for reference in index.references_from("OEBPS/Styles/a.css")] == [
+        "import"
+    ]
+    assert index.rewrite(members, {"OEBPS/Styles/b.css": "OEBPS/Styles/c.css"}) == []
+
+
+
+def test_unreachable_members_keep_loosely_linked_members() -> None:
+    members = {
+        "OEBPS/Text/c1.xhtml": (
+            b'<object data="../Images/a.svg"></object><img src=../Images/b.png alt=b>'
+            b"<script>show('c%20d.png')</script>"
+        ),
+        "OEBPS/Misc/app.js": "preload(['图.png', 'e f.jpg'])".encode("utf-8"),
+        "OEBPS/Images/a.svg": b"<svg/>",
+        "OEBPS/Images/b.png": b"png",
+        "OEBPS/Images/c d.png": b"png",
+        "OEBPS/Images/图.png": b"png",
+        "OEBPS/Images/e f.jpg": b"jpg",
+        "OEBPS/Images/orphan.png": b"png",
+        "OEBPS/Images/data.png": b"png",
+    }
+    index = ReferenceIndex.build(members)
+
+    assert unreachable_members(members, ["OEBPS/Text/c1.xhtml"], index, members) == [
+        "OEBPS/Images/orphan.png",
+        "OEBPS/Images/data.png",
+    ]
+    assert index.references_from("OEBPS/Text/c1.xhtml") == []
@@ -5,11 +5,13 @@ import zipfile
 from io import BytesIO
 from pathlib import Path
 from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 from bs4 import BeautifulSoup
 from fontTools.fontBuilder import FontBuilder
 from fontTools.pens.ttGlyphPen import TTGlyphPen
 from fontTools.ttLib import TTFont
+from tinycss2 import parse_stylesheet
 
 from python_backend.services.font.encrypt_font import (
     FONT_OBFUSCATION_ASCII_ALNUM_CODEPOINTS,
@@ -1661,6 +1663,101 @@ class FontEncryptObfuscationPolicyTest(unittest.TestCase):
                 )
             )
 
+    def test_shared_stylesheet_is_compiled_once_and_replayed_per_document(self):
+        with TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            epub_path = temp_path / "book.epub"
+            with zipfile.ZipFile(epub_path, "w") as epub:
+                epub.writestr(
+                    "OEBPS/Styles/style.css",
+                    """@font-face { font-family: TargetFont; src: url("../Fonts/target.ttf"); }
+@layer {
+  .target { font-family: serif; }
+}
+.target { font-family: TargetFont; }""",
+                )
+                for index in range(3):
+                    epub.writestr(
+                        f"OEBPS/Text/chapter{index}.xhtml",
+                        """<html><head><link rel="stylesheet" href="../Styles/style.css"/></head><body>
+<p class="target">甲乙</p>
+</body></html>""",
+                    )
+                epub.writestr("OEBPS/Fonts/target.ttf", b"target-font")
+
+            font_encrypt = FontEncrypt(
+                str(epub_path),
+                str(temp_path),
+                target_font_families=["TargetFont"],
+            )
+            with patch(
+                "tinycss2.parse_stylesheet",
+                wraps=parse_stylesheet,
+            ) as parse_mock:
+                font_encrypt.get_mapping()
+            font_encrypt.close_file()
+
+            self.assertEqual(parse_mock.call_count, 1)
+            self.assertEqual(
+                font_encrypt.font_to_char_mapping["OEBPS/Fonts/target.ttf"],
+                "甲乙",
+            )
+            layer_orders = [
+                rule["layer_order"]
+                for rule in font_encrypt.css_selector_font_rules
+                if rule["font_file"] is None
+            ]
+            self.assertEqual(len(layer_orders), 3)
+            self.assertEqual(len(set(layer_orders)), 3)
+            self.assertEqual(
+                [rule["order"] for rule in font_encrypt.css_selector_font_rules],
+                list(range(1, 7)),
+            )
+
+    def test_document_cache_parses_each_xhtml_once_across_phases(self):
+        with TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            epub_path = temp_path / "book.epub"
+            with zipfile.ZipFile(epub_path, "w") as epub:
+                epub.writestr(
+                    "OEBPS/style.css",
+                    """@font-face { font-family: "TestFont"; src: url("Fonts/TestFont.ttf"); }
+.body { font-family: "TestFont"; }""",
+                )
+                for name in ("one", "two"):
+                    epub.writestr(
+                        f"OEBPS/{name}.xhtml",
+                        """<html><head><link rel="stylesheet" href="style.css"/>
+<style>.note::after { content: "&lt;"; }</style></head>
+<body><p class="body">你&lt;好&gt;</p></body></html>""",
+                    )
+                epub.writestr("OEBPS/Fonts/TestFont.ttf", build_test_font_bytes())
+
+            results = {}
+            for budget in (None, 0):
+                font_encrypt = FontEncrypt(
+                    str(epub_path),
+                    str(temp_path),
+                    target_font_families=["TestFont"],
+                    document_cache_mb=budget,
+                )
+                font_encrypt.get_mapping()
+                char_mapping = dict(font_encrypt.font_to_char_mapping)
+                font_encrypt.clean_text()
+                font_encrypt.encrypt_font()
+                font_encrypt.read_html()
+                with zipfile.ZipFile(temp_path / "book_encrypt_font.epub") as output_epub:
+                    html = output_epub.read("OEBPS/one.xhtml").decode("utf-8")
+                results[budget] = (font_encrypt.get_document_cache().parses, char_mapping, html)
+
+            self.assertEqual(results[None][0], 2)
+            self.assertEqual(results[0][0], 6)
+            self.assertEqual(results[None][1], results[0][1])
+            self.assertEqual(results[None][1]["OEBPS/Fonts/TestFont.ttf"], "你<好>")
+            for _, _, html in results.values():
+                self.assertIn('content: "&lt;"', html)
+                self.assertRegex(html, r'<p class="body">.&lt;.&gt;</p>')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,101 @@
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from tinycss2 import parse_declaration_list, parse_stylesheet, serialize
+
+from python_backend.services.font.font_face_scanner import (
+    list_epub_font_families,
+    scan_css_font_faces,
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def tinycss2_font_faces(css_text):
+    """与旧实现一致的 tinycss2 参考结果。"""
+    results = []
+    for rule in parse_stylesheet(css_text):
+        if rule.type != "at-rule" or rule.lower_at_keyword != "font-face":
+            continue
+        font_family = None
+        src_value = None
+        for declaration in parse_declaration_list(rule.content):
+            if declaration.type != "declaration":
+                continue
+            if declaration.lower_name == "font-family":
+                values = [
+                    token.value
+                    for token in declaration.value
+                    if token.type in ("string", "ident")
+                ]
+                if values:
+                    font_family = " ".join(values).strip().strip("'\"")
+            elif declaration.lower_name == "src":
+                src_value = serialize(declaration.value)
+        if font_family and src_value:
+            results.append((font_family, src_value))
+    return results
+
+
+@pytest.mark.parametrize("css_text", [
+    '@font-face { font-family: "My Font", serif; src: url("../Fonts/a.ttf?v=1#x") format("truetype"); }',
+    "/* @font-face { font-family: Hidden; src: url(h.ttf) } */ @font-face{font-family:Kai\\54 i !important;src:local(x),url(b.otf)}",
+    "@media screen { @font-face { font-family: Nested; src: url(n.ttf); } } a[title='@font-face{'] { color: red }",
+    "@charset 'utf-8'; @import url(a.css) screen; @FONT-FACE { font-family: 12px Bad; src: url(c.ttf) }",
+    '@font-face { font-family: "A"; font-family: ""; src: url(d.ttf) }',
+    "@font-face { font-family: 'Q\\'uote', \"x\\\ny\"; src: url(e.ttf) }",
+    "@font-face { font-family: --var #hash 方正 -x; src: url(f.ttf) } @font-face { font-family: NoSrc; }",
+    '@font-face { font-family: ZZ; src: url("/*not a comment*/g.ttf"); unicode-range: U+4E00-9FFF }',
+    "@font-face { font-family: Unclosed; src: url(u.ttf)",
+])
+def test_scan_css_font_faces_matches_tinycss2(css_text):
+    expected = tinycss2_font_faces(css_text)
+    actual = list(scan_css_font_faces(css_text))
+
+    assert [family for family, _ in actual] == [family for family, _ in expected]
+    for (_, actual_src), (_, expected_src) in zip(actual, expected):
+        assert actual_src.replace("'", '"') == expected_src.strip().replace("'", '"')
+
+
+def test_list_epub_font_families_matches_font_files(tmp_path):
+    epub_path = tmp_path / "book.epub"
+    with zipfile.ZipFile(epub_path, "w") as epub:
+        epub.writestr(
+            "OEBPS/Styles/style.css",
+            """@font-face { font-family: "Kai"; src: url("../Fonts/kai.woff2?v=2"); }
+@font-face { font-family: Missing; src: url(../Fonts/missing.ttf); }
+@font-face { font-family: "Alpha Song"; src: local(x), url(../Fonts/Song.TTF#a); }""",
+        )
+        epub.writestr("OEBPS/Styles/plain.css", "p { font-family: Kai; }")
+        epub.writestr("OEBPS/Fonts/kai.woff2", b"font")
+        epub.writestr("OEBPS/Fonts/song.ttf", b"font")
+
+    assert list_epub_font_families(str(epub_path)) == {
+        "font_families": ["Alpha Song", "Kai"],
+    }
+
+
+def test_list_font_targets_does_not_import_font_processing_modules(tmp_path):
+    epub_path = tmp_path / "book.epub"
+    with zipfile.ZipFile(epub_path, "w") as epub:
+        epub.writestr("style.css", '@font-face { font-family: T; src: url(t.ttf); }')
+        epub.writestr("t.ttf", b"font")
+    script = (
+        "import sys\n"
+        "from python_backend.task_runner import list_font_targets\n"
+        f"print(list_font_targets({str(epub_path)!r})['font_families'])\n"
+        "print(sorted(name for name in ('tinycss2', 'cssselect2', 'fontTools', 'bs4') if name in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+        env={"EPUB_TOOL_LOG_PATH": str(tmp_path / "log.txt"), "PATH": ""},
+    ).stdout.splitlines()
+
+    assert output == ["['T']", "[]"]
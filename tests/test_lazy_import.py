@@ -0,0 +1,57 @@
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from python_backend.services.utils.lazy_import import LazyModule, load_lazy_modules
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("bs4", "cssselect2", "tinycss2", "fontTools", "PIL", "opencc")
+
+
+def test_lazy_module_replaces_global_binding_on_first_use() -> None:
+    namespace: dict[str, object] = {}
+    namespace["json"] = LazyModule("json", namespace)
+
+    assert namespace["json"].dumps([1]) == "[1]"
+    assert namespace["json"] is sys.modules["json"]
+
+
+def test_load_lazy_modules_loads_every_placeholder() -> None:
+    namespace: dict[str, object] = {}
+    namespace["decoder"] = LazyModule("json.decoder", namespace)
+    namespace["other"] = SimpleNamespace()
+
+    load_lazy_modules(namespace)
+
+    assert namespace["decoder"] is sys.modules["json.decoder"]
+
+
+@pytest.mark.parametrize(
+    "module_path",
+    [
+        "python_backend.services.font.decrypt_font",
+        "python_backend.services.font.encrypt_font",
+        "python_backend.services.image.image_compress",
+        "python_backend.services.image.replace_cover",
+        "python_backend.services.text.chinese_convert",
+    ],
+)
+def test_service_modules_defer_heavy_dependencies(module_path: str, tmp_path: Path) -> None:
+    script = (
+        "import sys\n"
+        f"import {module_path}\n"
+        f"print(sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+        env={"EPUB_TOOL_LOG_PATH": str(tmp_path / "log.txt"), "PATH": ""},
+    ).stdout.strip()
+
+    assert output == "[]"
@@ -0,0 +1,303 @@
+"""按标签扫描的链接改写与原逐属性正则替换的差分测试。"""
+
+import random
+import re
+from os import path
+from types import SimpleNamespace
+
+import pytest
+
+from python_backend.services.epub.rewrite_engine import (
+    FONT_EXTENSIONS,
+    HREF_IMAGE_EXTENSIONS,
+    IMAGE_EXTENSIONS,
+    EpubRewriteEngine,
+    RewritePolicy,
+)
+from python_backend.services.epub.task_base import split_file_reference
+
+
+class LegacyRewriteEngine(EpubRewriteEngine):
+    """改为按标签扫描之前的逐属性正则实现，作为差分参照。"""
+
+    def _rewrite_xhtml(self, text: str, source_path: str) -> str:
+        def rewrite_href(match: re.Match[str]) -> str:
+            reference, fragment = split_file_reference(match.group(3))
+            book_path = self._resolve_link(source_path, reference, fragment)
+            if not book_path:
+                return match.group()
+            suffix = reference.lower()
+            if suffix.endswith(HREF_IMAGE_EXTENSIONS):
+                resource_type, directory = "image", "../Images/"
+            elif suffix.endswith(".css"):
+                resource_type, directory = "css", "../Styles/"
+            elif suffix.endswith((".xhtml", ".html")):
+                resource_type, directory = "text", ""
+            else:
+                return match.group()
+            name = self.path_maps.get(resource_type, {}).get(book_path)
+            if name is None:
+                return match.group()
+            if resource_type == "css":
+                return f'<link href="{directory}{name}{fragment}" type="text/css" rel="stylesheet"/>'
+            return match.group(1) + directory + name + fragment + match.group(4)
+
+        def rewrite_src(match: re.Match[str]) -> str:
+            reference, fragment = split_file_reference(match.group(3))
+            book_path = self._resolve_link(source_path, reference, fragment)
+            if not book_path:
+                return match.group()
+            suffix = reference.lower()
+            if suffix.endswith(IMAGE_EXTENSIONS):
+                resource_type, directory = "image", "../Images/"
+            elif suffix.endswith(".mp3"):
+                resource_type, directory = "audio", "../Audio/"
+            elif suffix.endswith(".mp4"):
+                resource_type, directory = "video", "../Video/"
+            elif suffix.endswith(".js"):
+                resource_type, directory = "other", "../Misc/"
+            else:
+                return match.group()
+            name = self.path_maps.get(resource_type, {}).get(book_path)
+            return match.group() if name is None else match.group(1) + directory + name + fragment + match.group(4)
+
+        def rewrite_url(match: re.Match[str]) -> str:
+            reference, fragment = split_file_reference(match.group(2))
+            book_path = self._resolve_link(source_path, reference, fragment)
+            if not book_path:
+                return match.group()
+            suffix = reference.lower()
+            if suffix.endswith(FONT_EXTENSIONS):
+                resource_type, directory = "font", "../Fonts/"
+            elif suffix.endswith(IMAGE_EXTENSIONS):
+                resource_type, directory = "image", "../Images/"
+            else:
+                return match.group()
+            name = self.path_maps.get(resource_type, {}).get(book_path)
+            return match.group() if name is None else match.group(1) + directory + name + fragment + match.group(3)
+
+        text = re.sub(r"(<[^>]*href=([\'\"]))(.*?)(\2[^>]*>)", rewrite_href, text)
+        def rewrite_poster(match: re.Match[str]) -> str:
+            reference, fragment = split_file_reference(match.group(3))
+            book_path = self._resolve_link(source_path, reference, fragment)
+            if not book_path or not reference.lower().endswith(IMAGE_EXTENSIONS):
+                return match.group()
+            name = self.path_maps["image"].get(book_path)
+            return match.group() if name is None else match.group(1) + "../Images/" + name + fragment + match.group(4)
+
+        text = re.sub(r"(<[^>]* src=([\'\"]))(.*?)(\2[^>]*>)", rewrite_src, text)
+        text = re.sub(r"(<[^>]* poster=([\'\"]))(.*?)(\2[^>]*>)", rewrite_poster, text)
+        for attribute in ("placeholder", "activestate", "zy-cover-pic"):
+            text = re.sub(
+                rf"(<[^>]* {attribute}=([\'\"]))(.*?)(\2[^>]*>)", rewrite_src, text
+            )
+        return re.sub(r"(url\([\'\"]?)(.*?)([\'\"]?\))", rewrite_url, text)
+
+    def _rewrite_css(self, css: str, source_path: str) -> str:
+        def rewrite_import(match: re.Match[str]) -> str:
+            raw_reference = match.group(2) if match.group(2) else match.group(3)
+            reference, fragment = split_file_reference(raw_reference)
+            if not reference.lower().endswith(".css"):
+                return match.group()
+            name = path.basename(reference)
+            if self.policy.mapped_css_imports:
+                book_path = self._resolve_link(source_path, reference, fragment)
+                if not book_path:
+                    return match.group()
+                name = self.path_maps["css"].get(book_path, name)
+            if self.policy.normalize_css_import_to_quotes or match.group(2):
+                return f'@import "{name}{fragment}"'
+            return f'@import url("{name}{fragment}")'
+
+        def rewrite_url(match: re.Match[str]) -> str:
+            reference, fragment = split_file_reference(match.group(2))
+            book_path = self._resolve_link(source_path, reference, fragment)
+            if not book_path:
+                return match.group()
+            suffix = reference.lower()
+            if suffix.endswith(FONT_EXTENSIONS):
+                resource_type, directory = "font", "../Fonts/"
+            elif suffix.endswith(IMAGE_EXTENSIONS):
+                resource_type, directory = "image", "../Images/"
+            else:
+                return match.group()
+            name = self.path_maps.get(resource_type, {}).get(book_path)
+            return match.group() if name is None else match.group(1) + directory + name + fragment + match.group(3)
+
+        whitespace = "+" if self.policy.permissive_css_import_whitespace else ""
+        css = re.sub(
+            rf"@import {whitespace}([\'\"])(.*?)\1|@import {whitespace}url\([\'\"]?(.*?)[\'\"]?\)",
+            rewrite_import,
+            css,
+        )
+        return re.sub(r"(url\([\'\"]?)(.*?)([\'\"]?\))", rewrite_url, css)
+
+
+ARCHIVE = {
+    "text": ["OEBPS/Text/c1.xhtml", "OEBPS/Text/Chapter 2.xhtml"],
+    "css": ["OEBPS/Styles/main.css", "OEBPS/Styles/other.css"],
+    "image": ["OEBPS/Images/a.png", "OEBPS/Images/B.JPG", "OEBPS/Images/s.svg"],
+    "font": ["OEBPS/Fonts/f.ttf"],
+    "audio": ["OEBPS/Audio/a.mp3"],
+    "video": ["OEBPS/Video/v.mp4"],
+    "other": ["OEBPS/Misc/s.js"],
+}
+XHTML_REFERENCES = [
+    "../Images/a.png",
+    "../images/A.png",
+    "../Images/B.JPG#frag",
+    "../Images/s.svg",
+    "../Images/none.png",
+    "../Styles/main.css",
+    "../styles/other.css",
+    "c1.xhtml#top",
+    "Chapter%202.xhtml",
+    "../Fonts/f.ttf",
+    "../Audio/a.mp3",
+    "../Video/v.mp4",
+    "../Misc/s.js",
+    "https://example.com/a.png",
+    "data:image/png;base64,AAAA",
+    "#local",
+    "",
+]
+XHTML_TEMPLATES = [
+    '<a href="{0}">t</a>',
+    '<link href="{0}" rel="stylesheet" type="text/css"/>',
+    '<image xlink:href="{0}" width="1"/>',
+    '<a href="{0}" data-href="{1}">t</a>',
+    '<img src="{0}" alt="x"/>',
+    "<img class='c' src='{0}'/>",
+    '<img\tsrc="{0}"/>',
+    '<img alt="a src" src="{0}"/>',
+    '<video controls poster="{0}" src="{1}"></video>',
+    '<img placeholder="{0}" activestate="{1}" zy-cover-pic="{2}"/>',
+    '<img src="{0}" style="background:url(\'{1}\')"/>',
+    '<div style="background:url({0})">',
+    '<p>text url("{0}") more</p>',
+    '<svg><image href="{0}"/></svg>',
+    "<p>plain paragraph with no links</p>",
+]
+CSS_REFERENCES = [
+    "other.css",
+    "Other.css#x",
+    "missing.css",
+    "../Images/a.png",
+    "../images/a.png",
+    "../Fonts/f.ttf",
+    "../Fonts/none.otf",
+    "theme.less",
+    "https://example.com/f.ttf",
+]
+CSS_TEMPLATES = [
+    '@import "{0}";',
+    "@import  '{0}';",
+    "@import url({0});",
+    '@import  url("{0}");',
+    "body {{ background: url({0}); }}",
+    '@font-face {{ src: url("{0}"), url(\'{1}\'); }}',
+    "p {{ color: red; }}",
+]
+
+
+def build_engine(engine_type, policy):
+    task = SimpleNamespace(errorLink_log={})
+    engine = engine_type(task, policy)
+    engine.path_maps = {
+        resource_type: {
+            book_path: f"{index}_{path.basename(book_path)}"
+            for index, book_path in enumerate(book_paths)
+        }
+        for resource_type, book_paths in ARCHIVE.items()
+    }
+    engine.lower_to_original = {
+        book_path.lower(): book_path
+        for book_paths in ARCHIVE.values()
+        for book_path in book_paths
+    }
+    return engine
+
+
+def random_document(rng, templates, references, size):
+    parts = []
+    for _ in range(size):
+        template = rng.choice(templates)
+        parts.append(template.format(*(rng.choice(references) for _ in range(3))))
+        parts.append(rng.choice(["\n", " ", ""]))
+    return "".join(parts)
+
+
+POLICIES = [
+    RewritePolicy(mapped_css_imports=False, permissive_css_import_whitespace=False, normalize_css_import_to_quotes=True),
+    RewritePolicy(mapped_css_imports=True),
+    RewritePolicy(mapped_css_imports=True, permissive_css_import_whitespace=False),
+]
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_tag_scan_xhtml_rewrite_matches_legacy_passes(policy):
+    rng = random.Random(21)
+    for _ in range(200):
+        text = random_document(rng, XHTML_TEMPLATES, XHTML_REFERENCES, rng.randint(1, 12))
+        legacy = build_engine(LegacyRewriteEngine, policy)
+        engine = build_engine(EpubRewriteEngine, policy)
+        source_path = "OEBPS/Text/c1.xhtml"
+        expected = legacy._rewrite_xhtml(text, source_path)
+        assert engine._rewrite_xhtml(text, source_path) == (
+            expected,
+            legacy.task.errorLink_log.get(source_path, []),
+        )
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_css_rewrite_matches_legacy_passes(policy):
+    rng = random.Random(22)
+    for _ in range(200):
+        css = random_document(rng, CSS_TEMPLATES, CSS_REFERENCES, rng.randint(1, 10))
+        legacy = build_engine(LegacyRewriteEngine, policy)
+        engine = build_engine(EpubRewriteEngine, policy)
+        source_path = "OEBPS/Styles/main.css"
+        expected = legacy._rewrite_css(css, source_path)
+        assert engine._rewrite_css(css, source_path) == (
+            expected,
+            legacy.task.errorLink_log.get(source_path, []),
+        )
+
+
+def test_link_errors_keep_attribute_pass_order():
+    engine = build_engine(EpubRewriteEngine, POLICIES[0])
+    text = (
+        '<p style="background:url(../Images/missing1.png)"/>'
+        '<img src="../images/A.png"/><a href="../Images/missing2.png">t</a>'
+    )
+    _text, link_errors = engine._rewrite_xhtml(text, "OEBPS/Text/c1.xhtml")
+    assert link_errors == [
+        ("../Images/missing2.png", None),
+        ("../images/A.png", "OEBPS/Images/a.png"),
+        ("../Images/missing1.png", None),
+    ]
+
+
+def test_tag_scan_intentionally_differs_from_legacy_passes():
+    """按标签扫描与旧实现仅有的两处已知差异，均为有意为之。"""
+    source_path = "OEBPS/Text/c1.xhtml"
+
+    # 1. 旧正则会把其他属性值里的 href='…' 文本当作链接改写；按标签扫描只认真正的属性。
+    text = "<span title=\"x href='../Images/a.png'\">t</span>"
+    legacy = build_engine(LegacyRewriteEngine, POLICIES[0])
+    engine = build_engine(EpubRewriteEngine, POLICIES[0])
+    assert legacy._rewrite_xhtml(text, source_path) == (
+        "<span title=\"x href='../Images/0_a.png'\">t</span>"
+    )
+    assert engine._rewrite_xhtml(text, source_path) == (text, [])
+
+    # 2. 引号未闭合时，旧正则的引用值会跨过 ">" 吞到后面的标签并报告一个虚假的链接问题；
+    #    按标签扫描不跨标签匹配，不再报告。两者的改写结果相同。
+    text = '<a href="../Images/missing.png>t</a><p class="x">y</p>'
+    legacy = build_engine(LegacyRewriteEngine, POLICIES[0])
+    engine = build_engine(EpubRewriteEngine, POLICIES[0])
+    assert legacy._rewrite_xhtml(text, source_path) == text
+    assert legacy.task.errorLink_log[source_path] == [
+        ("../Images/missing.png>t</a><p class=", None)
+    ]
+    assert engine._rewrite_xhtml(text, source_path) == (text, [])
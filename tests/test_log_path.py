@@ -4,7 +4,7 @@ import tempfile
 import unittest
 from pathlib import Path
 
-from python_backend.services.utils.log import logwriter
+from python_backend.services.utils.log import BufferedLogFile, logwriter
 
 
 class LogWriterPathTest(unittest.TestCase):
@@ -21,6 +21,7 @@ class LogWriterPathTest(unittest.TestCase):
 
                     writer = logwriter()
                     writer.write("hello")
+                    writer.flush()
 
                     expected_path = Path(temp_dir) / "log.txt"
                     self.assertEqual(Path(writer.path).resolve(), expected_path.resolve())
@@ -34,5 +35,72 @@ class LogWriterPathTest(unittest.TestCase):
                 os.environ["EPUB_TOOL_LOG_PATH"] = original_env
 
 
+class BufferedLogFileTest(unittest.TestCase):
+    def test_lines_are_buffered_until_size_threshold_or_flush(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "log.txt"
+            log_file = BufferedLogFile(str(path), buffer_bytes=16, flush_interval=60)
+            log_file.reset("time: now")
+
+            log_file.append("first")
+            self.assertEqual(path.read_text(encoding="utf-8"), "time: now\n")
+            log_file.append("second line")
+            self.assertEqual(
+                path.read_text(encoding="utf-8"), "time: now\nfirst\nsecond line\n"
+            )
+            log_file.append("third")
+            log_file.flush()
+            self.assertTrue(path.read_text(encoding="utf-8").endswith("third\n"))
+
+    def test_error_lines_are_written_immediately(self):
+        original_env = os.environ.get("EPUB_TOOL_LOG_PATH")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "log.txt"
+            os.environ["EPUB_TOOL_LOG_PATH"] = str(path)
+            try:
+                writer = logwriter(level="info")
+                writer.write("info")
+                writer.error("失败: %s", "boom")
+                self.assertTrue(path.read_text(encoding="utf-8").endswith("info\n失败: boom\n"))
+            finally:
+                if original_env is None:
+                    os.environ.pop("EPUB_TOOL_LOG_PATH", None)
+                else:
+                    os.environ["EPUB_TOOL_LOG_PATH"] = original_env
+
+
+class LogLevelTest(unittest.TestCase):
+    def test_debug_arguments_are_not_formatted_below_debug_level(self):
+        class Expensive:
+            formatted = 0
+
+            def __str__(self):
+                Expensive.formatted += 1
+                return "mapping"
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            original_env = os.environ.get("EPUB_TOOL_LOG_PATH")
+            os.environ["EPUB_TOOL_LOG_PATH"] = str(Path(temp_dir) / "log.txt")
+            try:
+                writer = logwriter(level="info")
+                writer.debug("映射: %s", Expensive())
+                self.assertEqual(Expensive.formatted, 0)
+
+                writer = logwriter(level="debug")
+                writer.debug("映射: %s", Expensive())
+                writer.flush()
+                self.assertEqual(Expensive.formatted, 1)
+                self.assertIn("映射: mapping", Path(writer.path).read_text(encoding="utf-8"))
+            finally:
+                if original_env is None:
+                    os.environ.pop("EPUB_TOOL_LOG_PATH", None)
+                else:
+                    os.environ["EPUB_TOOL_LOG_PATH"] = original_env
+
+    def test_invalid_log_level_is_rejected(self):
+        with self.assertRaises(ValueError):
+            logwriter(level="verbose")
+
+
 if __name__ == "__main__":
     unittest.main()
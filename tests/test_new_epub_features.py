@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import io
 import json
+import os
 import random
+import re
 import subprocess
 import zipfile
 from pathlib import Path
@@ -11,10 +13,21 @@ import pytest
 from PIL import Image
 
 from python_backend.epub_workspace import EpubWorkspace
-from python_backend.services.image import image_compress, image_to_webp, replace_cover
+from python_backend.services.image import (
+    image_compress,
+    image_processing,
+    image_to_webp,
+    replace_cover,
+)
 from python_backend.services.text import chinese_convert
-from python_backend.services.image.image_processing import format_size_mb
-from python_backend.protocol import TaskRequest
+from python_backend.services.image.image_processing import (
+    format_size_mb,
+    process_images,
+    resolve_image_workers,
+)
+from python_backend import task_runner
+from python_backend.output_cache import OutputCache
+from python_backend.protocol import TaskRequest, TaskResult
 from python_backend.task_runner import (
     input_has_task_output_suffix,
     run_task,
@@ -124,6 +137,47 @@ def test_workspace_accepts_nonstandard_mimetype_and_normalizes_output(
     assert any("允许兼容读取" in message for message in logger.messages)
 
 
+def test_lazy_workspace_streams_unmodified_members_and_spills_large_edits(
+    tmp_path: Path,
+) -> None:
+    source = tmp_path / "book.epub"
+    output = tmp_path / "lazy.epub"
+    write_epub(source)
+    with zipfile.ZipFile(source) as archive:
+        original = {info.filename: archive.read(info) for info in archive.infolist()}
+
+    with EpubWorkspace.load(source, lazy=True) as workspace:
+        members = workspace.members
+        assert members.source_info("OPS/chapter.xhtml") is not None
+        assert members.memory_size == 0
+        assert members["OPS/chapter.xhtml"] == original["OPS/chapter.xhtml"]
+        assert members.memory_size == 0
+
+        members.memory_budget = 8
+        members["OPS/chapter.xhtml"] = b"<html>changed</html>"
+        members["OPS/extra.txt"] = b"tiny"
+        del members["OPS/Images/picture.png"]
+        assert members.source_info("OPS/chapter.xhtml") is None
+        assert members.memory_size == 4
+        assert "OPS/Images/picture.png" not in members
+
+        workspace.write(output)
+        with pytest.raises(ValueError, match="不能与输入 EPUB 相同"):
+            workspace.write(source)
+
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == [
+            "mimetype",
+            "META-INF/container.xml",
+            "OPS/package.opf",
+            "OPS/chapter.xhtml",
+            "OPS/extra.txt",
+        ]
+        assert archive.read("META-INF/container.xml") == original["META-INF/container.xml"]
+        assert archive.read("OPS/chapter.xhtml") == b"<html>changed</html>"
+        assert archive.read("OPS/extra.txt") == b"tiny"
+
+
 def test_image_to_webp_updates_manifest_and_references(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     source = tmp_path / "book.epub"
     write_epub(source)
@@ -245,6 +299,355 @@ def test_image_compress_handles_jpg_after_exif_normalization(
         assert image.format == "JPEG"
 
 
+def test_parallel_image_transcoding_matches_sequential_output(tmp_path: Path) -> None:
+    source = tmp_path / "many-images.epub"
+    write_epub(source)
+    random_source = random.Random(1)
+    with zipfile.ZipFile(source, "a") as archive:
+        for index in range(24):
+            if index % 7 == 3:
+                archive.writestr(f"OPS/Images/broken{index}.png", b"not an image")
+                continue
+            noise = Image.frombytes(
+                "RGB",
+                (48, 48),
+                bytes(random_source.randrange(256) for _ in range(48 * 48 * 3)),
+            )
+            buffer = io.BytesIO()
+            if index % 2:
+                noise.save(buffer, format="JPEG", quality=10)
+                archive.writestr(f"OPS/Images/photo{index}.jpg", buffer.getvalue())
+            else:
+                noise.save(buffer, format="PNG")
+                archive.writestr(f"OPS/Images/photo{index}.png", buffer.getvalue())
+
+    results = {}
+    for workers in (1, 4):
+        logger = Logger()
+        output = tmp_path / f"workers{workers}.epub"
+        assert (
+            process_images(
+                str(source),
+                str(output),
+                mode="compress",
+                quality=60,
+                webp_quality=60,
+                png_to_jpg=True,
+                workers=workers,
+                logger=logger,
+            )
+            == 0
+        )
+        workspace = EpubWorkspace.load(output)
+        # Pillow 的错误信息包含 BytesIO 对象地址，比较前去掉。
+        messages = [re.sub(r" at 0x[0-9a-f]+", "", message) for message in logger.messages]
+        results[workers] = (list(workspace.members.items()), messages)
+
+    assert results[4] == results[1]
+    assert any("跳过无法处理的图片 OPS/Images/broken3.png" in message for message in results[4][1])
+    assert "失败 3" in results[4][1][-1]
+
+
+def test_resolve_image_workers_avoids_nested_parallelism() -> None:
+    assert resolve_image_workers({"image_workers": 3}) == 3
+    assert resolve_image_workers({"max_workers": 4}) == 1
+    assert resolve_image_workers({}) >= 1
+
+
+def test_image_tasks_downscale_oversized_images(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from PIL import JpegImagePlugin
+
+    drafts: list[tuple[int, int]] = []
+    original_draft = JpegImagePlugin.JpegImageFile.draft
+
+    def recording_draft(self, mode, size):
+        drafts.append(size)
+        return original_draft(self, mode, size)
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", recording_draft)
+    source = tmp_path / "scan.epub"
+    write_epub(
+        source,
+        image_name="Images/picture.jpg",
+        image_format="JPEG",
+        image_data=image_bytes("JPEG", color=(200, 30, 30), size=(1600, 1200)),
+    )
+    logger = Logger()
+    monkeypatch.setattr(image_compress, "logger", logger)
+
+    assert image_compress.run(
+        str(source), str(tmp_path), options={"max_dimension": 300}
+    ) == 0
+
+    output = EpubWorkspace.load(tmp_path / "scan_image_compress.epub")
+    with Image.open(io.BytesIO(output.members["OPS/Images/picture.jpg"])) as image:
+        assert image.size == (300, 225)
+    assert drafts == [(300, 225)]
+    assert "缩小尺寸 1" in logger.messages[-1]
+
+    png_source = tmp_path / "png.epub"
+    write_epub(png_source, image_data=image_bytes("PNG", size=(400, 100)))
+    monkeypatch.setattr(image_to_webp, "logger", Logger())
+    assert image_to_webp.run(
+        str(png_source), str(tmp_path), options={"quality": 80, "max_pixels": 10000}
+    ) == 0
+    output = EpubWorkspace.load(tmp_path / "png_image_to_webp.epub")
+    with Image.open(io.BytesIO(output.members["OPS/Images/picture.webp"])) as image:
+        assert image.size == (200, 50)
+
+
+def test_image_to_webp_keeps_webp_within_downscale_limits(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    source = tmp_path / "small-webp.epub"
+    write_epub(source, image_name="Images/picture.webp", image_format="WEBP")
+    original = EpubWorkspace.load(source).members["OPS/Images/picture.webp"]
+    monkeypatch.setattr(image_to_webp, "logger", Logger())
+
+    assert image_to_webp.run(
+        str(source), str(tmp_path), options={"quality": 1, "max_dimension": 1000}
+    ) == 0
+
+    output = EpubWorkspace.load(tmp_path / "small-webp_image_to_webp.epub")
+    assert output.members["OPS/Images/picture.webp"] == original
+
+
+def test_image_dedupe_keeps_one_copy_and_transcodes_it_once(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    source = tmp_path / "dupes.epub"
+    logo = image_bytes("PNG", color=(10, 200, 10, 255))
+    opf = b"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+ <metadata><meta name="cover" content="logo-c"/></metadata>
+ <manifest>
+  <item id="chapter" href="chapter.xhtml" media-type="application/xhtml+xml"/>
+  <item id="logo-a" href="Images/logo-a.png" media-type="image/png"/>
+  <item id="logo-b" href="Images/logo-b.png" media-type="image/png" properties="decor"/>
+  <item id="logo-c" href="Images/logo-c.png" media-type="image/png" properties="cover-image"/>
+  <item id="other" href="Images/other.png" media-type="image/png"/>
+ </manifest>
+ <spine><itemref idref="chapter"/></spine>
+</package>"""
+    chapter = (
+        b'<html><body><img src="Images/logo-a.png"/><img src="Images/logo-b.png"/>'
+        b'<p style="background:url(Images/logo-c.png)"/><img src="Images/other.png"/></body></html>'
+    )
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("mimetype", b"application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr(
+            "META-INF/container.xml",
+            b'<container><rootfiles><rootfile full-path="OPS/package.opf"/></rootfiles></container>',
+        )
+        archive.writestr("OPS/package.opf", opf)
+        archive.writestr("OPS/chapter.xhtml", chapter)
+        for name in ("logo-a", "logo-b", "logo-c"):
+            archive.writestr(f"OPS/Images/{name}.png", logo)
+        archive.writestr("OPS/Images/other.png", image_bytes("PNG"))
+
+    transcoded: list[bytes] = []
+    original_transcode = image_processing.transcode_image
+
+    def counting_transcode(original, extension, **kwargs):
+        transcoded.append(original)
+        return original_transcode(original, extension, **kwargs)
+
+    monkeypatch.setattr(image_processing, "transcode_image", counting_transcode)
+    logger = Logger()
+    monkeypatch.setattr(image_to_webp, "logger", logger)
+
+    assert image_to_webp.run(
+        str(source), str(tmp_path), options={"quality": 80, "dedupe_images": True}
+    ) == 0
+
+    assert len(transcoded) == 2
+    output = EpubWorkspace.load(tmp_path / "dupes_image_to_webp.epub")
+    images = sorted(name for name in output.members if name.startswith("OPS/Images/"))
+    assert images == ["OPS/Images/logo-a.webp", "OPS/Images/other.webp"]
+    chapter_out = output.members["OPS/chapter.xhtml"]
+    assert chapter_out.count(b"Images/logo-a.webp") == 3
+    opf_out = output.members[output.opf_path]
+    assert b"logo-b" not in opf_out and b"logo-c.png" not in opf_out
+    assert b'<meta name="cover" content="logo-a"/>' in opf_out
+    assert re.search(
+        rb'<item id="logo-a" href="Images/logo-a.webp" media-type="image/webp" '
+        rb'properties="decor cover-image"/>',
+        opf_out,
+    )
+    assert any("合并 2 个重复图片" in message for message in logger.messages)
+
+
+def test_image_dedupe_keeps_images_whose_id_is_referenced_in_the_opf(tmp_path: Path) -> None:
+    source = tmp_path / "linked-dupes.epub"
+    logo = image_bytes("PNG", color=(10, 200, 10, 255))
+    opf = b"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+ <metadata><meta refines="#logo-c" property="alt-script">logo</meta></metadata>
+ <manifest>
+  <item id="chapter" href="chapter.xhtml" media-type="application/xhtml+xml"/>
+  <item id="logo-a" href="Images/logo-a.png" media-type="image/png"/>
+  <item id="svg" href="Images/logo.svg" media-type="image/svg+xml" fallback="logo-b"/>
+  <item id="logo-b" href="Images/logo-b.png" media-type="image/png"/>
+  <item id="logo-c" href="Images/logo-c.png" media-type="image/png"/>
+  <item id="logo-d" href="Images/logo-d.png" media-type="image/png"/>
+ </manifest>
+ <spine><itemref idref="chapter"/></spine>
+</package>"""
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("mimetype", b"application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr(
+            "META-INF/container.xml",
+            b'<container><rootfiles><rootfile full-path="OPS/package.opf"/></rootfiles></container>',
+        )
+        archive.writestr("OPS/package.opf", opf)
+        archive.writestr("OPS/chapter.xhtml", b"<html><body/></html>")
+        archive.writestr("OPS/Images/logo.svg", b"<svg/>")
+        for name in ("logo-a", "logo-b", "logo-c", "logo-d"):
+            archive.writestr(f"OPS/Images/{name}.png", logo)
+    workspace = EpubWorkspace.load(source)
+
+    duplicates, _removed_bytes = image_processing.dedupe_images(workspace)
+
+    assert duplicates == {"OPS/Images/logo-d.png": "OPS/Images/logo-a.png"}
+    opf_out = workspace.members[workspace.opf_path]
+    assert b'id="logo-b"' in opf_out and b'fallback="logo-b"' in opf_out
+    assert b'id="logo-c"' in opf_out and b'refines="#logo-c"' in opf_out
+    assert b"logo-d" not in opf_out
+
+
+def test_image_task_prunes_unreferenced_resources_before_transcoding(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    source = tmp_path / "bloated.epub"
+    opf = b"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+ <metadata><meta name="cover" content="cover"/></metadata>
+ <manifest>
+  <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+  <item id="chapter" href="chapter.xhtml" media-type="application/xhtml+xml"/>
+  <item id="appendix" href="appendix.xhtml" media-type="application/xhtml+xml"/>
+  <item id="style" href="Styles/main.css" media-type="text/css"/>
+  <item id="font" href="Fonts/body.ttf" media-type="font/ttf"/>
+  <item id="cover" href="Images/cover.png" media-type="image/png"/>
+  <item id="used" href="Images/used.png" media-type="image/png"/>
+  <item id="unused" href="Images/unused.png" media-type="image/png"/>
+ </manifest>
+ <spine><itemref idref="chapter"/></spine>
+</package>"""
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("mimetype", b"application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr(
+            "META-INF/container.xml",
+            b'<container><rootfiles><rootfile full-path="OPS/package.opf"/></rootfiles></container>',
+        )
+        archive.writestr("OPS/package.opf", opf)
+        archive.writestr("OPS/nav.xhtml", b'<html><body><a href="chapter.xhtml#c1">1</a></body></html>')
+        archive.writestr(
+            "OPS/chapter.xhtml",
+            b'<html><head><link href="Styles/main.css" rel="stylesheet"/></head><body/></html>',
+        )
+        archive.writestr("OPS/appendix.xhtml", b'<html><body><img src="Images/unused.png"/></body></html>')
+        archive.writestr(
+            "OPS/Styles/main.css",
+            b'@import "extra.css"; @font-face { src: url(../Fonts/body.ttf); }',
+        )
+        archive.writestr("OPS/Styles/extra.css", b"p { background: url('../images/USED.png'); }")
+        archive.writestr("OPS/Styles/orphan.css", b"p { color: red; }")
+        archive.writestr("OPS/Fonts/body.ttf", b"font")
+        archive.writestr("OPS/Scripts/app.js", b"void 0;")
+        for name in ("cover", "used", "unused", "orphan"):
+            archive.writestr(f"OPS/Images/{name}.png", image_bytes("PNG"))
+
+    transcoded: list[bytes] = []
+    original_transcode = image_processing.transcode_image
+
+    def counting_transcode(original, extension, **kwargs):
+        transcoded.append(original)
+        return original_transcode(original, extension, **kwargs)
+
+    monkeypatch.setattr(image_processing, "transcode_image", counting_transcode)
+    logger = Logger()
+    monkeypatch.setattr(image_to_webp, "logger", logger)
+
+    assert image_to_webp.run(
+        str(source), str(tmp_path), options={"quality": 80, "prune_unreferenced": True}
+    ) == 0
+
+    assert len(transcoded) == 2
+    output = EpubWorkspace.load(tmp_path / "bloated_image_to_webp.epub")
+    assert sorted(output.members) == [
+        "META-INF/container.xml",
+        "OPS/Fonts/body.ttf",
+        "OPS/Images/cover.webp",
+        "OPS/Images/used.webp",
+        "OPS/Scripts/app.js",
+        "OPS/Styles/extra.css",
+        "OPS/Styles/main.css",
+        "OPS/chapter.xhtml",
+        "OPS/nav.xhtml",
+        "OPS/package.opf",
+        "mimetype",
+    ]
+    opf_out = output.members[output.opf_path]
+    assert b"appendix" not in opf_out and b"unused" not in opf_out
+    assert b'href="Images/cover.webp"' in opf_out
+    removed = [message for message in logger.messages if message.startswith("已删除未引用资源")]
+    assert removed == [
+        f"已删除未引用资源: OPS/{name}"
+        for name in (
+            "appendix.xhtml",
+            "Styles/orphan.css",
+            "Images/unused.png",
+            "Images/orphan.png",
+        )
+    ]
+
+
+def test_prune_keeps_members_linked_by_object_data_unquoted_attributes_and_scripts(
+    tmp_path: Path,
+) -> None:
+    source = tmp_path / "book.epub"
+    with zipfile.ZipFile(source, "w") as archive:
+        archive.writestr("mimetype", b"application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr(
+            "META-INF/container.xml",
+            b'<container><rootfiles><rootfile full-path="OPS/package.opf"/></rootfiles></container>',
+        )
+        archive.writestr(
+            "OPS/package.opf",
+            b"""<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+ <manifest>
+  <item id="chapter" href="chapter.xhtml" media-type="application/xhtml+xml"/>
+  <item id="cover-page" href="cover.xhtml" media-type="application/xhtml+xml"/>
+  <item id="svg" href="Images/pic.svg" media-type="image/svg+xml"/>
+  <item id="unquoted" href="Images/unq.png" media-type="image/png"/>
+  <item id="scripted" href="Images/scripted.png" media-type="image/png"/>
+  <item id="unused" href="Images/unused.png" media-type="image/png"/>
+ </manifest>
+ <spine><itemref idref="chapter"/></spine>
+ <guide><reference type="cover" href="cover.xhtml"/></guide>
+</package>""",
+        )
+        archive.writestr(
+            "OPS/chapter.xhtml",
+            b'<html><body><object data="Images/pic.svg"></object><img src=Images/unq.png></body></html>',
+        )
+        archive.writestr("OPS/cover.xhtml", b"<html><body/></html>")
+        archive.writestr("OPS/Scripts/app.js", b'load("Images/" + "scripted.png");')
+        archive.writestr("OPS/Images/pic.svg", b"<svg/>")
+        for name in ("unq", "scripted", "unused"):
+            archive.writestr(f"OPS/Images/{name}.png", image_bytes("PNG"))
+    workspace = EpubWorkspace.load(source)
+
+    pruned, _removed_bytes = image_processing.prune_unreferenced(workspace)
+
+    assert pruned == ["OPS/Images/unused.png"]
+    assert b"unused" not in workspace.members[workspace.opf_path]
+    assert b'href="cover.xhtml"' in workspace.members[workspace.opf_path]
+
+
 def test_new_tasks_delete_and_replace_existing_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     source = tmp_path / "book.epub"
     output_path = tmp_path / "book_image_compress.epub"
@@ -345,7 +748,14 @@ def test_replace_cover_rewrites_percent_encoded_cover_references(
     ("webp_to_img", {"png_quantize": "yes"}),
     ("image_to_webp", {"quality": True}),
     ("chinese_convert", {"direction": "invalid"}),
+    ("image_compress", {"max_dimension": 0}),
+    ("image_to_webp", {"max_pixels": True}),
+    ("image_compress", {"prune_unreferenced": "yes"}),
     ("replace_cover", {"cover_path_by_file": []}),
+    ("reformat_epub", {"max_workers": 0}),
+    ("image_compress", {"max_workers": True}),
+    ("encrypt_font", {"document_cache_mb": -1}),
+    ("decrypt_font", {"document_cache_mb": "64"}),
 ])
 def test_invalid_options_fail_before_processing(task_type: str, options: dict[str, object]) -> None:
     with pytest.raises(ValueError):
@@ -372,6 +782,173 @@ def test_runner_emits_real_output_and_continues_partial_batch(tmp_path: Path, ca
     assert event_names.count("task.file.finished") == 2
 
 
+def test_runner_process_pool_keeps_event_order_and_result(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    sources = [tmp_path / f"book{index}.epub" for index in range(3)]
+    for source in sources:
+        write_epub(source)
+    missing = tmp_path / "missing.epub"
+    input_files = [str(sources[0]), str(missing), str(sources[1]), str(sources[2])]
+
+    result = run_task(TaskRequest(
+        task_id="parallel-batch",
+        task_type="chinese_convert",
+        input_files=input_files,
+        output_dir=str(tmp_path / "output"),
+        options={"direction": "s2t", "max_workers": 2},
+    ))
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert result.summary == {"total": 4, "success": 3, "failed": 1, "skipped": 0}
+    assert result.outputs == [
+        str(tmp_path / "output" / f"book{index}_chinese_convert_tc.epub")
+        for index in range(3)
+    ]
+    file_events = [
+        (event["event"], event["current_index"])
+        for event in events
+        if event["event"].startswith("task.file.")
+    ]
+    assert file_events == [
+        (name, index)
+        for index in range(1, 5)
+        for name in ("task.file.started", "task.file.finished")
+    ]
+    log_indexes = [event["current_index"] for event in events if event["event"] == "task.log"]
+    assert log_indexes == sorted(log_indexes)
+    assert events[-1]["event"] == "task.finished"
+
+
+def test_runner_resume_skips_completed_files_from_journal(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(task_runner, "JOURNAL_DIR", tmp_path / "journals")
+    sources = [tmp_path / f"book{index}.epub" for index in range(3)]
+    for source in sources:
+        write_epub(source)
+    request_kwargs = {
+        "task_id": "resume-batch",
+        "task_type": "chinese_convert",
+        "input_files": [str(source) for source in sources],
+        "output_dir": str(tmp_path / "output"),
+    }
+
+    first = run_task(TaskRequest(**request_kwargs, options={"direction": "s2t"}))
+    assert first.summary["success"] == 3
+    journal_path = tmp_path / "journals" / "resume-batch.jsonl"
+    entries = [json.loads(line) for line in journal_path.read_text(encoding="utf-8").splitlines()]
+    assert [entry["status"] for entry in entries] == ["success"] * 3
+    assert entries[0]["input_size"] == sources[0].stat().st_size
+
+    # 模拟中断：最后一行只写了一半，且第二本书在两次运行之间被修改。
+    with journal_path.open("a", encoding="utf-8") as file:
+        file.write('{"input_file": "trunc')
+    write_epub(sources[1], chapter_data="<html><body><p>新的内容</p></body></html>".encode("utf-8"))
+    processed: list[str] = []
+    original_process = task_runner.process_input_file
+
+    def tracking_process(task_type, input_file, output_dir, options):
+        processed.append(input_file)
+        return original_process(task_type, input_file, output_dir, options)
+
+    monkeypatch.setattr(task_runner, "process_input_file", tracking_process)
+    capsys.readouterr()
+    resumed = run_task(
+        TaskRequest(**request_kwargs, options={"direction": "s2t", "resume": True})
+    )
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert processed == [str(sources[1])]
+    assert resumed.summary == {"total": 3, "success": 3, "failed": 0, "skipped": 0}
+    assert resumed.outputs == [
+        str(tmp_path / "output" / f"book{index}_chinese_convert_tc.epub") for index in range(3)
+    ]
+    finished = [event for event in events if event["event"] == "task.file.finished"]
+    assert "跳过重复处理" in finished[0]["message"]
+    assert "跳过重复处理" not in finished[1]["message"]
+    lines = journal_path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["input_file"] == str(sources[1])
+
+    processed.clear()
+    changed_options = run_task(
+        TaskRequest(**request_kwargs, options={"direction": "t2s", "resume": True})
+    )
+    assert changed_options.summary["success"] == 3
+    assert len(processed) == 3
+
+
+def test_runner_output_cache_materializes_repeated_inputs(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(task_runner, "JOURNAL_DIR", tmp_path / "journals")
+    cache_dir = tmp_path / "cache"
+    source = tmp_path / "book.epub"
+    write_epub(source)
+    calls: list[str] = []
+    original_execute = task_runner.execute_task
+
+    def tracking_execute(task_type, input_file, output_dir, options):
+        calls.append(input_file)
+        return original_execute(task_type, input_file, output_dir, options)
+
+    monkeypatch.setattr(task_runner, "execute_task", tracking_execute)
+    options = {"direction": "s2t", "output_cache": True, "output_cache_dir": str(cache_dir)}
+
+    def run(output_name: str, run_options: dict) -> tuple[TaskResult, dict]:
+        capsys.readouterr()
+        result = run_task(
+            TaskRequest(
+                task_id=f"cache-{output_name}",
+                task_type="chinese_convert",
+                input_files=[str(source)],
+                output_dir=str(tmp_path / output_name),
+                options=run_options,
+            )
+        )
+        events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        finished = [event for event in events if event["event"] == "task.file.finished"]
+        return result, finished[0]
+
+    first, first_event = run("first", options)
+    assert first_event["cache"] == "miss"
+    assert len(list(cache_dir.glob("*/*.epub"))) == 1
+
+    second, second_event = run("second", {**options, "max_workers": 2})
+    assert second_event["cache"] == "hit"
+    assert "命中输出缓存" in second_event["message"]
+    assert len(calls) == 1
+    assert Path(second.outputs[0]).read_bytes() == Path(first.outputs[0]).read_bytes()
+
+    # 选项或输入内容变化都会得到新的缓存键。
+    run("third", {**options, "direction": "t2s"})
+    write_epub(source, chapter_data="<html><body><p>新的内容</p></body></html>".encode("utf-8"))
+    _result, changed_event = run("fourth", options)
+    assert changed_event["cache"] == "miss"
+    assert len(calls) == 3
+
+    _result, disabled_event = run("fifth", {"direction": "s2t"})
+    assert disabled_event["cache"] is None
+
+
+def test_output_cache_evicts_least_recently_used_entries(tmp_path: Path) -> None:
+    cache = OutputCache(directory=tmp_path / "cache", max_bytes=1000)
+    for index, key in enumerate(["aa01", "bb02", "cc03"]):
+        source = tmp_path / f"{key}.epub"
+        source.write_bytes(b"x" * 100)
+        cache.store(key, str(source))
+        os.utime(cache.entry_path(key), ns=(index * 10**9, index * 10**9))
+    assert cache.materialize("aa01", str(tmp_path / "restored.epub")) == "hardlink"
+
+    cache.max_bytes = 250
+    source = tmp_path / "dd04.epub"
+    source.write_bytes(b"x" * 100)
+    cache.store("dd04", str(source))
+
+    remaining = sorted(path.stem for path in (tmp_path / "cache").glob("*/*.epub"))
+    assert remaining == ["aa01", "dd04"]
+
+
 def test_runner_creates_missing_output_directory_for_rewrite_task(
     tmp_path: Path, capsys: pytest.CaptureFixture[str]
 ) -> None:
@@ -0,0 +1,165 @@
+import os
+import unittest
+from io import BytesIO
+from tempfile import TemporaryDirectory
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+from python_backend.services.font.decrypt_font import FontDecrypt, OcrTextResult
+from python_backend.services.font.ocr_cache import (
+    GlyphOcrCache,
+    GlyphOutlineHasher,
+    build_glyph_cache_key,
+    resolve_ocr_cache_path,
+)
+
+
+def build_box_glyph(width, height):
+    pen = TTGlyphPen(None)
+    pen.moveTo((100, 0))
+    pen.lineTo((100 + width, 0))
+    pen.lineTo((100 + width, height))
+    pen.lineTo((100, height))
+    pen.closePath()
+    return pen.glyph()
+
+
+def build_font_bytes(cmap_sizes):
+    glyph_order = [".notdef"]
+    glyphs = {".notdef": build_box_glyph(0, 0)}
+    metrics = {".notdef": (500, 0)}
+    cmap = {}
+    for index, (char, size) in enumerate(cmap_sizes.items()):
+        glyph_name = f"glyph{index}"
+        glyph_order.append(glyph_name)
+        glyphs[glyph_name] = build_box_glyph(*size)
+        metrics[glyph_name] = (1000, 100)
+        cmap[ord(char)] = glyph_name
+
+    font_builder = FontBuilder(1000, isTTF=True)
+    font_builder.setupGlyphOrder(glyph_order)
+    font_builder.setupCharacterMap(cmap)
+    font_builder.setupGlyf(glyphs)
+    font_builder.setupHorizontalMetrics(metrics)
+    font_builder.setupHorizontalHeader(ascent=900, descent=-200)
+    font_builder.setupNameTable({"familyName": "CacheTest", "styleName": "Regular"})
+    font_builder.setupOS2(sTypoAscender=900, sTypoDescender=-200)
+    font_builder.setupPost()
+    stream = BytesIO()
+    font_builder.save(stream)
+    return stream.getvalue()
+
+
+class FakeEpub:
+    def __init__(self, fonts):
+        self.fonts = fonts
+
+    def read(self, path):
+        return self.fonts[path]
+
+
+class FakeBackend:
+    model_name = "fake-model"
+    batch_size = 8
+
+    def __init__(self):
+        self.recognized = []
+
+    def recognize_batch(self, images, hint_chars=None, batch_size=None):
+        self.recognized.extend(hint_chars)
+        return [OcrTextResult("字", 0.95) for _ in images]
+
+    def recognize(self, image, hint_char=""):
+        self.recognized.append(hint_char)
+        return OcrTextResult("字", 0.95)
+
+
+class GlyphOcrCacheTest(unittest.TestCase):
+    def test_outline_hash_ignores_codepoint_and_font_identity(self):
+        first = GlyphOutlineHasher(build_font_bytes({"\ue000": (600, 700), "\ue001": (300, 300)}))
+        second = GlyphOutlineHasher(build_font_bytes({"\uf8ff": (600, 700)}))
+
+        self.assertEqual(first.outline_hash("\ue000"), second.outline_hash("\uf8ff"))
+        self.assertNotEqual(first.outline_hash("\ue000"), first.outline_hash("\ue001"))
+        self.assertIsNone(first.outline_hash("A"))
+
+    def test_cache_key_depends_on_renderer_options_and_model(self):
+        key = build_glyph_cache_key("outline", (128, 32), "model-a")
+
+        self.assertNotEqual(key, build_glyph_cache_key("outline", (96, 32), "model-a"))
+        self.assertNotEqual(key, build_glyph_cache_key("outline", (128, 32), "model-b"))
+        self.assertNotEqual(
+            build_glyph_cache_key("outline", (128, 32), "model-a", 3200),
+            build_glyph_cache_key("outline", (128, 32), "model-a", 1600),
+        )
+
+    def test_cache_evicts_least_recently_used_entries(self):
+        with TemporaryDirectory() as temp_dir:
+            cache = GlyphOcrCache(os.path.join(temp_dir, "cache.sqlite3"), max_entries=2)
+            cache.put_many([("a", "甲", 0.9, False), ("b", "乙", 0.9, False)])
+            cache.get_many(["a"])
+            cache.put_many([("c", "丙", 0.9, True)])
+
+            found = cache.get_many(["a", "b", "c"])
+            cache.close()
+
+        self.assertEqual(set(found), {"a", "c"})
+        self.assertEqual(found["c"], ("丙", 0.9, True))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_cache_path_follows_option_env_and_log_directory(self):
+        with TemporaryDirectory() as temp_dir:
+            original_env = {
+                name: os.environ.pop(name, None)
+                for name in ("EPUB_TOOL_OCR_CACHE_PATH", "EPUB_TOOL_LOG_PATH")
+            }
+            try:
+                self.assertIsNone(resolve_ocr_cache_path({}))
+                os.environ["EPUB_TOOL_LOG_PATH"] = os.path.join(temp_dir, "log.txt")
+                self.assertEqual(
+                    resolve_ocr_cache_path({}),
+                    os.path.join(temp_dir, "ocr_cache.sqlite3"),
+                )
+                self.assertIsNone(resolve_ocr_cache_path({"ocr_cache": False}))
+                explicit = os.path.join(temp_dir, "custom.sqlite3")
+                self.assertEqual(resolve_ocr_cache_path({"ocr_cache_path": explicit}), explicit)
+            finally:
+                for name, value in original_env.items():
+                    os.environ.pop(name, None)
+                    if value is not None:
+                        os.environ[name] = value
+
+    def test_build_ocr_mapping_only_sends_cache_misses_to_backend(self):
+        first_font = build_font_bytes({"\ue000": (600, 700), "\ue001": (300, 300)})
+        second_font = build_font_bytes({"\uf000": (600, 700), "\uf001": (200, 800)})
+
+        with TemporaryDirectory() as temp_dir:
+            options = {"ocr_cache_path": os.path.join(temp_dir, "cache.sqlite3")}
+
+            def run_mapping(font_path, font_bytes, chars):
+                backend = FakeBackend()
+                font_decrypt = FontDecrypt.__new__(FontDecrypt)
+                font_decrypt.epub = FakeEpub({font_path: font_bytes})
+                font_decrypt.ocr_backend = backend
+                font_decrypt.ocr_options = options
+                font_decrypt.font_to_char_mapping = {font_path: chars}
+                font_decrypt.font_to_replace_mapping = {}
+                font_decrypt.font_to_ocr_failure_mapping = {}
+                font_decrypt.build_ocr_mapping()
+                return backend, font_decrypt
+
+            first_backend, _ = run_mapping("a.ttf", first_font, "\ue000\ue001")
+            second_backend, second_decrypt = run_mapping("b.ttf", second_font, "\uf000\uf001")
+
+        self.assertEqual(first_backend.recognized, ["\ue000", "\ue001"])
+        self.assertEqual(second_backend.recognized, ["\uf001"])
+        self.assertEqual(
+            second_decrypt.font_to_replace_mapping["b.ttf"],
+            {"\uf000": "字", "\uf001": "字"},
+        )
+        self.assertEqual((second_decrypt.ocr_cache.hits, second_decrypt.ocr_cache.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
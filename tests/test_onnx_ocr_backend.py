@@ -112,6 +112,45 @@ PostProcess:
         self.assertEqual(tensor.shape, (1, 3, 48, 320))
         self.assertEqual(tensor.dtype, np.float32)
 
+    def test_recognize_batch_pads_chunks_to_shared_width(self):
+        class FakeSession:
+            def __init__(self):
+                self.shapes = []
+
+            def run(self, output_names, feeds):
+                tensor = feeds["x"]
+                self.shapes.append(tensor.shape)
+                prediction = np.zeros((tensor.shape[0], 2, 3), dtype=np.float32)
+                prediction[:, 0, 1] = 0.9
+                prediction[:, 1, 0] = 0.9
+                return [prediction]
+
+        backend = OnnxGlyphOcrBackend.__new__(OnnxGlyphOcrBackend)
+        backend.np = np
+        backend.image_shape = [3, 48, 320]
+        backend.image_mode = "RGB"
+        backend.max_img_width = 3200
+        backend.batch_size = 2
+        backend.characters = ["blank", "字", " "]
+        backend.input_name = "x"
+        backend.session = FakeSession()
+        images = [Image.new("RGB", (40, 40), (255, 255, 255)) for _ in range(4)]
+        images.append(Image.new("RGB", (480, 40), (255, 255, 255)))
+
+        results = backend.recognize_batch(images, hint_chars=list("abcde"))
+
+        self.assertEqual([result.text for result in results], ["字"] * 5)
+        self.assertEqual(
+            backend.session.shapes,
+            [(2, 3, 48, 320), (2, 3, 48, 320), (1, 3, 48, 576)],
+        )
+        self.assertEqual(
+            backend.recognize_batch(images[:3], batch_size=3)[0].text,
+            "字",
+        )
+        self.assertEqual(backend.session.shapes[-1], (3, 3, 48, 320))
+
+
 
 class FontGlyphRendererTest(unittest.TestCase):
     def test_small_glyph_bbox_triggers_adaptive_rendering(self):
@@ -301,6 +340,67 @@ class FontDecryptOcrTextCleanupTest(unittest.TestCase):
                     "U+E000 \ue000 " + status_code,
                 )
 
+    def test_build_ocr_mapping_batches_glyphs_and_isolates_failures(self):
+        class FakeEpub:
+            def read(self, path):
+                return b"font-bytes"
+
+        class FakeRenderer:
+            def __init__(self, font_bytes, font_path, options):
+                pass
+
+            def render(self, char):
+                if char == "\ue003":
+                    raise RuntimeError("render failed")
+                return Image.new("RGB", (16, 16), (255, 255, 255))
+
+            def is_period_like_image(self, image):
+                return False
+
+        class FakeBackend:
+            batch_size = 2
+
+            def __init__(self):
+                self.batches = []
+                self.single_calls = []
+
+            def recognize_batch(self, images, hint_chars=None, batch_size=None):
+                self.batches.append(list(hint_chars))
+                if "\ue001" in hint_chars:
+                    raise RuntimeError("batch failed")
+                return [OcrTextResult("字", 0.9) for _ in images]
+
+            def recognize(self, image, hint_char=""):
+                self.single_calls.append(hint_char)
+                if hint_char == "\ue001":
+                    raise RuntimeError("boom")
+                return OcrTextResult("文", 0.9)
+
+        backend = FakeBackend()
+        font_decrypt = FontDecrypt.__new__(FontDecrypt)
+        font_decrypt.epub = FakeEpub()
+        font_decrypt.ocr_backend = backend
+        font_decrypt.ocr_options = {"min_ocr_confidence": 0.8}
+        font_decrypt.font_to_char_mapping = {"font.ttf": "\ue000\ue001\ue002\ue003\ue004"}
+        font_decrypt.font_to_replace_mapping = {}
+        font_decrypt.font_to_ocr_failure_mapping = {}
+
+        with patch("python_backend.services.font.decrypt_font.FontGlyphRenderer", FakeRenderer):
+            font_decrypt.build_ocr_mapping()
+
+        self.assertEqual(
+            backend.batches,
+            [["\ue000", "\ue001"], ["\ue002"], ["\ue004"]],
+        )
+        self.assertEqual(backend.single_calls, ["\ue000", "\ue001"])
+        replace_table = font_decrypt.font_to_replace_mapping["font.ttf"]
+        self.assertEqual(list(replace_table), list("\ue000\ue001\ue002\ue003\ue004"))
+        self.assertEqual(replace_table["\ue000"], "文")
+        self.assertEqual(replace_table["\ue001"], "[U+E001 OCR_EXCEPTION]")
+        self.assertEqual(replace_table["\ue002"], "字")
+        self.assertEqual(replace_table["\ue003"], "[U+E003 OCR_EXCEPTION]")
+        self.assertEqual(replace_table["\ue004"], "字")
+
     def test_ocr_failed_placeholder_has_default_status_code(self):
         font_decrypt = self.create_font_decrypt()
         self.assertEqual(
@@ -1,5 +1,8 @@
 import os
+import tempfile
+import threading
 import unittest
+from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
@@ -42,7 +45,7 @@ class TaskRunnerLoadingTest(unittest.TestCase):
             result = task_runner.execute_task("reformat_epub", "book.epub", "output", {})
 
         self.assertEqual(result, 0)
-        run.assert_called_once_with("book.epub", "output")
+        run.assert_called_once_with("book.epub", "output", options={})
 
     def test_batch_font_targets_keeps_per_file_errors(self):
         def fake_list_font_targets(path):
@@ -61,6 +64,80 @@ class TaskRunnerLoadingTest(unittest.TestCase):
         self.assertEqual(events[1]["result"]["input_file"], os.path.normpath("broken.epub"))
         self.assertIn("损坏", events[1]["result"]["error"])
 
+    def test_concurrent_font_targets_stream_in_completion_order(self):
+        first_started = threading.Event()
+        release_first = threading.Event()
+
+        def fake_list_font_targets(path):
+            if path == "slow.epub":
+                first_started.set()
+                release_first.wait(5)
+            else:
+                first_started.wait(5)
+            return {"ok": True, "input_file": path, "font_families": [path]}
+
+        with patch.object(task_runner, "list_font_targets", side_effect=fake_list_font_targets):
+            events = []
+            for event in task_runner.iter_font_targets(
+                ["slow.epub", "fast.epub", "faster.epub"],
+                max_workers=3,
+            ):
+                events.append(event)
+                if len(events) == 2:
+                    release_first.set()
+
+        self.assertEqual(events[-1]["current_index"], 1)
+        self.assertEqual({event["current_index"] for event in events}, {1, 2, 3})
+        self.assertEqual(
+            [
+                result["input_file"]
+                for result in task_runner.collect_font_target_results(events)
+            ],
+            ["slow.epub", "fast.epub", "faster.epub"],
+        )
+
+    def test_font_targets_reject_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            list(task_runner.iter_font_targets(["a.epub"], max_workers=0))
+
+    def test_broadcast_logger_rate_limits_ui_events_but_keeps_file_detail(self):
+        emitter = Mock()
+        context = {
+            "current_file": "book.epub",
+            "current_index": 1,
+            "total_files": 1,
+            "progress": 0.0,
+            "output_path": None,
+        }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = Path(temp_dir) / "log.txt"
+            with patch.object(task_runner, "LOG_PATH", log_path):
+                logger = task_runner.BroadcastLogger(
+                    emitter, "task-1", lambda: context.copy(), level="info", event_interval=60
+                )
+                for index in range(5):
+                    logger.write(f"字符 {index}")
+                logger.debug("映射: %s", {"a": "b"})
+                logger.warning("字体缺少字符")
+                logger.flush()
+
+            lines = log_path.read_text(encoding="utf-8").splitlines()[1:]
+
+        self.assertEqual(lines, [f"字符 {index}" for index in range(5)] + ["字体缺少字符"])
+        events = [call.args[0] for call in emitter.emit.call_args_list]
+        self.assertEqual(
+            [(event.level, event.message) for event in events],
+            [
+                ("info", "字符 0"),
+                ("warning", "字体缺少字符（另有 4 条日志仅写入日志文件）"),
+            ],
+        )
+        self.assertTrue(all(event.event == "task.log" for event in events))
+
+    def test_invalid_log_level_option_is_rejected(self):
+        with self.assertRaises(ValueError):
+            task_runner.validate_task_options("reformat_epub", {"log_level": "verbose"})
+
 
 if __name__ == "__main__":
     unittest.main()
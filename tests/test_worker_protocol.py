@@ -41,6 +41,25 @@ class WorkerProtocolTest(unittest.TestCase):
         self.assertEqual(decoded["valid_pair"], "emoji-😀")
         self.assertNotIn("\\ud83d-value", encoded)
 
+    def test_run_jobs_flag_sets_max_workers_option(self):
+        args = cli.build_parser().parse_args(
+            [
+                "run",
+                "--task-type",
+                "image_compress",
+                "--input-file",
+                "book.epub",
+                "--options-json",
+                '{"jpeg_quality": 80}',
+                "--jobs",
+                "4",
+            ]
+        )
+
+        request = cli.load_request_from_args(args)
+
+        self.assertEqual(request.options, {"jpeg_quality": 80, "max_workers": 4})
+
     def test_parent_liveness_monitor_exits_when_rust_closes_socket(self):
         class FakeConnection:
             sent = b""
@@ -141,6 +160,44 @@ class WorkerProtocolTest(unittest.TestCase):
         self.assertTrue(response["ok"])
         self.assertEqual(response["result"]["status"], "success")
 
+    def test_serve_list_fonts_batch_streams_completion_order_and_returns_input_order(self):
+        original_stdin = sys.stdin
+        original_stdout = sys.stdout
+        sys.stdin = io.StringIO(
+            json.dumps(
+                {
+                    "request_id": "fonts-1",
+                    "command": "list-fonts-batch",
+                    "input_files": ["a.epub", "b.epub"],
+                    "max_workers": 2,
+                }
+            )
+            + "\n"
+        )
+        output = io.StringIO()
+        sys.stdout = output
+        events = [
+            {"event": "font-targets.progress", "current_index": 2, "total_files": 2, "result": {"input_file": "b.epub"}},
+            {"event": "font-targets.progress", "current_index": 1, "total_files": 2, "result": {"input_file": "a.epub"}},
+        ]
+        try:
+            with (
+                patch.object(cli, "iter_font_targets", return_value=iter(events)) as iter_targets,
+                patch.object(cli, "start_parent_monitor"),
+            ):
+                self.assertEqual(cli.cmd_serve(None), 0)
+        finally:
+            sys.stdin = original_stdin
+            sys.stdout = original_stdout
+
+        iter_targets.assert_called_once_with(["a.epub", "b.epub"], 2)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([line.get("current_index") for line in lines[:2]], [2, 1])
+        self.assertEqual(
+            [item["input_file"] for item in lines[2]["result"]],
+            ["a.epub", "b.epub"],
+        )
+
     def test_ocr_backend_is_reused_for_same_model_configuration(self):
         decrypt_font._OCR_BACKEND_CACHE.clear()
         options = {"onnx_max_image_width": 640}
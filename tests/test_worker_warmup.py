@@ -0,0 +1,161 @@
+import io
+import json
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from python_backend import cli
+from python_backend.protocol import TaskResult
+from python_backend.worker_warmup import (
+    OCR_BACKEND_RESOURCE,
+    WorkerWarmup,
+    request_warmup_targets,
+    resolve_warmup_targets,
+)
+
+
+class WorkerWarmupTest(unittest.TestCase):
+    def test_requests_wait_only_for_targets_still_loading(self):
+        release = threading.Event()
+        loaded = []
+
+        def loader(target):
+            if target == "decrypt_font":
+                release.wait(5)
+            loaded.append(target)
+
+        reports = []
+        finished = threading.Event()
+        warmup = WorkerWarmup(loader=loader)
+        warmup.start(
+            ["decrypt_font", "reformat_epub"],
+            lambda report: (reports.append(report), finished.set()),
+        )
+
+        warmup.wait_for(["encrypt_epub"])
+        waiter = threading.Thread(target=warmup.wait_for, args=(["decrypt_font"],))
+        waiter.start()
+        waiter.join(0.05)
+        self.assertTrue(waiter.is_alive())
+
+        release.set()
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(loaded, ["decrypt_font", "reformat_epub"])
+        self.assertTrue(reports[0]["ok"])
+        self.assertEqual(
+            [resource["name"] for resource in reports[0]["resources"]],
+            ["decrypt_font", "reformat_epub"],
+        )
+        self.assertTrue(
+            all(isinstance(resource["duration_ms"], int) for resource in reports[0]["resources"])
+        )
+
+    def test_failed_target_is_reported_and_can_be_retried(self):
+        attempts = []
+
+        def loader(target):
+            attempts.append(target)
+            if len(attempts) == 1:
+                raise RuntimeError("模型目录不存在")
+
+        warmup = WorkerWarmup(loader=loader)
+        reports = []
+        warmup.start([OCR_BACKEND_RESOURCE], reports.append).join(5)
+        warmup.start([OCR_BACKEND_RESOURCE], reports.append).join(5)
+
+        self.assertFalse(reports[0]["ok"])
+        self.assertEqual(reports[0]["resources"][0]["error"], "模型目录不存在")
+        self.assertTrue(reports[1]["ok"])
+        self.assertEqual(attempts, [OCR_BACKEND_RESOURCE, OCR_BACKEND_RESOURCE])
+
+    def test_loaded_targets_are_reported_as_cached(self):
+        warmup = WorkerWarmup(loader=lambda target: None)
+        reports = []
+        warmup.start(["reformat_epub"], reports.append).join(5)
+        warmup.start(["reformat_epub"], reports.append).join(5)
+
+        self.assertEqual(
+            reports[1]["resources"],
+            [{"name": "reformat_epub", "ok": True, "duration_ms": 0, "cached": True}],
+        )
+
+    def test_resolve_warmup_targets_validates_names(self):
+        self.assertIn(OCR_BACKEND_RESOURCE, resolve_warmup_targets(None))
+        self.assertEqual(
+            resolve_warmup_targets(["encrypt_font", "encrypt_font"]), ["encrypt_font"]
+        )
+        with self.assertRaises(ValueError):
+            resolve_warmup_targets(["unknown"])
+
+    def test_parallel_requests_wait_for_every_target(self):
+        self.assertEqual(request_warmup_targets("reformat_epub", {}), ["reformat_epub"])
+        self.assertIn(
+            OCR_BACKEND_RESOURCE,
+            request_warmup_targets("reformat_epub", {"max_workers": 2}),
+        )
+
+    def test_serve_preload_flag_defaults_to_font_targets(self):
+        args = cli.build_parser().parse_args(["serve", "--preload"])
+        self.assertEqual(args.preload, [])
+        self.assertIsNone(cli.build_parser().parse_args(["serve"]).preload)
+
+    def test_serve_warmup_command_responds_and_emits_warmup_event(self):
+        original_stdin = sys.stdin
+        original_stdout = sys.stdout
+        sys.stdin = io.StringIO(
+            json.dumps(
+                {"request_id": "warmup-1", "command": "warmup", "targets": ["decrypt_font"]}
+            )
+            + "\n"
+            + json.dumps(
+                {
+                    "request_id": "run-1",
+                    "command": "run",
+                    "request": {"task_type": "decrypt_font", "input_files": []},
+                }
+            )
+            + "\n"
+        )
+        output = io.StringIO()
+        sys.stdout = output
+        loaded = []
+
+        def slow_loader(target):
+            time.sleep(0.05)
+            loaded.append(target)
+
+        def run_task(request):
+            self.assertEqual(loaded, ["decrypt_font"])
+            return TaskResult(ok=True, status="success")
+
+        try:
+            with (
+                patch.object(cli, "WorkerWarmup", lambda: WorkerWarmup(loader=slow_loader)),
+                patch.object(cli, "run_task", side_effect=run_task),
+                patch.object(cli, "start_parent_monitor"),
+            ):
+                self.assertEqual(cli.cmd_serve(None), 0)
+            deadline = time.monotonic() + 5
+            while "worker.warmup" not in output.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            sys.stdin = original_stdin
+            sys.stdout = original_stdout
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        responses = [line for line in lines if line["event"] == "worker.response"]
+        self.assertEqual([line["request_id"] for line in responses], ["warmup-1", "run-1"])
+        self.assertEqual(responses[0]["result"], {"targets": ["decrypt_font"]})
+        self.assertTrue(responses[1]["ok"])
+        warmup_events = [line for line in lines if line["event"] == "worker.warmup"]
+        self.assertEqual(len(warmup_events), 1)
+        self.assertEqual(warmup_events[0]["request_id"], "warmup-1")
+        self.assertEqual(warmup_events[0]["resources"][0]["name"], "decrypt_font")
+
+
+if __name__ == "__main__":
+    unittest.main()